@@ -50,11 +50,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'gestion.middleware.PerformancesMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'gestion.middleware.RolesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -72,6 +74,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'gestion.context_processors.roles',
             ],
         },
     },
@@ -135,6 +138,32 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Cache disque des PDF de suivi de formation (éviction LRU au-delà de la taille max)
+SUIVI_PDF_CACHE_DIR = MEDIA_ROOT / 'cache_pdf_suivi'
+SUIVI_PDF_CACHE_MAX_BYTES = 200 * 1024 * 1024
+# Processus de mise en page pour l'archive ZIP des suivis d'une section (1 : dans le processus web)
+SUIVI_PDF_PROCESSUS = min(os.cpu_count() or 1, 4)
+
+# Rôles de l'utilisateur gardés en session entre les requêtes (invalidés quand ses groupes changent).
+# Avec plusieurs processus, n'activer qu'avec un cache partagé (CACHES).
+ROLES_CACHE_SESSION = False
+
+# Durée maximale (secondes) de mise en cache des statistiques du tableau de bord ;
+# elles sont de toute façon recalculées dès qu'un adhérent, une séance ou une évaluation change.
+DASHBOARD_STATS_DUREE = 300
+
+# Durée maximale (secondes) de conservation en cache d'une fiche de sécurité Excel générée ;
+# la fiche est regénérée dès que la séance, ses palanquées ou ses inscriptions changent.
+FICHE_SECURITE_CACHE_DUREE = 24 * 3600
+
+# Mesures de performance par page (rapport dans l'admin : Performances des pages) :
+# agrégées par tranche de PERFORMANCES_TRANCHE secondes, conservées PERFORMANCES_RETENTION secondes.
+# PERFORMANCES_JSONL : fichier recevant en plus une ligne JSON par réponse (None : désactivé).
+PERFORMANCES_ACTIVES = True
+PERFORMANCES_TRANCHE = 300
+PERFORMANCES_RETENTION = 7 * 24 * 3600
+PERFORMANCES_JSONL = None
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -158,6 +187,16 @@ EMAIL_USE_SSL = True
 EMAIL_HOST_USER = 'contact@app-suivitech.fr' #'ab.issolah@gmail.com'  # À configurer
 EMAIL_HOST_PASSWORD = 'az9^e5Wzox'  # À configurer
 DEFAULT_FROM_EMAIL = 'Aquadémie Paris Plongée <contact@app-suivitech.fr>'
+# Envois groupés : nombre maximal de mails envoyés sur une même connexion SMTP
+EMAIL_MESSAGES_PAR_CONNEXION = 50
+
+# Boîte d'envoi (commande traiter_boite_envoi) : pièces jointes des mails en file,
+# débit maximal accepté par le serveur SMTP, tentatives avant abandon (délai doublé
+# à chaque échec), fenêtre (secondes) pendant laquelle un mail identique n'est pas renvoyé.
+BOITE_ENVOI_DIR = MEDIA_ROOT / 'boite_envoi'
+BOITE_ENVOI_MAILS_PAR_MINUTE = 30
+BOITE_ENVOI_TENTATIVES_MAX = 5
+BOITE_ENVOI_FENETRE_DOUBLONS = 3600
 
 # Adresses en copie par défaut
 EMAIL_CC_DEFAULT = [
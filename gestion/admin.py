@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Adherent, Section, Competence, GroupeCompetence, Seance, Palanquee, Evaluation, LienEvaluation, Lieu, PalanqueeEleve, CorpsMailPdfPalanquees
+from .models import Adherent, Section, Competence, GroupeCompetence, Seance, Palanquee, Evaluation, LienEvaluation, Lieu, PalanqueeEleve, CorpsMailPdfPalanquees, StatistiquesCachePdf, TacheEnvoiPdfPalanquees, MailSortant, StatistiqueVue
+from . import pdf_cache, performances
 from django.contrib.auth.models import User
 
 @admin.register(Adherent)
@@ -148,3 +149,116 @@ class CorpsMailPdfPalanqueesAdmin(admin.ModelAdmin):
 
     def has_delete_permission(self, request, obj=None):
         return False
+
+
+@admin.register(StatistiquesCachePdf)
+class StatistiquesCachePdfAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'hits', 'misses', 'taux_succes_affiche', 'evictions', 'fichiers_en_cache', 'taille_cache', 'date_remise_a_zero']
+    readonly_fields = ['hits', 'misses', 'taux_succes_affiche', 'evictions', 'fichiers_en_cache', 'taille_cache', 'date_remise_a_zero']
+    actions = ['vider_cache', 'remettre_a_zero']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def taux_succes_affiche(self, obj):
+        return f"{obj.taux_succes} %" if obj.taux_succes is not None else '-'
+    taux_succes_affiche.short_description = 'Taux de succès'
+
+    def fichiers_en_cache(self, obj):
+        return pdf_cache.occupation()[0]
+    fichiers_en_cache.short_description = 'Fichiers en cache'
+
+    def taille_cache(self, obj):
+        return f"{pdf_cache.occupation()[1] / (1024 * 1024):.1f} Mo"
+    taille_cache.short_description = 'Taille sur disque'
+
+    def vider_cache(self, request, queryset):
+        nb = pdf_cache.vider()
+        self.message_user(request, f"{nb} PDF supprimé(s) du cache.")
+    vider_cache.short_description = 'Vider le cache des PDF'
+
+    def remettre_a_zero(self, request, queryset):
+        from django.utils import timezone
+        queryset.update(hits=0, misses=0, evictions=0, date_remise_a_zero=timezone.now())
+        self.message_user(request, "Compteurs remis à zéro.")
+    remettre_a_zero.short_description = 'Remettre les compteurs à zéro'
+
+    def changelist_view(self, request, extra_context=None):
+        # L'enregistrement unique est créé à la première consultation
+        StatistiquesCachePdf.get_singleton()
+        return super().changelist_view(request, extra_context)
+
+
+@admin.register(TacheEnvoiPdfPalanquees)
+class TacheEnvoiPdfPalanqueesAdmin(admin.ModelAdmin):
+    list_display = ['seance', 'statut', 'nb_envoyes', 'nb_total', 'auteur', 'date_creation', 'date_fin']
+    list_filter = ['statut']
+    readonly_fields = [
+        'seance', 'auteur', 'corps_html', 'statut', 'nb_total', 'nb_traites', 'nb_envoyes',
+        'destinataires', 'erreurs', 'resultat_notifie', 'date_creation', 'date_debut', 'date_reservation', 'date_fin',
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(MailSortant)
+class MailSortantAdmin(admin.ModelAdmin):
+    list_display = ['objet', 'destinataire', 'origine', 'statut', 'tentatives', 'prochaine_tentative', 'date_creation', 'date_envoi']
+    list_filter = ['statut', 'origine']
+    search_fields = ['destinataire', 'objet']
+    date_hierarchy = 'date_creation'
+    readonly_fields = [
+        'origine', 'seance', 'historique_seance', 'historique_adherents', 'destinataire', 'objet', 'message',
+        'empreinte', 'statut', 'tentatives', 'prochaine_tentative', 'derniere_erreur',
+        'date_creation', 'date_reservation', 'date_envoi',
+    ]
+    actions = ['remettre_en_file']
+
+    def has_add_permission(self, request):
+        return False
+
+    def remettre_en_file(self, request, queryset):
+        from django.utils import timezone
+        nb = queryset.filter(statut=MailSortant.STATUT_ECHEC).update(
+            statut=MailSortant.STATUT_EN_ATTENTE, tentatives=0, prochaine_tentative=timezone.now(),
+        )
+        self.message_user(request, f"{nb} mail(s) en échec remis en file d'envoi.")
+    remettre_en_file.short_description = "Remettre en file les mails en échec"
+
+
+@admin.register(StatistiqueVue)
+class StatistiqueVueAdmin(admin.ModelAdmin):
+    """Rapport des performances par route sur une fenêtre (?heures=) au lieu de la liste des tranches."""
+    fenetres = [(1, 'Dernière heure'), (24, '24 heures'), (168, '7 jours')]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        from datetime import timedelta
+        from django.template.response import TemplateResponse
+        from django.utils import timezone
+        try:
+            heures = int(request.GET.get('heures', 24))
+        except ValueError:
+            heures = 24
+        if heures not in dict(self.fenetres):
+            heures = 24
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Performances des pages',
+            'fenetres': self.fenetres,
+            'heures': heures,
+            'sections': performances.SECTIONS,
+            'lignes': performances.rapport(timezone.now() - timedelta(hours=heures)),
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, 'admin/gestion/statistiquevue/rapport.html', context)
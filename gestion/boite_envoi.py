@@ -0,0 +1,329 @@
+"""
+Boîte d'envoi des mails en masse.
+
+Les vues d'envoi (invitations, covoiturage, liens d'évaluation, communications)
+construisent leurs EmailMessage comme avant, puis mettre_en_file() les enregistre
+en MailSortant, un par destinataire, et la vue répond aussitôt. Les pièces jointes
+sont écrites une seule fois sous BOITE_ENVOI_DIR, dans un fichier nommé d'après
+l'empreinte de leur contenu : la même pièce jointe envoyée à cent adhérents
+n'occupe qu'un fichier.
+
+La commande traiter_boite_envoi envoie les mails arrivés à échéance au rythme
+BOITE_ENVOI_MAILS_PAR_MINUTE, sur une même connexion SMTP (envoyer_messages).
+Un échec passager est retenté plus tard, avec un délai doublé à chaque fois,
+jusqu'à BOITE_ENVOI_TENTATIVES_MAX tentatives ; un refus du serveur pour ce
+message est définitif. Un mail identique (mêmes destinataires, objet, contenu
+et pièces jointes) à un mail envoyé ou en file depuis moins de
+BOITE_ENVOI_FENETRE_DOUBLONS secondes n'est pas renvoyé : il est marqué doublon.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import timedelta
+from email import encoders
+from email.mime.base import MIMEBase
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .envoi_mail import envoyer_messages
+from .models import MailSortant
+
+logger = logging.getLogger(__name__)
+
+MAILS_PAR_MINUTE_DEFAUT = 30
+TENTATIVES_MAX_DEFAUT = 5
+FENETRE_DOUBLONS_DEFAUT = 3600
+DELAI_PREMIERE_RELANCE = 60
+DELAI_RELANCE_MAX = 3600
+# Un mail resté « en cours » plus longtemps vient d'un worker interrompu : il est remis en file
+DUREE_RESERVATION = timedelta(minutes=15)
+# Une pièce jointe plus référencée n'est supprimée qu'après ce délai (mise en file en cours)
+AGE_MIN_PURGE = 3600
+
+STATUTS_ACTIFS = (MailSortant.STATUT_EN_ATTENTE, MailSortant.STATUT_EN_COURS)
+# Mails dont les pièces jointes sont conservées : en file, ou en échec et remis en file depuis l'admin
+STATUTS_PIECES_JOINTES = STATUTS_ACTIFS + (MailSortant.STATUT_ECHEC,)
+# En-têtes recalculés à la reconstruction d'une pièce jointe MIME
+_ENTETES_MIME = {'mime-version', 'content-transfer-encoding'}
+
+
+def repertoire_pieces_jointes():
+    chemin = str(getattr(settings, 'BOITE_ENVOI_DIR', os.path.join(settings.MEDIA_ROOT, 'boite_envoi')))
+    os.makedirs(chemin, exist_ok=True)
+    return chemin
+
+
+def _ecrire_piece_jointe(source, contenu, deja_ecrites):
+    """
+    Écrit le contenu (s'il n'y est pas déjà) et retourne le nom du fichier : son empreinte SHA-256.
+    deja_ecrites : {id(source): (source, nom)} ; une pièce jointe partagée par tous les messages
+    (gestion.composition_mail) n'est ainsi lue et hachée qu'une fois par mise en file.
+    """
+    deja = deja_ecrites.get(id(source))
+    if deja is not None:
+        return deja[1]
+    contenu = contenu()
+    if isinstance(contenu, str):
+        contenu = contenu.encode('utf-8')
+    nom = hashlib.sha256(contenu).hexdigest()
+    repertoire = repertoire_pieces_jointes()
+    chemin = os.path.join(repertoire, nom)
+    if os.path.exists(chemin):
+        # Rafraîchit la date pour que purger_pieces_jointes ne la supprime pas avant l'enregistrement
+        os.utime(chemin)
+    else:
+        fd, temporaire = tempfile.mkstemp(dir=repertoire)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(contenu)
+        os.replace(temporaire, chemin)
+    # La référence à source garde son id unique tant que la mise en file dure
+    deja_ecrites[id(source)] = (source, nom)
+    return nom
+
+
+def _lire_piece_jointe(nom):
+    with open(os.path.join(repertoire_pieces_jointes(), nom), 'rb') as f:
+        return f.read()
+
+
+def serialiser(message, deja_ecrites):
+    """Dictionnaire JSON décrivant l'EmailMessage ; les pièces jointes sont écrites sur disque."""
+    pieces_jointes = []
+    for piece in message.attachments:
+        if isinstance(piece, MIMEBase):
+            # Image de signature en ligne (Content-ID) ou autre partie MIME construite par l'appelant
+            pieces_jointes.append({
+                'type': piece.get_content_type(),
+                'fichier': _ecrire_piece_jointe(piece, lambda: piece.get_payload(decode=True), deja_ecrites),
+                'entetes': [[nom, str(valeur)] for nom, valeur in piece.items() if nom.lower() not in _ENTETES_MIME],
+            })
+        else:
+            nom, contenu, type_mime = piece
+            pieces_jointes.append({
+                'nom': nom,
+                'type': type_mime,
+                'fichier': _ecrire_piece_jointe(contenu, lambda: contenu, deja_ecrites),
+            })
+    return {
+        'objet': str(message.subject),
+        'corps': message.body,
+        'sous_type': message.content_subtype,
+        'expediteur': message.from_email,
+        'to': list(message.to),
+        'cc': list(message.cc),
+        'bcc': list(message.bcc),
+        'reply_to': list(message.reply_to),
+        'entetes': dict(message.extra_headers),
+        'alternatives': [[contenu, type_mime] for contenu, type_mime in getattr(message, 'alternatives', [])],
+        'pieces_jointes': pieces_jointes,
+    }
+
+
+def reconstruire(donnees):
+    """EmailMultiAlternatives prêt à envoyer à partir du dictionnaire produit par serialiser()."""
+    message = EmailMultiAlternatives(
+        donnees['objet'], donnees['corps'], donnees['expediteur'], donnees['to'], donnees['bcc'],
+        cc=donnees['cc'], reply_to=donnees['reply_to'], headers=donnees['entetes'],
+    )
+    message.content_subtype = donnees['sous_type']
+    for contenu, type_mime in donnees['alternatives']:
+        message.attach_alternative(contenu, type_mime)
+    for piece in donnees['pieces_jointes']:
+        contenu = _lire_piece_jointe(piece['fichier'])
+        if 'entetes' in piece:
+            partie = MIMEBase(*piece['type'].split('/', 1))
+            partie.set_payload(contenu)
+            encoders.encode_base64(partie)
+            del partie['Content-Type']
+            for nom, valeur in piece['entetes']:
+                partie[nom] = valeur
+            message.attach(partie)
+        else:
+            message.attach(piece['nom'], contenu, piece['type'])
+    return message
+
+
+def empreinte(donnees):
+    """Empreinte du mail (destinataires, objet, contenu, pièces jointes) pour repérer les doublons."""
+    return hashlib.sha256(json.dumps(donnees, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _debut_fenetre_doublons():
+    return timezone.now() - timedelta(seconds=getattr(settings, 'BOITE_ENVOI_FENETRE_DOUBLONS', FENETRE_DOUBLONS_DEFAUT))
+
+
+def mettre_en_file(messages_a_envoyer, origine, seance=None, historique_seance=None, historique_adherents=None):
+    """
+    Enregistre les messages dans la boîte d'envoi.
+
+    messages_a_envoyer : itérable de couples (cle, EmailMessage), comme pour envoyer_messages.
+    origine : libellé de l'envoi (invitation, covoiturage...) ; seance et les historiques
+    sont rattachés à chaque MailSortant pour suivre l'envoi destinataire par destinataire.
+
+    Retourne la liste [(cle, MailSortant)] dans l'ordre des messages ; un message identique
+    à un mail envoyé ou en file récemment est enregistré avec le statut doublon et ne partira pas.
+    """
+    deja_ecrites = {}
+    a_creer = []
+    for cle, message in messages_a_envoyer:
+        donnees = serialiser(message, deja_ecrites)
+        a_creer.append((cle, MailSortant(
+            origine=origine,
+            seance=seance,
+            historique_seance=historique_seance,
+            historique_adherents=historique_adherents,
+            destinataire=', '.join(donnees['to'])[:254],
+            objet=donnees['objet'][:255],
+            message=donnees,
+            empreinte=empreinte(donnees),
+        )))
+    if not a_creer:
+        return []
+    with transaction.atomic():
+        deja_vues = set(MailSortant.objects.filter(
+            empreinte__in={mail.empreinte for _, mail in a_creer},
+            date_creation__gte=_debut_fenetre_doublons(),
+            statut__in=STATUTS_ACTIFS + (MailSortant.STATUT_ENVOYE,),
+        ).values_list('empreinte', flat=True))
+        for _, mail in a_creer:
+            if mail.empreinte in deja_vues:
+                mail.statut = MailSortant.STATUT_DOUBLON
+            deja_vues.add(mail.empreinte)
+        MailSortant.objects.bulk_create([mail for _, mail in a_creer])
+    return a_creer
+
+
+def hors_doublons(request, mis_en_file):
+    """Signale les mails écartés comme doublons et retourne les [(cle, MailSortant)] réellement en file."""
+    en_file = [(cle, mail) for cle, mail in mis_en_file if mail.statut != MailSortant.STATUT_DOUBLON]
+    nb_doublons = len(mis_en_file) - len(en_file)
+    if nb_doublons:
+        messages.warning(request, (
+            f"{nb_doublons} mail(s) identique(s) à un envoi récent non remis en file "
+            "(double clic ou renvoi trop rapproché)."
+        ))
+    return en_file
+
+
+def annoter_etat_envoi(queryset):
+    """Ajoute aux historiques de mails le nombre de leurs mails envoyés, en attente et en échec."""
+    return queryset.annotate(
+        nb_mails_envoyes=Count('mails', filter=Q(mails__statut=MailSortant.STATUT_ENVOYE)),
+        nb_mails_en_attente=Count('mails', filter=Q(mails__statut__in=STATUTS_ACTIFS)),
+        nb_mails_echec=Count('mails', filter=Q(mails__statut=MailSortant.STATUT_ECHEC)),
+    )
+
+
+def liberer_reservations_expirees():
+    """Remet en file les mails réservés par un worker interrompu avant d'avoir fini."""
+    return MailSortant.objects.filter(
+        statut=MailSortant.STATUT_EN_COURS,
+        date_reservation__lt=timezone.now() - DUREE_RESERVATION,
+    ).update(statut=MailSortant.STATUT_EN_ATTENTE)
+
+
+def reserver_mails(limite):
+    """
+    Réserve jusqu'à limite mails arrivés à échéance, les plus anciens d'abord.
+    Chaque réservation est un UPDATE conditionnel : deux workers ne prennent pas le même mail.
+    """
+    maintenant = timezone.now()
+    en_attente = MailSortant.objects.filter(statut=MailSortant.STATUT_EN_ATTENTE, prochaine_tentative__lte=maintenant)
+    reserves = []
+    for mail_id in en_attente.order_by('prochaine_tentative', 'id').values_list('id', flat=True)[:limite]:
+        if en_attente.filter(pk=mail_id).update(statut=MailSortant.STATUT_EN_COURS, date_reservation=maintenant):
+            reserves.append(mail_id)
+    return list(MailSortant.objects.filter(pk__in=reserves).order_by('prochaine_tentative', 'id'))
+
+
+def delai_relance(tentatives):
+    """Délai avant la tentative suivante : 1 min, 2 min, 4 min... plafonné à une heure."""
+    return timedelta(seconds=min(DELAI_PREMIERE_RELANCE * 2 ** (tentatives - 1), DELAI_RELANCE_MAX))
+
+
+def enregistrer_resultat(mail, erreur):
+    """Statut du mail après une tentative d'envoi (erreur : None si le mail est parti)."""
+    tentatives = mail.tentatives + 1
+    maintenant = timezone.now()
+    if erreur is None:
+        champs = {'statut': MailSortant.STATUT_ENVOYE, 'date_envoi': maintenant, 'derniere_erreur': ''}
+    elif getattr(erreur, 'definitive', False) or tentatives >= getattr(settings, 'BOITE_ENVOI_TENTATIVES_MAX', TENTATIVES_MAX_DEFAUT):
+        champs = {'statut': MailSortant.STATUT_ECHEC, 'derniere_erreur': str(erreur)}
+    else:
+        champs = {
+            'statut': MailSortant.STATUT_EN_ATTENTE,
+            'prochaine_tentative': maintenant + delai_relance(tentatives),
+            'derniere_erreur': str(erreur),
+        }
+    MailSortant.objects.filter(pk=mail.pk).update(tentatives=tentatives, **champs)
+    for champ, valeur in champs.items():
+        setattr(mail, champ, valeur)
+    mail.tentatives = tentatives
+
+
+def envoyer_mails_en_attente(par_minute=None, attendre=time.sleep):
+    """
+    Envoie un lot de mails arrivés à échéance (au plus une minute d'envoi au rythme par_minute).
+    Retourne les MailSortant traités avec leur nouveau statut ; liste vide si rien n'était à envoyer.
+    """
+    if par_minute is None:
+        par_minute = getattr(settings, 'BOITE_ENVOI_MAILS_PAR_MINUTE', MAILS_PAR_MINUTE_DEFAUT)
+    intervalle = 60 / par_minute
+    liberer_reservations_expirees()
+    mails = reserver_mails(max(int(par_minute), 1))
+    debut_fenetre = _debut_fenetre_doublons()
+
+    def construire_messages():
+        for mail in mails:
+            if MailSortant.objects.filter(
+                empreinte=mail.empreinte, statut=MailSortant.STATUT_ENVOYE, date_envoi__gte=debut_fenetre,
+            ).exclude(pk=mail.pk).exists():
+                # Mis en file deux fois en même temps : le premier est déjà parti
+                MailSortant.objects.filter(pk=mail.pk).update(statut=MailSortant.STATUT_DOUBLON)
+                mail.statut = MailSortant.STATUT_DOUBLON
+                continue
+            try:
+                message = reconstruire(mail.message)
+            except OSError as e:
+                logger.error("Mail %s : pièce jointe illisible (%s)", mail.pk, e)
+                MailSortant.objects.filter(pk=mail.pk).update(
+                    statut=MailSortant.STATUT_ECHEC, derniere_erreur=f"Pièce jointe illisible : {e}",
+                )
+                mail.statut = MailSortant.STATUT_ECHEC
+                continue
+            debut = time.monotonic()
+            yield mail, message
+            # Cadence : pas plus de par_minute mails par minute, d'un lot à l'autre compris
+            attendre(max(0, intervalle - (time.monotonic() - debut)))
+
+    envoyer_messages(construire_messages(), apres_envoi=enregistrer_resultat)
+    return mails
+
+
+def purger_pieces_jointes():
+    """
+    Supprime les pièces jointes que ne référencent plus que des mails envoyés ou doublons ;
+    retourne leur nombre. Celles des mails en échec restent : ils peuvent être remis en file.
+    """
+    referencees = set()
+    for donnees in MailSortant.objects.filter(statut__in=STATUTS_PIECES_JOINTES).values_list('message', flat=True).iterator():
+        referencees.update(piece['fichier'] for piece in donnees.get('pieces_jointes', []))
+    repertoire = repertoire_pieces_jointes()
+    limite = time.time() - AGE_MIN_PURGE
+    supprimees = 0
+    for entree in os.scandir(repertoire):
+        if entree.is_file() and entree.name not in referencees and entree.stat().st_mtime < limite:
+            try:
+                os.remove(entree.path)
+                supprimees += 1
+            except OSError:
+                pass
+    return supprimees
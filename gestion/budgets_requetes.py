@@ -0,0 +1,359 @@
+"""
+Budgets de requêtes SQL des routes de gestion/urls.py.
+
+Chaque route nommée a un Budget : le nombre maximal de requêtes de sa réponse
+sur le club synthétique de référence (voir la commande verifier_budgets_requetes).
+Sauf pour les routes marquées proportionnel (dette connue), le nombre de
+requêtes doit aussi rester le même sur un club plus grand : une requête par
+élève, par séance ou par inscription est un N+1.
+
+Les paramètres des URL sont pris dans objets_de_reference() : par défaut selon
+le nom du paramètre (seance_id → séance, eleve_id → élève...), sinon selon
+Budget.objets. Les données envoyées peuvent être une fonction des objets.
+"""
+import json
+from datetime import timedelta
+
+from django.contrib.auth.models import Group, User
+from django.db.models import Count
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from .models import (
+    Adherent, Competence, Evaluation, EvaluationExercice, Exercice, GroupeCompetence,
+    HistoriqueMailAdherents, LienEvaluation, LienInscriptionSeance, Lieu,
+    ListeDiffusion, ModeleMailAdherents, ModeleMailSeance, Seance, Section, TacheEnvoiPdfPalanquees,
+)
+
+# Objet pris par défaut pour chaque paramètre d'URL
+OBJETS_PAR_PARAMETRE = {
+    'seance_id': 'seance',
+    'eleve_id': 'eleve',
+    'section_id': 'section',
+    'exercice_id': 'exercice',
+    'adherent_id': 'eleve',
+    'palanquee_id': 'palanquee',
+    'inscription_id': 'inscription',
+    'tache_id': 'tache',
+    'mail_id': 'historique_adherents',
+    'liste_id': 'liste_diffusion',
+    'token': 'lien_evaluation',
+    'uuid': 'lien_inscription',
+}
+
+
+class Budget:
+    """
+    Budget de requêtes d'une route.
+
+    maximum : nombre de requêtes toléré sur le club de référence ;
+    proportionnel : le nombre de requêtes croît avec les données (dette connue, non vérifiée sur le grand club) ;
+    methode : 'get' ou 'post' ; donnees : paramètres GET ou POST, ou fonction(objets) -> paramètres ;
+    json : données envoyées en corps JSON ; objets : {paramètre de l'URL: clé dans objets_de_reference()} ;
+    anonyme : requête sans utilisateur connecté ; non_mesuree : raison pour laquelle la route n'est pas mesurée.
+    """
+
+    def __init__(self, maximum, proportionnel=False, methode='get', donnees=None, json=False, objets=None,
+                 anonyme=False, non_mesuree=None):
+        self.maximum = maximum
+        self.proportionnel = proportionnel
+        self.methode = methode
+        self.donnees = donnees
+        self.json = json
+        self.objets = objets or {}
+        self.anonyme = anonyme
+        self.non_mesuree = non_mesuree
+
+    def requete(self, nom, pattern, objets):
+        """(méthode, url, arguments du client de test) de la route sur les objets de référence."""
+        kwargs = {}
+        for parametre in pattern.pattern.converters:
+            cle = self.objets.get(parametre) or OBJETS_PAR_PARAMETRE.get(parametre)
+            if cle is None:
+                raise KeyError(f"{nom} : aucun objet pour le paramètre {parametre}")
+            objet = objets[cle]
+            kwargs[parametre] = getattr(objet, parametre, None) if parametre in ('token', 'uuid') else objet.pk
+        url = reverse(nom, kwargs=kwargs)
+        donnees = self.donnees(objets) if callable(self.donnees) else self.donnees
+        if self.json:
+            return self.methode, url, {'data': json.dumps(donnees or {}), 'content_type': 'application/json'}
+        return self.methode, url, {'data': donnees}
+
+
+_GABARIT_ABSENT = "gabarit absent du projet : la page répond par une erreur"
+
+
+def _sortie(budget):
+    """Budget d'une route des sorties : les paramètres seance_id et pk désignent la sortie."""
+    budget.objets = {'seance_id': 'sortie', 'pk': 'sortie', **budget.objets}
+    return budget
+
+
+# Les budgets sont les nombres de requêtes mesurés sur le club de référence. Les routes
+# proportionnel=True font aujourd'hui une requête par ligne affichée ou traitée (lieu de
+# chaque séance, section de chaque adhérent, inscriptions copiées une à une, envois par lot...) :
+# leur budget ne vaut que pour le club de référence.
+BUDGETS = {
+    # Authentification
+    'login': Budget(0, anonyme=True),
+    'logout': Budget(4, methode='post'),
+    'dashboard': Budget(14),
+
+    # Adhérents
+    'adherent_list': Budget(10),
+    'adherent_detail': Budget(12, proportionnel=True, objets={'pk': 'eleve'}),
+    'adherent_create': Budget(4),
+    'adherent_update': Budget(6, objets={'pk': 'eleve'}),
+    'adherent_delete': Budget(4, objets={'pk': 'eleve'}),
+    'adherent_desactiver': Budget(7, methode='post', objets={'pk': 'eleve'}),
+    'import_adherents_excel': Budget(3),
+    'download_excel_template': Budget(2),
+    'export_adherents_excel': Budget(7),
+    'adherent_public_create': Budget(0, anonyme=True),
+    'adherent_public_create_2025_2026': Budget(0, anonyme=True),
+    'adherent_public_success': Budget(14),
+    'valider_caci': Budget(3),
+    'copier_caci': Budget(3),
+    'copier_tous_caci': Budget(3),
+    'creer_compte_adherent': Budget(20),
+    'affecter_section_masse': Budget(6),
+    'adherents_communiquer': Budget(113, proportionnel=True),
+    'exporter_destinataires_adherents_excel': Budget(2),
+    'supprimer_historique_mail_adherents': Budget(5, methode='post'),
+    'supprimer_liste_diffusion': Budget(6, methode='post'),
+
+    # Élèves
+    'eleve_list': Budget(8),
+    'suivi_eleves': Budget(4),
+    'api_suivi_eleves_section': Budget(6, donnees=lambda o: {'section_id': o['section'].pk}),
+    'suivi_formation_eleve': Budget(10),
+    'suivi_formation_eleve_pdf': Budget(17),
+    'suivis_formation_section_zip': Budget(30, proportionnel=True),
+    'suivi_evaluations_exercices_eleve_pdf': Budget(17),
+    'validation_dt_eleve_exercice': Budget(10, methode='post'),
+
+    # Encadrants, sections, compétences
+    'encadrant_list': Budget(6, proportionnel=True),
+    'section_list': Budget(4),
+    'section_detail': Budget(11, objets={'pk': 'section'}),
+    'section_create': Budget(3),
+    'section_update': Budget(4, objets={'pk': 'section'}),
+    'section_delete': Budget(7, objets={'pk': 'section'}),
+    'competence_list': Budget(5),
+    'competence_create': Budget(6),
+    'competence_update': Budget(11, objets={'pk': 'competence'}),
+    'competence_delete': Budget(5, objets={'pk': 'competence'}),
+    'competence_detail': Budget(8, objets={'pk': 'competence'}),
+    'groupe_competence_list': Budget(14),
+    'exporter_groupes_competences_pdf': Budget(36),
+    'exporter_groupes_competences_evaluation_pdf': Budget(36),
+    'groupe_competence_create': Budget(25),
+    'groupe_competence_update': Budget(27, objets={'pk': 'groupe_competence'}),
+    'groupe_competence_delete': Budget(7, objets={'pk': 'groupe_competence'}),
+    'groupe_competence_detail': Budget(7, objets={'pk': 'groupe_competence'}),
+
+    # Séances
+    'seance_list': Budget(16),
+    'seance_detail': Budget(78, proportionnel=True, objets={'pk': 'seance'}),
+    'seance_create': Budget(5),
+    'seance_update': Budget(23, proportionnel=True, objets={'pk': 'seance'}),
+    'seance_delete': Budget(7, objets={'pk': 'seance'}),
+    'generer_lien_inscription_seance': Budget(7),
+    'envoyer_mail_invitation_seance': Budget(13, proportionnel=True),
+    'exporter_destinataires_invitation_excel': Budget(3),
+    'exporter_inscrits_seance': Budget(6),
+    'exporter_covoiturage_seance': Budget(4),
+    'importer_palanquees_seance': Budget(3),
+    'creer_palanquees': Budget(16, proportionnel=True),
+    'generer_fiche_securite': Budget(6),
+    'generer_fiche_securite_excel': Budget(10),
+    'admin_inscription_seance': Budget(7),
+    'api_corps_mail_pdf_palanquees': Budget(6),
+    'api_envoi_pdf_palanquees': Budget(3),
+    'envoyer_pdf_palanquees_encadrants': Budget(
+        9, methode='post', json=True, donnees={'corps_html': '<p>Bonjour {{ palanquee.encadrant.prenom }}</p>'},
+    ),
+    'envoyer_mail_covoiturage': Budget(4),
+    'exporter_destinataires_covoiturage_excel': Budget(3),
+    'envoyer_liens_evaluation_encadrants': Budget(70, proportionnel=True),
+    'exporter_destinataires_evaluation_excel': Budget(3),
+    'exporter_destinataires_pdf_excel': Budget(3),
+    'exporter_participations_encadrants_excel': Budget(5, donnees={'saison': 'toutes'}),
+    'participations_encadrants': Budget(6, donnees={'saison': 'toutes'}),
+    'api_participations_encadrants': Budget(5, donnees={'saison': 'toutes'}),
+    'seance_communiquer': Budget(7, objets={'pk': 'seance'}),
+    'exporter_destinataires_communication_excel': Budget(3),
+    'suivi_inscrits_seance': Budget(5),
+    'api_suivi_inscrits_section': Budget(7, donnees=lambda o: {'section_id': o['palanquee'].section_id}),
+    'api_historique_eleve_exercice': Budget(5),
+    'changer_role_inscription_seance': Budget(
+        4, methode='post', json=True, donnees=lambda o: {'inscription_id': o['inscription'].pk, 'role': 'eleve'},
+    ),
+    'exporter_inscrits_seance_excel': Budget(6),
+
+    # Sorties en mer
+    'sortie_list': Budget(6),
+    'sortie_detail': _sortie(Budget(46, proportionnel=True)),
+    'sortie_create': Budget(5),
+    'sortie_update': _sortie(Budget(20, proportionnel=True)),
+    'sortie_delete': _sortie(Budget(6)),
+    'sortie_creer_palanquees': _sortie(Budget(15, proportionnel=True)),
+    'sortie_generer_fiche_securite_excel': _sortie(Budget(10)),
+    'sortie_admin_inscription_seance': _sortie(Budget(7)),
+    'sortie_envoyer_pdf_palanquees_encadrants': _sortie(Budget(
+        9, methode='post', json=True, donnees={'corps_html': '<p>Bonjour {{ palanquee.encadrant.prenom }}</p>'},
+    )),
+    'sortie_envoyer_liens_evaluation_encadrants': _sortie(Budget(52, proportionnel=True)),
+    'sortie_exporter_destinataires_evaluation_excel': _sortie(Budget(3)),
+    'sortie_exporter_destinataires_pdf_excel': _sortie(Budget(3)),
+    'sortie_changer_role_inscription_seance': _sortie(Budget(
+        4, methode='post', json=True,
+        donnees=lambda o: {'inscription_id': o['inscription_sortie'].pk, 'role': 'eleve'},
+    )),
+    'sortie_exporter_inscrits_seance_excel': _sortie(Budget(6)),
+    'sortie_evaluations': _sortie(Budget(23, proportionnel=True)),
+    'dupliquer_inscrits_sortie': _sortie(Budget(
+        32, proportionnel=True, methode='post', donnees=lambda o: {'sortie_source_id': o['sortie_source'].pk},
+    )),
+    'dupliquer_inscrits_palanquees_sortie': _sortie(Budget(
+        391, proportionnel=True, methode='post',
+        donnees=lambda o: {'sortie_source_id': o['sortie_source'].pk, 'avec_exercices': '1'},
+    )),
+    'sortie_programmes_palanquees_pdf': _sortie(Budget(30, proportionnel=True)),
+
+    # Palanquées et évaluations
+    'palanquee_list': Budget(14, proportionnel=True),
+    'palanquee_detail': Budget(47, objets={'pk': 'palanquee'}),
+    'palanquee_create': Budget(18, proportionnel=True),
+    'palanquee_update': Budget(47, proportionnel=True, objets={'pk': 'palanquee'}),
+    'palanquee_delete': Budget(9, objets={'pk': 'palanquee'}),
+    'envoyer_pdf_palanquee_encadrant': Budget(15),
+    'palanquee_evaluation': Budget(None, objets={'pk': 'palanquee'}, non_mesuree=_GABARIT_ABSENT),
+    'palanquee_evaluation_view': Budget(22, objets={'pk': 'palanquee'}),
+    'generer_lien_evaluation': Budget(6, objets={'pk': 'palanquee'}),
+    'envoyer_lien_par_email': Budget(15, objets={'pk': 'palanquee'}),
+    'evaluation_publique': Budget(16, anonyme=True),
+    'generer_fiche_palanquee_pdf': Budget(12, objets={'pk': 'palanquee'}),
+    'evaluation_detail': Budget(None, objets={'pk': 'evaluation'}, non_mesuree=_GABARIT_ABSENT),
+    'evaluation_update': Budget(None, objets={'pk': 'evaluation'}, non_mesuree=_GABARIT_ABSENT),
+    'evaluation_delete': Budget(None, objets={'pk': 'evaluation'}, non_mesuree=_GABARIT_ABSENT),
+    'evaluations_list': Budget(8),
+
+    # Référentiel
+    'lieu_list': Budget(4),
+    'lieu_create': Budget(3),
+    'lieu_update': Budget(4, objets={'pk': 'lieu'}),
+    'lieu_delete': Budget(4, objets={'pk': 'lieu'}),
+    'exercice_list': Budget(4),
+    'exercice_create': Budget(3),
+    'exercice_update': Budget(4, objets={'pk': 'exercice'}),
+    'exercice_delete': Budget(4, objets={'pk': 'exercice'}),
+    'exercice_evaluation_list': Budget(4),
+    'exercice_evaluation_create': Budget(3),
+    'exercice_evaluation_update': Budget(4, objets={'pk': 'exercice_evaluation'}),
+    'exercice_evaluation_delete': Budget(4, objets={'pk': 'exercice_evaluation'}),
+    'import_exercices_evaluation_excel': Budget(3),
+
+    # APIs et inscriptions
+    'get_competences_section': Budget(3, donnees=lambda o: {'section_id': o['section'].pk}),
+    'get_eleves_section': Budget(5, donnees=lambda o: {'section_id': o['section'].pk}),
+    'get_palanquees_seance': Budget(5),
+    'dupliquer_exercices_palanquee': Budget(
+        28, proportionnel=True, methode='post', json=True,
+        donnees=lambda o: {'source': o['palanquee'].pk, 'cibles': o['palanquees_cibles']},
+    ),
+    'inscription_seance_uuid': Budget(3, anonyme=True),
+    'api_membres_app': Budget(6, donnees={'q': 'ele'}),
+    'api_inscrire_membre_app': Budget(
+        6, methode='post', json=True, anonyme=True,
+        donnees=lambda o: {'uuid': str(o['lien_inscription'].uuid), 'membre_id': o['membre_non_inscrit'].pk},
+    ),
+    'api_recherche_non_membre': Budget(4, donnees=lambda o: {'nom': o['non_adherent'].nom}),
+    'api_liste_non_adherents_actifs': Budget(3),
+    'api_details_non_adherent': Budget(4, objets={'adherent_id': 'non_adherent'}),
+    'api_inscrire_non_membre': Budget(
+        3, methode='post', anonyme=True,
+        donnees=lambda o: {
+            'uuid': str(o['lien_inscription'].uuid), 'nom': 'NOUVEAU', 'prenom': 'Invité',
+            'email': 'invite@exemple.fr', 'telephone': '0600000000', 'date_naissance': '1990-01-01',
+        },
+    ),
+    'supprimer_inscription_seance': Budget(5, methode='post'),
+    'envoyer_mail_inscription': Budget(2, methode='post', json=True, donnees={'email': 'invite@exemple.fr'}),
+    'api_modele_mail': Budget(3, objets={'modele_id': 'modele_mail'}),
+    'supprimer_modele_mail': Budget(4, methode='post', objets={'modele_id': 'modele_mail'}),
+    'supprimer_modele_mail_adherents': Budget(4, methode='post', objets={'modele_id': 'modele_mail_adherents'}),
+    'api_modele_mail_adherents': Budget(3, objets={'modele_id': 'modele_mail_adherents'}),
+}
+
+
+def routes(urlpatterns):
+    """{nom: pattern} des routes nommées d'une liste d'urlpatterns (includes compris)."""
+    trouvees = {}
+    for pattern in urlpatterns:
+        if isinstance(pattern, URLPattern):
+            if pattern.name:
+                trouvees[pattern.name] = pattern
+        else:
+            trouvees.update(routes(pattern.url_patterns))
+    return trouvees
+
+
+def _plus_chargee(seances):
+    return seances.annotate(nb=Count('palanques')).order_by('-nb', 'id').first()
+
+
+def objets_de_reference():
+    """
+    Objets désignés par les paramètres des routes, pris parmi les plus chargés du club
+    synthétique (séance aux palanquées les plus nombreuses, élève le plus évalué...),
+    complétés des objets que le générateur ne crée pas (liens, modèles, historiques).
+    """
+    seance = _plus_chargee(Seance.objects.filter(type=Seance.TYPE_SEANCE))
+    sorties = Seance.objects.filter(type=Seance.TYPE_SORTIE)
+    sortie = _plus_chargee(sorties)
+    palanquee = seance.palanques.annotate(nb=Count('eleves')).order_by('-nb', 'id').first()
+    palanquee.exercices_prevus.set(Exercice.objects.filter(
+        competences__section=palanquee.section, type=palanquee.type_exercice_attendu(),
+    ).distinct())
+    eleve_id = EvaluationExercice.objects.values('eleve_id').annotate(nb=Count('id')).order_by('-nb', 'eleve_id')[0]['eleve_id']
+    inscrits = seance.inscriptions.values('personne_id')
+    competence = palanquee.section.competences.order_by('id').first()
+    utilisateur = User.objects.create_superuser('budgets', 'budgets@exemple.fr', 'budgets')
+    utilisateur.groups.add(Group.objects.get_or_create(name='admin')[0])
+    liste = ListeDiffusion.objects.create(nom='Liste de mesure', auteur=utilisateur)
+    liste.adherents.set(Adherent.objects.filter(statut='eleve')[:20])
+    expiration = timezone.now() + timedelta(days=7)
+    return {
+        'utilisateur': utilisateur,
+        'seance': seance,
+        'sortie': sortie,
+        'sortie_source': sorties.exclude(pk=sortie.pk).order_by('-date').first(),
+        'palanquee': palanquee,
+        'palanquees_cibles': list(seance.palanques.exclude(pk=palanquee.pk).values_list('pk', flat=True)),
+        'eleve': Adherent.objects.get(pk=eleve_id),
+        'membre_non_inscrit': Adherent.objects.filter(type_personne='adherent', actif=True).exclude(id__in=inscrits).first(),
+        'non_adherent': Adherent.objects.filter(type_personne='non_adherent').order_by('id').first(),
+        'section': Section.objects.annotate(nb=Count('adherents')).order_by('-nb', 'id').first(),
+        'exercice': Exercice.objects.filter(type=Exercice.TYPE_CLASSIQUE).order_by('id').first(),
+        'exercice_evaluation': Exercice.objects.filter(type=Exercice.TYPE_EVALUATION).order_by('id').first(),
+        'competence': competence,
+        'groupe_competence': GroupeCompetence.objects.filter(section=palanquee.section).order_by('id').first(),
+        'lieu': Lieu.objects.order_by('id').first(),
+        'inscription': seance.inscriptions.order_by('id').first(),
+        'inscription_sortie': sortie.inscriptions.order_by('id').first(),
+        'evaluation': Evaluation.objects.create(
+            palanquee=palanquee, eleve=palanquee.eleves.first(), competence=competence, note=3,
+        ),
+        'lien_evaluation': LienEvaluation.objects.create(palanquee=palanquee, date_expiration=expiration),
+        'lien_inscription': LienInscriptionSeance.objects.create(seance=seance, date_expiration=expiration),
+        'tache': TacheEnvoiPdfPalanquees.objects.create(seance=seance, auteur=utilisateur, corps_html='<p>Bonjour</p>'),
+        'modele_mail': ModeleMailSeance.objects.create(nom='Modèle de mesure', objet='Objet', contenu='<p>Contenu</p>'),
+        'modele_mail_adherents': ModeleMailAdherents.objects.create(
+            nom='Modèle de mesure', objet='Objet', contenu='<p>Contenu</p>',
+        ),
+        'historique_adherents': HistoriqueMailAdherents.objects.create(
+            objet='Objet', contenu='<p>Contenu</p>', destinataires='eleve0@exemple.fr', auteur=utilisateur,
+        ),
+        'liste_diffusion': liste,
+    }
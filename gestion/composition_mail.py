@@ -0,0 +1,142 @@
+"""
+Composition des mails.
+
+Un ModeleMail décrit le mail d'un envoi : objet, texte et HTML sont compilés une
+fois (gabarit() pour une chaîne, gabarit_fichier() pour un template du projet,
+ou texte littéral), puis message() ne fait que le rendu des variables du
+destinataire. Les parties communes à tous les messages (image de signature,
+pièces jointes identiques comme la fiche de sécurité prévisionnelle ou les
+fichiers d'une communication) sont encodées une fois et la même partie MIME
+est jointe à chaque message ; l'image de signature reste en mémoire d'un envoi
+à l'autre tant que son fichier ne change pas.
+"""
+import mimetypes
+import os
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.image import MIMEImage
+from email.mime.text import MIMEText
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.template import engines
+from django.template.loader import get_template
+from django.utils.html import strip_tags
+
+SIGNATURE = 'Signature_mouss2.png'
+SIGNATURE_PDF = 'Signature_mouss.png'
+
+# {chemin: (date de modification, partie MIME)} des images de signature
+_signatures = {}
+
+
+def gabarit(source, echappement=True):
+    """Template compilé à partir d'une chaîne ; echappement=False pour un objet ou un texte brut."""
+    if not echappement:
+        source = '{% autoescape off %}' + source + '{% endautoescape %}'
+    return engines['django'].from_string(source)
+
+
+def gabarit_fichier(nom):
+    """Template du projet compilé une fois (comme render_to_string, sans relecture par destinataire)."""
+    return get_template(nom)
+
+
+def signature_inline(fichier=SIGNATURE):
+    """
+    Image de signature (static/<fichier>) en partie MIME en ligne, référencée par cid:signature_mouss2.
+    La même partie est partagée par tous les messages ; None si le fichier n'existe pas.
+    """
+    chemin = os.path.join(settings.BASE_DIR, 'static', fichier)
+    try:
+        date_modification = os.stat(chemin).st_mtime_ns
+    except OSError:
+        return None
+    en_cache = _signatures.get(chemin)
+    if en_cache is None or en_cache[0] != date_modification:
+        with open(chemin, 'rb') as img:
+            partie = MIMEImage(img.read(), _subtype='png')
+        partie.add_header('Content-ID', '<signature_mouss2>')
+        partie.add_header('Content-Disposition', 'inline', filename='Signature_mouss2.png')
+        _signatures[chemin] = en_cache = (date_modification, partie)
+    return en_cache[1]
+
+
+def piece_jointe(nom, contenu, type_mime=None):
+    """
+    Pièce jointe encodée une fois, à joindre telle quelle à plusieurs messages. Comme
+    EmailMessage.attach() : type deviné d'après le nom s'il manque, texte en UTF-8, et
+    un texte qui n'est pas de l'UTF-8 valide est joint en application/octet-stream.
+    """
+    type_mime = type_mime or mimetypes.guess_type(nom)[0] or 'application/octet-stream'
+    principal, sous_type = type_mime.split('/', 1)
+    if principal == 'text' and isinstance(contenu, bytes):
+        try:
+            contenu = contenu.decode()
+        except UnicodeDecodeError:
+            principal, sous_type = 'application', 'octet-stream'
+    if principal == 'text':
+        partie = MIMEText(contenu, sous_type, 'utf-8')
+    else:
+        partie = MIMEBase(principal, sous_type)
+        partie.set_payload(contenu)
+        encoders.encode_base64(partie)
+    partie.add_header('Content-Disposition', 'attachment', filename=nom)
+    return partie
+
+
+def _rendre(valeur, contexte):
+    if valeur is None or isinstance(valeur, str):
+        return valeur
+    return valeur.render(contexte)
+
+
+class ModeleMail:
+    """
+    Mail d'un envoi, rendu pour chaque destinataire par message().
+
+    objet, texte, html : texte littéral ou template compilé (gabarit, gabarit_fichier).
+    Sans texte, le texte est tiré du HTML ; avec html_seul, le HTML est le corps du mail
+    (sans version texte). contexte : variables communes à tous les destinataires.
+    pieces_jointes : [(nom, contenu, type)] communes, encodées une fois.
+    signature : fichier de l'image de signature en ligne (static/), ou None.
+    """
+
+    def __init__(self, objet, texte=None, html=None, html_seul=False, contexte=None, pieces_jointes=(),
+                 signature=None, from_email=None, cc=None, reply_to=None):
+        self.objet = objet
+        self.texte = texte
+        self.html = html
+        self.html_seul = html_seul
+        self.contexte = contexte or {}
+        self.parties_communes = [piece_jointe(*piece) for piece in pieces_jointes]
+        self.partie_signature = signature_inline(signature) if signature else None
+        self.from_email = from_email
+        self.cc = list(cc or [])
+        self.reply_to = list(reply_to or [])
+
+    def message(self, to, contexte=None, pieces_jointes=()):
+        """EmailMultiAlternatives pour les destinataires to ; pieces_jointes : [(nom, contenu, type)] propres à ce message."""
+        contexte = {**self.contexte, **(contexte or {})}
+        html = _rendre(self.html, contexte)
+        if self.html_seul:
+            corps = html
+        elif self.texte is not None:
+            corps = _rendre(self.texte, contexte)
+        else:
+            corps = strip_tags(html or '').strip() or '(message vide)'
+        message = EmailMultiAlternatives(
+            _rendre(self.objet, contexte), corps, self.from_email, list(to),
+            cc=self.cc, reply_to=self.reply_to,
+        )
+        if self.html_seul:
+            message.content_subtype = 'html'
+        elif html is not None:
+            message.attach_alternative(html, 'text/html')
+        for piece in pieces_jointes:
+            message.attach(*piece)
+        for partie in self.parties_communes:
+            message.attach(partie)
+        if self.partie_signature is not None:
+            message.attach(self.partie_signature)
+        return message
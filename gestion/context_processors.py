@@ -0,0 +1,6 @@
+from .roles import roles_requete
+
+
+def roles(request):
+    """Expose les rôles de l'utilisateur aux templates : {% if 'admin' in roles %}."""
+    return {'roles': roles_requete(request)}
@@ -0,0 +1,199 @@
+"""
+Génération d'un club synthétique pour les mesures de performance : sections,
+référentiel de compétences, adhérents, séances, sorties en mer, palanquées,
+inscriptions et évaluations d'exercices, insérés par lots (bulk_create, sans
+signaux).
+
+Réservé aux bases de test : la génération ne vérifie pas que la base est vide.
+base_de_mesure() fournit une telle base, créée puis détruite.
+"""
+import os
+import random
+import tempfile
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from .models import (
+    Adherent, Competence, EvaluationExercice, Exercice, GroupeCompetence, InscriptionSeance,
+    Lieu, Palanquee, PalanqueeEleve, Seance, Section,
+)
+from .progression import reconstruire_progressions
+from .recherche import indexer_adherents
+from .statistiques_dashboard import invalider_statistiques
+
+TAILLE_LOT = 2000
+SECTIONS = ['prepa_niveau1', 'prepa_niveau2', 'prepa_niveau3', 'niveau3', 'niveau4']
+
+
+@contextmanager
+def base_de_mesure():
+    """
+    Base de test créée puis détruite, dans l'environnement du client de test (mails en mémoire),
+    avec un cache en mémoire et des fichiers (médias, cache PDF, boîte d'envoi) temporaires :
+    la base, le cache et les médias configurés ne sont pas touchés. Les PDF de suivi sont
+    générés dans le processus courant : un pool ouvrirait la base configurée. Les mesures de
+    performance des pages sont désactivées : leur enregistrement ajouterait des requêtes.
+    """
+    nom_base = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    setup_test_environment()
+    try:
+        with tempfile.TemporaryDirectory() as repertoire, override_settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'mesure'}},
+            MEDIA_ROOT=repertoire,
+            SUIVI_PDF_CACHE_DIR=os.path.join(repertoire, 'cache_pdf_suivi'),
+            BOITE_ENVOI_DIR=os.path.join(repertoire, 'boite_envoi'),
+            SUIVI_PDF_PROCESSUS=1,
+            PERFORMANCES_ACTIVES=False,
+        ):
+            yield
+    finally:
+        teardown_test_environment()
+        connection.creation.destroy_test_db(nom_base, verbosity=0)
+
+
+def _adherent(rnd, i, statut, section_nom=''):
+    return Adherent(
+        nom=f"{'ENC' if statut == 'encadrant' else 'ELEVE'}{i:04d}",
+        prenom=rnd.choice(['Hélène', 'Jérôme', 'Zoé', 'Amine', 'Léa', 'Noël']),
+        date_naissance=date(1970, 1, 1) + timedelta(days=rnd.randrange(15000)),
+        adresse='1 rue de la Plongée',
+        email=f"{statut}{i}@exemple.fr",
+        telephone='0600000000',
+        niveau='initiateur1' if statut == 'encadrant' else 'niveau1',
+        statut=statut,
+        type_personne='adherent' if rnd.random() < 0.9 else 'non_adherent',
+        actif=rnd.random() < 0.95,
+        date_delivrance_caci=date.today() - timedelta(days=rnd.randrange(500)),
+    )
+
+
+@transaction.atomic
+def generer_club(nb_evaluations=50000, nb_eleves=300, nb_encadrants=40, nb_seances=120,
+                 nb_exercices=60, graine=1, avec_progressions=True, nb_sorties=0,
+                 avec_index_recherche=True):
+    """
+    Crée un club complet et retourne un résumé {nom: nombre d'objets créés}.
+    Les séances sont hebdomadaires ; les sorties en mer (sans lieu) sont réparties
+    sur la même période, le samedi. Le tirage est déterministe pour une graine donnée.
+    avec_index_recherche=False : les jetons de recherche ne sont pas écrits (schéma
+    antérieur à la migration 0033, voir mesurer_index).
+    """
+    rnd = random.Random(graine)
+    sections = [Section.objects.get_or_create(nom=nom)[0] for nom in SECTIONS]
+    lieu = Lieu.objects.create(nom='Piscine synthétique', adresse='1 rue du Bassin', code_postal='75000', ville='Paris')
+
+    # Référentiel : exercices répartis dans 4 compétences et 2 groupes par section
+    exercices = Exercice.objects.bulk_create([
+        Exercice(nom=f"Exercice {i:03d}", type=Exercice.TYPE_EVALUATION if i % 10 == 0 else Exercice.TYPE_CLASSIQUE)
+        for i in range(nb_exercices)
+    ])
+    exercices_par_section = {}
+    for s_index, section in enumerate(sections):
+        exercices_section = exercices[s_index::len(sections)]
+        exercices_par_section[section.id] = exercices_section
+        competences = []
+        for c in range(4):
+            competence = Competence.objects.create(nom=f"Compétence {c + 1}", section=section)
+            competence.exercices.set(exercices_section[c::4])
+            competences.append(competence)
+        for g in range(2):
+            groupe = GroupeCompetence.objects.create(
+                section=section, intitule=f"Groupe {g + 1}",
+                competences_attendues='-', technique='-', modalites_evaluation='-',
+            )
+            groupe.competences.set(competences[g::2])
+
+    encadrants = Adherent.objects.bulk_create([_adherent(rnd, i, 'encadrant') for i in range(nb_encadrants)])
+    eleves = Adherent.objects.bulk_create([_adherent(rnd, i, 'eleve') for i in range(nb_eleves)])
+    if avec_index_recherche:
+        indexer_adherents(encadrants + eleves)
+    section_eleve = {}
+    liens_sections = []
+    for eleve in eleves:
+        section = rnd.choice(sections)
+        section_eleve[eleve.id] = section
+        liens_sections.append(Adherent.sections.through(adherent_id=eleve.id, section_id=section.id))
+    Adherent.sections.through.objects.bulk_create(liens_sections, batch_size=TAILLE_LOT)
+
+    debut = date.today() - timedelta(days=7 * nb_seances)
+    seances = Seance.objects.bulk_create([
+        Seance(date=debut + timedelta(days=7 * i), lieu=lieu) for i in range(nb_seances)
+    ] + [
+        Seance(date=debut + timedelta(days=7 * (i * nb_seances // nb_sorties) + 5), type=Seance.TYPE_SORTIE)
+        for i in range(nb_sorties)
+    ])
+
+    # Palanquées : par séance, les élèves inscrits sont groupés par section, 4 par encadrant
+    palanquees, membres, inscriptions = [], [], []
+    for seance in seances:
+        presents = rnd.sample(eleves, min(len(eleves), max(4, nb_eleves // 5)))
+        encadrants_seance = rnd.sample(encadrants, min(len(encadrants), max(1, len(presents) // 4)))
+        for personne in presents + encadrants_seance:
+            inscriptions.append(InscriptionSeance(seance=seance, personne=personne, covoiturage='none'))
+        par_section = {}
+        for eleve in presents:
+            par_section.setdefault(section_eleve[eleve.id].id, []).append(eleve)
+        for section_id, groupe in par_section.items():
+            for k in range(0, len(groupe), 4):
+                palanquee = Palanquee(
+                    nom=f"P{len(palanquees) + 1}", seance=seance, section_id=section_id,
+                    encadrant=rnd.choice(encadrants_seance), precision_exercices='',
+                )
+                palanquees.append(palanquee)
+                membres.append((palanquee, groupe[k:k + 4]))
+    InscriptionSeance.objects.bulk_create(inscriptions, batch_size=TAILLE_LOT)
+    Palanquee.objects.bulk_create(palanquees, batch_size=TAILLE_LOT)
+    PalanqueeEleve.objects.bulk_create(
+        [PalanqueeEleve(palanquee=p, eleve=e) for p, groupe in membres for e in groupe],
+        batch_size=TAILLE_LOT,
+    )
+
+    # Évaluations : tirées dans les palanquées, sur les exercices de la section
+    maintenant = timezone.now()
+    evaluations = []
+    nb_creees = 0
+    while nb_creees < nb_evaluations:
+        palanquee, groupe = rnd.choice(membres)
+        eleve = rnd.choice(groupe)
+        note = rnd.choice([1, 2, 3, 3, None])
+        evaluations.append(EvaluationExercice(
+            palanquee=palanquee,
+            eleve=eleve,
+            exercice=rnd.choice(exercices_par_section[palanquee.section_id]),
+            encadrant=palanquee.encadrant,
+            note=note,
+            raison_non_realise=None if note else 'temps',
+            commentaire='',
+        ))
+        nb_creees += 1
+        if len(evaluations) >= TAILLE_LOT or nb_creees == nb_evaluations:
+            EvaluationExercice.objects.bulk_create(evaluations)
+            evaluations = []
+    # date_evaluation est en auto_now : on étale les dates après coup, une requête par séance
+    for seance in seances:
+        EvaluationExercice.objects.filter(palanquee__seance=seance).update(
+            date_evaluation=maintenant - timedelta(days=(date.today() - seance.date).days)
+        )
+
+    resume = {
+        'sections': len(sections),
+        'exercices': len(exercices),
+        'encadrants': len(encadrants),
+        'eleves': len(eleves),
+        'seances': nb_seances,
+        'sorties': nb_sorties,
+        'palanquees': len(palanquees),
+        'inscriptions': len(inscriptions),
+        'evaluations': nb_creees,
+    }
+    if avec_progressions:
+        resume['progressions'] = reconstruire_progressions()
+    # Insertions en masse : aucun signal n'a invalidé les statistiques du tableau de bord
+    invalider_statistiques()
+    return resume
@@ -0,0 +1,102 @@
+"""
+Envoi groupé des mails.
+
+Les envois en masse (boîte d'envoi, PDF palanquées) passent par
+envoyer_messages() : une connexion SMTP est ouverte pour un lot de messages
+et réutilisée, au lieu d'une poignée de main SSL par destinataire. La connexion est renouvelée tous les
+EMAIL_MESSAGES_PAR_CONNEXION messages et après une coupure ; un message
+interrompu par une coupure est retenté une fois sur une connexion neuve.
+"""
+import logging
+import smtplib
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+from .performances import section
+
+logger = logging.getLogger(__name__)
+
+MESSAGES_PAR_CONNEXION_DEFAUT = 50
+
+# Refus du serveur pour ce message précis : la connexion reste utilisable, inutile de réessayer
+ERREURS_DEFINITIVES = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+class ErreurEnvoi(str):
+    """Texte de l'erreur d'envoi d'un message ; definitive : inutile de le renvoyer plus tard."""
+
+    def __new__(cls, texte, definitive=False):
+        erreur = super().__new__(cls, texte)
+        erreur.definitive = definitive
+        return erreur
+
+
+def _fermer(connexion):
+    try:
+        connexion.close()
+    except Exception:
+        pass
+
+
+def envoyer_messages(messages, par_connexion=None, pause=0, apres_envoi=None):
+    """
+    Envoie des messages en réutilisant la connexion SMTP.
+
+    messages : itérable de couples (cle, EmailMessage) ; cle identifie le destinataire
+    pour l'appelant (adhérent, inscription, palanquée...). Le générateur peut construire
+    les messages au fur et à mesure.
+    par_connexion : nombre maximal de messages par connexion (EMAIL_MESSAGES_PAR_CONNEXION).
+    pause : secondes d'attente avant d'ouvrir chaque nouvelle connexion après la première.
+    apres_envoi : fonction appelée avec (cle, erreur) après chaque message (suivi de progression).
+
+    Retourne la liste [(cle, erreur)] dans l'ordre d'envoi : erreur vaut None si le
+    message est parti, sinon le texte de l'erreur (ErreurEnvoi).
+    """
+    if par_connexion is None:
+        par_connexion = getattr(settings, 'EMAIL_MESSAGES_PAR_CONNEXION', MESSAGES_PAR_CONNEXION_DEFAUT)
+    resultats = []
+    connexion = None
+    envoyes_sur_connexion = 0
+    nb_connexions = 0
+    try:
+        for cle, message in messages:
+            for tentative in (1, 2):
+                erreur = None
+                try:
+                    if connexion is None:
+                        if nb_connexions and pause:
+                            time.sleep(pause)
+                        connexion = get_connection(fail_silently=False)
+                        with section('smtp'):
+                            connexion.open()
+                        nb_connexions += 1
+                        envoyes_sur_connexion = 0
+                    with section('smtp'):
+                        envoye = connexion.send_messages([message])
+                    if envoye:
+                        envoyes_sur_connexion += 1
+                    else:
+                        erreur = ErreurEnvoi("Aucun destinataire valide", definitive=True)
+                    break
+                except ERREURS_DEFINITIVES as e:
+                    erreur = ErreurEnvoi(str(e), definitive=True)
+                    break
+                except Exception as e:
+                    # Connexion perdue ou refusée : on repart d'une connexion neuve
+                    logger.warning("Envoi de mail interrompu (tentative %s) : %s", tentative, e)
+                    if connexion is not None:
+                        _fermer(connexion)
+                        connexion = None
+                    erreur = ErreurEnvoi(str(e))
+            resultats.append((cle, erreur))
+            if apres_envoi is not None:
+                apres_envoi(cle, erreur)
+            if connexion is not None and envoyes_sur_connexion >= par_connexion:
+                _fermer(connexion)
+                connexion = None
+    finally:
+        if connexion is not None:
+            _fermer(connexion)
+    return resultats
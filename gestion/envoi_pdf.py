@@ -0,0 +1,273 @@
+"""
+Envoi en arrière-plan des PDF de palanquée aux encadrants d'une séance.
+
+La vue envoyer_pdf_palanquees_encadrants enregistre une TacheEnvoiPdfPalanquees
+et répond aussitôt ; la commande traiter_envois_pdf exécute les tâches en
+attente. Les fiches de palanquée et les PDF de suivi sont mis en page dans un
+pool de processus, puis les mails partent sur une même connexion SMTP en
+mettant à jour la progression de la tâche, que la page séance interroge jusqu'à la fin.
+
+Chaque progression, et chaque fiche ou lot de PDF de suivi mis en page, renouvelle
+la réservation de la tâche : une tâche « en cours » dont la réservation a expiré
+(worker arrêté) est reprise par le worker suivant, sans renvoyer les mails déjà partis.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib import messages
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .composition_mail import SIGNATURE_PDF, ModeleMail, gabarit
+from .envoi_mail import envoyer_messages
+from .models import Palanquee, TacheEnvoiPdfPalanquees
+from .palanquee_views import write_palanquee_pdf
+from .suivi_pdf import TAILLE_LOT, initialiser_processus, pdfs_suivi_lot
+from .utils import get_signature_html
+
+logger = logging.getLogger(__name__)
+
+# Une tâche « en cours » sans progression depuis plus longtemps vient d'un worker interrompu : elle est reprise
+DUREE_RESERVATION = timedelta(minutes=15)
+
+
+def creer_tache(seance, corps_html, auteur=None):
+    return TacheEnvoiPdfPalanquees.objects.create(
+        seance=seance,
+        corps_html=corps_html,
+        auteur=auteur if auteur is not None and auteur.is_authenticated else None,
+    )
+
+
+def prendre_tache_suivante():
+    """
+    Réserve la plus ancienne tâche en attente, ou en cours dont la réservation a expiré,
+    et la passe « en cours ». La réservation est un UPDATE conditionnel : deux workers
+    ne peuvent pas prendre la même tâche.
+    """
+    maintenant = timezone.now()
+    disponibles = TacheEnvoiPdfPalanquees.objects.filter(
+        Q(statut=TacheEnvoiPdfPalanquees.STATUT_EN_ATTENTE)
+        | Q(statut=TacheEnvoiPdfPalanquees.STATUT_EN_COURS, date_reservation__lt=maintenant - DUREE_RESERVATION)
+        # Tâches prises avant l'ajout de date_reservation
+        | Q(statut=TacheEnvoiPdfPalanquees.STATUT_EN_COURS, date_reservation__isnull=True)
+    )
+    for tache_id in disponibles.order_by('date_creation', 'id').values_list('id', flat=True)[:10]:
+        reservee = disponibles.filter(pk=tache_id).update(
+            statut=TacheEnvoiPdfPalanquees.STATUT_EN_COURS,
+            date_debut=Coalesce('date_debut', maintenant),
+            date_reservation=maintenant,
+        )
+        if reservee:
+            return TacheEnvoiPdfPalanquees.objects.select_related('seance__lieu').get(pk=tache_id)
+    return None
+
+
+def _pdf_palanquee(palanquee_id):
+    """
+    Tâche d'un pool de processus : fiche PDF d'une palanquée.
+    Retourne (palanquee_id, contenu, None) ou (palanquee_id, None, message d'erreur).
+    """
+    try:
+        palanquee = Palanquee.objects.select_related('seance__lieu', 'section', 'encadrant').get(pk=palanquee_id)
+        buffer = BytesIO()
+        write_palanquee_pdf(buffer, palanquee)
+    except Exception as e:
+        logger.exception("Fiche PDF de la palanquée %s", palanquee_id)
+        return palanquee_id, None, str(e)
+    return palanquee_id, buffer.getvalue(), None
+
+
+def generer_pdfs(palanquee_ids, eleve_ids, processus=1, renouveler=None):
+    """
+    Met en page les fiches de palanquée et les PDF de suivi des élèves.
+    Retourne ({palanquee_id: PDF}, {palanquee_id: erreur}, {eleve_id: PDF de suivi}, {eleve_id: erreur}) :
+    une fiche ou un PDF de suivi en échec n'empêche pas de générer les autres.
+    Avec processus > 1, le travail ReportLab est réparti sur un pool de processus
+    (une fiche par tâche, les élèves par lots de TAILLE_LOT). renouveler() est appelé
+    après chaque fiche et chaque lot (renouvellement de la réservation de la tâche).
+    """
+    palanquee_ids = list(palanquee_ids)
+    eleve_ids = list(eleve_ids)
+    lots = [tuple(eleve_ids[i:i + TAILLE_LOT]) for i in range(0, len(eleve_ids), TAILLE_LOT)]
+    pdfs_palanquees, erreurs_palanquees, pdfs_suivi, erreurs_suivi = {}, {}, {}, {}
+
+    def fiche_terminee(palanquee_id, pdf, erreur):
+        if erreur is None:
+            pdfs_palanquees[palanquee_id] = pdf
+        else:
+            erreurs_palanquees[palanquee_id] = erreur
+        if renouveler:
+            renouveler()
+
+    def lot_termine(pdfs, erreurs):
+        pdfs_suivi.update(pdfs)
+        erreurs_suivi.update(erreurs)
+        if renouveler:
+            renouveler()
+
+    if processus > 1:
+        # Chaque processus ouvre ses propres connexions à la base
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=processus, initializer=initialiser_processus) as pool:
+            taches = {pool.submit(_pdf_palanquee, palanquee_id): ('fiche', palanquee_id) for palanquee_id in palanquee_ids}
+            taches.update({pool.submit(pdfs_suivi_lot, list(lot)): ('lot', lot) for lot in lots})
+            for tache in as_completed(taches):
+                nature, cle = taches[tache]
+                try:
+                    resultat = tache.result()
+                except Exception as e:
+                    # Processus du pool interrompu pendant la mise en page
+                    resultat = (cle, None, str(e)) if nature == 'fiche' else ({}, {eleve_id: str(e) for eleve_id in cle})
+                if nature == 'fiche':
+                    fiche_terminee(*resultat)
+                else:
+                    lot_termine(*resultat)
+    else:
+        for palanquee_id in palanquee_ids:
+            fiche_terminee(*_pdf_palanquee(palanquee_id))
+        for lot in lots:
+            lot_termine(*pdfs_suivi_lot(list(lot)))
+    return pdfs_palanquees, erreurs_palanquees, pdfs_suivi, erreurs_suivi
+
+
+def _lire_fiche_previsionnelle(seance, erreurs):
+    if not seance.fiche_securite_previsionnelle:
+        return None
+    try:
+        with open(seance.fiche_securite_previsionnelle.path, 'rb') as f:
+            return os.path.basename(seance.fiche_securite_previsionnelle.name), f.read()
+    except Exception as e:
+        erreurs.append(f"Fiche de sécu prévisionnelle : impossible de joindre le fichier ({str(e)}).")
+        return None
+
+
+def executer_tache(tache, processus=1):
+    """
+    Génère les PDF et envoie un mail par encadrant, en enregistrant la progression au fil de l'eau.
+    Une tâche reprise après l'arrêt d'un worker n'envoie que les mails qui n'étaient pas partis.
+    """
+    champs_progression = ['nb_total', 'nb_traites', 'nb_envoyes', 'destinataires', 'erreurs', 'date_reservation']
+
+    def enregistrer_progression():
+        tache.date_reservation = timezone.now()
+        tache.save(update_fields=champs_progression)
+
+    def renouveler_reservation():
+        tache.date_reservation = timezone.now()
+        TacheEnvoiPdfPalanquees.objects.filter(pk=tache.pk).update(date_reservation=tache.date_reservation)
+
+    try:
+        seance = tache.seance
+        palanquees = [
+            palanquee for palanquee in seance.palanques.select_related('encadrant', 'seance').prefetch_related('eleves')
+            if palanquee.encadrant and palanquee.encadrant.email
+        ]
+        tache.nb_total = len(palanquees)
+        # Reprise : les envois réussis sont gardés, les échecs seront retentés
+        deja_envoyees = {destinataire.get('palanquee_id') for destinataire in tache.destinataires}
+        palanquees = [palanquee for palanquee in palanquees if palanquee.id not in deja_envoyees]
+        tache.nb_traites = tache.nb_envoyes
+        tache.erreurs = []
+        enregistrer_progression()
+
+        pdfs_palanquees, erreurs_palanquees, pdfs_suivi, erreurs_suivi = generer_pdfs(
+            [palanquee.id for palanquee in palanquees],
+            {eleve.id for palanquee in palanquees for eleve in palanquee.eleves.all()},
+            processus=processus,
+            renouveler=renouveler_reservation,
+        )
+        enregistrer_progression()
+        fiche_previsionnelle = _lire_fiche_previsionnelle(seance, tache.erreurs)
+        # Corps compilé une fois ; signature et fiche prévisionnelle encodées une fois pour tous les encadrants
+        modele = ModeleMail(
+            gabarit("Fiche palanquée - {{ palanquee.nom }} ({{ seance.date|date:'Y-m-d' }})", echappement=False),
+            html=gabarit(tache.corps_html + get_signature_html()),
+            contexte={'seance': seance},
+            pieces_jointes=[(*fiche_previsionnelle, 'application/octet-stream')] if fiche_previsionnelle else [],
+            signature=SIGNATURE_PDF,
+            cc=getattr(settings, 'EMAIL_CC_DEFAULT', []),
+        )
+
+        def construire_messages():
+            for palanquee in palanquees:
+                encadrant = palanquee.encadrant
+                if palanquee.id in erreurs_palanquees:
+                    tache.erreurs.append(
+                        f"{encadrant.nom_complet} : impossible de générer la fiche de palanquée ({erreurs_palanquees[palanquee.id]})."
+                    )
+                    tache.nb_traites += 1
+                    enregistrer_progression()
+                    continue
+                pieces_jointes = [(
+                    f"fiche_palanquee_{seance.date}_{encadrant.nom_complet}.pdf",
+                    pdfs_palanquees[palanquee.id],
+                    'application/pdf',
+                )]
+                for eleve in palanquee.eleves.all():
+                    if eleve.id in erreurs_suivi:
+                        tache.erreurs.append(
+                            f"{encadrant.nom_complet} - {eleve.nom_complet} : impossible de générer le PDF de suivi ({erreurs_suivi[eleve.id]})."
+                        )
+                        continue
+                    pieces_jointes.append((
+                        f"suivi_formation_{eleve.nom_complet.replace(' ', '_')}.pdf",
+                        pdfs_suivi[eleve.id],
+                        'application/pdf'
+                    ))
+                # Corps du mail : template Django + signature, texte tiré du HTML
+                try:
+                    email = modele.message([encadrant.email], {'palanquee': palanquee}, pieces_jointes=pieces_jointes)
+                except Exception as e:
+                    tache.erreurs.append(f"{encadrant.nom_complet} (rendu du message) : {str(e)}")
+                    tache.nb_traites += 1
+                    enregistrer_progression()
+                    continue
+                yield palanquee, email
+
+        def apres_envoi(palanquee, erreur):
+            encadrant = palanquee.encadrant
+            if erreur:
+                tache.erreurs.append(f"{encadrant.nom_complet} : {erreur}")
+            else:
+                tache.nb_envoyes += 1
+                tache.destinataires.append({
+                    'nom': encadrant.nom,
+                    'prenom': encadrant.prenom,
+                    'email': encadrant.email,
+                    'palanquee': palanquee.nom,
+                    'palanquee_id': palanquee.id,
+                })
+            tache.nb_traites += 1
+            enregistrer_progression()
+
+        envoyer_messages(construire_messages(), apres_envoi=apres_envoi)
+        tache.statut = TacheEnvoiPdfPalanquees.STATUT_TERMINEE
+    except Exception as e:
+        logger.exception("Échec de l'envoi des PDF palanquées (tâche %s)", tache.pk)
+        tache.erreurs.append(f"Envoi interrompu : {str(e)}")
+        tache.statut = TacheEnvoiPdfPalanquees.STATUT_ECHEC
+    tache.date_fin = timezone.now()
+    tache.save(update_fields=champs_progression + ['statut', 'date_fin'])
+    return tache
+
+
+def messages_resultat(tache):
+    """Lignes de compte rendu [(niveau, texte)] d'une tâche terminée, comme affichées sur la page séance."""
+    lignes = []
+    if tache.nb_envoyes:
+        lignes.append((messages.SUCCESS, f"{tache.nb_envoyes} PDF envoyés aux encadrants."))
+    elif not tache.erreurs:
+        lignes.append((messages.WARNING, (
+            "Aucun PDF envoyé : vérifiez qu'il existe des palanquées avec un encadrant "
+            "disposant d'une adresse e-mail."
+        )))
+    if tache.erreurs:
+        lignes.append((messages.ERROR, "Erreurs lors de l'envoi : " + ", ".join(tache.erreurs)))
+    return lignes
@@ -0,0 +1,138 @@
+"""
+Exports Excel en écriture seule.
+
+Les lignes sont ajoutées au fil de l'itération (listes ou querysets parcourus
+avec .iterator()) dans un classeur openpyxl write_only : chaque feuille est
+écrite dans un fichier temporaire au lieu de garder toutes les cellules en
+mémoire. Les mises en forme sont des styles nommés déclarés une fois par
+classeur (_styles()) et référencés par leur nom. Le classeur terminé est envoyé
+depuis un fichier temporaire, par blocs (FileResponse).
+"""
+import tempfile
+
+from django.http import FileResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+from .performances import section
+
+TYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Lignes lues par requête lorsqu'une feuille parcourt un queryset
+TAILLE_LOT = 500
+
+_bordure_fine = Side(style='thin')
+
+
+def _styles():
+    return [
+        # En-tête de tableau des listes de destinataires
+        NamedStyle(
+            name='entete',
+            font=Font(bold=True, color='FFFFFF'),
+            fill=PatternFill(start_color='366092', end_color='366092', fill_type='solid'),
+            alignment=Alignment(horizontal='center', vertical='center'),
+        ),
+        # En-tête sur fond clair (tableau des participations)
+        NamedStyle(
+            name='entete_clair',
+            font=Font(bold=True),
+            fill=PatternFill(start_color='D9E1F2', end_color='D9E1F2', fill_type='solid'),
+            alignment=Alignment(horizontal='center', vertical='center'),
+        ),
+        # En-tête de colonnes encadré (présentation des anciens exports pandas)
+        NamedStyle(
+            name='entete_colonne',
+            font=Font(bold=True),
+            border=Border(left=_bordure_fine, right=_bordure_fine, top=_bordure_fine, bottom=_bordure_fine),
+            alignment=Alignment(horizontal='center', vertical='top'),
+        ),
+        NamedStyle(name='centre', alignment=Alignment(horizontal='center', vertical='center')),
+        NamedStyle(name='vertical', alignment=Alignment(text_rotation=90, vertical='bottom', horizontal='center')),
+    ]
+
+
+class Feuille:
+    """Feuille en écriture seule : les lignes sont écrites dans l'ordre, sans retour en arrière."""
+
+    def __init__(self, ws):
+        self.ws = ws
+
+    def ligne(self, valeurs, style=None, styles=None):
+        """
+        Ajoute une ligne. style : nom du style de toutes les cellules ;
+        styles : {indice de colonne (à partir de 0): nom de style}, prioritaire sur style.
+        """
+        if style is None and not styles:
+            with section('openpyxl'):
+                self.ws.append(list(valeurs))
+            return
+        styles = styles or {}
+        cellules = []
+        for indice, valeur in enumerate(valeurs):
+            nom = styles.get(indice, style)
+            if nom is None:
+                cellules.append(valeur)
+            else:
+                cellule = WriteOnlyCell(self.ws, value=valeur)
+                cellule.style = nom
+                cellules.append(cellule)
+        with section('openpyxl'):
+            self.ws.append(cellules)
+
+    def lignes(self, lignes, style=None, styles=None):
+        for valeurs in lignes:
+            self.ligne(valeurs, style=style, styles=styles)
+
+
+class ClasseurExcel:
+    """Classeur write_only muni des styles nommés (entete, entete_clair, entete_colonne, centre, vertical)."""
+
+    def __init__(self):
+        self.classeur = Workbook(write_only=True)
+        for style in _styles():
+            self.classeur.add_named_style(style)
+
+    def feuille(self, titre, largeurs=()):
+        """Nouvelle feuille ; largeurs : largeur de chaque colonne en partant de A."""
+        ws = self.classeur.create_sheet(titre)
+        for indice, largeur in enumerate(largeurs, 1):
+            ws.column_dimensions[get_column_letter(indice)].width = largeur
+        return Feuille(ws)
+
+    def reponse(self, nom_fichier):
+        """Réponse de téléchargement : le classeur est enregistré dans un fichier temporaire puis envoyé par blocs."""
+        fichier = tempfile.TemporaryFile()
+        try:
+            with section('openpyxl'):
+                self.classeur.save(fichier)
+        except Exception:
+            fichier.close()
+            raise
+        fichier.seek(0)
+        return FileResponse(fichier, as_attachment=True, filename=nom_fichier, content_type=TYPE_XLSX)
+
+
+def parcourir(queryset, taille_lot=TAILLE_LOT):
+    """Itère un queryset par lots (prefetch_related compris) sans le garder en cache."""
+    return queryset.iterator(chunk_size=taille_lot)
+
+
+def export_destinataires(titre_feuille, entete, colonnes, destinataires, nom_fichier):
+    """
+    Export d'une liste de destinataires enregistrée en session :
+    lignes d'information (entete), ligne vide, en-têtes de colonnes puis un destinataire par ligne.
+    colonnes : [(titre, clé du destinataire, largeur)] ; nom et prénom sont mis en forme comme à l'écran.
+    """
+    classeur = ClasseurExcel()
+    feuille = classeur.feuille(titre_feuille, [largeur for _, _, largeur in colonnes])
+    for texte in entete:
+        feuille.ligne([texte, ''])
+    feuille.ligne([''])
+    feuille.ligne([titre for titre, _, _ in colonnes], style='entete')
+    formats = {'nom': str.upper, 'prenom': str.capitalize}
+    for dest in destinataires:
+        feuille.ligne([formats.get(cle, lambda valeur: valeur)(dest.get(cle, '')) for _, cle, _ in colonnes])
+    return classeur.reponse(nom_fichier)
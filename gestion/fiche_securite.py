@@ -0,0 +1,488 @@
+"""
+Fiches de sécurité Excel d'une séance (modèle fiche_securite_modele.xlsx) ou
+d'une sortie (modèle ESTARTIT).
+
+Chaque modèle est chargé et restructuré (en-têtes, fusions, ligne des aptitudes
+moniteurs) une seule fois par processus, puis conservé sérialisé : une fiche
+part d'une copie obtenue par pickle.loads, bien plus rapide qu'un
+openpyxl.load_workbook suivi des dé-fusions et copies de styles.
+
+Le fichier généré est mis en cache (cache Django) sous une empreinte de la
+séance : date de modification, palanquées, élèves et aptitudes, inscriptions,
+personnes concernées, lieu, modèle et date du jour (âges). Tant que rien ne
+change, un nouveau téléchargement ne coûte que le calcul de l'empreinte.
+"""
+import pickle
+from copy import copy
+from datetime import date
+from io import BytesIO
+from pathlib import Path
+
+import openpyxl
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.crypto import salted_hmac
+from openpyxl.styles import Alignment, Border
+from openpyxl.utils import column_index_from_string, get_column_letter, range_boundaries
+
+from .models import Adherent, PalanqueeEleve
+from .performances import section
+
+MODELE_SEANCE = 'fiche_securite_modele.xlsx'
+MOTIF_MODELE_SORTIE = 'ESTARTIT*securite.xlsx'
+DUREE_DEFAUT = 24 * 3600
+
+# Colonnes palanquées de la fiche sortie (14 max dans le modèle, 3 colonnes fusionnées par palanquée).
+COLONNES_PALANQUEES_SORTIE = ['U', 'X', 'AA', 'AD', 'AG', 'AJ', 'AM', 'AP', 'AS', 'AV', 'AY', 'BB', 'BE', 'BH']
+# Ligne 16 réservée aux aptitudes moniteurs (E1, E2, …) ; élèves décalés d'une ligne.
+LIGNE_APTITUDES_MONITEURS = 16
+PREMIERE_LIGNE_ELEVE = 17
+DERNIERE_LIGNE_ELEVE = 42
+
+# Blocs palanquée de la fiche séance (9 par feuille)
+BLOCS_SEANCE = [
+    (18, 'A'), (18, 'M'), (18, 'Y'),
+    (31, 'A'), (31, 'M'), (31, 'Y'),
+    (44, 'A'), (44, 'M'), (44, 'Y'),
+]
+COLONNE_NIVEAU = {'A': 'J', 'M': 'V', 'Y': 'AH'}
+COLONNE_PROFONDEUR = {'A': 'F', 'M': 'R', 'Y': 'AD'}
+COLONNE_DUREE = {'A': 'J', 'M': 'V', 'Y': 'AH'}
+
+# {chemin du modèle: (date de modification du fichier, classeur préparé sérialisé)}
+_modeles = {}
+
+
+def _niveau_court(adherent):
+    mapping = {
+        'debutant': 'DEB',
+        'niveau1': 'N1',
+        'niveau2': 'N2',
+        'niveau3': 'N3',
+        'initiateur1': 'E1',
+        'initiateur2': 'E2',
+        'moniteur_federal1': 'E3',
+        'moniteur_federal2': 'E4',
+    }
+    return mapping.get(getattr(adherent, 'niveau', None), '-')
+
+
+def _niveau_encadrant_display(niveau):
+    mapping = {
+        'encadrant1': 'E1',
+        'encadrant2': 'E2',
+        'initiateur1': 'E1',
+        'initiateur2': 'E2',
+        'moniteur_federal1': 'E3',
+        'moniteur_federal2': 'E4',
+    }
+    return mapping.get(niveau, niveau)
+
+
+# --- Modèles préparés ---
+
+def chemin_modele(sortie):
+    """Chemin du modèle ; FileNotFoundError si le modèle sortie est absent."""
+    if not sortie:
+        return Path(MODELE_SEANCE)
+    # Gère l'espace insécable dans le nom de fichier
+    candidats = sorted(Path('.').glob(MOTIF_MODELE_SORTIE))
+    if not candidats:
+        raise FileNotFoundError("Modèle ESTARTIT introuvable (ESTARTIT*securite.xlsx).")
+    return candidats[0]
+
+
+def _classeur(chemin, preparer=None):
+    """
+    Copie du modèle chargé puis préparé (preparer(ws)), une fois par processus
+    et par version du fichier modèle.
+    """
+    version = chemin.stat().st_mtime_ns
+    modele = _modeles.get(str(chemin))
+    if modele is None or modele[0] != version:
+        wb = openpyxl.load_workbook(chemin)
+        if preparer:
+            preparer(wb.active)
+        modele = _modeles[str(chemin)] = (version, pickle.dumps(wb, pickle.HIGHEST_PROTOCOL))
+    return pickle.loads(modele[1])
+
+
+def _safe_unmerge_cells(ws, range_string):
+    """Dé-fusionne une plage en créant les cellules manquantes (contournement KeyError openpyxl)."""
+    min_col, min_row, max_col, max_row = range_boundaries(range_string)
+    for row in range(min_row, max_row + 1):
+        for col in range(min_col, max_col + 1):
+            if (row, col) not in ws._cells:
+                ws.cell(row=row, column=col)
+    ws.unmerge_cells(range_string)
+
+
+def _restructure_plongee_header(ws):
+    """Fusionne PLONGEE n°1/n°2 en « PLONGEE n° » + cellule numéro à côté (BE)."""
+    to_unmerge = []
+    for merged_range in list(ws.merged_cells.ranges):
+        if merged_range.min_col >= 57 and merged_range.max_row <= 4:
+            to_unmerge.append(str(merged_range))
+    for ref in to_unmerge:
+        _safe_unmerge_cells(ws, ref)
+    ws.merge_cells('BE1:BF4')
+    ws.merge_cells('BG1:BK4')
+    ws['BG1'] = 'PLONGEE n°'
+    ws['BE1'] = ''
+    for cell_ref in ('BG1', 'BE1'):
+        ws[cell_ref].alignment = Alignment(horizontal='center', vertical='center')
+
+
+def _set_aptitude_moniteurs_title(ws, row):
+    """Titre fusionné B:P sur la ligne des aptitudes moniteurs."""
+    col_b, col_p = 2, 16
+    to_unmerge = []
+    for merged_range in list(ws.merged_cells.ranges):
+        if (
+            merged_range.min_row == row
+            and merged_range.max_row == row
+            and merged_range.min_col >= col_b
+            and merged_range.max_col <= col_p
+        ):
+            to_unmerge.append(str(merged_range))
+    for ref in to_unmerge:
+        _safe_unmerge_cells(ws, ref)
+    ws.merge_cells(f'B{row}:P{row}')
+
+    # Même fond que l'en-tête « Nom » (ligne 15), bordures gauche/droite comme la ligne élève suivante.
+    header_fill = copy(ws['D15'].fill)
+    ref_row_below = row + 1
+    left_side = copy(ws.cell(ref_row_below, col_b).border.left)
+    right_side = copy(ws.cell(ref_row_below, col_p).border.right)
+    for col in range(col_b, col_p + 1):
+        cell = ws.cell(row=row, column=col)
+        cell.fill = copy(header_fill)
+        cell.border = Border(
+            left=left_side if col == col_b else None,
+            right=right_side if col == col_p else None,
+        )
+
+    title_cell = ws[f'B{row}']
+    title_cell.value = 'Aptitude moniteurs'
+    title_cell.alignment = Alignment(horizontal='center', vertical='center')
+
+
+def _apply_row_borders_from_below(ws, row, col_min, col_max):
+    """Reproduit les bordures de la ligne suivante (ex. colonnes R → fin palanquées)."""
+    ref_row = row + 1
+    for col in range(col_min, col_max + 1):
+        ref_border = ws.cell(ref_row, col).border
+        ws.cell(row, col).border = Border(
+            left=copy(ref_border.left) if ref_border.left else None,
+            right=copy(ref_border.right) if ref_border.right else None,
+            top=copy(ref_border.top) if ref_border.top else None,
+            bottom=copy(ref_border.bottom) if ref_border.bottom else None,
+        )
+
+
+def _unmerge_cells_on_row(ws, row, col_min, col_max):
+    """Dé-fusionne les plages qui chevauchent une ligne et une bande de colonnes."""
+    to_unmerge = []
+    for merged_range in list(ws.merged_cells.ranges):
+        if (
+            merged_range.min_row <= row <= merged_range.max_row
+            and merged_range.min_col <= col_max
+            and merged_range.max_col >= col_min
+        ):
+            to_unmerge.append(str(merged_range))
+    for ref in to_unmerge:
+        _safe_unmerge_cells(ws, ref)
+
+
+def _row_has_eleve_merges(ws, row):
+    for merged_range in ws.merged_cells.ranges:
+        if (
+            merged_range.min_row == row
+            and merged_range.max_row == row
+            and merged_range.min_col == 2
+            and merged_range.max_col == 3
+        ):
+            return True
+    return False
+
+
+def _apply_ligne_eleve_merges(ws, row, col_starts_palanquees):
+    """
+    Réapplique les fusions d'une ligne élève (B:C, O:P, R:T, palanquées par 3 colonnes).
+    Nécessaire pour la dernière ligne après insert_rows, qui perd ses fusions avec openpyxl.
+    """
+    _unmerge_cells_on_row(ws, row, 2, 62)
+    for start_col, end_col in (('B', 'C'), ('O', 'P'), ('R', 'T')):
+        ws.merge_cells(f'{start_col}{row}:{end_col}{row}')
+    for col_start in col_starts_palanquees:
+        end_col = get_column_letter(column_index_from_string(col_start) + 2)
+        ws.merge_cells(f'{col_start}{row}:{end_col}{row}')
+
+
+def _copy_row_styles_from_reference(ws, row, ref_row, col_min, col_max):
+    """Copie bordures et fond depuis une ligne de référence (ligne au-dessus)."""
+    for col in range(col_min, col_max + 1):
+        ref_cell = ws.cell(ref_row, col)
+        cell = ws.cell(row, col)
+        if ref_cell.has_style:
+            cell.border = copy(ref_cell.border)
+            cell.fill = copy(ref_cell.fill)
+
+
+def _preparer_modele_sortie(ws):
+    """Restructuration du modèle ESTARTIT indépendante de la sortie, faite une fois par processus."""
+    col_starts = COLONNES_PALANQUEES_SORTIE
+    row_aptitudes_moniteurs = LIGNE_APTITUDES_MONITEURS
+    _restructure_plongee_header(ws)
+    ws.insert_rows(row_aptitudes_moniteurs)
+
+    # Nettoyage entête colonnes.
+    for col in col_starts:
+        ws[f'{col}14'] = ''
+        ws[f'{col}15'] = ''
+        ws[f'{col}{row_aptitudes_moniteurs}'] = ''
+        ws[f'{col}6'] = ''
+        ws[f'{col}7'] = ''
+
+    _set_aptitude_moniteurs_title(ws, row_aptitudes_moniteurs)
+
+    # Bordures colonnes R → fin des palanquées (R16:T16, U16:W16, …), comme les lignes élèves.
+    col_r = column_index_from_string('R')
+    col_last_palanquee = column_index_from_string(col_starts[-1]) + 2
+    _apply_row_borders_from_below(ws, row_aptitudes_moniteurs, col_r, col_last_palanquee)
+
+    # Augmenter la hauteur de la ligne des noms moniteurs pour améliorer la lisibilité verticale.
+    ws.row_dimensions[15].height = 85
+
+    # Nettoyage de la zone élèves + matrice X
+    for row in range(PREMIERE_LIGNE_ELEVE, DERNIERE_LIGNE_ELEVE + 1):
+        ws[f'B{row}'] = ''
+        ws[f'D{row}'] = ''
+        ws[f'O{row}'] = ''
+        ws[f'R{row}'] = ''
+        for col in col_starts:
+            ws[f'{col}{row}'] = ''
+
+    # insert_rows(16) ne reporte pas les fusions sur la dernière ligne élève (42).
+    col_b = 2
+    for row in range(PREMIERE_LIGNE_ELEVE, DERNIERE_LIGNE_ELEVE + 1):
+        if not _row_has_eleve_merges(ws, row):
+            ref_row = row - 1 if row > PREMIERE_LIGNE_ELEVE else row + 1
+            _apply_ligne_eleve_merges(ws, row, col_starts)
+            _copy_row_styles_from_reference(ws, row, ref_row, col_b, col_last_palanquee)
+
+
+# --- Génération ---
+
+def _enregistrer(wb):
+    output = BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def generer_fiche_sortie(seance):
+    """
+    Fiche sécurité 'sortie' à partir du modèle ESTARTIT.
+    Grille: colonnes = palanquées/moniteurs, lignes = élèves, X = appartenance.
+    """
+    palanquees = list(
+        seance.palanques.select_related('encadrant').prefetch_related('palanqueeeleve_set')
+    )
+    wb = _classeur(chemin_modele(sortie=True), _preparer_modele_sortie)
+    ws = wb.active
+    col_starts = COLONNES_PALANQUEES_SORTIE
+    row_aptitudes_moniteurs = LIGNE_APTITUDES_MONITEURS
+
+    # En-tête
+    ws['I1'] = seance.date.strftime('%d/%m/%Y')
+    ws['I3'] = seance.directeur_plongee.nom_complet if seance.directeur_plongee else '-'
+    if seance.lieu:
+        site_label = f"SITE : {seance.lieu.nom}"
+        if seance.lieu.ville:
+            site_label = f"{site_label} - {seance.lieu.ville}"
+        ws['V3'] = site_label
+    else:
+        ws['V3'] = "SITE :"
+
+    palanquees_export = palanquees[:len(col_starts)]
+    for idx, palanquee in enumerate(palanquees_export):
+        col = col_starts[idx]
+        encadrant_label = (
+            f"{palanquee.encadrant.nom} {palanquee.encadrant.prenom}"
+            if palanquee.encadrant
+            else 'AUTONOMES'
+        )
+        ws[f'{col}15'] = encadrant_label
+        ws[f'{col}15'].alignment = Alignment(
+            text_rotation=90,
+            horizontal='center',
+            vertical='center',
+            wrap_text=True,
+        )
+        if palanquee.encadrant:
+            ws[f'{col}{row_aptitudes_moniteurs}'] = _niveau_court(palanquee.encadrant)
+        ws[f'{col}{row_aptitudes_moniteurs}'].alignment = Alignment(
+            horizontal='center',
+            vertical='center',
+        )
+        ws[f'{col}6'] = palanquee.profondeur_max if palanquee.profondeur_max is not None else ''
+        ws[f'{col}7'] = palanquee.duree if palanquee.duree is not None else ''
+
+    # Élèves en lignes (même logique que l'écran de création des palanquées).
+    inscriptions = seance.inscriptions.select_related('personne').all()
+    eleves = [
+        i.personne
+        for i in inscriptions
+        if i.personne.statut == 'eleve' or (i.personne.statut == 'encadrant' and i.role_pour_seance == 'eleve')
+    ]
+    eleves = sorted(eleves, key=lambda e: (e.nom.upper(), e.prenom.upper()))
+    eleves_export = eleves[:DERNIERE_LIGNE_ELEVE - PREMIERE_LIGNE_ELEVE + 1]
+
+    # Index de ligne par élève
+    eleve_row = {}
+    for idx, eleve in enumerate(eleves_export, start=1):
+        row = PREMIERE_LIGNE_ELEVE + idx - 1
+        eleve_row[eleve.id] = row
+        ws[f'B{row}'] = idx
+        ws[f'D{row}'] = f"{eleve.nom} {eleve.prenom}"
+        ws[f'O{row}'] = _niveau_court(eleve)
+
+    # Aptitudes + croix X par palanquée.
+    for col_idx, palanquee in enumerate(palanquees_export):
+        col = col_starts[col_idx]
+        for pal_eleve in palanquee.palanqueeeleve_set.all():
+            row = eleve_row.get(pal_eleve.eleve_id)
+            if not row:
+                continue
+            ws[f'{col}{row}'] = 'X'
+            if pal_eleve.aptitude:
+                ws[f'R{row}'] = pal_eleve.aptitude
+
+    return _enregistrer(wb)
+
+
+def _remplir_entete_seance(ws, seance, directeur):
+    ws['D2'] = seance.date.strftime('%d/%m/%Y')
+    ws['P2'] = seance.heure_debut.strftime('%Hh%M') if seance.heure_debut else "-"
+    ws['AA2'] = seance.heure_fin.strftime('%Hh%M') if seance.heure_fin else "-"
+    ws['H5'] = directeur
+    ws['H56'] = directeur
+    # Présence du président
+    ws['AC4'] = "Oui" if getattr(seance, 'presence_president', False) else "Non"
+
+
+def _age(adherent, aujourdhui):
+    return (aujourdhui - adherent.date_naissance).days // 365
+
+
+def generer_fiche_seance(seance):
+    """Fiche sécurité d'une séance : 9 blocs palanquée par feuille, une feuille par tranche de 9."""
+    palanquees = list(seance.palanques.select_related('encadrant').prefetch_related('eleves', 'palanqueeeleve_set'))
+    wb = _classeur(chemin_modele(sortie=False))
+    ws = wb.active
+    directeur = seance.directeur_plongee.nom_complet if seance.directeur_plongee else "-"
+    _remplir_entete_seance(ws, seance, directeur)
+
+    # Découpage en tranches de 9 palanquées
+    nb_blocs = (len(palanquees) + 8) // 9
+    for bloc_idx in range(nb_blocs):
+        if bloc_idx > 0:
+            # Ajoute une nouvelle feuille à partir du modèle
+            ws_new = wb.copy_worksheet(ws)
+            ws_new.title = f"Fiche {bloc_idx+1}"
+            ws = ws_new
+            # Vider les cellules des blocs palanquées (9 blocs max)
+            for base_row, base_col in BLOCS_SEANCE:
+                # Efface encadrant, niveau, profondeur, durée
+                ws[f'{base_col}{base_row}'] = ""
+                ws[f'{COLONNE_NIVEAU[base_col]}{base_row}'] = ""
+                for i in range(4):
+                    ws[f'{base_col}{base_row+2+i}'] = ""
+                    ws[f'{COLONNE_NIVEAU[base_col]}{base_row+2+i}'] = ""
+                ws[f'{COLONNE_PROFONDEUR[base_col]}{base_row+7}'] = ""
+                ws[f'{COLONNE_DUREE[base_col]}{base_row+7}'] = ""
+        # Remplir les infos fixes à chaque feuille/bloc
+        _remplir_entete_seance(ws, seance, directeur)
+        # Palanquées de ce bloc
+        palanquees_bloc = palanquees[bloc_idx*9:(bloc_idx+1)*9]
+        for idx, palanquee in enumerate(palanquees_bloc):
+            base_row, base_col = BLOCS_SEANCE[idx]
+            ws[f'{base_col}{base_row}'] = palanquee.encadrant.nom_complet if palanquee.encadrant else "AUTONOMES"
+            niveau = palanquee.encadrant.niveau if palanquee.encadrant else "-"
+            ws[f'{COLONNE_NIVEAU[base_col]}{base_row}'] = _niveau_encadrant_display(niveau)
+            eleves = list(palanquee.eleves.all())
+            aptitudes = {pe.eleve_id: pe for pe in palanquee.palanqueeeleve_set.all()}
+            for i in range(4):
+                nom_cell = f'{base_col}{base_row+2+i}'
+                niv_cell = f'{COLONNE_NIVEAU[base_col]}{base_row+2+i}'
+                if i < len(eleves):
+                    eleve = eleves[i]
+                    ws[nom_cell] = f"{eleve.nom} {eleve.prenom}"
+                    aptitude = "-"
+                    palanquee_eleve = aptitudes.get(eleve.id)
+                    if palanquee_eleve and palanquee_eleve.aptitude:
+                        aptitude = palanquee_eleve.get_aptitude_display()
+                    ws[niv_cell] = aptitude
+                else:
+                    ws[nom_cell] = ""
+                    ws[niv_cell] = ""
+            ws[f'{COLONNE_PROFONDEUR[base_col]}{base_row+7}'] = palanquee.profondeur_max if palanquee.profondeur_max else "-"
+            ws[f'{COLONNE_DUREE[base_col]}{base_row+7}'] = palanquee.duree if palanquee.duree else "-"
+        # Comptage adultes/enfants/total (sur la première feuille uniquement)
+        if bloc_idx == 0:
+            aujourdhui = date.today()
+            adultes = 0
+            enfants = 0
+            for palanquee in palanquees:
+                personnes = list(palanquee.eleves.all())
+                if palanquee.encadrant:
+                    personnes.append(palanquee.encadrant)
+                for personne in personnes:
+                    if personne.date_naissance and _age(personne, aujourdhui) < 18:
+                        enfants += 1
+                    else:
+                        adultes += 1
+            ws['AH57'] = adultes
+            ws['AH58'] = enfants
+            ws['AH59'] = adultes + enfants
+
+    return _enregistrer(wb)
+
+
+# --- Cache des fiches générées ---
+
+def cle_fiche(seance):
+    """Empreinte de tout ce qui figure sur la fiche de la séance (4 requêtes)."""
+    palanquees = list(seance.palanques.order_by('id').values_list('id', 'date_modification', 'encadrant_id'))
+    membres = list(PalanqueeEleve.objects.filter(palanquee__seance=seance).order_by('id').values_list(
+        'palanquee_id', 'eleve_id', 'aptitude',
+    ))
+    inscriptions = list(seance.inscriptions.order_by('id').values_list('personne_id', 'role_pour_seance'))
+    personnes = {encadrant_id for _, _, encadrant_id in palanquees if encadrant_id}
+    personnes.update(eleve_id for _, eleve_id, _ in membres)
+    personnes.update(personne_id for personne_id, _ in inscriptions)
+    if seance.directeur_plongee_id:
+        personnes.add(seance.directeur_plongee_id)
+    adherents = Adherent.objects.filter(id__in=personnes).aggregate(derniere=Max('date_modification'), nb=Count('id'))
+    chemin = chemin_modele(seance.est_sortie)
+    lieu = (seance.lieu.nom, seance.lieu.ville) if seance.lieu else None
+    source = '|'.join(str(v) for v in (
+        seance.pk, seance.date_modification, seance.type, lieu, palanquees, membres, inscriptions,
+        adherents['derniere'], adherents['nb'], chemin, chemin.stat().st_mtime_ns, date.today(),
+    ))
+    return 'fiche_securite:' + salted_hmac('gestion.fiche_securite', source, algorithm='sha256').hexdigest()
+
+
+def fiche_securite(seance):
+    """
+    Contenu .xlsx de la fiche de sécurité de la séance ou de la sortie, depuis le cache
+    s'il est à jour. FileNotFoundError si le modèle est introuvable.
+    """
+    cle = cle_fiche(seance)
+    contenu = cache.get(cle)
+    if contenu is None:
+        with section('openpyxl'):
+            contenu = generer_fiche_sortie(seance) if seance.est_sortie else generer_fiche_seance(seance)
+        cache.set(cle, contenu, getattr(settings, 'FICHE_SECURITE_CACHE_DUREE', DUREE_DEFAUT))
+    return contenu
@@ -374,34 +374,69 @@ class EvaluationBulkForm(forms.Form):
                 )
 
 class EvaluationExerciceBulkForm(forms.Form):
-    def __init__(self, palanquee, *args, **kwargs):
+    """
+    Grille d'évaluation d'une palanquée : pour chaque élève et exercice prévu, une note
+    (eval_<eleve>_<exercice>, 1 à 3 étoiles), une raison de non réalisation (raison_...)
+    et un commentaire (comment_...), tous facultatifs.
+
+    Élèves et exercices sont résolus une seule fois. Plutôt que trois champs par case,
+    trois champs partagés valident chaque case sous son nom : erreurs et cleaned_data
+    sont les mêmes qu'avec des champs distincts. La page est rendue depuis grille().
+    """
+    NOTE_CHOICES = [(1, '1 étoile'), (2, '2 étoiles'), (3, '3 étoiles')]
+
+    def __init__(self, palanquee, *args, eleves=None, exercices=None, **kwargs):
         super().__init__(*args, **kwargs)
+        from .models import EvaluationExercice
         self.palanquee = palanquee
-        # Pour chaque élève et exercice prévu, créer un champ note (1-3 étoiles) et un champ commentaire
-        for eleve in palanquee.eleves.all():
-            for exercice in palanquee.exercices_prevus_pour_seance():
-                field_name = f"eval_{eleve.id}_{exercice.id}"
-                self.fields[field_name] = forms.ChoiceField(
-                    choices=[(1, '1 étoile'), (2, '2 étoiles'), (3, '3 étoiles')],
-                    label=f"{eleve.nom_complet} - {exercice.nom}",
-                    required=False,
-                    widget=forms.RadioSelect
-                )
-                # Champ raison de non réalisation
-                raison_field_name = f"raison_{eleve.id}_{exercice.id}"
-                from .models import EvaluationExercice
-                self.fields[raison_field_name] = forms.ChoiceField(
-                    choices=[('', '-- Sélectionner une raison --')] + EvaluationExercice.RAISON_NON_REALISE_CHOICES,
-                    label="",
-                    required=False,
-                    widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
-                )
-                comment_field_name = f"comment_{eleve.id}_{exercice.id}"
-                self.fields[comment_field_name] = forms.CharField(
-                    widget=forms.Textarea(attrs={'rows': 2, 'placeholder': 'Commentaire...'}),
-                    required=False,
-                    label=""
-                )
+        self.eleves = list(palanquee.eleves.all() if eleves is None else eleves)
+        self.exercices = list(palanquee.exercices_prevus_pour_seance() if exercices is None else exercices)
+        self.raisons = [('', '-- Sélectionner une raison --')] + EvaluationExercice.RAISON_NON_REALISE_CHOICES
+        self.champs_case = {
+            'eval': forms.ChoiceField(choices=self.NOTE_CHOICES, required=False, widget=forms.RadioSelect),
+            'raison': forms.ChoiceField(choices=self.raisons, required=False),
+            'comment': forms.CharField(required=False),
+        }
+
+    def cases(self):
+        """(eleve, exercice, suffixe des noms de champs) pour chaque case de la grille."""
+        for eleve in self.eleves:
+            for exercice in self.exercices:
+                yield eleve, exercice, f'{eleve.id}_{exercice.id}'
+
+    def _valeur(self, nom):
+        if self.is_bound:
+            return self.data.get(self.add_prefix(nom))
+        return self.initial.get(nom)
+
+    def _clean_fields(self):
+        super()._clean_fields()
+        for _, _, suffixe in self.cases():
+            for prefixe, champ in self.champs_case.items():
+                nom = f'{prefixe}_{suffixe}'
+                try:
+                    self.cleaned_data[nom] = champ.clean(self.data.get(self.add_prefix(nom)))
+                except forms.ValidationError as e:
+                    self._errors.setdefault(nom, self.error_class(renderer=self.renderer)).extend(e.error_list)
+
+    def grille(self):
+        """Cases à afficher, par élève : valeurs soumises si le formulaire est lié, initiales sinon."""
+        lignes = []
+        for eleve in self.eleves:
+            cases = []
+            for exercice in self.exercices:
+                suffixe = f'{eleve.id}_{exercice.id}'
+                cases.append({
+                    'exercice': exercice,
+                    'field_name': f'eval_{suffixe}',
+                    'raison_name': f'raison_{suffixe}',
+                    'comment_name': f'comment_{suffixe}',
+                    'value': self._valeur(f'eval_{suffixe}') or '',
+                    'raison': self._valeur(f'raison_{suffixe}') or '',
+                    'commentaire': self._valeur(f'comment_{suffixe}') or '',
+                })
+            lignes.append({'eleve': eleve, 'exercices': cases})
+        return lignes
 
 class NonAdherentInscriptionForm(forms.ModelForm):
     class Meta:
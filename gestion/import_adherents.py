@@ -0,0 +1,225 @@
+"""
+Import en masse d'adhérents depuis un fichier Excel.
+
+Les lignes sont lues au fil de l'eau (openpyxl en lecture seule) et validées en
+une passe : les doublons sont cherchés dans des index en mémoire des emails et
+des couples (nom, prénom) déjà en base, complétés à chaque ligne acceptée pour
+détecter aussi les doublons internes au fichier. Les adhérents valides sont
+ensuite insérés par lots (bulk_create), un lot par transaction, avec leurs
+sections et leurs jetons de recherche. En simulation, rien n'est écrit : le
+rapport indique ce que l'import ferait.
+"""
+import re
+from datetime import date, datetime
+
+from django.db import transaction
+
+from .models import Adherent, Section
+from .performances import section
+from .recherche import indexer_adherents
+from .statistiques_dashboard import invalider_statistiques
+
+COLONNES_OBLIGATOIRES = [
+    'nom', 'prenom', 'date_naissance', 'adresse', 'code_postal', 'ville', 'email',
+    'telephone', 'numero_licence', 'assurance', 'date_delivrance_caci', 'niveau', 'statut',
+]
+CHAMPS_TEXTE = ['nom', 'prenom', 'adresse', 'code_postal', 'ville', 'email', 'telephone', 'numero_licence']
+TAILLE_LOT = 500
+_FORMAT_DATE = re.compile(r'^\d{2}/\d{2}/\d{4}$')
+
+
+class ErreurImport(Exception):
+    """Fichier illisible ou colonnes manquantes : rien n'est importé."""
+
+
+def _texte(valeur):
+    """Valeur de cellule en texte ; 75001.0 (cellule numérique) donne '75001'."""
+    if valeur is None:
+        return ''
+    if isinstance(valeur, float) and valeur.is_integer():
+        valeur = int(valeur)
+    return str(valeur).strip()
+
+
+def _lignes_xlsx(fichier):
+    from openpyxl import load_workbook
+    with section('openpyxl'):
+        classeur = load_workbook(fichier, read_only=True, data_only=True)
+    try:
+        yield from classeur.active.iter_rows(values_only=True)
+    finally:
+        classeur.close()
+
+
+def _lignes_xls(fichier):
+    try:
+        import xlrd
+    except ImportError:
+        raise ErreurImport("Le format .xls n'est pas pris en charge sur ce serveur, enregistrez le fichier en .xlsx")
+    classeur = xlrd.open_workbook(file_contents=fichier.read())
+    feuille = classeur.sheet_by_index(0)
+    for i in range(feuille.nrows):
+        ligne = []
+        for cellule in feuille.row(i):
+            if cellule.ctype == xlrd.XL_CELL_DATE:
+                ligne.append(xlrd.xldate_as_datetime(cellule.value, classeur.datemode))
+            elif cellule.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+                ligne.append(None)
+            else:
+                ligne.append(cellule.value)
+        yield tuple(ligne)
+
+
+def lire_lignes(fichier, nom_fichier):
+    """
+    Itère sur les lignes du premier onglet : (numéro de ligne Excel, {colonne: valeur}).
+    La première ligne donne les noms de colonnes ; les lignes vides sont ignorées.
+    """
+    lignes = _lignes_xls(fichier) if nom_fichier.endswith('.xls') else _lignes_xlsx(fichier)
+    entete = next(lignes, None)
+    if entete is None:
+        raise ErreurImport('Le fichier est vide')
+    colonnes = [_texte(c) for c in entete]
+    manquantes = [c for c in COLONNES_OBLIGATOIRES if c not in colonnes]
+    if manquantes:
+        raise ErreurImport(f'Colonnes manquantes dans le fichier : {", ".join(manquantes)}')
+    for numero, valeurs in enumerate(lignes, start=2):
+        if all(v is None or _texte(v) == '' for v in valeurs):
+            continue
+        yield numero, dict(zip(colonnes, valeurs))
+
+
+def _date(valeur, libelle):
+    """Date d'une cellule (date Excel ou texte DD/MM/YYYY) ; aujourd'hui si vide."""
+    if isinstance(valeur, datetime):
+        return valeur.date()
+    if isinstance(valeur, date):
+        return valeur
+    texte = _texte(valeur)
+    if not texte:
+        return date.today()
+    if not _FORMAT_DATE.match(texte):
+        raise ValueError(f"{libelle} '{texte}' format incorrect (DD/MM/YYYY attendu)")
+    try:
+        return datetime.strptime(texte, '%d/%m/%Y').date()
+    except ValueError:
+        raise ValueError(f"{libelle} '{texte}' invalide (format DD/MM/YYYY attendu)")
+
+
+class _Validateur:
+    """Valide les lignes une à une contre les index en mémoire (emails, noms, sections)."""
+
+    def __init__(self):
+        self.emails = set()
+        self.noms = set()
+        for email, nom, prenom in Adherent.objects.values_list('email', 'nom', 'prenom').iterator():
+            self.emails.add(email.lower())
+            self.noms.add((nom, prenom))
+        self.sections = dict(Section.objects.values_list('nom', 'id'))
+        self.niveaux = [c[0] for c in Adherent.NIVEAUX_CHOICES]
+        self.statuts = [c[0] for c in Adherent.STATUT_CHOICES]
+        self.assurances = [c[0] for c in Adherent.ASSURANCE_CHOICES]
+        self.longueurs = {champ: Adherent._meta.get_field(champ).max_length for champ in CHAMPS_TEXTE}
+
+    def valider(self, ligne):
+        """Retourne (Adherent non enregistré, ids de sections) ; ValueError avec le motif du rejet."""
+        valeurs = {champ: _texte(ligne.get(champ)) for champ in CHAMPS_TEXTE}
+        nom, prenom, email = valeurs['nom'], valeurs['prenom'], valeurs['email']
+        if not nom or not prenom or not email:
+            raise ValueError('nom, prénom et email sont obligatoires')
+        # Même normalisation qu'Adherent.save(), appliquée ici car bulk_create ne l'appelle pas
+        nom, prenom = nom.upper(), prenom.capitalize()
+        if email.lower() in self.emails:
+            raise ValueError(f"l'email {email} existe déjà")
+        if (nom, prenom) in self.noms:
+            raise ValueError(f"l'adhérent {nom} {prenom} existe déjà")
+        for champ, longueur in self.longueurs.items():
+            if longueur and len(valeurs[champ]) > longueur:
+                raise ValueError(f"{champ} trop long ({longueur} caractères maximum)")
+        date_naissance = _date(ligne.get('date_naissance'), 'date de naissance')
+        date_delivrance_caci = _date(ligne.get('date_delivrance_caci'), 'date fin validité CACI')
+        niveau = _texte(ligne.get('niveau')) or 'debutant'
+        if niveau not in self.niveaux:
+            raise ValueError(f"niveau '{niveau}' invalide (valeurs: {', '.join(self.niveaux)})")
+        statut = _texte(ligne.get('statut')) or 'eleve'
+        if statut not in self.statuts:
+            raise ValueError(f"statut '{statut}' invalide (valeurs: {', '.join(self.statuts)})")
+        assurance = _texte(ligne.get('assurance'))
+        if assurance not in self.assurances:
+            raise ValueError(f"assurance '{assurance}' invalide (valeurs: {', '.join(self.assurances)})")
+        noms_sections = [s.strip() for s in _texte(ligne.get('sections')).split(',') if s.strip()]
+        inconnues = [s for s in noms_sections if s not in self.sections]
+        if inconnues:
+            raise ValueError(f"sections inexistantes: {', '.join(inconnues)}")
+
+        self.emails.add(email.lower())
+        self.noms.add((nom, prenom))
+        adherent = Adherent(
+            nom=nom, prenom=prenom, date_naissance=date_naissance, adresse=valeurs['adresse'],
+            code_postal=valeurs['code_postal'], ville=valeurs['ville'], email=email,
+            telephone=valeurs['telephone'], numero_licence=valeurs['numero_licence'],
+            assurance=assurance, date_delivrance_caci=date_delivrance_caci,
+            niveau=niveau, statut=statut,
+        )
+        return adherent, {self.sections[s] for s in noms_sections}
+
+
+def _enregistrer_lot(lot):
+    with transaction.atomic():
+        adherents = Adherent.objects.bulk_create([adherent for _, adherent, _ in lot])
+        Adherent.sections.through.objects.bulk_create([
+            Adherent.sections.through(adherent_id=adherent.pk, section_id=section_id)
+            for adherent, (_, _, sections) in zip(adherents, lot)
+            for section_id in sections
+        ])
+        indexer_adherents(adherents)
+
+
+def importer_adherents(fichier, nom_fichier, simulation=False, taille_lot=TAILLE_LOT):
+    """
+    Importe les adhérents du fichier ; retourne le rapport affiché par la vue
+    (success_count, error_count, errors, imported_adherents, simulation).
+    En simulation, les lignes sont validées mais rien n'est enregistré.
+    Lève ErreurImport si le fichier est illisible ou s'il manque des colonnes.
+    """
+    try:
+        lignes = lire_lignes(fichier, nom_fichier)
+        validateur = _Validateur()
+        valides = []
+        errors = []
+        for numero, ligne in lignes:
+            try:
+                adherent, sections = validateur.valider(ligne)
+            except ValueError as e:
+                errors.append(f"Ligne {numero}: {e}")
+                continue
+            valides.append((numero, adherent, sections))
+    except ErreurImport:
+        raise
+    except Exception as e:
+        raise ErreurImport(f'Erreur lors de la lecture du fichier Excel : {e}')
+
+    lignes_rejetees = len(errors)
+    imported_adherents = []
+    lignes_en_echec = 0
+    if simulation:
+        imported_adherents = [str(adherent) for _, adherent, _ in valides]
+    else:
+        for debut in range(0, len(valides), taille_lot):
+            lot = valides[debut:debut + taille_lot]
+            try:
+                _enregistrer_lot(lot)
+            except Exception as e:
+                errors.append(f"Lignes {lot[0][0]} à {lot[-1][0]}: non importées ({e})")
+                lignes_en_echec += len(lot)
+                continue
+            imported_adherents.extend(str(adherent) for _, adherent, _ in lot)
+        if imported_adherents:
+            invalider_statistiques()
+    return {
+        'success_count': len(imported_adherents),
+        'error_count': lignes_rejetees + lignes_en_echec,
+        'errors': errors,
+        'imported_adherents': imported_adherents,
+        'simulation': simulation,
+    }
@@ -0,0 +1,56 @@
+"""
+Listes paginées de personnes (adhérents, élèves, encadrants).
+
+Chaque onglet ou bloc d'une liste est sa propre requête, filtrée, triée et
+limitée à une page côté base ; le statut CACI est calculé en SQL. Chaque
+onglet a son paramètre de page (?page_<onglet>=), les autres paramètres
+(recherche, tri, onglet affiché) sont conservés par les liens de pagination.
+"""
+from datetime import timedelta
+
+from django.core.paginator import Paginator
+from django.db.models import Case, CharField, Value, When
+from django.utils import timezone
+
+PAR_PAGE = 25
+TRIS_VALIDES = ['nom', 'prenom', 'email', 'niveau', 'statut', 'date_delivrance_caci', 'telephone']
+
+
+def annoter_statut_caci(queryset, aujourdhui=None):
+    """
+    Ajoute caci_status : 'expired' si le CACI a plus d'un an, 'soon' s'il expire
+    dans moins de 30 jours, '' sinon (ou sans date de délivrance).
+    """
+    if aujourdhui is None:
+        aujourdhui = timezone.now().date()
+    return queryset.annotate(caci_status=Case(
+        When(date_delivrance_caci__lt=aujourdhui - timedelta(days=365), then=Value('expired')),
+        When(date_delivrance_caci__lt=aujourdhui - timedelta(days=335), then=Value('soon')),
+        default=Value(''),
+        output_field=CharField(),
+    ))
+
+
+def trier(queryset, request, tris_valides=TRIS_VALIDES):
+    """Trie selon ?sort=&order= (asc/desc), nom puis prénom par défaut."""
+    sort = request.GET.get('sort', 'nom')
+    if sort not in tris_valides:
+        sort = 'nom'
+    secondaire = 'prenom' if sort == 'nom' else 'nom'
+    if request.GET.get('order') == 'desc':
+        sort = '-' + sort
+    return queryset.order_by(sort, secondaire, 'id')
+
+
+def paginer_onglets(request, onglets, par_page=PAR_PAGE):
+    """
+    onglets : [(nom, queryset)] ; retourne {nom: Page}, une requête COUNT et une
+    requête limitée à la page demandée (?page_<nom>=) par onglet.
+    """
+    pages = {}
+    for nom, queryset in onglets:
+        page = Paginator(queryset, par_page).get_page(request.GET.get(f'page_{nom}'))
+        page.param = f'page_{nom}'
+        page.onglet = nom
+        pages[nom] = page
+    return pages
@@ -0,0 +1,268 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from gestion import pdf_cache
+from gestion.donnees_synthetiques import base_de_mesure, generer_club
+from gestion.fiche_securite import cle_fiche
+from gestion.models import (
+    Adherent, EvaluationExercice, Exercice, LienEvaluation, Seance, Section,
+)
+from gestion.statistiques_dashboard import invalider_statistiques
+
+
+def _section_la_plus_nombreuse():
+    return Section.objects.annotate(
+        nb=Count('adherents', filter=Q(adherents__statut='eleve', adherents__actif=True))
+    ).order_by('-nb', 'id').first()
+
+
+def _eleve_le_plus_evalue():
+    eleve_id = EvaluationExercice.objects.values('eleve_id').annotate(nb=Count('id')).order_by('-nb', 'eleve_id')[0]['eleve_id']
+    return Adherent.objects.get(pk=eleve_id)
+
+
+def _seance_la_plus_chargee(type_seance):
+    return Seance.objects.filter(type=type_seance).annotate(nb=Count('palanques')).order_by('-nb', 'id').first()
+
+
+def _palanquee_a_evaluer(seance):
+    """Palanquée la plus nombreuse de la séance, avec tous les exercices attendus de sa section prévus."""
+    palanquee = seance.palanques.annotate(nb=Count('eleves')).order_by('-nb', 'id').first()
+    palanquee.exercices_prevus.set(Exercice.objects.filter(
+        competences__section=palanquee.section, type=palanquee.type_exercice_attendu(),
+    ).distinct())
+    donnees = {}
+    for i, eleve in enumerate(palanquee.eleves.all()):
+        for j, exercice in enumerate(palanquee.exercices_prevus_pour_seance()):
+            cle = f'{eleve.id}_{exercice.id}'
+            donnees[f'eval_{cle}'] = str(1 + (i + j) % 3)
+            donnees[f'comment_{cle}'] = 'Mesure de performance'
+    return palanquee, donnees
+
+
+def _scenarios(inclure_sorties):
+    """
+    Scénarios mesurés : (nom, préparation). La préparation, exécutée avant chaque
+    passage et non chronométrée, retourne la requête (méthode, url, données).
+    """
+    section = _section_la_plus_nombreuse()
+    eleve = _eleve_le_plus_evalue()
+    seance = _seance_la_plus_chargee(Seance.TYPE_SEANCE)
+    palanquee, evaluation = _palanquee_a_evaluer(seance)
+
+    def get(url, *nettoyages):
+        def preparer():
+            for nettoyer in nettoyages:
+                nettoyer()
+            return 'get', url, None
+        return preparer
+
+    def soumettre_evaluation():
+        # Un lien neuf par passage : le lien est fermé par la soumission
+        lien = LienEvaluation.objects.create(palanquee=palanquee, date_expiration=timezone.now() + timedelta(days=1))
+        return 'post', reverse('evaluation_publique', args=[lien.token]), evaluation
+
+    def fiche(seance_fiche):
+        return reverse('generer_fiche_securite_excel', args=[seance_fiche.id]), lambda: cache.delete(cle_fiche(seance_fiche))
+
+    suivi_section = f"{reverse('api_suivi_eleves_section')}?section_id={section.id}"
+    scenarios = [
+        ("Tableau de bord (statistiques recalculées)", get(reverse('dashboard'), invalider_statistiques)),
+        ("Tableau de bord (statistiques en cache)", get(reverse('dashboard'))),
+        ("API suivi d'une section", get(suivi_section)),
+        ("API suivi d'une section (format détaillé)", get(suivi_section + '&version=1')),
+        ("API suivi des inscrits d'une séance", get(
+            f"{reverse('api_suivi_inscrits_section', args=[seance.id])}?section_id={palanquee.section_id}"
+        )),
+        ("Suivi de formation d'un élève", get(reverse('suivi_formation_eleve', args=[eleve.id]))),
+        ("PDF de suivi (généré)", get(reverse('suivi_formation_eleve_pdf', args=[eleve.id]), pdf_cache.vider)),
+        ("PDF de suivi (en cache)", get(reverse('suivi_formation_eleve_pdf', args=[eleve.id]))),
+        ("Fiche de sécurité Excel d'une séance (générée)", get(*fiche(seance))),
+        ("Fiche de sécurité Excel d'une séance (en cache)", get(fiche(seance)[0])),
+    ]
+    sortie = _seance_la_plus_chargee(Seance.TYPE_SORTIE) if inclure_sorties else None
+    if sortie is not None:
+        scenarios.append(("Fiche de sécurité Excel d'une sortie (générée)", get(*fiche(sortie))))
+    scenarios += [
+        ("Page de communication aux adhérents", get(reverse('adherents_communiquer'))),
+        ("Page de communication d'une séance", get(reverse('seance_communiquer', args=[seance.id]))),
+        ("Soumission d'une évaluation publique", soumettre_evaluation),
+    ]
+    return scenarios
+
+
+class _CompteurRequetes:
+    """execute_wrapper comptant les requêtes SQL (connection.queries est vidé au début de chaque requête HTTP)."""
+
+    def __init__(self):
+        self.nombre = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.nombre += 1
+        return execute(sql, params, many, context)
+
+
+def _executer(client, preparer):
+    methode, url, donnees = preparer()
+    response = getattr(client, methode)(url, donnees)
+    # Les réponses en flux ne sont produites qu'à la lecture
+    corps = b''.join(response.streaming_content) if response.streaming else response.content
+    response.close()
+    return response.status_code, len(corps)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure les pages les plus sollicitées (durée, requêtes SQL, pic mémoire) sur une base de test "
+        "peuplée d'un club synthétique, et compare à une référence enregistrée"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--eleves', type=int, default=600, help="Nombre d'élèves générés")
+        parser.add_argument('--encadrants', type=int, default=60, help="Nombre d'encadrants générés")
+        parser.add_argument('--seances', type=int, default=150, help='Nombre de séances générées (une par semaine)')
+        parser.add_argument('--sorties', type=int, default=20, help='Nombre de sorties en mer générées')
+        parser.add_argument('--evaluations', type=int, default=300000, help="Nombre d'évaluations générées")
+        parser.add_argument('--repetitions', type=int, default=5, help='Passages chronométrés par scénario')
+        parser.add_argument('--graine', type=int, default=1, help='Graine du générateur (résultats reproductibles)')
+        parser.add_argument('--scenario', action='append', dest='filtres', default=[],
+                            help='Ne mesure que les scénarios dont le nom contient ce texte (répétable)')
+        parser.add_argument('--json', dest='fichier_json', help='Écrit les résultats dans ce fichier JSON (future référence)')
+        parser.add_argument('--reference', help='Compare aux résultats JSON enregistrés dans ce fichier')
+        parser.add_argument('--tolerance', type=float, default=20,
+                            help='Ralentissement toléré par rapport à la référence, en %% (défaut : 20)')
+
+    def handle(self, *args, **options):
+        reference = None
+        if options['reference']:
+            try:
+                with open(options['reference'], encoding='utf-8') as f:
+                    reference = json.load(f)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Référence illisible : {exc}")
+
+        with base_de_mesure():
+            resultats = self._mesurer(options)
+
+        regressions = self._afficher(resultats, reference, options['tolerance'])
+        if options['fichier_json']:
+            with open(options['fichier_json'], 'w', encoding='utf-8') as f:
+                json.dump(resultats, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Résultats écrits dans {options['fichier_json']}")
+        if regressions:
+            raise CommandError(f"{regressions} régression(s) par rapport à {options['reference']}")
+
+    def _mesurer(self, options):
+        self.stdout.write(
+            f"Génération du club synthétique ({options['eleves']} élèves, {options['seances']} séances, "
+            f"{options['sorties']} sorties, {options['evaluations']} évaluations)..."
+        )
+        debut = time.perf_counter()
+        resume = generer_club(
+            nb_evaluations=options['evaluations'], nb_eleves=options['eleves'], nb_encadrants=options['encadrants'],
+            nb_seances=options['seances'], nb_sorties=options['sorties'], graine=options['graine'],
+        )
+        self.stdout.write(f"  généré en {time.perf_counter() - debut:.1f} s")
+
+        utilisateur = User.objects.create_superuser('bench', 'bench@exemple.fr', 'bench')
+        utilisateur.groups.add(Group.objects.get_or_create(name='admin')[0])
+        client = Client()
+        client.force_login(utilisateur)
+
+        scenarios = _scenarios(options['sorties'] > 0)
+        if options['filtres']:
+            scenarios = [
+                (nom, preparer) for nom, preparer in scenarios
+                if any(filtre.lower() in nom.lower() for filtre in options['filtres'])
+            ]
+            if not scenarios:
+                raise CommandError('Aucun scénario ne correspond à --scenario')
+
+        mesures = {}
+        for nom, preparer in scenarios:
+            self.stdout.write(f"  {nom}...")
+            # Premier passage : requêtes et pic mémoire (tracemalloc ralentit, il n'est pas chronométré)
+            requetes = _CompteurRequetes()
+            tracemalloc.start()
+            try:
+                with connection.execute_wrapper(requetes):
+                    statut, taille = _executer(client, preparer)
+                pic = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            if statut != 200:
+                raise CommandError(f"{nom} : réponse HTTP {statut}")
+            durees = []
+            for _ in range(options['repetitions']):
+                methode, url, donnees = preparer()
+                debut = time.perf_counter()
+                response = getattr(client, methode)(url, donnees)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                durees.append(time.perf_counter() - debut)
+                response.close()
+            mesures[nom] = {
+                'ms_median': round(1000 * statistics.median(durees), 2) if durees else None,
+                'ms_min': round(1000 * min(durees), 2) if durees else None,
+                'requetes': requetes.nombre,
+                'pic_memoire_kio': round(pic / 1024),
+                'octets': taille,
+            }
+        return {
+            'base': connection.vendor,
+            'python': platform.python_version(),
+            'date': timezone.now().isoformat(timespec='seconds'),
+            'donnees': resume,
+            'repetitions': options['repetitions'],
+            'scenarios': mesures,
+        }
+
+    def _afficher(self, resultats, reference, tolerance):
+        """Affiche les mesures (et l'écart à la référence) ; retourne le nombre de régressions."""
+        self.stdout.write(f"\nBase : {resultats['base']} — données : " + ', '.join(
+            f"{nb} {nom}" for nom, nb in resultats['donnees'].items()
+        ))
+        if reference is not None and reference.get('donnees') != resultats['donnees']:
+            self.stdout.write(self.style.WARNING(
+                "Les données de la référence diffèrent (tailles ou graine) : la comparaison est indicative"
+            ))
+        regressions = 0
+        for nom, mesure in resultats['scenarios'].items():
+            self.stdout.write(self.style.MIGRATE_HEADING(nom))
+            duree = f"{mesure['ms_median']:.1f} ms (min {mesure['ms_min']:.1f})" if mesure['ms_median'] is not None else '-'
+            self.stdout.write(
+                f"  {duree}   {mesure['requetes']} requêtes   pic mémoire {mesure['pic_memoire_kio']} Kio"
+                f"   {mesure['octets']} octets"
+            )
+            avant = (reference or {}).get('scenarios', {}).get(nom)
+            if not avant:
+                continue
+            ecarts = []
+            if avant.get('ms_median') and mesure['ms_median'] is not None:
+                rapport = mesure['ms_median'] / avant['ms_median']
+                ecarts.append((f"durée x{rapport:.2f} ({avant['ms_median']:.1f} ms)", rapport > 1 + tolerance / 100))
+            if mesure['requetes'] != avant['requetes']:
+                ecarts.append((f"requêtes {avant['requetes']} → {mesure['requetes']}", mesure['requetes'] > avant['requetes']))
+            if avant.get('pic_memoire_kio'):
+                rapport = mesure['pic_memoire_kio'] / avant['pic_memoire_kio']
+                ecarts.append((f"mémoire x{rapport:.2f}", rapport > 1 + tolerance / 100))
+            for texte, regression in ecarts:
+                if regression:
+                    regressions += 1
+                    self.stdout.write(self.style.ERROR(f"  référence : {texte}"))
+                else:
+                    self.stdout.write(f"  référence : {texte}")
+        return regressions
@@ -0,0 +1,124 @@
+import json
+import random
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from gestion.donnees_synthetiques import generer_club
+from gestion.models import Adherent, EvaluationExercice, InscriptionSeance
+
+MIGRATION_SANS_INDEX = '0031_tacheenvoipdfpalanquees'
+
+
+def _requetes():
+    """Requêtes mesurées : (nom, fonction(échantillon) -> queryset)."""
+    return [
+        ("Dernière évaluation élève × exercice", lambda e: EvaluationExercice.objects.filter(
+            eleve_id=e['eleve_id'], exercice_id=e['exercice_id']).order_by('-date_evaluation')[:1]),
+        ("Historique d'un élève", lambda e: EvaluationExercice.objects.filter(
+            eleve_id=e['eleve_id']).order_by('-date_evaluation', '-id')),
+        ("Saisie palanquée × élève × exercice", lambda e: EvaluationExercice.objects.filter(
+            palanquee_id=e['palanquee_id'], eleve_id=e['eleve_id'], exercice_id=e['exercice_id'])),
+        ("Encadrants inscrits à une séance", lambda e: InscriptionSeance.objects.filter(
+            seance_id=e['seance_id'], personne__statut='encadrant')),
+        ("Adhérents actifs par type et statut", lambda e: Adherent.objects.filter(
+            type_personne='adherent', statut='eleve', actif=True)),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure l'effet des index de la migration 0032 sur une base de test synthétique : "
+        "plans d'exécution et durées avant / après"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--evaluations', type=int, default=50000, help="Nombre d'évaluations générées")
+        parser.add_argument('--echantillons', type=int, default=200, help='Nombre de paramètres tirés par requête')
+        parser.add_argument('--repetitions', type=int, default=5, help='Répétitions (la meilleure est retenue)')
+        parser.add_argument('--graine', type=int, default=1, help='Graine du générateur (résultats reproductibles)')
+        parser.add_argument('--json', dest='fichier_json', help='Écrit aussi les résultats dans ce fichier JSON')
+
+    def handle(self, *args, **options):
+        # Tout se passe dans une base de test créée puis détruite : la base configurée n'est pas touchée
+        nom_base = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            resultats = self._mesurer(options)
+        finally:
+            connection.creation.destroy_test_db(nom_base, verbosity=0)
+        self._afficher(resultats)
+        if options['fichier_json']:
+            with open(options['fichier_json'], 'w', encoding='utf-8') as f:
+                json.dump(resultats, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Résultats écrits dans {options['fichier_json']}")
+
+    def _mesurer(self, options):
+        call_command('migrate', 'gestion', MIGRATION_SANS_INDEX, verbosity=0)
+        self.stdout.write(f"Génération du club synthétique ({options['evaluations']} évaluations)...")
+        # Au schéma 0031, la table des jetons de recherche (migration 0033) n'existe pas encore :
+        # generer_club crée les adhérents par bulk_create, sans Adherent.save(), et ne les indexe pas
+        resume = generer_club(
+            nb_evaluations=options['evaluations'], graine=options['graine'], avec_progressions=False,
+            avec_index_recherche=False,
+        )
+        rnd = random.Random(options['graine'])
+        triplets = list(
+            EvaluationExercice.objects.values('eleve_id', 'exercice_id', 'palanquee_id', 'palanquee__seance_id')
+        )
+        echantillons = [
+            dict(t, seance_id=t['palanquee__seance_id'])
+            for t in rnd.sample(triplets, min(options['echantillons'], len(triplets)))
+        ]
+        resultats = {
+            'base': connection.vendor,
+            'donnees': resume,
+            'echantillons': len(echantillons),
+            'avant': self._chronometrer(echantillons, options['repetitions']),
+        }
+        call_command('migrate', 'gestion', verbosity=0)
+        resultats['apres'] = self._chronometrer(echantillons, options['repetitions'])
+        return resultats
+
+    def _chronometrer(self, echantillons, repetitions):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        mesures = {}
+        for nom, requete in _requetes():
+            # SQL compilé une fois : on chronomètre la base, pas l'instanciation des modèles par l'ORM
+            compilees = [requete(echantillon).query.sql_with_params() for echantillon in echantillons]
+            meilleure = None
+            with connection.cursor() as cursor:
+                for _ in range(repetitions):
+                    debut = time.perf_counter()
+                    for sql, params in compilees:
+                        cursor.execute(sql, params)
+                        cursor.fetchall()
+                    duree = time.perf_counter() - debut
+                    meilleure = duree if meilleure is None else min(meilleure, duree)
+            mesures[nom] = {
+                'ms_par_requete': round(1000 * meilleure / len(echantillons), 4),
+                'plan': requete(echantillons[0]).explain(),
+            }
+        return mesures
+
+    def _afficher(self, resultats):
+        self.stdout.write(f"Base : {resultats['base']} — données : " + ', '.join(
+            f"{nb} {nom}" for nom, nb in resultats['donnees'].items()
+        ))
+        self.stdout.write(f"{resultats['echantillons']} échantillons par requête, durée moyenne par requête\n")
+        for nom, avant in resultats['avant'].items():
+            apres = resultats['apres'][nom]
+            gain = avant['ms_par_requete'] / apres['ms_par_requete'] if apres['ms_par_requete'] else 0
+            self.stdout.write(self.style.MIGRATE_HEADING(nom))
+            self.stdout.write(
+                f"  avant : {avant['ms_par_requete']:.3f} ms   après : {apres['ms_par_requete']:.3f} ms   (x{gain:.1f})"
+            )
+            self.stdout.write('  plan avant :')
+            for ligne in avant['plan'].splitlines():
+                self.stdout.write(f'    {ligne}')
+            self.stdout.write('  plan après :')
+            for ligne in apres['plan'].splitlines():
+                self.stdout.write(f'    {ligne}')
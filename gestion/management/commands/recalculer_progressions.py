@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from gestion.progression import reconstruire_progressions
+
+class Command(BaseCommand):
+    help = 'Reconstruit entièrement la table des progressions élève / exercice à partir des évaluations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=1000, help='Nombre de lignes insérées par lot')
+
+    def handle(self, *args, **options):
+        total = reconstruire_progressions(taille_lot=options['taille_lot'])
+        self.stdout.write(self.style.SUCCESS(f'{total} progression(s) recalculée(s).'))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from gestion.boite_envoi import envoyer_mails_en_attente, purger_pieces_jointes
+
+class Command(BaseCommand):
+    help = "Envoie les mails de la boîte d'envoi (invitations, covoiturage, communications...) au rythme autorisé par le serveur SMTP"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--une-fois', action='store_true', help='Envoie les mails arrivés à échéance puis s\'arrête (usage cron)')
+        parser.add_argument('--intervalle', type=float, default=5, help='Secondes entre deux recherches de mails à envoyer')
+        parser.add_argument(
+            '--par-minute', type=float, default=None,
+            help='Nombre maximal de mails envoyés par minute (par défaut BOITE_ENVOI_MAILS_PAR_MINUTE)',
+        )
+
+    def handle(self, *args, **options):
+        purge_faite = False
+        while True:
+            mails = envoyer_mails_en_attente(par_minute=options['par_minute'])
+            if not mails:
+                # File vide : on en profite pour supprimer les pièces jointes des mails partis
+                if not purge_faite:
+                    purger_pieces_jointes()
+                    purge_faite = True
+                if options['une_fois']:
+                    break
+                time.sleep(options['intervalle'])
+                continue
+            purge_faite = False
+            nb_envoyes = sum(1 for mail in mails if mail.statut == mail.STATUT_ENVOYE)
+            nb_relances = sum(1 for mail in mails if mail.statut == mail.STATUT_EN_ATTENTE)
+            nb_echecs = sum(1 for mail in mails if mail.statut == mail.STATUT_ECHEC)
+            style = self.style.SUCCESS if nb_envoyes == len(mails) else self.style.WARNING
+            self.stdout.write(style(
+                f'{nb_envoyes}/{len(mails)} mail(s) envoyé(s), {nb_relances} à retenter, {nb_echecs} en échec.'
+            ))
@@ -0,0 +1,32 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from gestion.envoi_pdf import executer_tache, prendre_tache_suivante
+
+class Command(BaseCommand):
+    help = 'Traite les envois de PDF palanquées aux encadrants mis en file depuis la page séance'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--une-fois', action='store_true', help='Traite les tâches en attente puis s\'arrête (usage cron)')
+        parser.add_argument('--intervalle', type=float, default=2, help='Secondes entre deux recherches de tâches')
+        parser.add_argument(
+            '--processus', type=int, default=min(os.cpu_count() or 1, 4),
+            help='Nombre de processus pour générer les PDF (1 : dans le processus courant)',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            tache = prendre_tache_suivante()
+            if tache is None:
+                if options['une_fois']:
+                    break
+                time.sleep(options['intervalle'])
+                continue
+            self.stdout.write(f'Tâche {tache.pk} : envoi des PDF palanquées de la séance {tache.seance}...')
+            tache = executer_tache(tache, processus=options['processus'])
+            style = self.style.SUCCESS if tache.statut == tache.STATUT_TERMINEE else self.style.ERROR
+            self.stdout.write(style(
+                f'Tâche {tache.pk} {tache.get_statut_display().lower()} : '
+                f'{tache.nb_envoyes}/{tache.nb_total} mail(s) envoyé(s), {len(tache.erreurs)} erreur(s).'
+            ))
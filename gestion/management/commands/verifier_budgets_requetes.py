@@ -0,0 +1,157 @@
+import json
+from collections import Counter
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+
+from gestion import urls
+from gestion.budgets_requetes import BUDGETS, Budget, objets_de_reference, routes
+from gestion.donnees_synthetiques import base_de_mesure, generer_club
+
+# Requêtes SQL affichées par route en échec (les plus répétées d'abord)
+SQL_AFFICHEES = 15
+SQL_LONGUEUR_MAX = 300
+
+
+class _Requetes:
+    """execute_wrapper gardant le SQL de chaque requête exécutée."""
+
+    def __init__(self):
+        self.sql = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.sql.append(sql)
+        return execute(sql, params, many, context)
+
+
+def _mesurer_route(nom, pattern, budget, objets):
+    """{'statut', 'sql'} de la réponse de la route, ou {'erreur'} ; ses écritures sont annulées."""
+    cache.clear()
+    client = Client()
+    if not budget.anonyme:
+        client.force_login(objets['utilisateur'])
+    requetes = _Requetes()
+    try:
+        methode, url, arguments = budget.requete(nom, pattern, objets)
+        with transaction.atomic():
+            with connection.execute_wrapper(requetes):
+                response = getattr(client, methode)(url, **arguments)
+                # Les réponses en flux ne sont produites (et ne font leurs requêtes) qu'à la lecture
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            response.close()
+            transaction.set_rollback(True)
+    except Exception as exc:
+        return {'erreur': f'{type(exc).__name__} : {exc}'}
+    return {'statut': response.status_code, 'sql': requetes.sql}
+
+
+class Command(BaseCommand):
+    help = (
+        "Vérifie le budget de requêtes SQL de chaque route de gestion/urls.py sur un club synthétique, "
+        "puis sur un club plus grand pour détecter les N+1"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--eleves', type=int, default=30, help="Nombre d'élèves du club de référence")
+        parser.add_argument('--facteur', type=int, default=3,
+                            help='Le second club est ce nombre de fois plus grand (1 : pas de second club)')
+        parser.add_argument('--graine', type=int, default=1, help='Graine du générateur')
+        parser.add_argument('--route', action='append', dest='filtres', default=[],
+                            help='Ne vérifie que les routes dont le nom contient ce texte (répétable)')
+        parser.add_argument('--json', dest='fichier_json', help='Écrit le nombre de requêtes par route dans ce fichier JSON')
+
+    def handle(self, *args, **options):
+        toutes = routes(urls.urlpatterns)
+        selection = {
+            nom: pattern for nom, pattern in sorted(toutes.items())
+            if not options['filtres'] or any(filtre in nom for filtre in options['filtres'])
+        }
+        if not selection:
+            raise CommandError('Aucune route ne correspond à --route')
+
+        with base_de_mesure():
+            reference = self._mesurer(selection, options['eleves'], options['graine'])
+            grand = None
+            if options['facteur'] > 1:
+                call_command('flush', interactive=False, verbosity=0)
+                grand = self._mesurer(selection, options['eleves'] * options['facteur'], options['graine'])
+
+        echecs = self._verifier(selection, reference, grand, options['facteur'])
+        inconnues = sorted(set(BUDGETS) - set(toutes))
+        for nom in inconnues:
+            self.stdout.write(self.style.ERROR(f"{nom} : budget d'une route absente de gestion/urls.py"))
+        if options['fichier_json']:
+            with open(options['fichier_json'], 'w', encoding='utf-8') as f:
+                json.dump({
+                    nom: {
+                        'statut': mesure.get('statut'),
+                        'reference': len(mesure.get('sql', [])),
+                        'grand': len(grand[nom].get('sql', [])) if grand else None,
+                    } for nom, mesure in reference.items()
+                }, f, ensure_ascii=False, indent=2)
+        nb_echecs = echecs + len(inconnues)
+        if nb_echecs:
+            raise CommandError(f"{nb_echecs} route(s) hors budget, en erreur ou sans budget sur {len(selection)}")
+        self.stdout.write(self.style.SUCCESS(f"{len(reference)} route(s) dans leur budget de requêtes"))
+
+    def _mesurer(self, selection, nb_eleves, graine):
+        resume = generer_club(
+            nb_evaluations=30 * nb_eleves, nb_eleves=nb_eleves, nb_encadrants=max(4, nb_eleves // 6),
+            nb_seances=max(12, nb_eleves // 3), nb_sorties=3, nb_exercices=40, graine=graine,
+        )
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            'Club synthétique : ' + ', '.join(f"{nb} {nom}" for nom, nb in resume.items())
+        ))
+        objets = objets_de_reference()
+        mesures = {}
+        for nom, pattern in selection.items():
+            budget = BUDGETS.get(nom) or Budget(None)
+            if not budget.non_mesuree:
+                mesures[nom] = _mesurer_route(nom, pattern, budget, objets)
+        return mesures
+
+    def _verifier(self, selection, reference, grand, facteur):
+        """Affiche les routes en échec avec leur SQL ; retourne leur nombre."""
+        echecs = 0
+        for nom in selection:
+            budget = BUDGETS.get(nom)
+            if budget is not None and budget.non_mesuree:
+                self.stdout.write(self.style.WARNING(f"{nom} : non mesurée ({budget.non_mesuree})"))
+                continue
+            mesure = reference[nom]
+            mesure_grand = grand[nom] if grand else None
+            probleme = None
+            if 'erreur' in mesure or (mesure_grand and 'erreur' in mesure_grand):
+                probleme = f"erreur : {mesure.get('erreur') or mesure_grand['erreur']}"
+            elif mesure['statut'] >= 400 or (mesure_grand and mesure_grand['statut'] >= 400):
+                probleme = f"réponse HTTP {mesure['statut']}" + (f" / {mesure_grand['statut']}" if mesure_grand else '')
+            elif budget is None:
+                probleme = f"sans budget ({len(mesure['sql'])} requêtes)"
+            elif len(mesure['sql']) > budget.maximum:
+                probleme = f"{len(mesure['sql'])} requêtes, budget {budget.maximum}"
+            elif mesure_grand and not budget.proportionnel and len(mesure_grand['sql']) > len(mesure['sql']):
+                probleme = (
+                    f"{len(mesure['sql'])} requêtes, {len(mesure_grand['sql'])} sur un club {facteur} fois plus grand "
+                    "(requêtes proportionnelles aux données)"
+                )
+                mesure = mesure_grand
+            if probleme is None:
+                continue
+            echecs += 1
+            self.stdout.write(self.style.ERROR(f"{nom} : {probleme}"))
+            if budget is not None and 'sql' in mesure:
+                self._afficher_sql(mesure['sql'])
+        return echecs
+
+    def _afficher_sql(self, requetes):
+        for sql, nombre in Counter(requetes).most_common(SQL_AFFICHEES):
+            if len(sql) > SQL_LONGUEUR_MAX:
+                sql = sql[:SQL_LONGUEUR_MAX] + '…'
+            self.stdout.write(f"  {nombre:4d} × {sql}")
+        autres = len(set(requetes)) - SQL_AFFICHEES
+        if autres > 0:
+            self.stdout.write(f"  ... et {autres} autre(s) requête(s) distincte(s)")
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.functional import SimpleLazyObject
+
+from . import performances
+from .roles import roles_utilisateur
+
+
+class RolesMiddleware:
+    """
+    Pose request.roles, chargé à la première lecture puis réutilisé pendant toute la requête.
+    La session est rattachée à l'utilisateur pour que les helpers qui ne reçoivent que
+    user (is_codir, peut_voir_suivi...) profitent aussi du cache de session.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.roles = SimpleLazyObject(
+            lambda: roles_utilisateur(request.user, getattr(request, 'session', None))
+        )
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        session = getattr(request, 'session', None)
+        if session is not None and request.user.is_authenticated:
+            request.user._session_roles = session
+        return None
+
+
+class PerformancesMiddleware:
+    """
+    Mesure chaque réponse (durée, requêtes SQL, taille, sections) et l'agrège par nom
+    d'URL (voir gestion.performances). Placé en tête de MIDDLEWARE pour couvrir les autres ;
+    désactivé par PERFORMANCES_ACTIVES = False.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFORMANCES_ACTIVES', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mesure = performances.Mesure()
+        with mesure.active():
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else '(introuvable)'
+
+        def terminer(octets):
+            performances.enregistrer(route, request.method, response.status_code, mesure, octets)
+
+        if response.streaming:
+            response.streaming_content = mesure.suivre_flux(response.streaming_content, terminer)
+        else:
+            terminer(len(response.content))
+        return response
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:11
+
+import django.db.models.deletion
+from itertools import groupby
+from django.db import migrations, models
+
+
+def remplir_progressions(apps, schema_editor):
+    EvaluationExercice = apps.get_model('gestion', 'EvaluationExercice')
+    EleveExerciceProgression = apps.get_model('gestion', 'EleveExerciceProgression')
+    evaluations = EvaluationExercice.objects.order_by(
+        'eleve_id', 'exercice_id', '-date_evaluation', '-id'
+    ).iterator(chunk_size=1000)
+    lot = []
+    for (eleve_id, exercice_id), groupe in groupby(evaluations, key=lambda e: (e.eleve_id, e.exercice_id)):
+        historique = list(groupe)
+        notes = [e.note for e in historique if e.note is not None]
+        note_max = max(notes) if notes else None
+        evals_max = [e for e in historique if note_max and e.note == note_max]
+        lot.append(EleveExerciceProgression(
+            eleve_id=eleve_id,
+            exercice_id=exercice_id,
+            note_max=note_max,
+            nb_eval_max=len(evals_max),
+            nb_evaluations=len(historique),
+            derniere_evaluation_id=historique[0].id,
+            derniere_evaluation_max_id=evals_max[0].id if evals_max else None,
+            validation_dt=any(e.palanquee_id is None for e in historique),
+        ))
+        if len(lot) >= 1000:
+            EleveExerciceProgression.objects.bulk_create(lot)
+            lot = []
+    if lot:
+        EleveExerciceProgression.objects.bulk_create(lot)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0028_seance_type_and_exercice_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EleveExerciceProgression',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('note_max', models.IntegerField(blank=True, null=True)),
+                ('nb_eval_max', models.PositiveIntegerField(default=0)),
+                ('nb_evaluations', models.PositiveIntegerField(default=0)),
+                ('validation_dt', models.BooleanField(default=False)),
+                ('date_mise_a_jour', models.DateTimeField(auto_now=True)),
+                ('derniere_evaluation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='gestion.evaluationexercice')),
+                ('derniere_evaluation_max', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='gestion.evaluationexercice')),
+                ('eleve', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progressions_exercices', to='gestion.adherent')),
+                ('exercice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progressions', to='gestion.exercice')),
+            ],
+            options={
+                'verbose_name': 'Progression élève / exercice',
+                'verbose_name_plural': 'Progressions élèves / exercices',
+                'unique_together': {('eleve', 'exercice')},
+            },
+        ),
+        migrations.RunPython(remplir_progressions, migrations.RunPython.noop),
+    ]
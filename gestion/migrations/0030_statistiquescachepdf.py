@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0029_eleveexerciceprogression'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiquesCachePdf',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hits', models.PositiveIntegerField(default=0, verbose_name='Succès (PDF lus en cache)')),
+                ('misses', models.PositiveIntegerField(default=0, verbose_name='Échecs (PDF générés)')),
+                ('evictions', models.PositiveIntegerField(default=0, verbose_name='PDF évincés')),
+                ('date_remise_a_zero', models.DateTimeField(auto_now_add=True, verbose_name='Compteurs depuis le')),
+            ],
+            options={
+                'verbose_name': 'Cache des PDF de suivi',
+                'verbose_name_plural': 'Cache des PDF de suivi',
+            },
+        ),
+    ]
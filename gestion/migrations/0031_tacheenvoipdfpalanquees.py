@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0030_statistiquescachepdf'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TacheEnvoiPdfPalanquees',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('corps_html', models.TextField(verbose_name='Corps du message (HTML)')),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('terminee', 'Terminée'), ('echec', 'Échec')], default='en_attente', max_length=20)),
+                ('nb_total', models.PositiveIntegerField(default=0, verbose_name='Mails à envoyer')),
+                ('nb_traites', models.PositiveIntegerField(default=0, verbose_name='Mails traités')),
+                ('nb_envoyes', models.PositiveIntegerField(default=0, verbose_name='Mails envoyés')),
+                ('destinataires', models.JSONField(blank=True, default=list, help_text='Encadrants ayant reçu leur mail')),
+                ('erreurs', models.JSONField(blank=True, default=list, help_text='Erreurs par destinataire')),
+                ('resultat_notifie', models.BooleanField(default=False)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_debut', models.DateTimeField(blank=True, null=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+                ('auteur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('seance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='taches_envoi_pdf', to='gestion.seance')),
+            ],
+            options={
+                'verbose_name': 'Envoi des PDF palanquées',
+                'verbose_name_plural': 'Envois des PDF palanquées',
+                'ordering': ['-date_creation'],
+            },
+        ),
+    ]
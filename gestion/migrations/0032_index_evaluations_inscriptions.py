@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0031_tacheenvoipdfpalanquees'),
+    ]
+
+    operations = [
+        # Index composites d'abord, puis suppression des index simples qu'ils couvrent
+        migrations.AddIndex(
+            model_name='adherent',
+            index=models.Index(fields=['type_personne', 'statut', 'actif'], name='adherent_type_statut_actif'),
+        ),
+        migrations.AddIndex(
+            model_name='evaluationexercice',
+            index=models.Index(fields=['eleve', 'exercice', '-date_evaluation'], name='evalex_eleve_ex_date'),
+        ),
+        migrations.AddIndex(
+            model_name='evaluationexercice',
+            index=models.Index(fields=['palanquee', 'eleve', 'exercice'], name='evalex_palanquee_eleve_ex'),
+        ),
+        migrations.AlterField(
+            model_name='evaluationexercice',
+            name='eleve',
+            field=models.ForeignKey(db_index=False, limit_choices_to={'statut': 'eleve'}, on_delete=django.db.models.deletion.CASCADE, related_name='evaluations_exercices_recues', to='gestion.adherent'),
+        ),
+        migrations.AlterField(
+            model_name='evaluationexercice',
+            name='palanquee',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='evaluations_exercices', to='gestion.palanquee'),
+        ),
+        migrations.AlterField(
+            model_name='inscriptionseance',
+            name='seance',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='inscriptions', to='gestion.seance'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:36
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copie figée de gestion.recherche à la création de cette migration : une évolution
+# ultérieure de la normalisation ne doit pas changer ce que la migration écrit.
+CHAMPS = ('nom', 'prenom', 'email')
+LONGUEUR_MAX = 100
+_LIGATURES = str.maketrans({'œ': 'oe', 'æ': 'ae', 'ß': 'ss'})
+_SEPARATEURS = re.compile(r'[^a-z0-9]+')
+
+
+def jetons(texte):
+    texte = unicodedata.normalize('NFKD', (texte or '').lower().translate(_LIGATURES))
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    return [mot[:LONGUEUR_MAX] for mot in _SEPARATEURS.split(texte) if mot]
+
+
+def remplir_jetons(apps, schema_editor):
+    Adherent = apps.get_model('gestion', 'Adherent')
+    JetonRechercheAdherent = apps.get_model('gestion', 'JetonRechercheAdherent')
+    lot = []
+    for adherent in Adherent.objects.only(*CHAMPS).iterator(chunk_size=2000):
+        for champ in CHAMPS:
+            for jeton in set(jetons(getattr(adherent, champ))):
+                lot.append(JetonRechercheAdherent(adherent_id=adherent.pk, champ=champ, jeton=jeton))
+        if len(lot) >= 2000:
+            JetonRechercheAdherent.objects.bulk_create(lot)
+            lot = []
+    JetonRechercheAdherent.objects.bulk_create(lot)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0032_index_evaluations_inscriptions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JetonRechercheAdherent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('champ', models.CharField(choices=[('nom', 'Nom'), ('prenom', 'Prénom'), ('email', 'Email')], max_length=10)),
+                ('jeton', models.CharField(db_index=True, max_length=100)),
+                ('adherent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jetons_recherche', to='gestion.adherent')),
+            ],
+            options={
+                'verbose_name': 'Jeton de recherche',
+                'verbose_name_plural': 'Jetons de recherche',
+            },
+        ),
+        migrations.RunPython(remplir_jetons, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:57
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0033_jetonrechercheadherent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailSortant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origine', models.CharField(help_text="Envoi d'origine (invitation, covoiturage...)", max_length=50)),
+                ('destinataire', models.CharField(max_length=254)),
+                ('objet', models.CharField(max_length=255)),
+                ('message', models.JSONField(help_text='Message sérialisé ; les pièces jointes sont sur disque (BOITE_ENVOI_DIR)')),
+                ('empreinte', models.CharField(db_index=True, help_text='Empreinte du contenu, pour écarter les doublons', max_length=64)),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('envoye', 'Envoyé'), ('echec', 'Échec'), ('doublon', 'Doublon non envoyé')], default='en_attente', max_length=20)),
+                ('tentatives', models.PositiveSmallIntegerField(default=0)),
+                ('prochaine_tentative', models.DateTimeField(default=django.utils.timezone.now)),
+                ('derniere_erreur', models.TextField(blank=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_reservation', models.DateTimeField(blank=True, null=True)),
+                ('date_envoi', models.DateTimeField(blank=True, null=True)),
+                ('historique_adherents', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mails', to='gestion.historiquemailadherents')),
+                ('historique_seance', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mails', to='gestion.historiquemailseance')),
+                ('seance', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mails_sortants', to='gestion.seance')),
+            ],
+            options={
+                'verbose_name': "Mail de la boîte d'envoi",
+                'verbose_name_plural': "Boîte d'envoi",
+                'ordering': ['-date_creation'],
+                'indexes': [models.Index(fields=['statut', 'prochaine_tentative'], name='mailsortant_statut_prochaine')],
+            },
+        ),
+    ]
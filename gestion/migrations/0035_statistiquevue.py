@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0034_mailsortant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiqueVue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('debut', models.DateTimeField(verbose_name='Début de la tranche')),
+                ('route', models.CharField(max_length=200, verbose_name='Route')),
+                ('nb', models.PositiveIntegerField(default=0, verbose_name='Réponses')),
+                ('nb_erreurs', models.PositiveIntegerField(default=0, verbose_name='Erreurs serveur')),
+                ('duree_ms', models.FloatField(default=0, verbose_name='Durée cumulée (ms)')),
+                ('duree_max_ms', models.FloatField(default=0, verbose_name='Durée maximale (ms)')),
+                ('histogramme', models.JSONField(default=list)),
+                ('requetes', models.PositiveIntegerField(default=0, verbose_name='Requêtes SQL cumulées')),
+                ('requetes_max', models.PositiveIntegerField(default=0, verbose_name='Requêtes SQL maximum')),
+                ('duree_sql_ms', models.FloatField(default=0, verbose_name='Durée SQL cumulée (ms)')),
+                ('octets', models.BigIntegerField(default=0, verbose_name='Octets envoyés')),
+                ('sections', models.JSONField(default=dict)),
+            ],
+            options={
+                'verbose_name': 'Performances des pages',
+                'verbose_name_plural': 'Performances des pages',
+                'constraints': [models.UniqueConstraint(fields=('debut', 'route'), name='statistique_vue_unique_tranche_route')],
+            },
+        ),
+    ]
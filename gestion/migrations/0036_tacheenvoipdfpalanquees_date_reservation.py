@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0035_statistiquevue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tacheenvoipdfpalanquees',
+            name='date_reservation',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -4,6 +4,7 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db.models import Q
 import uuid
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 class Section(models.Model):
     SECTIONS_CHOICES = [
@@ -86,6 +87,10 @@ class Adherent(models.Model):
         verbose_name = "Adhérent"
         verbose_name_plural = "Adhérents"
         ordering = ['nom', 'prenom']
+        indexes = [
+            # Listes et destinataires filtrés par type de personne, statut et activité
+            models.Index(fields=['type_personne', 'statut', 'actif'], name='adherent_type_statut_actif'),
+        ]
     
     def __str__(self):
         return f"{self.nom} {self.prenom}"
@@ -112,6 +117,31 @@ class Adherent(models.Model):
             group, _ = Group.objects.get_or_create(name=group_name)
             self.user.groups.clear()
             self.user.groups.add(group)
+        # Index de recherche (nom, prénom, email sans accents ni majuscules)
+        from .recherche import indexer_adherents
+        indexer_adherents([self])
+
+
+class JetonRechercheAdherent(models.Model):
+    """
+    Mot normalisé (minuscules, sans accents) du nom, du prénom ou de l'email d'un adhérent,
+    tenu à jour par Adherent.save() ; la recherche se fait par préfixe sur l'index de jeton.
+    """
+    CHAMP_CHOICES = [
+        ('nom', 'Nom'),
+        ('prenom', 'Prénom'),
+        ('email', 'Email'),
+    ]
+    adherent = models.ForeignKey(Adherent, on_delete=models.CASCADE, related_name='jetons_recherche')
+    champ = models.CharField(max_length=10, choices=CHAMP_CHOICES)
+    jeton = models.CharField(max_length=100, db_index=True)
+
+    class Meta:
+        verbose_name = "Jeton de recherche"
+        verbose_name_plural = "Jetons de recherche"
+
+    def __str__(self):
+        return f"{self.adherent_id} {self.champ}:{self.jeton}"
 
 class Exercice(models.Model):
     TYPE_CLASSIQUE = 'classique'
@@ -325,7 +355,8 @@ class InscriptionSeance(models.Model):
         ("encadrant", "Encadrant"),
         ("eleve", "Passer en élève pour la séance"),
     ]
-    seance = models.ForeignKey('Seance', on_delete=models.CASCADE, related_name='inscriptions')
+    # Pas d'index propre sur seance : l'index unique (seance, personne) le couvre
+    seance = models.ForeignKey('Seance', on_delete=models.CASCADE, related_name='inscriptions', db_index=False)
     personne = models.ForeignKey('Adherent', on_delete=models.CASCADE, related_name='inscriptions_seance')
     date_inscription = models.DateTimeField(auto_now_add=True)
     covoiturage = models.CharField(max_length=10, choices=COVOITURAGE_CHOICES, blank=True, null=True, verbose_name="Covoiturage")
@@ -369,8 +400,9 @@ class EvaluationExercice(models.Model):
         ('autre', 'Autre'),
     ]
     
-    palanquee = models.ForeignKey(Palanquee, on_delete=models.CASCADE, related_name='evaluations_exercices', null=True, blank=True)
-    eleve = models.ForeignKey(Adherent, on_delete=models.CASCADE, related_name='evaluations_exercices_recues', limit_choices_to={'statut': 'eleve'})
+    # palanquee et eleve sont en tête des index composites déclarés dans Meta : pas d'index propre
+    palanquee = models.ForeignKey(Palanquee, on_delete=models.CASCADE, related_name='evaluations_exercices', null=True, blank=True, db_index=False)
+    eleve = models.ForeignKey(Adherent, on_delete=models.CASCADE, related_name='evaluations_exercices_recues', limit_choices_to={'statut': 'eleve'}, db_index=False)
     exercice = models.ForeignKey(Exercice, on_delete=models.CASCADE, related_name='evaluations')
     encadrant = models.ForeignKey(Adherent, on_delete=models.SET_NULL, null=True, blank=True, related_name='evaluations_exercices_donnees', limit_choices_to={'statut': 'encadrant'})
     note = models.IntegerField(choices=[(1, 'Non maitrise'), (2, "En cours d'acquisition"), (3, 'Maitrise')], null=True, blank=True)
@@ -381,6 +413,12 @@ class EvaluationExercice(models.Model):
     class Meta:
         verbose_name = "Evaluation exercice"
         verbose_name_plural = "Evaluations exercices"
+        indexes = [
+            # Historique d'un élève sur un exercice, du plus récent au plus ancien
+            models.Index(fields=['eleve', 'exercice', '-date_evaluation'], name='evalex_eleve_ex_date'),
+            # Saisie par palanquée (evaluation_publique)
+            models.Index(fields=['palanquee', 'eleve', 'exercice'], name='evalex_palanquee_eleve_ex'),
+        ]
     
     def __str__(self):
         if self.note:
@@ -388,6 +426,34 @@ class EvaluationExercice(models.Model):
         else:
             return f"{self.eleve.nom_complet} - {self.exercice.nom} : Non realise"
 
+class EleveExerciceProgression(models.Model):
+    """
+    Synthèse dénormalisée des évaluations d'un élève pour un exercice.
+    Tenue à jour à chaque enregistrement / suppression d'EvaluationExercice
+    (voir gestion.signals) et reconstructible via la commande recalculer_progressions.
+    """
+    eleve = models.ForeignKey(Adherent, on_delete=models.CASCADE, related_name='progressions_exercices')
+    exercice = models.ForeignKey(Exercice, on_delete=models.CASCADE, related_name='progressions')
+    note_max = models.IntegerField(null=True, blank=True)
+    nb_eval_max = models.PositiveIntegerField(default=0)
+    nb_evaluations = models.PositiveIntegerField(default=0)
+    derniere_evaluation = models.ForeignKey(EvaluationExercice, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    derniere_evaluation_max = models.ForeignKey(EvaluationExercice, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    validation_dt = models.BooleanField(default=False)
+    date_mise_a_jour = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Progression élève / exercice"
+        verbose_name_plural = "Progressions élèves / exercices"
+        unique_together = ('eleve', 'exercice')
+
+    def __str__(self):
+        return f"{self.eleve} - {self.exercice} : {self.note_max or 0}/3 ({self.nb_eval_max})"
+
+    @property
+    def has_evaluation(self):
+        return self.nb_evaluations > 0
+
 class ModeleMailSeance(models.Model):
     nom = models.CharField(max_length=100, unique=True)
     objet = models.CharField(max_length=255)
@@ -430,6 +496,79 @@ class CorpsMailPdfPalanquees(models.Model):
         return obj
 
 
+class TacheEnvoiPdfPalanquees(models.Model):
+    """
+    Envoi des PDF de palanquée aux encadrants d'une séance, mis en file par la vue
+    et exécuté par la commande traiter_envois_pdf (voir gestion.envoi_pdf).
+    """
+    STATUT_EN_ATTENTE = 'en_attente'
+    STATUT_EN_COURS = 'en_cours'
+    STATUT_TERMINEE = 'terminee'
+    STATUT_ECHEC = 'echec'
+    STATUT_CHOICES = [
+        (STATUT_EN_ATTENTE, 'En attente'),
+        (STATUT_EN_COURS, 'En cours'),
+        (STATUT_TERMINEE, 'Terminée'),
+        (STATUT_ECHEC, 'Échec'),
+    ]
+
+    seance = models.ForeignKey(Seance, on_delete=models.CASCADE, related_name='taches_envoi_pdf')
+    auteur = models.ForeignKey(get_user_model(), on_delete=models.SET_NULL, null=True, blank=True)
+    corps_html = models.TextField(verbose_name='Corps du message (HTML)')
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default=STATUT_EN_ATTENTE)
+    nb_total = models.PositiveIntegerField("Mails à envoyer", default=0)
+    nb_traites = models.PositiveIntegerField("Mails traités", default=0)
+    nb_envoyes = models.PositiveIntegerField("Mails envoyés", default=0)
+    destinataires = models.JSONField(default=list, blank=True, help_text="Encadrants ayant reçu leur mail")
+    erreurs = models.JSONField(default=list, blank=True, help_text="Erreurs par destinataire")
+    resultat_notifie = models.BooleanField(default=False)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(null=True, blank=True)
+    # Réservation par un worker, renouvelée à chaque progression (voir envoi_pdf.DUREE_RESERVATION)
+    date_reservation = models.DateTimeField(null=True, blank=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Envoi des PDF palanquées"
+        verbose_name_plural = "Envois des PDF palanquées"
+        ordering = ['-date_creation']
+
+    def __str__(self):
+        return f"Envoi PDF palanquées - {self.seance} ({self.get_statut_display()})"
+
+    @property
+    def est_terminee(self):
+        return self.statut in (self.STATUT_TERMINEE, self.STATUT_ECHEC)
+
+
+class StatistiquesCachePdf(models.Model):
+    """
+    Compteurs du cache disque des PDF de suivi de formation (voir gestion.pdf_cache).
+    Un seul enregistrement (pk=1).
+    """
+    hits = models.PositiveIntegerField("Succès (PDF lus en cache)", default=0)
+    misses = models.PositiveIntegerField("Échecs (PDF générés)", default=0)
+    evictions = models.PositiveIntegerField("PDF évincés", default=0)
+    date_remise_a_zero = models.DateTimeField("Compteurs depuis le", auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Cache des PDF de suivi'
+        verbose_name_plural = verbose_name
+
+    def __str__(self):
+        return 'Cache des PDF de suivi'
+
+    @classmethod
+    def get_singleton(cls):
+        obj, _ = cls.objects.get_or_create(pk=1)
+        return obj
+
+    @property
+    def taux_succes(self):
+        total = self.hits + self.misses
+        return round(100 * self.hits / total, 1) if total else None
+
+
 class HistoriqueMailSeance(models.Model):
     seance = models.ForeignKey('Seance', on_delete=models.CASCADE, related_name='mails_envoyes')
     objet = models.CharField(max_length=255)
@@ -478,6 +617,49 @@ class HistoriqueMailAdherents(models.Model):
     def __str__(self):
         return f"{self.objet} ({self.date_envoi:%d/%m/%Y %H:%M})"
 
+class MailSortant(models.Model):
+    """
+    Mail de la boîte d'envoi, un par destinataire : mis en file par les vues d'envoi
+    en masse et envoyé par la commande traiter_boite_envoi (voir gestion.boite_envoi).
+    """
+    STATUT_EN_ATTENTE = 'en_attente'
+    STATUT_EN_COURS = 'en_cours'
+    STATUT_ENVOYE = 'envoye'
+    STATUT_ECHEC = 'echec'
+    STATUT_DOUBLON = 'doublon'
+    STATUT_CHOICES = [
+        (STATUT_EN_ATTENTE, 'En attente'),
+        (STATUT_EN_COURS, 'En cours'),
+        (STATUT_ENVOYE, 'Envoyé'),
+        (STATUT_ECHEC, 'Échec'),
+        (STATUT_DOUBLON, 'Doublon non envoyé'),
+    ]
+
+    origine = models.CharField(max_length=50, help_text="Envoi d'origine (invitation, covoiturage...)")
+    seance = models.ForeignKey(Seance, on_delete=models.SET_NULL, null=True, blank=True, related_name='mails_sortants')
+    historique_seance = models.ForeignKey(HistoriqueMailSeance, on_delete=models.SET_NULL, null=True, blank=True, related_name='mails')
+    historique_adherents = models.ForeignKey(HistoriqueMailAdherents, on_delete=models.SET_NULL, null=True, blank=True, related_name='mails')
+    destinataire = models.CharField(max_length=254)
+    objet = models.CharField(max_length=255)
+    message = models.JSONField(help_text="Message sérialisé ; les pièces jointes sont sur disque (BOITE_ENVOI_DIR)")
+    empreinte = models.CharField(max_length=64, db_index=True, help_text="Empreinte du contenu, pour écarter les doublons")
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default=STATUT_EN_ATTENTE)
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    prochaine_tentative = models.DateTimeField(default=timezone.now)
+    derniere_erreur = models.TextField(blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_reservation = models.DateTimeField(null=True, blank=True)
+    date_envoi = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Mail de la boîte d'envoi"
+        verbose_name_plural = "Boîte d'envoi"
+        ordering = ['-date_creation']
+        indexes = [models.Index(fields=['statut', 'prochaine_tentative'], name='mailsortant_statut_prochaine')]
+
+    def __str__(self):
+        return f"{self.objet} → {self.destinataire} ({self.get_statut_display()})"
+
 class ListeDiffusion(models.Model):
     nom = models.CharField(max_length=100, unique=True, verbose_name="Nom de la liste")
     adherents = models.ManyToManyField(Adherent, related_name='listes_diffusion', verbose_name="Adhérents")
@@ -491,3 +673,33 @@ class ListeDiffusion(models.Model):
 
     def __str__(self):
         return f"{self.nom} ({self.adherents.count()} adhérent(s))"
+
+
+class StatistiqueVue(models.Model):
+    """
+    Mesures agrégées des réponses d'une route sur une tranche de temps (voir gestion.performances).
+    Les durées sont en millisecondes ; histogramme : nombre de réponses par classe de durée
+    (performances.BORNES_MS) ; sections : durée cumulée par section (reportlab, openpyxl, smtp).
+    """
+    debut = models.DateTimeField("Début de la tranche")
+    route = models.CharField("Route", max_length=200)
+    nb = models.PositiveIntegerField("Réponses", default=0)
+    nb_erreurs = models.PositiveIntegerField("Erreurs serveur", default=0)
+    duree_ms = models.FloatField("Durée cumulée (ms)", default=0)
+    duree_max_ms = models.FloatField("Durée maximale (ms)", default=0)
+    histogramme = models.JSONField(default=list)
+    requetes = models.PositiveIntegerField("Requêtes SQL cumulées", default=0)
+    requetes_max = models.PositiveIntegerField("Requêtes SQL maximum", default=0)
+    duree_sql_ms = models.FloatField("Durée SQL cumulée (ms)", default=0)
+    octets = models.BigIntegerField("Octets envoyés", default=0)
+    sections = models.JSONField(default=dict)
+
+    class Meta:
+        verbose_name = "Performances des pages"
+        verbose_name_plural = verbose_name
+        constraints = [
+            models.UniqueConstraint(fields=['debut', 'route'], name='statistique_vue_unique_tranche_route'),
+        ]
+
+    def __str__(self):
+        return f"{self.route} ({self.debut})"
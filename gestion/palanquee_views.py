@@ -3,6 +3,7 @@ from django.http import Http404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
+from django.db import transaction
 from django.http import HttpResponse, JsonResponse
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
@@ -17,6 +18,9 @@ from reportlab.lib.enums import TA_CENTER
 
 from .models import Palanquee, Evaluation, LienEvaluation, EvaluationExercice
 from .forms import PalanqueeForm, EvaluationBulkForm, EvaluationExerciceBulkForm
+from .performances import section
+from .progression import recalculer_progressions
+from .statistiques_dashboard import invalider_statistiques
 
 # Vues pour les palanquées
 class PalanqueeListView(LoginRequiredMixin, ListView):
@@ -293,6 +297,60 @@ def generer_lien_evaluation(request, pk):
     messages.success(request, f'Nouveau lien d\'évaluation généré : {request.build_absolute_uri(lien.url_evaluation)}')
     return redirect('palanquee_detail', pk=pk)
 
+def _enregistrer_evaluations_publiques(lien, palanquee, eleves, exercices, donnees):
+    """
+    Enregistre la saisie d'un lien d'évaluation en une seule transaction : le lien
+    est fermé, les évaluations existantes de la palanquée sont lues en une requête,
+    puis créées ou mises à jour en masse, et les progressions recalculées.
+    Tout ou rien : une saisie interrompue laisse le lien ouvert et aucune évaluation.
+    Retourne le nombre d'évaluations enregistrées, ou None si le lien a déjà servi.
+    """
+    with transaction.atomic():
+        # Fermer le lien d'abord : une soumission concurrente attend ici puis trouve le lien fermé
+        if not LienEvaluation.objects.filter(pk=lien.pk, est_valide=True).update(est_valide=False):
+            return None
+        lien.est_valide = False
+        existantes = {}
+        for evaluation in EvaluationExercice.objects.filter(palanquee=palanquee).order_by('-id'):
+            # La plus ancienne évaluation d'un couple est celle mise à jour
+            existantes[(evaluation.eleve_id, evaluation.exercice_id)] = evaluation
+        maintenant = timezone.now()
+        a_creer = []
+        a_modifier = []
+        for eleve in eleves:
+            for exercice in exercices:
+                note = donnees.get(f'eval_{eleve.id}_{exercice.id}')
+                commentaire = donnees.get(f'comment_{eleve.id}_{exercice.id}')
+                raison = donnees.get(f'raison_{eleve.id}_{exercice.id}')
+                if not note and not raison:
+                    continue
+                # Une note (exercice réalisé) efface la raison de non réalisation, et inversement
+                note = int(note) if note else None
+                raison = None if note else raison
+                evaluation = existantes.get((eleve.id, exercice.id))
+                if evaluation is None:
+                    a_creer.append(EvaluationExercice(
+                        eleve=eleve,
+                        exercice=exercice,
+                        palanquee=palanquee,
+                        encadrant=palanquee.encadrant,
+                        note=note,
+                        commentaire=commentaire,
+                        raison_non_realise=raison,
+                    ))
+                else:
+                    evaluation.note = note
+                    evaluation.commentaire = commentaire
+                    evaluation.raison_non_realise = raison
+                    evaluation.date_evaluation = maintenant  # auto_now n'est pas appliqué par bulk_update
+                    a_modifier.append(evaluation)
+        EvaluationExercice.objects.bulk_create(a_creer)
+        EvaluationExercice.objects.bulk_update(a_modifier, ['note', 'commentaire', 'raison_non_realise', 'date_evaluation'])
+        # bulk_create / bulk_update ne déclenchent pas les signaux
+        recalculer_progressions((e.eleve_id, e.exercice_id) for e in a_creer + a_modifier)
+    invalider_statistiques()
+    return len(a_creer) + len(a_modifier)
+
 def evaluation_publique(request, token):
     """Page d'évaluation publique accessible sans connexion (par exercice)"""
     try:
@@ -316,110 +374,39 @@ def evaluation_publique(request, token):
         messages.error(request, 'Ce lien d\'évaluation a expiré.')
         return render(request, 'gestion/evaluation_expiree.html')
     palanquee = lien.palanquee
+    eleves = list(palanquee.eleves.all())
+    exercices_palanquee = list(palanquee.exercices_prevus_pour_seance())
     if request.method == 'POST':
-        form = EvaluationExerciceBulkForm(palanquee, request.POST)
+        form = EvaluationExerciceBulkForm(palanquee, request.POST, eleves=eleves, exercices=exercices_palanquee)
         if form.is_valid():
-            evaluations_sauvegardees = 0
-            exercices_palanquee = palanquee.exercices_prevus_pour_seance()
-            total_evaluations_attendues = palanquee.eleves.count() * exercices_palanquee.count()
-            encadrant = palanquee.encadrant
-            for eleve in palanquee.eleves.all():
-                for exercice in exercices_palanquee:
-                    note = form.cleaned_data.get(f'eval_{eleve.id}_{exercice.id}')
-                    commentaire = form.cleaned_data.get(f'comment_{eleve.id}_{exercice.id}')
-                    raison = form.cleaned_data.get(f'raison_{eleve.id}_{exercice.id}')
-                    
-                    # Vérifier si l'évaluation existe déjà
-                    evaluation_existante = EvaluationExercice.objects.filter(
-                        eleve=eleve,
-                        exercice=exercice,
-                        palanquee=palanquee
-                    ).first()
-                    
-                    if note:
-                        # Si une note est donnée (exercice réalisé)
-                        if evaluation_existante:
-                            # Mettre à jour l'évaluation existante
-                            evaluation_existante.note = note
-                            evaluation_existante.commentaire = commentaire
-                            evaluation_existante.raison_non_realise = None  # Réinitialiser la raison
-                            evaluation_existante.save()
-                        else:
-                            # Créer une nouvelle évaluation
-                            EvaluationExercice.objects.create(
-                                eleve=eleve,
-                                exercice=exercice,
-                                palanquee=palanquee,
-                                encadrant=encadrant,
-                                note=note,
-                                commentaire=commentaire,
-                                raison_non_realise=None
-                            )
-                        evaluations_sauvegardees += 1
-                    elif raison:
-                        # Si une raison est donnée (exercice non réalisé)
-                        if evaluation_existante:
-                            # Mettre à jour l'évaluation existante
-                            evaluation_existante.note = None
-                            evaluation_existante.raison_non_realise = raison
-                            evaluation_existante.commentaire = commentaire
-                            evaluation_existante.save()
-                        else:
-                            # Créer une nouvelle évaluation sans note
-                            EvaluationExercice.objects.create(
-                                eleve=eleve,
-                                exercice=exercice,
-                                palanquee=palanquee,
-                                encadrant=encadrant,
-                                note=None,
-                                raison_non_realise=raison,
-                                commentaire=commentaire
-                            )
-                        evaluations_sauvegardees += 1
-            # Marquer le lien comme invalidé dès qu'il y a eu une soumission
-            lien.est_valide = False
-            lien.save()
+            evaluations_sauvegardees = _enregistrer_evaluations_publiques(
+                lien, palanquee, eleves, exercices_palanquee, form.cleaned_data,
+            )
+            if evaluations_sauvegardees is None:
+                # Lien utilisé entre-temps (double envoi, nouvelle tentative après une coupure réseau)
+                dp = palanquee.seance.directeur_plongee
+                return render(request, 'gestion/evaluation_deja_soumise.html', {'palanquee': palanquee, 'dp': dp})
             
             messages.success(request, f'{evaluations_sauvegardees} évaluation(s) sauvegardée(s) avec succès. Le lien d\'évaluation est maintenant fermé.')
             return render(request, 'gestion/evaluation_soumise.html')
     else:
-        form = EvaluationExerciceBulkForm(palanquee)
+        form = EvaluationExerciceBulkForm(palanquee, eleves=eleves, exercices=exercices_palanquee)
     # Pré-remplir avec les évaluations existantes
     evaluations_existantes = {}
     for evaluation in EvaluationExercice.objects.filter(palanquee=palanquee):
-        key = f'eval_{evaluation.eleve.id}_{evaluation.exercice.id}'
+        key = f'eval_{evaluation.eleve_id}_{evaluation.exercice_id}'
         evaluations_existantes[key] = evaluation.note
-        key_comment = f'comment_{evaluation.eleve.id}_{evaluation.exercice.id}'
+        key_comment = f'comment_{evaluation.eleve_id}_{evaluation.exercice_id}'
         evaluations_existantes[key_comment] = evaluation.commentaire
-        key_raison = f'raison_{evaluation.eleve.id}_{evaluation.exercice.id}'
+        key_raison = f'raison_{evaluation.eleve_id}_{evaluation.exercice_id}'
         evaluations_existantes[key_raison] = evaluation.raison_non_realise
     if evaluations_existantes:
-        form = EvaluationExerciceBulkForm(palanquee, initial=evaluations_existantes)
-    # Préparer la structure eleves_exercices pour le template
-    eleves_exercices = []
-    for eleve in palanquee.eleves.all():
-        exos = []
-        for exercice in palanquee.exercices_prevus_pour_seance():
-            field_name = f"eval_{eleve.id}_{exercice.id}"
-            comment_field = f"comment_{eleve.id}_{exercice.id}"
-            raison_field = f"raison_{eleve.id}_{exercice.id}"
-            value = form.initial.get(field_name, '')
-            exos.append({
-                'exercice': exercice,
-                'field_name': field_name,
-                'comment_field': form[comment_field],
-                'raison_field': form[raison_field],
-                'value': value,
-            })
-        eleves_exercices.append({
-            'eleve': eleve,
-            'exercices': exos,
-        })
+        form = EvaluationExerciceBulkForm(palanquee, initial=evaluations_existantes, eleves=eleves, exercices=exercices_palanquee)
     context = {
         'palanquee': palanquee,
         'form': form,
         'token': token,
-        'eleves_exercices': eleves_exercices,
+        'eleves_exercices': form.grille(),
     }
     return render(request, 'gestion/evaluation_publique.html', context)
 
@@ -482,7 +469,8 @@ def build_palanquee_pdf_elements(palanquee):
 
 def write_palanquee_pdf(buffer, palanquee):
     doc = SimpleDocTemplate(buffer, pagesize=A4)
-    doc.build(build_palanquee_pdf_elements(palanquee))
+    with section('reportlab'):
+        doc.build(build_palanquee_pdf_elements(palanquee))
 
 
 def _palanquee_pdf_filename(palanquee):
@@ -538,7 +526,8 @@ def generer_programmes_palanquees_sortie_pdf(request, seance_id):
         if index > 0:
             elements.append(PageBreak())
         elements.extend(build_palanquee_pdf_elements(palanquee))
-    doc.build(elements)
+    with section('reportlab'):
+        doc.build(elements)
     buffer.seek(0)
 
     response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
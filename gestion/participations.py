@@ -0,0 +1,178 @@
+"""
+Participations des encadrants aux séances.
+
+La matrice encadrant × séance est construite à partir d'une seule requête
+values_list sur les inscriptions « encadrant » de la période : seules les
+cases remplies sont gardées, sous forme de tableaux numpy d'indices (ligne,
+colonne) triés par ligne comme une matrice creuse CSR, au lieu d'un test
+d'appartenance par case. Les totaux par encadrant et par saison sont des
+bincount sur ces indices.
+
+Une saison va du 1er septembre au 31 août ; sans période demandée, c'est la
+saison en cours qui est retenue.
+"""
+import datetime
+
+import numpy as np
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import InscriptionSeance, Seance
+
+SAISON_MOIS_DEBUT = 9
+
+
+def saison(date):
+    """Année de début de la saison d'une date (2025 pour la saison 2025-2026)."""
+    return date.year if date.month >= SAISON_MOIS_DEBUT else date.year - 1
+
+
+def libelle_saison(annee):
+    return f"{annee}-{annee + 1}"
+
+
+def bornes_saison(annee):
+    """(premier jour, dernier jour) de la saison commençant en annee."""
+    return (
+        datetime.date(annee, SAISON_MOIS_DEBUT, 1),
+        datetime.date(annee + 1, SAISON_MOIS_DEBUT, 1) - datetime.timedelta(days=1),
+    )
+
+
+def _date(valeur):
+    try:
+        return parse_date(valeur or '')
+    except ValueError:
+        return None
+
+
+def periode(params):
+    """
+    Période demandée dans les paramètres GET : (date de début, date de fin, saison).
+    saison=AAAA : la saison commençant en AAAA ; saison=toutes : sans limite ;
+    date_debut / date_fin (AAAA-MM-JJ) : bornes libres, saison None ;
+    rien : la saison en cours. Une saison hors des années représentables ou une
+    date impossible (2024-02-30) est ignorée.
+    """
+    valeur = params.get('saison')
+    if valeur == 'toutes':
+        return None, None, None
+    if valeur and valeur.isdigit() and datetime.MINYEAR <= int(valeur) < datetime.MAXYEAR:
+        annee = int(valeur)
+        return (*bornes_saison(annee), annee)
+    date_debut = _date(params.get('date_debut'))
+    date_fin = _date(params.get('date_fin'))
+    if date_debut or date_fin:
+        return date_debut, date_fin, None
+    annee = saison(timezone.localdate())
+    return (*bornes_saison(annee), annee)
+
+
+def saisons_disponibles():
+    """Années de début des saisons ayant au moins une séance, de la plus récente à la plus ancienne."""
+    premiere = Seance.objects.order_by('date').values_list('date', flat=True).first()
+    courante = saison(timezone.localdate())
+    if premiere is None:
+        return [courante]
+    return list(range(max(courante, saison(premiere)), saison(premiere) - 1, -1))
+
+
+class MatriceParticipations:
+    """
+    Matrice creuse des participations.
+
+    seances : [(id, date)] des colonnes, par date ; encadrants : [(id, nom, prénom)] des lignes,
+    par nom et prénom (seulement les encadrants ayant au moins une participation) ;
+    lignes, colonnes : indices des cases remplies, triés par ligne puis par colonne.
+    """
+
+    def __init__(self, seances, encadrants, lignes, colonnes):
+        self.seances = seances
+        self.encadrants = encadrants
+        self.lignes = lignes
+        self.colonnes = colonnes
+        # Début des cases de chaque ligne dans lignes / colonnes
+        self.debuts = np.searchsorted(lignes, np.arange(len(encadrants) + 1))
+        self.saisons, self.saison_colonnes = np.unique(
+            np.array([saison(date) for _, date in seances], dtype=np.int64), return_inverse=True,
+        )
+
+    def seances_encadrant(self, ligne):
+        """Indices des séances (colonnes) de l'encadrant de la ligne donnée."""
+        return self.colonnes[self.debuts[ligne]:self.debuts[ligne + 1]]
+
+    def cases(self, ligne):
+        """Ligne complète de la matrice : un booléen par séance."""
+        cases = np.zeros(len(self.seances), dtype=bool)
+        cases[self.seances_encadrant(ligne)] = True
+        return cases
+
+    def totaux_encadrants(self):
+        return np.bincount(self.lignes, minlength=len(self.encadrants))
+
+    def totaux_par_saison(self):
+        """Tableau encadrants × saisons du nombre de participations."""
+        nb_saisons = len(self.saisons)
+        cles = self.lignes * nb_saisons + self.saison_colonnes[self.colonnes]
+        return np.bincount(cles, minlength=len(self.encadrants) * nb_saisons).reshape(len(self.encadrants), nb_saisons)
+
+    def resume(self):
+        """Totaux par saison et par encadrant (données de l'API et du rapport)."""
+        par_saison = self.totaux_par_saison()
+        seances_par_saison = np.bincount(self.saison_colonnes, minlength=len(self.saisons))
+        return {
+            'nb_seances': len(self.seances),
+            'nb_participations': int(len(self.lignes)),
+            'saisons': [
+                {'saison': libelle_saison(int(annee)), 'seances': int(nb_seances), 'participations': int(total)}
+                for annee, nb_seances, total in zip(self.saisons, seances_par_saison, par_saison.sum(axis=0))
+            ],
+            'encadrants': [
+                {
+                    'id': encadrant_id,
+                    'nom': nom,
+                    'prenom': prenom,
+                    'total': int(total),
+                    'par_saison': [int(n) for n in totaux],
+                }
+                for (encadrant_id, nom, prenom), total, totaux in zip(self.encadrants, self.totaux_encadrants(), par_saison)
+            ],
+        }
+
+
+def matrice_participations(date_debut=None, date_fin=None):
+    """Matrice des participations des encadrants (rôle encadrant) aux séances de la période, bornes incluses."""
+    seances = Seance.objects.order_by('date', 'id')
+    inscriptions = InscriptionSeance.objects.filter(personne__statut='encadrant', role_pour_seance='encadrant')
+    if date_debut:
+        seances = seances.filter(date__gte=date_debut)
+        inscriptions = inscriptions.filter(seance__date__gte=date_debut)
+    if date_fin:
+        seances = seances.filter(date__lte=date_fin)
+        inscriptions = inscriptions.filter(seance__date__lte=date_fin)
+    seances = list(seances.values_list('id', 'date'))
+    participations = list(
+        inscriptions.order_by('personne__nom', 'personne__prenom', 'personne_id')
+        .values_list('personne_id', 'personne__nom', 'personne__prenom', 'seance_id')
+    )
+    vide = np.zeros(0, dtype=np.int64)
+    if not participations or not seances:
+        return MatriceParticipations(seances, [], vide, vide)
+
+    personne_ids = np.fromiter((p[0] for p in participations), dtype=np.int64, count=len(participations))
+    seance_ids = np.fromiter((p[3] for p in participations), dtype=np.int64, count=len(participations))
+    # Les inscriptions sont triées par encadrant : une nouvelle ligne à chaque changement
+    nouvelle_ligne = np.ones(len(personne_ids), dtype=bool)
+    nouvelle_ligne[1:] = personne_ids[1:] != personne_ids[:-1]
+    lignes = np.cumsum(nouvelle_ligne) - 1
+    encadrants = [participations[i][:3] for i in np.flatnonzero(nouvelle_ligne)]
+
+    ids_colonnes = np.array([seance_id for seance_id, _ in seances], dtype=np.int64)
+    ordre = np.argsort(ids_colonnes)
+    positions = np.minimum(np.searchsorted(ids_colonnes, seance_ids, sorter=ordre), len(ordre) - 1)
+    colonnes = ordre[positions]
+    # Séance créée entre les deux requêtes : ignorée
+    connue = ids_colonnes[colonnes] == seance_ids
+    # Une case par (encadrant, séance), triée par ligne puis colonne
+    cles = np.unique(lignes[connue] * len(seances) + colonnes[connue])
+    return MatriceParticipations(seances, encadrants, cles // len(seances), cles % len(seances))
@@ -0,0 +1,165 @@
+"""
+Cache disque des PDF de suivi de formation.
+
+Chaque PDF est stocké sous MEDIA_ROOT dans un fichier nommé d'après une
+empreinte de son contenu source : élève (date de modification, sections),
+type d'exercice, nombre d'évaluations et date de la dernière évaluation,
+version du référentiel (groupes → compétences → exercices) des sections
+de l'élève. Tant que rien ne change, un téléchargement ou un envoi
+supplémentaire coûte une lecture de fichier au lieu d'une mise en page
+ReportLab complète.
+
+La taille du répertoire est bornée (SUIVI_PDF_CACHE_MAX_BYTES) : les fichiers
+les moins récemment utilisés sont supprimés en premier.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.db.models import Count, F, Max, prefetch_related_objects
+from django.utils.crypto import salted_hmac
+
+from .models import EvaluationExercice, GroupeCompetence, StatistiquesCachePdf
+
+TAILLE_MAX_DEFAUT = 200 * 1024 * 1024
+
+
+def repertoire_cache():
+    chemin = str(getattr(settings, 'SUIVI_PDF_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, 'cache_pdf_suivi')))
+    os.makedirs(chemin, exist_ok=True)
+    return chemin
+
+
+def _version_referentiel(section_ids):
+    """Empreinte du référentiel (groupes, compétences, exercices) des sections données."""
+    lignes = GroupeCompetence.objects.filter(section_id__in=section_ids).values_list(
+        'id', 'intitule', 'section_id',
+        'competences__id', 'competences__nom',
+        'competences__exercices__id', 'competences__exercices__nom', 'competences__exercices__type',
+    )
+    return hashlib.sha256(repr(sorted(lignes, key=repr)).encode('utf-8')).hexdigest()
+
+
+def cles_suivi_formation(eleves, exercice_type, titre):
+    """
+    Retourne {eleve_id: clé de cache} pour le PDF de suivi de chaque élève.
+    Deux requêtes pour tous les élèves, plus une par combinaison de sections distincte.
+    """
+    eleves = list(eleves)
+    prefetch_related_objects(eleves, 'sections')
+    stats = {
+        ligne['eleve_id']: (ligne['derniere'], ligne['nb'])
+        for ligne in EvaluationExercice.objects.filter(
+            eleve_id__in=[e.id for e in eleves], exercice__type=exercice_type,
+        ).values('eleve_id').annotate(derniere=Max('date_evaluation'), nb=Count('id'))
+    }
+    versions = {}
+    cles = {}
+    for eleve in eleves:
+        section_ids = tuple(sorted(s.id for s in eleve.sections.all()))
+        if section_ids not in versions:
+            versions[section_ids] = _version_referentiel(section_ids)
+        derniere, nb = stats.get(eleve.id, (None, 0))
+        source = '|'.join(str(v) for v in (
+            eleve.id, eleve.date_modification, section_ids, exercice_type, titre,
+            derniere, nb, versions[section_ids],
+        ))
+        cles[eleve.id] = salted_hmac('gestion.pdf_cache', source, algorithm='sha256').hexdigest()
+    return cles
+
+
+def _incrementer(**compteurs):
+    maj = {nom: F(nom) + valeur for nom, valeur in compteurs.items()}
+    if not StatistiquesCachePdf.objects.filter(pk=1).update(**maj):
+        StatistiquesCachePdf.get_singleton()
+        StatistiquesCachePdf.objects.filter(pk=1).update(**maj)
+
+
+def lire(cle):
+    """Contenu du PDF en cache, ou None. Un succès rafraîchit la date d'utilisation (LRU)."""
+    chemin = os.path.join(repertoire_cache(), f'{cle}.pdf')
+    try:
+        with open(chemin, 'rb') as f:
+            contenu = f.read()
+        os.utime(chemin)
+    except OSError:
+        return None
+    return contenu
+
+
+def ecrire(cle, contenu):
+    repertoire = repertoire_cache()
+    # Écriture atomique : fichier temporaire puis renommage
+    fd, chemin_tmp = tempfile.mkstemp(dir=repertoire, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(contenu)
+    os.replace(chemin_tmp, os.path.join(repertoire, f'{cle}.pdf'))
+
+
+def obtenir_pdfs(cles, generer):
+    """
+    cles : {identifiant: clé de cache}. Retourne {identifiant: contenu PDF}.
+    Les PDF absents du cache sont obtenus en un seul appel generer(identifiants
+    manquants) -> {identifiant: contenu}, puis mémorisés.
+    """
+    resultat = {}
+    manquants = []
+    for ident, cle in cles.items():
+        contenu = lire(cle)
+        if contenu is None:
+            manquants.append(ident)
+        else:
+            resultat[ident] = contenu
+    if manquants:
+        generes = generer(manquants)
+        for ident, contenu in generes.items():
+            ecrire(cles[ident], contenu)
+        resultat.update(generes)
+        evincer()
+    _incrementer(hits=len(cles) - len(manquants), misses=len(manquants))
+    return resultat
+
+
+def _fichiers():
+    repertoire = repertoire_cache()
+    fichiers = []
+    for entree in os.scandir(repertoire):
+        if entree.is_file() and entree.name.endswith('.pdf'):
+            try:
+                stat = entree.stat()
+            except FileNotFoundError:
+                continue
+            fichiers.append((stat.st_mtime, stat.st_size, entree.path))
+    return fichiers
+
+
+def evincer(taille_max=None):
+    """Supprime les PDF les moins récemment utilisés jusqu'à repasser sous la taille maximale."""
+    if taille_max is None:
+        taille_max = getattr(settings, 'SUIVI_PDF_CACHE_MAX_BYTES', TAILLE_MAX_DEFAUT)
+    fichiers = _fichiers()
+    total = sum(taille for _, taille, _ in fichiers)
+    supprimes = 0
+    for _, taille, chemin in sorted(fichiers):
+        if total <= taille_max:
+            break
+        try:
+            os.remove(chemin)
+        except FileNotFoundError:
+            pass
+        total -= taille
+        supprimes += 1
+    if supprimes:
+        _incrementer(evictions=supprimes)
+    return supprimes
+
+
+def occupation():
+    """(nombre de fichiers, taille totale en octets) du cache."""
+    fichiers = _fichiers()
+    return len(fichiers), sum(taille for _, taille, _ in fichiers)
+
+
+def vider():
+    return evincer(taille_max=0)
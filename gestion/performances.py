@@ -0,0 +1,270 @@
+"""
+Mesures de performance des pages.
+
+PerformancesMiddleware (gestion.middleware) mesure chaque réponse : durée, nombre
+et durée des requêtes SQL, taille, et temps passé dans les sections délimitées
+par section() autour de ReportLab, openpyxl et de l'envoi SMTP (hors SQL). Les
+réponses en flux sont suivies jusqu'au dernier bloc envoyé.
+
+Les mesures sont agrégées par route (nom d'URL) et par tranche de
+PERFORMANCES_TRANCHE secondes : en mémoire pour la tranche en cours, puis
+ajoutées à StatistiqueVue par la première réponse de la tranche suivante (une
+transaction par route, par processus et par tranche). Les durées sont comptées
+dans un histogramme à classes fixes : tranches et processus se fusionnent par
+simple addition, et les percentiles se lisent sur l'histogramme fusionné. Les
+tranches plus anciennes que PERFORMANCES_RETENTION sont supprimées.
+
+Avec PERFORMANCES_JSONL, chaque réponse est aussi écrite sur une ligne JSON de
+ce fichier, pour une analyse hors ligne.
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+
+from .models import StatistiqueVue
+
+logger = logging.getLogger(__name__)
+
+SECTIONS = ('reportlab', 'openpyxl', 'smtp')
+TRANCHE_DEFAUT = 300
+RETENTION_DEFAUT = 7 * 24 * 3600
+# Bornes supérieures (ms) des classes de l'histogramme des durées, plus une classe au-delà
+BORNES_MS = (5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000, 30000)
+
+_local = threading.local()
+_verrou = threading.Lock()
+_verrou_jsonl = threading.Lock()
+# Tranche en cours dans ce processus : début (timestamp) et {route: Agregat}
+_tranche = None
+_tampon = {}
+
+
+class Mesure:
+    """Mesures d'une réponse ; sert d'execute_wrapper aux connexions pendant active()."""
+
+    def __init__(self):
+        self.duree = 0.0
+        self.requetes = 0
+        self.duree_sql = 0.0
+        self.sections = {}
+        self.ouvertes = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.requetes += 1
+            self.duree_sql += time.perf_counter() - debut
+
+    @contextmanager
+    def active(self):
+        """Mesure le bloc : durée, requêtes SQL de toutes les connexions, sections."""
+        precedente = getattr(_local, 'mesure', None)
+        _local.mesure = self
+        debut = time.perf_counter()
+        try:
+            with ExitStack() as pile:
+                for alias in connections:
+                    pile.enter_context(connections[alias].execute_wrapper(self))
+                yield self
+        finally:
+            self.duree += time.perf_counter() - debut
+            _local.mesure = precedente
+
+    def suivre_flux(self, contenu, terminer):
+        """Itère le contenu d'une réponse en flux en mesurant la production de chaque bloc ; terminer(octets) à la fin."""
+        octets = 0
+        iterateur = iter(contenu)
+        try:
+            while True:
+                with self.active():
+                    bloc = next(iterateur, None)
+                if bloc is None:
+                    break
+                octets += len(bloc)
+                yield bloc
+        finally:
+            terminer(octets)
+
+
+@contextmanager
+def section(nom):
+    """
+    Compte le temps passé dans le bloc, hors requêtes SQL, dans la section nom de la
+    réponse en cours. Sans effet hors d'une réponse mesurée ou dans une section du même nom.
+    """
+    mesure = getattr(_local, 'mesure', None)
+    if mesure is None or nom in mesure.ouvertes:
+        yield
+        return
+    mesure.ouvertes.add(nom)
+    debut, sql_debut = time.perf_counter(), mesure.duree_sql
+    try:
+        yield
+    finally:
+        mesure.ouvertes.discard(nom)
+        duree = time.perf_counter() - debut - (mesure.duree_sql - sql_debut)
+        mesure.sections[nom] = mesure.sections.get(nom, 0.0) + duree
+
+
+def _classe(duree_ms):
+    for indice, borne in enumerate(BORNES_MS):
+        if duree_ms <= borne:
+            return indice
+    return len(BORNES_MS)
+
+
+class Agregat:
+    """Cumuls d'une route (mêmes champs que StatistiqueVue) ; fusionnable avec un autre Agregat ou une StatistiqueVue."""
+
+    CUMULS = ('nb', 'nb_erreurs', 'duree_ms', 'requetes', 'duree_sql_ms', 'octets')
+    MAXIMUMS = ('duree_max_ms', 'requetes_max')
+
+    def __init__(self):
+        for champ in self.CUMULS + self.MAXIMUMS:
+            setattr(self, champ, 0)
+        self.histogramme = [0] * (len(BORNES_MS) + 1)
+        self.sections = {}
+
+    def ajouter(self, statut, duree_ms, requetes, duree_sql_ms, octets, sections):
+        self.nb += 1
+        self.nb_erreurs += statut >= 500
+        self.duree_ms += duree_ms
+        self.duree_max_ms = max(self.duree_max_ms, duree_ms)
+        self.histogramme[_classe(duree_ms)] += 1
+        self.requetes += requetes
+        self.requetes_max = max(self.requetes_max, requetes)
+        self.duree_sql_ms += duree_sql_ms
+        self.octets += octets
+        for nom, duree in sections.items():
+            self.sections[nom] = self.sections.get(nom, 0) + duree
+
+    def fusionner(self, autre):
+        for champ in self.CUMULS:
+            setattr(self, champ, getattr(self, champ) + getattr(autre, champ))
+        for champ in self.MAXIMUMS:
+            setattr(self, champ, max(getattr(self, champ), getattr(autre, champ)))
+        # Une tranche enregistrée avec d'autres classes est ignorée pour les percentiles
+        if len(autre.histogramme) == len(self.histogramme):
+            self.histogramme = [a + b for a, b in zip(self.histogramme, autre.histogramme)]
+        for nom, duree in autre.sections.items():
+            self.sections[nom] = self.sections.get(nom, 0) + duree
+
+    def percentile(self, fraction):
+        """Borne supérieure (ms) de la classe contenant le percentile, au plus la durée maximale."""
+        rang = fraction * sum(self.histogramme)
+        cumul = 0
+        for indice, nb in enumerate(self.histogramme):
+            cumul += nb
+            if nb and cumul >= rang:
+                borne = BORNES_MS[indice] if indice < len(BORNES_MS) else self.duree_max_ms
+                return round(min(borne, self.duree_max_ms), 1)
+        return None
+
+    def resume(self, route):
+        """Ligne du rapport : moyennes par réponse et percentiles des durées."""
+        nb = self.nb or 1
+        return {
+            'route': route,
+            'nb': self.nb,
+            'nb_erreurs': self.nb_erreurs,
+            'duree_totale_s': round(self.duree_ms / 1000, 1),
+            'moyenne_ms': round(self.duree_ms / nb, 1),
+            'p50_ms': self.percentile(0.5),
+            'p90_ms': self.percentile(0.9),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': round(self.duree_max_ms, 1),
+            'requetes': round(self.requetes / nb, 1),
+            'requetes_max': self.requetes_max,
+            'sql_ms': round(self.duree_sql_ms / nb, 1),
+            'kio': round(self.octets / nb / 1024, 1),
+            'sections_ms': [round(self.sections.get(nom, 0) / nb, 1) for nom in SECTIONS],
+        }
+
+
+def enregistrer(route, methode, statut, mesure, octets):
+    """Ajoute la réponse mesurée à la tranche en cours ; la tranche précédente est d'abord enregistrée en base."""
+    global _tranche, _tampon
+    duree_ms = 1000 * mesure.duree
+    duree_sql_ms = 1000 * mesure.duree_sql
+    sections = {nom: 1000 * duree for nom, duree in mesure.sections.items()}
+    taille_tranche = getattr(settings, 'PERFORMANCES_TRANCHE', TRANCHE_DEFAUT)
+    maintenant = time.time()
+    debut = maintenant - maintenant % taille_tranche
+    terminee = None
+    with _verrou:
+        if debut != _tranche:
+            terminee = (_tranche, _tampon)
+            _tranche, _tampon = debut, {}
+        _tampon.setdefault(route, Agregat()).ajouter(statut, duree_ms, mesure.requetes, duree_sql_ms, octets, sections)
+    if terminee and terminee[1]:
+        _enregistrer_tranche(*terminee)
+
+    chemin = getattr(settings, 'PERFORMANCES_JSONL', None)
+    if chemin:
+        _ecrire_jsonl(chemin, {
+            'date': datetime.fromtimestamp(maintenant, dt_timezone.utc).isoformat(timespec='milliseconds'),
+            'route': route,
+            'methode': methode,
+            'statut': statut,
+            'duree_ms': round(duree_ms, 2),
+            'requetes': mesure.requetes,
+            'sql_ms': round(duree_sql_ms, 2),
+            'octets': octets,
+            'sections_ms': {nom: round(duree, 2) for nom, duree in sections.items()},
+        })
+
+
+def _ecrire_jsonl(chemin, ligne):
+    try:
+        with _verrou_jsonl, open(chemin, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(ligne, ensure_ascii=False) + '\n')
+    except OSError:
+        logger.exception("Écriture impossible dans %s", chemin)
+
+
+def _enregistrer_tranche(debut, agregats):
+    """Ajoute les agrégats d'une tranche de ce processus à StatistiqueVue, puis supprime les tranches expirées."""
+    debut = datetime.fromtimestamp(debut, dt_timezone.utc)
+    try:
+        for route, agregat in agregats.items():
+            with transaction.atomic():
+                ligne, _ = StatistiqueVue.objects.select_for_update().get_or_create(debut=debut, route=route)
+                cumul = Agregat()
+                cumul.fusionner(ligne)
+                cumul.fusionner(agregat)
+                for champ in Agregat.CUMULS + Agregat.MAXIMUMS + ('histogramme', 'sections'):
+                    setattr(ligne, champ, getattr(cumul, champ))
+                ligne.save()
+        retention = getattr(settings, 'PERFORMANCES_RETENTION', RETENTION_DEFAUT)
+        StatistiqueVue.objects.filter(debut__lt=timezone.now() - timedelta(seconds=retention)).delete()
+    except DatabaseError:
+        logger.exception("Enregistrement des mesures de performance impossible")
+
+
+def ecrire_tampon():
+    """Enregistre sans attendre la tranche en cours de ce processus (avant d'afficher le rapport)."""
+    global _tampon
+    with _verrou:
+        tranche, agregats = _tranche, _tampon
+        _tampon = {}
+    if agregats:
+        _enregistrer_tranche(tranche, agregats)
+
+
+def rapport(depuis):
+    """Résumé par route des réponses depuis la date donnée, les routes les plus coûteuses (durée cumulée) d'abord."""
+    ecrire_tampon()
+    agregats = {}
+    for ligne in StatistiqueVue.objects.filter(debut__gte=depuis):
+        agregats.setdefault(ligne.route, Agregat()).fusionner(ligne)
+    classees = sorted(agregats.items(), key=lambda element: element[1].duree_ms, reverse=True)
+    return [agregat.resume(route) for route, agregat in classees]
@@ -0,0 +1,228 @@
+"""
+Moteur de progression des élèves.
+
+Pour chaque couple (élève, exercice), la synthèse des évaluations (note
+maximale, nombre d'évaluations à cette note, dernière évaluation, dernière
+évaluation à la note maximale, validation DT) est stockée dans la table
+EleveExerciceProgression. Elle est recalculée à chaque enregistrement ou
+suppression d'EvaluationExercice (voir gestion.signals) ; les écrans de suivi
+la lisent en une requête par élève ou par section.
+"""
+from collections import defaultdict
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import Prefetch, Q, prefetch_related_objects
+
+from .models import EleveExerciceProgression, EvaluationExercice, Exercice, GroupeCompetence
+
+CHAMPS_PROGRESSION = [
+    'note_max', 'nb_eval_max', 'nb_evaluations',
+    'derniere_evaluation', 'derniere_evaluation_max', 'validation_dt',
+    'date_mise_a_jour',
+]
+
+
+class ProgressionExercice:
+    """Synthèse des évaluations d'un élève pour un exercice, calculée en mémoire."""
+
+    def __init__(self, evaluations):
+        # Évaluations triées de la plus récente à la plus ancienne
+        self.historique = list(evaluations)
+        notes = [e.note for e in self.historique if e.note is not None]
+        self.note_max = max(notes) if notes else None
+        evals_max = [e for e in self.historique if self.note_max and e.note == self.note_max]
+        self.nb_eval_max = len(evals_max)
+        self.nb_evaluations = len(self.historique)
+        self.derniere_evaluation_max = evals_max[0] if evals_max else None
+        self.derniere_evaluation = self.historique[0] if self.historique else None
+        self.validation_dt = any(e.palanquee_id is None for e in self.historique)
+
+    @property
+    def has_evaluation(self):
+        return bool(self.historique)
+
+    def vers_ligne(self, eleve_id, exercice_id):
+        return EleveExerciceProgression(
+            eleve_id=eleve_id,
+            exercice_id=exercice_id,
+            note_max=self.note_max,
+            nb_eval_max=self.nb_eval_max,
+            nb_evaluations=self.nb_evaluations,
+            derniere_evaluation=self.derniere_evaluation,
+            derniere_evaluation_max=self.derniere_evaluation_max,
+            validation_dt=self.validation_dt,
+        )
+
+
+def exercices_section(section, exercice_type=Exercice.TYPE_CLASSIQUE):
+    """Exercices d'un type donné rattachés aux compétences d'une section, triés par nom."""
+    return Exercice.objects.filter(
+        type=exercice_type,
+        competences__section=section,
+    ).distinct().order_by('nom')
+
+
+def charger_progressions(eleves, exercices, avec_historique=False):
+    """
+    Retourne {(eleve_id, exercice_id): progression} pour tous les couples
+    élève × exercice, lus dans EleveExerciceProgression en une requête.
+    Les couples sans évaluation reçoivent une progression vide.
+    Avec avec_historique=True, chaque progression porte aussi la liste
+    complète de ses évaluations (une requête supplémentaire).
+    """
+    eleve_ids = [e.id for e in eleves]
+    exercice_ids = [ex.id for ex in exercices]
+    if not eleve_ids or not exercice_ids:
+        return {}
+    lignes = EleveExerciceProgression.objects.filter(
+        eleve_id__in=eleve_ids,
+        exercice_id__in=exercice_ids,
+    ).select_related(
+        'derniere_evaluation__encadrant',
+        'derniere_evaluation__palanquee__seance',
+        'derniere_evaluation_max__encadrant',
+    )
+    progressions = {(p.eleve_id, p.exercice_id): p for p in lignes}
+    historiques = defaultdict(list)
+    if avec_historique:
+        evaluations = EvaluationExercice.objects.filter(
+            eleve_id__in=eleve_ids,
+            exercice_id__in=exercice_ids,
+        ).select_related('encadrant', 'palanquee__seance').order_by('-date_evaluation', '-id')
+        for evaluation in evaluations:
+            historiques[(evaluation.eleve_id, evaluation.exercice_id)].append(evaluation)
+    resultat = {}
+    for eleve_id in eleve_ids:
+        for exercice_id in exercice_ids:
+            couple = (eleve_id, exercice_id)
+            progression = progressions.get(couple) or ProgressionExercice(())
+            if avec_historique:
+                progression.historique = historiques.get(couple, [])
+            resultat[couple] = progression
+    return resultat
+
+
+def construire_suivis_formation(eleves, exercice_type=Exercice.TYPE_CLASSIQUE):
+    """
+    Construit le suivi de formation (groupes → compétences → exercices, avec la
+    dernière évaluation de chaque exercice) et les historiques de plusieurs
+    élèves à partir d'un nombre fixe de requêtes, quel que soit leur nombre.
+    Le référentiel des sections concernées est chargé une seule fois et partagé.
+    Retourne {eleve_id: (progression, historiques)}.
+    """
+    eleves = list(eleves)
+    if not eleves:
+        return {}
+    prefetch_related_objects(eleves, 'sections')
+    sections_par_eleve = {e.id: {s.id for s in e.sections.all()} for e in eleves}
+    section_ids = set().union(*sections_par_eleve.values())
+    groupes = list(
+        GroupeCompetence.objects.filter(section_id__in=section_ids).prefetch_related(
+            'competences',
+            Prefetch('competences__exercices', queryset=Exercice.objects.filter(type=exercice_type)),
+        )
+    )
+
+    # Historiques : toutes les évaluations des élèves en une requête
+    exercice_ids = list(Exercice.objects.filter(type=exercice_type).values_list('id', flat=True))
+    historiques = {e.id: {ex_id: [] for ex_id in exercice_ids} for e in eleves}
+    evaluations = EvaluationExercice.objects.filter(
+        eleve_id__in=historiques.keys(), exercice__type=exercice_type,
+    ).select_related('encadrant', 'palanquee__seance').order_by('-date_evaluation', '-id')
+    for evaluation in evaluations:
+        historiques[evaluation.eleve_id].setdefault(evaluation.exercice_id, []).append(evaluation)
+
+    raisons = dict(EvaluationExercice.RAISON_NON_REALISE_CHOICES)
+    resultat = {}
+    for eleve in eleves:
+        historiques_eleve = historiques[eleve.id]
+        # Dernière évaluation et validation DT par exercice, déduites de l'historique
+        syntheses = {ex_id: ProgressionExercice(hist) for ex_id, hist in historiques_eleve.items()}
+        progression = []
+        for groupe in groupes:
+            if groupe.section_id not in sections_par_eleve[eleve.id]:
+                continue
+            groupe_data = {'groupe': groupe, 'competences': [], 'etoile_groupe': True}
+            for comp in groupe.competences.all():
+                comp_data = {'competence': comp, 'exercices': [], 'etoile_competence': True}
+                for ex in comp.exercices.all():
+                    synthese = syntheses.get(ex.id)
+                    eval_ex = synthese.derniere_evaluation if synthese else None
+                    etoiles = eval_ex.note if eval_ex and eval_ex.note else 0
+                    commentaire = eval_ex.commentaire if eval_ex else ''
+                    raison = eval_ex.raison_non_realise if eval_ex else None
+                    comp_data['exercices'].append({
+                        'exercice': ex, 'etoiles': etoiles, 'commentaire': commentaire,
+                        'raison': raison, 'raison_display': raisons.get(raison, '') if raison else '',
+                        'has_validation_dt': exercice_type == Exercice.TYPE_CLASSIQUE and bool(synthese and synthese.validation_dt),
+                    })
+                    if etoiles < 3:
+                        comp_data['etoile_competence'] = False
+                # Si la compétence n'a aucun exercice, elle n'est pas validée
+                if not comp_data['exercices']:
+                    comp_data['etoile_competence'] = False
+                groupe_data['competences'].append(comp_data)
+                if not comp_data['etoile_competence']:
+                    groupe_data['etoile_groupe'] = False
+            progression.append(groupe_data)
+        resultat[eleve.id] = (progression, historiques_eleve)
+    return resultat
+
+
+def recalculer_progressions(couples):
+    """Recalcule les lignes EleveExerciceProgression des couples (eleve_id, exercice_id) donnés."""
+    couples = set(couples)
+    if not couples:
+        return
+    eleve_ids = {eleve_id for eleve_id, _ in couples}
+    exercice_ids = {exercice_id for _, exercice_id in couples}
+    par_couple = defaultdict(list)
+    evaluations = EvaluationExercice.objects.filter(
+        eleve_id__in=eleve_ids,
+        exercice_id__in=exercice_ids,
+    ).order_by('-date_evaluation', '-id')
+    for evaluation in evaluations:
+        couple = (evaluation.eleve_id, evaluation.exercice_id)
+        if couple in couples:
+            par_couple[couple].append(evaluation)
+
+    lignes = [
+        ProgressionExercice(evaluations).vers_ligne(*couple)
+        for couple, evaluations in par_couple.items()
+    ]
+    vides = couples - set(par_couple)
+    with transaction.atomic():
+        if vides:
+            condition = Q()
+            for eleve_id, exercice_id in vides:
+                condition |= Q(eleve_id=eleve_id, exercice_id=exercice_id)
+            EleveExerciceProgression.objects.filter(condition).delete()
+        if lignes:
+            EleveExerciceProgression.objects.bulk_create(
+                lignes,
+                update_conflicts=True,
+                unique_fields=['eleve', 'exercice'],
+                update_fields=CHAMPS_PROGRESSION,
+            )
+
+
+def reconstruire_progressions(taille_lot=1000):
+    """Vide et reconstruit entièrement EleveExerciceProgression. Retourne le nombre de lignes créées."""
+    total = 0
+    evaluations = EvaluationExercice.objects.order_by(
+        'eleve_id', 'exercice_id', '-date_evaluation', '-id'
+    ).iterator(chunk_size=taille_lot)
+    with transaction.atomic():
+        EleveExerciceProgression.objects.all().delete()
+        lot = []
+        for (eleve_id, exercice_id), groupe in groupby(evaluations, key=lambda e: (e.eleve_id, e.exercice_id)):
+            lot.append(ProgressionExercice(groupe).vers_ligne(eleve_id, exercice_id))
+            if len(lot) >= taille_lot:
+                EleveExerciceProgression.objects.bulk_create(lot)
+                total += len(lot)
+                lot = []
+        if lot:
+            EleveExerciceProgression.objects.bulk_create(lot)
+            total += len(lot)
+    return total
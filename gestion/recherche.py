@@ -0,0 +1,91 @@
+"""
+Recherche d'adhérents insensible aux accents et à la casse.
+
+Le nom, le prénom et l'email de chaque adhérent sont découpés en mots normalisés
+(minuscules, sans accents : « Hélène » → « helene ») rangés dans
+JetonRechercheAdherent, tenu à jour par Adherent.save() (indexer_adherents pour
+les insertions en masse). rechercher_adherents() exige que chaque mot saisi soit
+le début d'un jeton de l'adhérent : « hel dup » trouve « DUPONT Hélène ».
+
+Le préfixe est cherché sur l'index de jeton : LIKE 'x%' sous PostgreSQL (Django
+crée l'index varchar_pattern_ops), intervalle équivalent sous SQLite dont le LIKE,
+insensible à la casse, n'utilise pas l'index.
+"""
+import re
+import unicodedata
+
+from django.db import connections, transaction
+from django.db.models import Q
+
+from .models import JetonRechercheAdherent
+
+CHAMPS = ('nom', 'prenom', 'email')
+LONGUEUR_MAX = 100
+_LIGATURES = str.maketrans({'œ': 'oe', 'æ': 'ae', 'ß': 'ss'})
+_SEPARATEURS = re.compile(r'[^a-z0-9]+')
+
+
+def normaliser(texte):
+    """Minuscules, sans accents ni ligatures : « Cœur-Hélène » → « coeur-helene »."""
+    texte = unicodedata.normalize('NFKD', (texte or '').lower().translate(_LIGATURES))
+    return ''.join(c for c in texte if not unicodedata.combining(c))
+
+
+def jetons(texte):
+    """Mots normalisés d'un texte ; la ponctuation (tirets, points, @) sépare les mots."""
+    return [mot[:LONGUEUR_MAX] for mot in _SEPARATEURS.split(normaliser(texte)) if mot]
+
+
+def _jetons_adherent(adherent):
+    return {(champ, jeton) for champ in CHAMPS for jeton in jetons(getattr(adherent, champ))}
+
+
+@transaction.atomic
+def indexer_adherents(adherents):
+    """Réécrit les jetons des adhérents dont le nom, le prénom ou l'email a changé."""
+    adherents = [a for a in adherents if a.pk]
+    if not adherents:
+        return
+    existants = {}
+    for adherent_id, champ, jeton in JetonRechercheAdherent.objects.filter(
+        adherent__in=adherents
+    ).values_list('adherent_id', 'champ', 'jeton'):
+        existants.setdefault(adherent_id, set()).add((champ, jeton))
+    a_reecrire = {}
+    for adherent in adherents:
+        attendus = _jetons_adherent(adherent)
+        if attendus != existants.get(adherent.pk, set()):
+            a_reecrire[adherent.pk] = attendus
+    if not a_reecrire:
+        return
+    JetonRechercheAdherent.objects.filter(adherent_id__in=a_reecrire).delete()
+    JetonRechercheAdherent.objects.bulk_create([
+        JetonRechercheAdherent(adherent_id=adherent_id, champ=champ, jeton=jeton)
+        for adherent_id, attendus in a_reecrire.items()
+        for champ, jeton in attendus
+    ], batch_size=1000)
+
+
+def _prefixe(prefixe, vendor):
+    if vendor == 'sqlite':
+        # Les jetons ne contiennent que [a-z0-9] : tous ceux qui commencent par le préfixe sont < préfixe + '\x7f'
+        return Q(jeton__gte=prefixe, jeton__lt=prefixe + '\x7f')
+    return Q(jeton__startswith=prefixe)
+
+
+def rechercher_adherents(queryset, q, champs=CHAMPS):
+    """
+    Filtre un queryset d'Adherent : chaque mot de q doit commencer un jeton de l'un des champs.
+    Un q vide laisse le queryset inchangé ; un q sans lettre ni chiffre ne trouve rien.
+    """
+    if not q or not q.strip():
+        return queryset
+    mots = jetons(q)
+    if not mots:
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    for mot in dict.fromkeys(mots):
+        queryset = queryset.filter(pk__in=JetonRechercheAdherent.objects.filter(
+            _prefixe(mot, vendor), champ__in=champs,
+        ).values('adherent_id'))
+    return queryset
@@ -0,0 +1,92 @@
+"""
+Rôles (noms des groupes Django) de l'utilisateur connecté.
+
+Les noms de groupes sont chargés une seule fois par requête : RolesMiddleware
+pose request.roles, et roles_utilisateur(user) mémorise le résultat sur l'objet
+user de la requête. Les décorateurs et helpers de gestion.utils (group_required,
+is_codir, can_access_dashboard...) ainsi que peut_voir_suivi le relisent au lieu
+de lancer chacun leur requête user.groups.filter(...).exists().
+
+Avec ROLES_CACHE_SESSION = True, les noms sont aussi conservés en session et
+réutilisés d'une requête à l'autre tant que la version des rôles de
+l'utilisateur, tenue dans le cache Django, n'a pas changé. Toute modification
+de user.groups (Adherent.save, activation de compte, admin) change cette
+version (signal m2m_changed). Avec plusieurs processus, le cache doit être
+partagé (Redis, Memcached, base de données).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+CLE_SESSION = 'roles_utilisateur'
+
+
+class Roles:
+    """Noms des groupes d'un utilisateur : `'codir' in roles`."""
+
+    def __init__(self, noms=()):
+        self.noms = frozenset(noms)
+
+    def __contains__(self, nom):
+        return nom in self.noms
+
+    def __iter__(self):
+        return iter(sorted(self.noms))
+
+    def __len__(self):
+        return len(self.noms)
+
+    def __repr__(self):
+        return f"Roles({sorted(self.noms)})"
+
+
+def _cle_version(user_id):
+    return f"roles_version:{user_id}"
+
+
+def _version(user_id):
+    # Une entrée expirée ou absente reçoit une nouvelle valeur : les sessions existantes sont rechargées
+    return cache.get_or_set(_cle_version(user_id), time.time_ns, None)
+
+
+def invalider_roles(user_id):
+    """Force le rechargement des rôles de l'utilisateur à sa prochaine requête."""
+    cache.set(_cle_version(user_id), time.time_ns(), None)
+
+
+def _roles_session(user, session):
+    version = _version(user.pk)
+    donnees = session.get(CLE_SESSION)
+    if donnees and donnees.get('user_id') == user.pk and donnees.get('version') == version:
+        return Roles(donnees['noms'])
+    roles = Roles(user.groups.values_list('name', flat=True))
+    session[CLE_SESSION] = {'user_id': user.pk, 'version': version, 'noms': sorted(roles.noms)}
+    return roles
+
+
+def roles_utilisateur(user, session=None):
+    """
+    Rôles de l'utilisateur, chargés une fois puis mémorisés sur l'objet user.
+    session : session de la requête, utilisée comme cache si ROLES_CACHE_SESSION est activé.
+    """
+    if not user.is_authenticated:
+        return Roles()
+    roles = getattr(user, '_roles', None)
+    if roles is None:
+        if session is None:
+            session = getattr(user, '_session_roles', None)
+        if session is not None and getattr(settings, 'ROLES_CACHE_SESSION', False):
+            roles = _roles_session(user, session)
+        else:
+            roles = Roles(user.groups.values_list('name', flat=True))
+        user._roles = roles
+    return roles
+
+
+def roles_requete(request):
+    """Rôles de l'utilisateur de la requête (request.roles si le middleware est installé)."""
+    roles = getattr(request, 'roles', None)
+    if roles is None:
+        roles = roles_utilisateur(request.user, getattr(request, 'session', None))
+    return roles
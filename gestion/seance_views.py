@@ -6,10 +6,11 @@ from django.views.generic import ListView, DetailView, CreateView, UpdateView, D
 from django.urls import reverse_lazy
 from .models import Seance, Section, LienEvaluation, ModeleMailSeance, HistoriqueMailSeance
 from .forms import SeanceForm, CommunicationSeanceForm
+from .boite_envoi import hors_doublons, mettre_en_file
+from .composition_mail import ModeleMail
 import logging
 from django.contrib.admin.views.decorators import staff_member_required
 from django.utils.decorators import method_decorator
-from django.core.mail import EmailMessage
 from django.conf import settings
 
 # Vues pour les séances
@@ -199,25 +200,38 @@ class CommunicationSeanceView(LoginRequiredMixin, View):
                     id__in=ids, personne__email__in=destinataires
                 ).values('personne__nom', 'personne__prenom', 'personne__email'))
             
-            # Envoi du mail (un email par destinataire pour éviter les problèmes de pièces jointes)
-            cc_emails = getattr(settings, 'EMAIL_CC_DEFAULT', [])
-            nb_envoyes = 0
+            # Un email par destinataire pour éviter les problèmes de pièces jointes ;
+            # les fichiers joints sont encodés une fois pour tous les destinataires
+            modele = ModeleMail(
+                form.cleaned_data['objet'],
+                html=form.cleaned_data['contenu'],
+                html_seul=True,
+                pieces_jointes=[(f_data['name'], f_data['content'], f_data['content_type']) for f_data in fichiers_data],
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                cc=getattr(settings, 'EMAIL_CC_DEFAULT', []),
+                reply_to=reply_to_list,
+            )
+
+            def construire_messages():
+                for destinataire in destinataires:
+                    yield destinataire, modele.message([destinataire])
+
+            # Historique, auquel chaque mail mis en file est rattaché pour suivre son envoi
+            historique_mail = HistoriqueMailSeance.objects.create(
+                seance=seance,
+                objet=form.cleaned_data['objet'],
+                contenu=form.cleaned_data['contenu'],
+                destinataires=",".join(destinataires),
+                fichiers=",".join([f.name for f in fichiers]),
+                auteur=request.user
+            )
+            # Mise en file : la commande traiter_boite_envoi envoie les mails au rythme autorisé par le serveur SMTP
+            mis_en_file = mettre_en_file(
+                construire_messages(), origine='communication_seance', seance=seance, historique_seance=historique_mail,
+            )
+            en_file = hors_doublons(request, mis_en_file)
             destinataires_envoyes = []
-            for destinataire in destinataires:
-                email = EmailMessage(
-                    subject=form.cleaned_data['objet'],
-                    body=form.cleaned_data['contenu'],
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    to=[destinataire],
-                    cc=cc_emails,
-                    reply_to=reply_to_list,
-                )
-                email.content_subtype = "html"
-                # Utiliser les données pré-chargées au lieu de relire les fichiers
-                for f_data in fichiers_data:
-                    email.attach(f_data['name'], f_data['content'], f_data['content_type'])
-                email.send()
-                nb_envoyes += 1
+            for destinataire, mail in en_file:
                 # Trouver les informations du destinataire
                 dest_info = next((d for d in destinataires_complets if d['personne__email'] == destinataire), None)
                 if dest_info:
@@ -238,17 +252,7 @@ class CommunicationSeanceView(LoginRequiredMixin, View):
                     'lieu': str(seance.lieu.nom),
                     'objet': form.cleaned_data['objet']
                 }
-            
-            # Historique
-            HistoriqueMailSeance.objects.create(
-                seance=seance,
-                objet=form.cleaned_data['objet'],
-                contenu=form.cleaned_data['contenu'],
-                destinataires=",".join(destinataires),
-                fichiers=",".join([f.name for f in fichiers]),
-                auteur=request.user
-            )
-            messages.success(request, f"{nb_envoyes} mail(s) envoyé(s) avec succès.")
+            messages.success(request, f"{len(en_file)} mail(s) mis en file d'envoi.")
             return redirect('seance_communiquer', pk=seance.pk)
         else:
             print('[DEBUG] Formulaire NON valide :', form.errors)
@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Adherent, EvaluationExercice, Palanquee, PalanqueeEleve, Seance
+from .progression import recalculer_progressions
+from .roles import invalider_roles
+from .statistiques_dashboard import invalider_statistiques
+
+
+@receiver(post_save, sender=EvaluationExercice)
+@receiver(post_delete, sender=EvaluationExercice)
+def maj_progression_evaluation(sender, instance, **kwargs):
+    """Tient EleveExerciceProgression à jour à chaque écriture d'évaluation."""
+    recalculer_progressions([(instance.eleve_id, instance.exercice_id)])
+
+
+@receiver(post_save, sender=Adherent)
+@receiver(post_delete, sender=Adherent)
+@receiver(post_save, sender=Seance)
+@receiver(post_delete, sender=Seance)
+@receiver(post_save, sender=Palanquee)
+@receiver(post_delete, sender=Palanquee)
+@receiver(post_save, sender=PalanqueeEleve)
+@receiver(post_delete, sender=PalanqueeEleve)
+@receiver(post_save, sender=EvaluationExercice)
+@receiver(post_delete, sender=EvaluationExercice)
+def maj_statistiques_dashboard(sender, **kwargs):
+    """Les compteurs et alertes CACI du tableau de bord seront recalculés au prochain affichage."""
+    invalider_statistiques()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def maj_roles_utilisateur(sender, instance, action, reverse, pk_set, **kwargs):
+    """Invalide les rôles en cache quand les groupes d'un utilisateur changent (Adherent.save, admin...)."""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        instance.__dict__.pop('_roles', None)
+        invalider_roles(instance.pk)
+        return
+    # Modification depuis le groupe : group.user_set.add(...), .clear()...
+    user_ids = pk_set if action != 'pre_clear' else instance.user_set.values_list('pk', flat=True)
+    for user_id in user_ids:
+        invalider_roles(user_id)
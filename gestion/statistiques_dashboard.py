@@ -0,0 +1,93 @@
+"""
+Statistiques du tableau de bord, calculées une fois puis servies depuis le cache Django.
+
+Les compteurs, les listes d'alertes CACI et les dernières palanquées évaluées
+sont recalculés seulement :
+- quand un Adherent, une Seance, une Palanquee, un élève de palanquée ou une
+  EvaluationExercice est enregistré ou supprimé (signaux, voir signals.py) ;
+- au changement de date, les fenêtres d'expiration CACI dépendant du jour ;
+- à l'expiration de DASHBOARD_STATS_DUREE, filet de sécurité lorsque le cache
+  n'est pas partagé entre les processus.
+
+Les écritures en masse (bulk_create, update) ne déclenchent pas de signal :
+le code qui en fait appelle invalider_statistiques().
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Adherent, EvaluationExercice, Palanquee, Seance
+
+CLE_VERSION = 'dashboard_stats_version'
+DUREE_DEFAUT = 300
+CHAMPS_ALERTE = ('id', 'nom', 'prenom', 'date_delivrance_caci', 'caci_fichier')
+
+
+def invalider_statistiques():
+    """Force le recalcul des statistiques au prochain affichage du tableau de bord."""
+    cache.set(CLE_VERSION, time.time_ns(), None)
+
+
+def _cle(aujourdhui):
+    version = cache.get_or_set(CLE_VERSION, time.time_ns, None)
+    return f"dashboard_stats:{version}:{aujourdhui.isoformat()}"
+
+
+def calculer_statistiques(aujourdhui):
+    """Calcule les statistiques sans passer par le cache."""
+    compteurs_adherents = Adherent.objects.filter(type_personne='adherent').aggregate(
+        total_adherents=Count('id'),
+        adherents_eleves=Count('id', filter=Q(statut='eleve')),
+        adherents_encadrants=Count('id', filter=Q(statut='encadrant')),
+    )
+    compteurs_seances = Seance.objects.aggregate(
+        total_seances=Count('id', filter=Q(type=Seance.TYPE_SEANCE)),
+        total_sorties=Count('id', filter=Q(type=Seance.TYPE_SORTIE)),
+    )
+    # Alertes CACI
+    adherents_caci = Adherent.objects.filter(
+        Q(type_personne='adherent') |
+        (Q(type_personne='non_adherent') & ~Q(niveau='debutant'))
+    ).only(*CHAMPS_ALERTE)
+    il_y_a_un_an = aujourdhui - timedelta(days=365)
+    # Palanquées ayant au moins une évaluation (les 10 plus récentes)
+    palanquees_evaluees_ids = list(
+        Palanquee.objects.filter(
+            Exists(EvaluationExercice.objects.filter(palanquee=OuterRef('pk'))),
+            encadrant__isnull=False,
+        ).order_by('-seance__date', '-id').values_list('id', flat=True)[:10]
+    )
+    return {
+        **compteurs_adherents,
+        **compteurs_seances,
+        'total_palanquees': Palanquee.objects.count(),
+        'adherents_sans_caci': list(adherents_caci.filter(Q(caci_fichier__isnull=True) | Q(caci_fichier='', actif=True))),
+        'adherents_caci_expire': list(adherents_caci.filter(
+            date_delivrance_caci__isnull=False, date_delivrance_caci__lt=il_y_a_un_an, actif=True,
+        )),
+        'adherents_caci_bientot': list(adherents_caci.filter(
+            date_delivrance_caci__isnull=False, date_delivrance_caci__gte=il_y_a_un_an,
+            date_delivrance_caci__lte=aujourdhui - timedelta(days=335), actif=True,
+        )),
+        'adherents_caci_non_valide': list(adherents_caci.filter(caci_valide=False)),
+        'palanquees_evaluees_ids': palanquees_evaluees_ids,
+        'calcule_le': timezone.now(),
+    }
+
+
+def statistiques_dashboard(forcer=False):
+    """
+    Statistiques du tableau de bord, depuis le cache si elles sont à jour.
+    forcer : recalcule et remplace l'entrée du cache.
+    """
+    aujourdhui = timezone.now().date()
+    cle = _cle(aujourdhui)
+    statistiques = None if forcer else cache.get(cle)
+    if statistiques is None:
+        statistiques = calculer_statistiques(aujourdhui)
+        cache.set(cle, statistiques, getattr(settings, 'DASHBOARD_STATS_DUREE', DUREE_DEFAUT))
+    return statistiques
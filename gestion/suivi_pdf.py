@@ -0,0 +1,219 @@
+"""
+PDF du suivi de formation d'un élève (même structure que la page de suivi).
+Utilisé par les vues de téléchargement, l'archive ZIP des suivis d'une section
+et l'envoi des PDF aux encadrants.
+"""
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
+from . import pdf_cache
+from .models import Adherent, Exercice
+from .performances import section
+from .progression import construire_suivis_formation
+
+PROCESSUS_DEFAUT = min(os.cpu_count() or 1, 4)
+# Élèves par tâche du pool : les progressions d'un lot sont construites en une passe
+TAILLE_LOT = 5
+
+
+def build_suivi_formation_pdf(eleve, progression, historiques, titre="SUIVI DE"):
+    """Construit le contenu PDF du suivi (même structure que la page)."""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=1.5*cm, rightMargin=1.5*cm, topMargin=1.5*cm, bottomMargin=1.5*cm)
+    elements = []
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=14, spaceAfter=12, alignment=TA_CENTER)
+    date_style = ParagraphStyle('DateGen', parent=styles['Normal'], alignment=TA_CENTER)
+    section_style = ParagraphStyle('Section', parent=styles['Normal'], alignment=TA_CENTER, spaceAfter=4)
+    stats_style = ParagraphStyle('Stats', parent=styles['Normal'], fontSize=8, alignment=TA_CENTER, spaceBefore=12, spaceAfter=0)
+    heading_style = ParagraphStyle('Heading', parent=styles['Heading2'], fontSize=11, spaceAfter=6, spaceBefore=12)
+    sub_style = ParagraphStyle('Sub', parent=styles['Normal'], fontSize=10, spaceAfter=4, spaceBefore=8, leftIndent=20)
+    exercice_style = ParagraphStyle('Exercice', parent=styles['Normal'], fontSize=9, spaceAfter=2, spaceBefore=10, leftIndent=40)
+    hist_style = ParagraphStyle('Hist', parent=styles['Normal'], fontSize=9, spaceAfter=2, leftIndent=40)
+
+    # Date de la dernière évaluation plutôt que de génération : le PDF mis en cache reste
+    # servi tant que ses données (clé pdf_cache) ne changent pas
+    dates = [h.date_evaluation for hist_list in historiques.values() for h in hist_list if h.date_evaluation]
+    if dates:
+        date_donnees = timezone.localtime(max(dates)).strftime('%d/%m/%Y')
+        elements.append(Paragraph(f"Données au : {date_donnees}", date_style))
+    elements.append(Spacer(1, 12))
+    elements.append(Paragraph(f"<b>{titre} :</b> {eleve.nom_complet.upper()}", title_style))
+    sections_names = ", ".join(s.get_nom_display() for s in eleve.sections.all()) or "-"
+    elements.append(Paragraph(f"<b>SECTION(S) :</b> {sections_names}", section_style))
+    nb_groupes = len(progression)
+    nb_groupes_valides = sum(1 for g in progression if g['etoile_groupe'])
+    nb_competences = sum(len(g['competences']) for g in progression)
+    nb_competences_valides = sum(1 for g in progression for c in g['competences'] if c['etoile_competence'])
+    stats_text = f"<b>{nb_groupes_valides}/{nb_groupes} groupe(s) validé(s)</b><br/><b>{nb_competences_valides}/{nb_competences} compétence(s) validée(s)</b>"
+    elements.append(Paragraph(stats_text, stats_style))
+    elements.append(Spacer(1, 12))
+
+    for g in progression:
+        statut_g = "Validé" if g['etoile_groupe'] else "En cours"
+        coche_g = '<font color="#28a745" size="18"> ✓</font>' if g['etoile_groupe'] else ''
+        elements.append(Paragraph(f"<b>{g['groupe'].intitule}</b> — {statut_g}{coche_g}", heading_style))
+        for c in g['competences']:
+            statut_c = "validée" if c['etoile_competence'] else "en cours"
+            coche = '<font color="#28a745" size="18"> ✓</font>' if c['etoile_competence'] else ''
+            elements.append(Paragraph(f"<b>{c['competence'].nom}</b> — {statut_c}{coche}", sub_style))
+            for e in c['exercices']:
+                n = e['etoiles'] or 0
+                if n:
+                    etoiles_texte = '<font color="#E6B800">' + "★" * n + '</font>'
+                else:
+                    etoiles_texte = ''
+                elements.append(Paragraph(f"<b>{e['exercice'].nom}</b> — {etoiles_texte}", exercice_style))
+                hist_list = historiques.get(e['exercice'].id, [])
+                for h in hist_list:
+                    date_str = (h.date_evaluation.strftime('%d/%m/%Y') if getattr(h, 'date_evaluation', None) else '-')
+                    if getattr(h, 'palanquee', None) and getattr(h.palanquee, 'seance', None):
+                        date_str = h.palanquee.seance.date.strftime('%d/%m/%Y')
+                    moniteur = (getattr(h, 'encadrant', None) and h.encadrant.nom_complet) or "Validé par le DT"
+                    comm = (getattr(h, 'commentaire', None) or '').replace('<', ' ').replace('>', ' ')
+                    elements.append(Paragraph(f"Date : {date_str} — Moniteur : {moniteur} — {comm}", hist_style))
+            elements.append(Spacer(1, 4))
+        elements.append(Spacer(1, 8))
+    with section('reportlab'):
+        doc.build(elements)
+    buffer.seek(0)
+    return buffer.getvalue()
+
+
+def suivi_formation_pdfs(eleves, exercice_type=Exercice.TYPE_CLASSIQUE, titre="SUIVI DE", erreurs=None):
+    """
+    PDF de suivi de plusieurs élèves : {eleve_id: contenu}.
+    Les PDF inchangés sont lus dans le cache disque, les autres générés à partir de
+    données construites en une passe. Si erreurs (dict) est fourni, les élèves dont
+    le PDF échoue y sont consignés ({eleve_id: exception}) au lieu de lever.
+    """
+    eleves = {eleve.id: eleve for eleve in eleves}
+
+    def generer(eleve_ids):
+        suivis = construire_suivis_formation([eleves[eleve_id] for eleve_id in eleve_ids], exercice_type)
+        pdfs = {}
+        for eleve_id in eleve_ids:
+            progression, historiques = suivis[eleve_id]
+            try:
+                pdfs[eleve_id] = build_suivi_formation_pdf(eleves[eleve_id], progression, historiques, titre=titre)
+            except Exception as e:
+                if erreurs is None:
+                    raise
+                erreurs[eleve_id] = e
+        return pdfs
+
+    return pdf_cache.obtenir_pdfs(pdf_cache.cles_suivi_formation(eleves.values(), exercice_type, titre), generer)
+
+
+def initialiser_processus():
+    # Nécessaire lorsque les processus sont lancés par « spawn » (Windows)
+    django.setup()
+
+
+def pdfs_suivi_lot(eleve_ids, exercice_type=Exercice.TYPE_CLASSIQUE, titre="SUIVI DE"):
+    """
+    Tâche d'un pool de processus : PDF de suivi d'un lot d'élèves.
+    Retourne ({eleve_id: contenu}, {eleve_id: message d'erreur}).
+    """
+    erreurs = {}
+    pdfs = suivi_formation_pdfs(Adherent.objects.filter(pk__in=eleve_ids), exercice_type, titre, erreurs=erreurs)
+    return pdfs, {eleve_id: str(e) for eleve_id, e in erreurs.items()}
+
+
+def iterer_suivi_formation_pdfs(eleves, exercice_type=Exercice.TYPE_CLASSIQUE, titre="SUIVI DE", processus=None):
+    """
+    Génère (élève, contenu PDF ou None, erreur ou None) dans l'ordre de eleves, au fil de la mise en page.
+    Les élèves sont traités par lots de TAILLE_LOT dans un pool de processus
+    (SUIVI_PDF_PROCESSUS par défaut ; 1 : dans le processus courant). Au plus deux
+    lots par processus sont en cours à la fois, la mémoire reste bornée quelle que
+    soit la taille de la section.
+    """
+    if processus is None:
+        processus = getattr(settings, 'SUIVI_PDF_PROCESSUS', PROCESSUS_DEFAUT)
+    eleves = list(eleves)
+    lots = [eleves[i:i + TAILLE_LOT] for i in range(0, len(eleves), TAILLE_LOT)]
+
+    def resultats(lot, pdfs, erreurs):
+        for eleve in lot:
+            yield eleve, pdfs.get(eleve.id), erreurs.get(eleve.id)
+
+    if processus <= 1 or len(lots) <= 1:
+        for lot in lots:
+            yield from resultats(lot, *pdfs_suivi_lot([eleve.id for eleve in lot], exercice_type, titre))
+        return
+    # Chaque processus ouvre ses propres connexions à la base
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=processus, initializer=initialiser_processus) as pool:
+        en_cours = deque()
+        lots_restants = iter(lots)
+        try:
+            while True:
+                for lot in lots_restants:
+                    en_cours.append((lot, pool.submit(pdfs_suivi_lot, [eleve.id for eleve in lot], exercice_type, titre)))
+                    if len(en_cours) >= 2 * processus:
+                        break
+                if not en_cours:
+                    break
+                lot, tache = en_cours.popleft()
+                yield from resultats(lot, *tache.result())
+        finally:
+            # Téléchargement interrompu : les lots pas encore commencés sont abandonnés
+            for _, tache in en_cours:
+                tache.cancel()
+
+
+class _FluxZip:
+    """Destination d'écriture de zipfile (non positionnable) dont le contenu est récupéré morceau par morceau."""
+
+    def __init__(self):
+        self._morceaux = []
+
+    def write(self, donnees):
+        self._morceaux.append(bytes(donnees))
+        return len(donnees)
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        donnees = b''.join(self._morceaux)
+        self._morceaux.clear()
+        return donnees
+
+
+def archive_suivis_formation(eleves, processus=None):
+    """
+    Archive ZIP des PDF de suivi des élèves, produite au fil de l'eau (itérable d'octets pour
+    StreamingHttpResponse) : chaque PDF est écrit dans l'archive dès qu'il est prêt.
+    Les élèves dont le PDF échoue sont listés dans ERREURS.txt en fin d'archive.
+    """
+    flux = _FluxZip()
+    noms = set()
+    erreurs = []
+    with zipfile.ZipFile(flux, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for eleve, contenu, erreur in iterer_suivi_formation_pdfs(eleves, processus=processus):
+            if contenu is None:
+                erreurs.append(f"{eleve.nom_complet} : {erreur}")
+                continue
+            nom = 'suivi_formation_{}.pdf'.format(eleve.nom_complet.replace(' ', '_'))
+            if nom in noms:
+                nom = 'suivi_formation_{}_{}.pdf'.format(eleve.nom_complet.replace(' ', '_'), eleve.id)
+            noms.add(nom)
+            archive.writestr(nom, contenu)
+            yield flux.vider()
+        if erreurs:
+            archive.writestr('ERREURS.txt', "PDF non générés :\n" + "\n".join(erreurs) + "\n")
+    yield flux.vider()
@@ -1,3 +1,142 @@
-from django.test import TestCase
+import datetime
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import boite_envoi, envoi_pdf, participations
+from .composition_mail import ModeleMail
+from .donnees_synthetiques import generer_club
+from .models import MailSortant, Seance, TacheEnvoiPdfPalanquees
+
+
+class PurgePiecesJointesTests(TestCase):
+
+    def setUp(self):
+        repertoire = tempfile.TemporaryDirectory()
+        self.addCleanup(repertoire.cleanup)
+        reglages = override_settings(
+            BOITE_ENVOI_DIR=repertoire.name,
+            EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+        )
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.repertoire = repertoire.name
+
+    def _vieillir_pieces_jointes(self):
+        for entree in os.scandir(self.repertoire):
+            os.utime(entree.path, (0, 0))
+
+    def test_mail_en_echec_remis_en_file_apres_purge(self):
+        message = EmailMessage('Invitation', 'Bonjour', None, ['eleve@exemple.fr'])
+        message.attach('programme.txt', 'Programme de la séance', 'text/plain')
+        (_, sortant), = boite_envoi.mettre_en_file([(1, message)], origine='test')
+        MailSortant.objects.filter(pk=sortant.pk).update(statut=MailSortant.STATUT_ECHEC)
+        self._vieillir_pieces_jointes()
+
+        self.assertEqual(boite_envoi.purger_pieces_jointes(), 0)
+
+        # Comme l'action « Remettre en file » de l'admin
+        MailSortant.objects.filter(pk=sortant.pk).update(
+            statut=MailSortant.STATUT_EN_ATTENTE, tentatives=0, prochaine_tentative=timezone.now(),
+        )
+        boite_envoi.envoyer_mails_en_attente(par_minute=6000, attendre=lambda duree: None)
+
+        sortant.refresh_from_db()
+        self.assertEqual(sortant.statut, MailSortant.STATUT_ENVOYE)
+        self.assertEqual(mail.outbox[0].attachments[0][1], 'Programme de la séance')
+
+    def test_pieces_jointes_des_mails_envoyes_purgees(self):
+        message = EmailMessage('Invitation', 'Bonjour', None, ['eleve@exemple.fr'])
+        message.attach('programme.txt', 'Programme de la séance', 'text/plain')
+        boite_envoi.mettre_en_file([(1, message)], origine='test')
+        boite_envoi.envoyer_mails_en_attente(par_minute=6000, attendre=lambda duree: None)
+        self._vieillir_pieces_jointes()
+
+        self.assertEqual(boite_envoi.purger_pieces_jointes(), 1)
+
+    def test_pieces_jointes_communes_reconstruites(self):
+        modele = ModeleMail('Invitation', texte='Bonjour', pieces_jointes=[
+            ('séance.txt', 'Programme de la séance'.encode(), 'text/plain'),
+            ('fiche.pdf', b'%PDF-1.4', None),
+            ('brut.txt', b'\xff\xfe', 'text/plain'),
+        ])
+        boite_envoi.mettre_en_file([(1, modele.message(['eleve@exemple.fr']))], origine='test')
+        boite_envoi.envoyer_mails_en_attente(par_minute=6000, attendre=lambda duree: None)
+
+        parties = [partie for partie in mail.outbox[0].message().walk() if partie.get_filename()]
+        self.assertEqual(
+            [(partie.get_filename(), partie.get_content_type(), partie.get_payload(decode=True)) for partie in parties],
+            [
+                ('séance.txt', 'text/plain', 'Programme de la séance'.encode()),
+                ('fiche.pdf', 'application/pdf', b'%PDF-1.4'),
+                ('brut.txt', 'application/octet-stream', b'\xff\xfe'),
+            ],
+        )
+
+
+class EnvoiPdfPalanqueesTests(TestCase):
+
+    def setUp(self):
+        reglages = override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        generer_club(nb_evaluations=60, nb_eleves=12, nb_encadrants=3, nb_seances=1, nb_exercices=10)
+        self.seance = Seance.objects.get()
+        self.palanquees = list(self.seance.palanques.order_by('id'))
+        self.assertGreater(len(self.palanquees), 1)
+
+    def test_fiche_en_echec_n_empeche_pas_les_autres_envois(self):
+        en_echec = self.palanquees[0]
+        ecrire = envoi_pdf.write_palanquee_pdf
+
+        def write_palanquee_pdf(buffer, palanquee):
+            if palanquee.pk == en_echec.pk:
+                raise ValueError('mise en page impossible')
+            ecrire(buffer, palanquee)
+
+        envoi_pdf.creer_tache(self.seance, '<p>Bonjour</p>')
+        with mock.patch.object(envoi_pdf, 'write_palanquee_pdf', write_palanquee_pdf), \
+                self.assertLogs('gestion.envoi_pdf', 'ERROR'):
+            tache = envoi_pdf.executer_tache(envoi_pdf.prendre_tache_suivante())
+
+        self.assertEqual(tache.statut, TacheEnvoiPdfPalanquees.STATUT_TERMINEE)
+        self.assertEqual(tache.nb_envoyes, len(self.palanquees) - 1)
+        self.assertEqual(tache.nb_traites, len(self.palanquees))
+        self.assertEqual(len(mail.outbox), len(self.palanquees) - 1)
+        self.assertEqual(len(tache.erreurs), 1)
+        self.assertIn(en_echec.encadrant.nom_complet, tache.erreurs[0])
+
+    def test_reservation_renouvelee_pendant_la_mise_en_page(self):
+        reservations = []
+        ecrire = envoi_pdf.write_palanquee_pdf
+
+        def write_palanquee_pdf(buffer, palanquee):
+            reservations.append(TacheEnvoiPdfPalanquees.objects.values_list('date_reservation', flat=True).get())
+            ecrire(buffer, palanquee)
+
+        envoi_pdf.creer_tache(self.seance, '<p>Bonjour</p>')
+        with mock.patch.object(envoi_pdf, 'write_palanquee_pdf', write_palanquee_pdf):
+            envoi_pdf.executer_tache(envoi_pdf.prendre_tache_suivante())
+
+        self.assertEqual(len(reservations), len(self.palanquees))
+        self.assertEqual(reservations, sorted(set(reservations)))
+
+
+class PeriodeTests(SimpleTestCase):
+
+    def test_saison_hors_limites_donne_la_saison_en_cours(self):
+        en_cours = participations.periode(QueryDict())
+        for valeur in ('0', '9999', '99999999999999999999'):
+            with self.subTest(saison=valeur):
+                self.assertEqual(participations.periode(QueryDict(f'saison={valeur}')), en_cours)
+
+    def test_date_impossible_ignoree(self):
+        debut, fin, saison = participations.periode(QueryDict('date_debut=2024-02-30&date_fin=2024-06-30'))
+        self.assertEqual((debut, fin, saison), (None, datetime.date(2024, 6, 30), None))
+        self.assertEqual(participations.periode(QueryDict('date_debut=2024-02-30')), participations.periode(QueryDict()))
@@ -53,6 +53,7 @@ urlpatterns = [
     path('eleves/api/suivi-section/', views.api_suivi_eleves_section, name='api_suivi_eleves_section'),
     path('eleves/<int:eleve_id>/suivi-formation/', views.suivi_formation_eleve, name='suivi_formation_eleve'),
     path('eleves/<int:eleve_id>/suivi-formation/pdf/', views.suivi_formation_eleve_pdf, name='suivi_formation_eleve_pdf'),
+    path('eleves/section/<int:section_id>/suivis-formation/zip/', views.suivis_formation_section_zip, name='suivis_formation_section_zip'),
     path('eleves/<int:eleve_id>/suivi-evaluations/pdf/', views.suivi_evaluations_exercices_eleve_pdf, name='suivi_evaluations_exercices_eleve_pdf'),
     path('eleves/<int:eleve_id>/validation-dt/<int:exercice_id>/', views.validation_dt_eleve_exercice, name='validation_dt_eleve_exercice'),
     
@@ -99,6 +100,7 @@ urlpatterns = [
     path('seances/<int:seance_id>/fiche-securite-excel/', views.generer_fiche_securite_excel, name='generer_fiche_securite_excel'),
     path('seances/<int:seance_id>/admin-inscription/', views.admin_inscription_seance, name='admin_inscription_seance'),
     path('api/corps-mail-pdf-palanquees/', views.api_corps_mail_pdf_palanquees, name='api_corps_mail_pdf_palanquees'),
+    path('api/envoi-pdf-palanquees/<int:tache_id>/', views.api_envoi_pdf_palanquees, name='api_envoi_pdf_palanquees'),
     path('seances/<int:seance_id>/envoyer-pdf-palanquees/', views.envoyer_pdf_palanquees_encadrants, name='envoyer_pdf_palanquees_encadrants'),
     path('seances/<int:seance_id>/envoyer-mail-covoiturage/', views.envoyer_mail_covoiturage, name='envoyer_mail_covoiturage'),
     path('seances/<int:seance_id>/exporter-destinataires-covoiturage/', views.exporter_destinataires_covoiturage_excel, name='exporter_destinataires_covoiturage_excel'),
@@ -106,6 +108,8 @@ urlpatterns = [
     path('seances/<int:seance_id>/exporter-destinataires-evaluation/', views.exporter_destinataires_evaluation_excel, name='exporter_destinataires_evaluation_excel'),
     path('seances/<int:seance_id>/exporter-destinataires-pdf/', views.exporter_destinataires_pdf_excel, name='exporter_destinataires_pdf_excel'),
     path('seances/export-participations-encadrants/', views.exporter_participations_encadrants_excel, name='exporter_participations_encadrants_excel'),
+    path('seances/participations-encadrants/', views.participations_encadrants, name='participations_encadrants'),
+    path('seances/api/participations-encadrants/', views.api_participations_encadrants, name='api_participations_encadrants'),
     path('seances/<int:pk>/communiquer/', CommunicationSeanceView.as_view(), name='seance_communiquer'),
     path('seances/<int:seance_id>/exporter-destinataires-communication/', views.exporter_destinataires_communication_excel, name='exporter_destinataires_communication_excel'),
     path('seances/<int:seance_id>/suivi-inscrits/', views.suivi_inscrits_seance, name='suivi_inscrits_seance'),
@@ -3,18 +3,36 @@ from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
 from django.urls import reverse
+from .composition_mail import ModeleMail, gabarit, gabarit_fichier
 from .models import LienEvaluation
+from .performances import section
+from .roles import roles_requete, roles_utilisateur
 from django.templatetags.static import static
 from django.contrib.auth.decorators import user_passes_test
 from django.shortcuts import redirect
 from functools import wraps
 
 
-def envoyer_lien_evaluation(lien_evaluation, request=None):
+def modele_mail_lien_evaluation():
     """
-    Envoie un email avec le lien d'évaluation à l'encadrant
+    Mail du lien d'évaluation, compilé une fois pour tout un envoi (voir construire_mail_lien_evaluation)
+    """
+    return ModeleMail(
+        gabarit("Lien d'évaluation - Séance du {{ seance.date|date:'d/m/Y' }} - {{ palanquee.nom }}", echappement=False),
+        html=gabarit_fichier('gestion/email_lien_evaluation.html'),
+        contexte={'site_name': getattr(settings, 'SITE_NAME', 'Aquadémie Paris Plongée')},
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        cc=getattr(settings, 'EMAIL_CC_DEFAULT', []),
+    )
+
+
+def construire_mail_lien_evaluation(lien_evaluation, request=None, modele=None):
+    """
+    Prépare l'email contenant le lien d'évaluation pour l'encadrant (sans l'envoyer).
+    modele : ModeleMail de modele_mail_lien_evaluation(), à réutiliser pour un envoi à plusieurs encadrants.
     """
-    seance = lien_evaluation.palanquee.seance
+    if modele is None:
+        modele = modele_mail_lien_evaluation()
     encadrant = lien_evaluation.palanquee.encadrant
     
     # Construire l'URL complète du lien
@@ -23,42 +41,25 @@ def envoyer_lien_evaluation(lien_evaluation, request=None):
     else:
         lien_complet = f"{settings.SITE_URL}{reverse('evaluation_publique', kwargs={'token': lien_evaluation.token})}"
     
-    # Préparer le contexte pour le template
-    context = {
-        'seance': seance,
+    # Texte tiré de la version HTML
+    return modele.message([encadrant.email], {
+        'seance': lien_evaluation.palanquee.seance,
         'encadrant': encadrant,
         'palanquee': lien_evaluation.palanquee,
         'lien': lien_evaluation,
         'lien_complet': lien_complet,
-        'site_name': getattr(settings, 'SITE_NAME', 'Aquadémie Paris Plongée'),
-    }
-    
-    # Rendre le template HTML
-    html_content = render_to_string('gestion/email_lien_evaluation.html', context)
-    text_content = strip_tags(html_content)
-    
-    # Préparer l'email
-    subject = f"Lien d'évaluation - Séance du {seance.date.strftime('%d/%m/%Y')} - {lien_evaluation.palanquee.nom}"
-    
-    # Destinataires
-    to_emails = [encadrant.email]
-    cc_emails = getattr(settings, 'EMAIL_CC_DEFAULT', [])
-    
-    # Créer l'email
-    email = EmailMultiAlternatives(
-        subject=subject,
-        body=text_content,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        to=to_emails,
-        cc=cc_emails
-    )
-    
-    # Ajouter la version HTML
-    email.attach_alternative(html_content, "text/html")
-    
+    })
+
+
+def envoyer_lien_evaluation(lien_evaluation, request=None):
+    """
+    Envoie un email avec le lien d'évaluation à l'encadrant
+    """
+    email = construire_mail_lien_evaluation(lien_evaluation, request)
     try:
         # Envoyer l'email
-        email.send()
+        with section('smtp'):
+            email.send()
         return True, "Email envoyé avec succès"
     except Exception as e:
         return False, f"Erreur lors de l'envoi de l'email : {str(e)}"
@@ -117,7 +118,8 @@ def envoyer_lien_evaluation_avec_cc(lien_evaluation, cc_emails=None, request=Non
     
     try:
         # Envoyer l'email
-        email.send()
+        with section('smtp'):
+            email.send()
         return True, "Email envoyé avec succès"
     except Exception as e:
         return False, f"Erreur lors de l'envoi de l'email : {str(e)}" 
@@ -137,16 +139,17 @@ def group_required(group_name):
         def _wrapped_view(request, *args, **kwargs):
             if not request.user.is_authenticated:
                 return redirect('login')
-            if request.user.groups.filter(name=group_name).exists() or request.user.is_superuser:
+            roles = roles_requete(request)
+            if group_name in roles or request.user.is_superuser:
                 return view_func(request, *args, **kwargs)
             # Redirection selon le groupe
-            if request.user.groups.filter(name='codir').exists():
+            if 'codir' in roles:
                 return redirect('dashboard')
-            elif request.user.groups.filter(name='eleve').exists():
+            elif 'eleve' in roles:
                 adherent = getattr(request.user, 'adherent_profile', None)
                 if adherent:
                     return redirect('suivi_formation_eleve', eleve_id=adherent.id)
-            elif request.user.groups.filter(name='encadrant').exists():
+            elif 'encadrant' in roles:
                 return redirect('eleve_list')
             else:
                 return redirect('dashboard')
@@ -169,24 +172,27 @@ def is_codir(user):
     """Vérifie si l'utilisateur appartient au groupe Codir"""
     if not user.is_authenticated:
         return False
-    return user.groups.filter(name='codir').exists()
+    return 'codir' in roles_utilisateur(user)
 
 def is_codir_eleve(user):
     """Vérifie si l'utilisateur est à la fois Codir et élève"""
     if not user.is_authenticated:
         return False
-    return user.groups.filter(name='codir').exists() and user.groups.filter(name='eleve').exists()
+    roles = roles_utilisateur(user)
+    return 'codir' in roles and 'eleve' in roles
 
 def is_codir_encadrant(user):
     """Vérifie si l'utilisateur est à la fois Codir et encadrant"""
     if not user.is_authenticated:
         return False
-    return user.groups.filter(name='codir').exists() and user.groups.filter(name='encadrant').exists()
+    roles = roles_utilisateur(user)
+    return 'codir' in roles and 'encadrant' in roles
 
 def can_access_dashboard(user):
     """Vérifie si l'utilisateur peut accéder au dashboard"""
     if not user.is_authenticated:
         return False
+    roles = roles_utilisateur(user)
     return (user.is_superuser or 
-            user.groups.filter(name='admin').exists() or 
-            user.groups.filter(name='codir').exists()) 
\ No newline at end of file
+            'admin' in roles or 
+            'codir' in roles) 
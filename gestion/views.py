@@ -2,10 +2,10 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View
 from django.urls import reverse_lazy
-from django.db.models import Q
+from django.db.models import Count, Max, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
 import json
@@ -17,11 +17,12 @@ from reportlab.lib import colors
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
-from django.views.decorators.http import require_GET, require_POST, require_http_methods
+from django.views.decorators.http import condition, require_GET, require_POST, require_http_methods
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.gzip import gzip_page
 from django.core.mail import send_mass_mail
 from django.template.loader import render_to_string
-from django.core.mail import send_mail
 import openpyxl
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Alignment
@@ -35,11 +36,19 @@ import time
 
 from .models import Adherent, Section, Competence, GroupeCompetence, Seance, Evaluation, LienEvaluation, Palanquee, Lieu, LienInscriptionSeance, InscriptionSeance, Exercice
 from .forms import AdherentForm, SectionForm, CompetenceForm, GroupeCompetenceForm, SeanceForm, EvaluationBulkForm, PalanqueeForm, NonAdherentInscriptionForm, AdherentPublicForm, ExerciceForm, ExerciceEvaluationForm, AdminInscriptionSeanceForm, AffectationSectionMasseForm, CommunicationSeanceForm, CommunicationAdherentsForm
-from .utils import envoyer_lien_evaluation, envoyer_lien_evaluation_avec_cc
+from .utils import construire_mail_lien_evaluation, envoyer_lien_evaluation, envoyer_lien_evaluation_avec_cc, modele_mail_lien_evaluation
+from .progression import charger_progressions, construire_suivis_formation, exercices_section
+from .suivi_pdf import archive_suivis_formation, suivi_formation_pdfs
+from . import envoi_pdf
+from .boite_envoi import annoter_etat_envoi, hors_doublons, mettre_en_file
+from .composition_mail import SIGNATURE, SIGNATURE_PDF, ModeleMail, gabarit, gabarit_fichier
+from .export_excel import ClasseurExcel, export_destinataires, parcourir
+from .participations import libelle_saison, matrice_participations, saisons_disponibles
+from .participations import periode as periode_participations
+from .performances import section
 from .models import PalanqueeEleve
 from gestion.models import EvaluationExercice, GroupeCompetence, Competence, Exercice, Adherent
 from django.contrib.admin.views.decorators import staff_member_required
-from django.core.mail import EmailMessage
 import tempfile
 from gestion.palanquee_views import generer_fiche_palanquee_pdf, write_palanquee_pdf
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
@@ -47,23 +56,26 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER
 from reportlab.lib.pagesizes import A4
 from gestion.utils import get_signature_html
-from django.core.mail import EmailMultiAlternatives
-from email.mime.image import MIMEImage
 from django.contrib.auth.models import User, Group
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
-from django.core.mail import send_mail
 from django.conf import settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.contrib.sites.shortcuts import get_current_site
 from .utils import eleve_only, encadrant_only, admin_only, group_required
+from .roles import roles_utilisateur
+from .listes import annoter_statut_caci, paginer_onglets, trier
+from .recherche import rechercher_adherents
+from .import_adherents import ErreurImport, importer_adherents
+from .fiche_securite import fiche_securite
 from django.utils.decorators import method_decorator
 from .models import ModeleMailSeance
-from .models import Adherent, Section, ModeleMailAdherents, HistoriqueMailAdherents, CorpsMailPdfPalanquees
+from .models import Adherent, Section, ModeleMailAdherents, HistoriqueMailAdherents, CorpsMailPdfPalanquees, TacheEnvoiPdfPalanquees
 from django.template import engines
 from django.utils.html import strip_tags
+from django.utils.safestring import mark_safe
 import html as html_lib
 
 # Corps HTML par défaut si aucun contenu n'a encore été mémorisé (équivalent à email_pdf_palanquee.txt)
@@ -116,43 +128,36 @@ def dashboard(request):
         return redirect('login')
     """Tableau de bord principal"""
     from .utils import is_codir, is_codir_eleve, is_codir_encadrant
-    
+    from .statistiques_dashboard import statistiques_dashboard
+
+    # Compteurs, alertes CACI et palanquées évaluées : mis en cache, recalculés à chaque modification
+    statistiques = statistiques_dashboard(forcer=bool(request.GET.get('rafraichir')))
     context = {
-        'total_adherents': Adherent.objects.filter(type_personne='adherent').count(),
-        'total_seances': Seance.objects.filter(type=Seance.TYPE_SEANCE).count(),
-        'total_sorties': Seance.objects.filter(type=Seance.TYPE_SORTIE).count(),
-        'total_palanquees': Palanquee.objects.count(),
-        'seances_recentes': Seance.objects.filter(type=Seance.TYPE_SEANCE)[:5],
+        'total_adherents': statistiques['total_adherents'],
+        'total_seances': statistiques['total_seances'],
+        'total_sorties': statistiques['total_sorties'],
+        'total_palanquees': statistiques['total_palanquees'],
+        'seances_recentes': Seance.objects.filter(type=Seance.TYPE_SEANCE).select_related('lieu')[:5],
         'palanquees_recentes': Palanquee.objects.select_related('seance', 'section').prefetch_related('eleves')[:5],
-        'adherents_eleves': Adherent.objects.filter(type_personne='adherent', statut='eleve').count(),
-        'adherents_encadrants': Adherent.objects.filter(type_personne='adherent', statut='encadrant').count(),
+        'adherents_eleves': statistiques['adherents_eleves'],
+        'adherents_encadrants': statistiques['adherents_encadrants'],
         'is_codir': is_codir(request.user),
         'is_codir_eleve': is_codir_eleve(request.user),
         'is_codir_encadrant': is_codir_encadrant(request.user),
+        'statistiques_calculees_le': statistiques['calcule_le'],
     }
     # Ajout des alertes CACI
-    from datetime import timedelta
-    today = timezone.now().date()
-    adherents_caci = Adherent.objects.filter(
-        Q(type_personne='adherent') |
-        (Q(type_personne='non_adherent') & ~Q(niveau='debutant'))
-    )
-    context['adherents_sans_caci'] = adherents_caci.filter(caci_fichier__isnull=True) | adherents_caci.filter(caci_fichier='',actif=True)
-    context['adherents_caci_expire'] = adherents_caci.filter(date_delivrance_caci__isnull=False, date_delivrance_caci__lt=today - timedelta(days=365),actif=True)
-    context['adherents_caci_bientot'] = adherents_caci.filter(date_delivrance_caci__isnull=False, date_delivrance_caci__gte=today - timedelta(days=365), date_delivrance_caci__lte=today - timedelta(days=335),actif=True)
-    context['adherents_caci_non_valide'] = adherents_caci.filter(caci_valide=False)
+    context['adherents_sans_caci'] = statistiques['adherents_sans_caci']
+    context['adherents_caci_expire'] = statistiques['adherents_caci_expire']
+    context['adherents_caci_bientot'] = statistiques['adherents_caci_bientot']
+    context['adherents_caci_non_valide'] = statistiques['adherents_caci_non_valide']
     # Bloc dernières palanquées évaluées (par encadrant)
-    # On récupère les palanquées qui ont au moins une évaluation_exercice
-    palanquees_evaluees_ids = (
-        EvaluationExercice.objects.values_list('palanquee_id', flat=True).distinct()
-    )
     palanquees_evaluees = (
-        Palanquee.objects.filter(id__in=palanquees_evaluees_ids, encadrant__isnull=False)
+        Palanquee.objects.filter(id__in=statistiques['palanquees_evaluees_ids'])
         .select_related('seance', 'encadrant')
         .prefetch_related('eleves')
         .order_by('-seance__date', '-id')
-        .distinct()
-    )[:10]
+    )
     context['dernieres_palanquees_evaluees'] = palanquees_evaluees
     # Lien vers la page toutes les évaluations (à créer)
     context['url_toutes_evaluations'] = '/evaluations/'
@@ -164,7 +169,7 @@ class AdherentListView(LoginRequiredMixin, ListView):
     model = Adherent
     template_name = 'gestion/adherent_list.html'
     context_object_name = 'adherents'
-    # paginate_by = 20  # Pagination supprimée pour afficher tous les adhérents
+    # Pagination par onglet : voir paginer_onglets dans get_context_data
     
     def get(self, request, *args, **kwargs):
         # Vérifier les permissions d'accès
@@ -174,46 +179,27 @@ class AdherentListView(LoginRequiredMixin, ListView):
         return super().get(request, *args, **kwargs)
     
     def get_queryset(self):
-        queryset = Adherent.objects.all()
-        q = self.request.GET.get('q')
-        if q:
-            queryset = queryset.filter(
-                Q(nom__icontains=q) | Q(prenom__icontains=q) | Q(email__icontains=q)
-            )
-        sort = self.request.GET.get('sort', 'nom')
-        order = self.request.GET.get('order', 'asc')
-        valid_sorts = ['nom', 'prenom', 'email', 'niveau', 'statut', 'date_delivrance_caci', 'telephone']
-        if sort not in valid_sorts:
-            sort = 'nom'
-        if order == 'desc':
-            sort = '-' + sort
-        queryset = queryset.order_by(sort, 'prenom' if sort.lstrip('-') == 'nom' else 'nom')
-        # Ajout du statut CACI pour affichage
-        from datetime import timedelta
-        from django.utils import timezone
-        today = timezone.now().date()
-        adherents = list(queryset)
-        for a in adherents:
-            if a.date_delivrance_caci:
-                expiration = a.date_delivrance_caci + timedelta(days=365)
-                if expiration < today:
-                    a.caci_status = 'expired'
-                elif (expiration - today).days < 30:
-                    a.caci_status = 'soon'
-                else:
-                    a.caci_status = ''
-            else:
-                a.caci_status = ''
-        return adherents
+        queryset = Adherent.objects.select_related('user').prefetch_related('sections')
+        queryset = rechercher_adherents(queryset, self.request.GET.get('q'))
+        # Statut CACI (expired / soon) calculé en SQL pour affichage
+        return annoter_statut_caci(trier(queryset, self.request))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         from .utils import is_codir, is_codir_eleve, is_codir_encadrant
         
         adherents = context['adherents']
-        context['adherents_adherents'] = [a for a in adherents if a.type_personne == 'adherent']
-        context['adherents_non_adherents'] = [a for a in adherents if a.type_personne == 'non_adherent' and bool(a.actif)]
-        context['adherents_non_adherents_desactives'] = [a for a in adherents if a.type_personne == 'non_adherent' and not bool(a.actif)]
+        # Un onglet = une requête filtrée, triée et limitée à la page affichée
+        pages = paginer_onglets(self.request, [
+            ('adherents', adherents.filter(type_personne='adherent')),
+            ('non_adherents', adherents.filter(type_personne='non_adherent', actif=True)),
+            ('desactives', adherents.filter(type_personne='non_adherent', actif=False)),
+        ])
+        context['adherents_adherents'] = pages['adherents']
+        context['adherents_non_adherents'] = pages['non_adherents']
+        context['adherents_non_adherents_desactives'] = pages['desactives']
+        onglet = self.request.GET.get('onglet')
+        context['onglet_actif'] = onglet if onglet in pages else 'adherents'
         context['is_codir'] = is_codir(self.request.user)
         context['is_codir_eleve'] = is_codir_eleve(self.request.user)
         context['is_codir_encadrant'] = is_codir_encadrant(self.request.user)
@@ -276,35 +262,38 @@ class EleveListView(LoginRequiredMixin, ListView):
     model = Adherent
     template_name = 'gestion/eleve_list.html'
     context_object_name = 'eleves'
-    # paginate_by = 20  # Pagination supprimée pour afficher tous les élèves
+    # Pagination par bloc (adhérents / non adhérents) : voir get_context_data
     
     def get(self, request, *args, **kwargs):
         # Vérifier les permissions d'accès : dashboard OU encadrant
         from .utils import can_access_dashboard
-        is_encadrant = request.user.groups.filter(name='encadrant').exists()
+        is_encadrant = 'encadrant' in roles_utilisateur(request.user)
         if not can_access_dashboard(request.user) and not is_encadrant:
             return redirect('login')
         return super().get(request, *args, **kwargs)
     
     def get_queryset(self):
-        queryset = Adherent.objects.filter(statut='eleve').order_by('nom', 'prenom')
-        q = self.request.GET.get('q')
-        if q:
-            queryset = queryset.filter(
-                Q(nom__icontains=q) | Q(prenom__icontains=q) | Q(email__icontains=q)
-            )
-        return queryset
+        queryset = Adherent.objects.filter(statut='eleve')
+        queryset = rechercher_adherents(queryset, self.request.GET.get('q'))
+        return trier(queryset, self.request)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         from .utils import is_codir, is_codir_eleve, is_codir_encadrant
         
         eleves = context['eleves']
-        context['eleves_adherents'] = [e for e in eleves if e.type_personne == 'adherent']
-        context['eleves_non_adherents'] = [e for e in eleves if e.type_personne == 'non_adherent']
+        pages = paginer_onglets(self.request, [
+            ('adherents', eleves.filter(type_personne='adherent')),
+            ('non_adherents', eleves.filter(type_personne='non_adherent')),
+        ])
+        context['eleves_adherents'] = pages['adherents']
+        context['eleves_non_adherents'] = pages['non_adherents']
         context['is_codir'] = is_codir(self.request.user)
         context['is_codir_eleve'] = is_codir_eleve(self.request.user)
         context['is_codir_encadrant'] = is_codir_encadrant(self.request.user)
+        if peut_voir_tous_les_suivis(self.request.user):
+            # Téléchargement groupé des suivis PDF par section
+            context['sections_suivis'] = Section.objects.order_by('nom')
         return context
 
 #@method_decorator(group_required('admin'), name='dispatch')
@@ -313,7 +302,7 @@ class EncadrantListView(LoginRequiredMixin, ListView):
     template_name = 'gestion/encadrant_list.html'
     context_object_name = 'encadrants'
    
-    # paginate_by = 20  # Pagination supprimée pour afficher tous les encadrants
+    # Pagination par bloc (adhérents / non adhérents) : voir get_context_data
     def get(self, request, *args, **kwargs):
         # Vérifier les permissions d'accès
         from .utils import can_access_dashboard
@@ -322,19 +311,19 @@ class EncadrantListView(LoginRequiredMixin, ListView):
         return super().get(request, *args, **kwargs)
     def get_queryset(self):
         
-        queryset = Adherent.objects.filter(statut='encadrant').order_by('nom', 'prenom')
-        q = self.request.GET.get('q')
-        if q:
-            queryset = queryset.filter(
-                Q(nom__icontains=q) | Q(prenom__icontains=q) | Q(email__icontains=q)
-            )
-        return queryset
+        queryset = Adherent.objects.filter(statut='encadrant')
+        queryset = rechercher_adherents(queryset, self.request.GET.get('q'))
+        return trier(queryset, self.request)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         encadrants = context['encadrants']
-        context['encadrants_adherents'] = [e for e in encadrants if e.type_personne == 'adherent']
-        context['encadrants_non_adherents'] = [e for e in encadrants if e.type_personne == 'non_adherent']
+        pages = paginer_onglets(self.request, [
+            ('adherents', encadrants.filter(type_personne='adherent')),
+            ('non_adherents', encadrants.filter(type_personne='non_adherent')),
+        ])
+        context['encadrants_adherents'] = pages['adherents']
+        context['encadrants_non_adherents'] = pages['non_adherents']
         return context
 
 # Vues pour les sections
@@ -551,7 +540,8 @@ def _export_groupes_competences_pdf_by_type(exercice_type):
             for exercice in exercices:
                 elements.append(Paragraph(f"• {exercice.nom}", exercice_style))
 
-    doc.build(elements)
+    with section('reportlab'):
+        doc.build(elements)
     buffer.seek(0)
 
     filename = (
@@ -906,22 +896,69 @@ def get_eleves_section(request):
             return JsonResponse({'eleves': []})
     return JsonResponse({'eleves': []})
 
+# Autocomplétion des membres (page d'inscription publique) : nombre de résultats par défaut et maximal
+MEMBRES_AUTOCOMPLETE_LIMITE = 20
+MEMBRES_AUTOCOMPLETE_LIMITE_MAX = 50
+
+
+def _etag_membres_app(request):
+    """
+    Change dès qu'un adhérent est créé, modifié ou supprimé (Adherent.date_modification, nombre)
+    ou que ses sections changent : la table d'association n'a pas de date, un ajout augmente
+    le plus grand id de ses lignes, un retrait diminue leur nombre.
+    """
+    etat = Adherent.objects.filter(type_personne='adherent').aggregate(
+        derniere_modification=Max('date_modification'), nombre=Count('id'),
+    )
+    liens = Adherent.sections.through.objects.filter(adherent__type_personne='adherent').aggregate(
+        dernier=Max('id'), nombre=Count('id'),
+    )
+    derniere = etat['derniere_modification']
+    return (
+        f"membres-{derniere.timestamp() if derniere else 0}-{etat['nombre']}"
+        f"-{liens['dernier'] or 0}-{liens['nombre']}"
+    )
+
+
 @require_GET
+@cache_control(public=True, no_cache=True)
+@condition(etag_func=_etag_membres_app)
 def api_membres_app(request):
+    """
+    Autocomplétion des adhérents : les N premiers (par nom, prénom) dont chaque mot saisi
+    commence le nom ou le prénom. L'ETag permet au navigateur et au proxy de revalider
+    sans recalculer la réponse tant qu'aucun adhérent ni ses sections n'ont changé.
+    """
     q = request.GET.get('q', '').strip()
+    try:
+        limite = min(int(request.GET.get('limite', MEMBRES_AUTOCOMPLETE_LIMITE)), MEMBRES_AUTOCOMPLETE_LIMITE_MAX)
+    except ValueError:
+        limite = MEMBRES_AUTOCOMPLETE_LIMITE
     membres = Adherent.objects.filter(type_personne='adherent')
     if q:
-        membres = membres.filter(Q(nom__icontains=q) | Q(prenom__icontains=q))
-    membres = membres.order_by('nom', 'prenom')
+        membres = rechercher_adherents(membres, q, champs=('nom', 'prenom'))
+    membres = list(
+        membres.order_by('nom', 'prenom', 'id')
+        .values('id', 'nom', 'prenom', 'niveau', 'statut', 'date_delivrance_caci')[:max(limite, 1)]
+    )
+    # Noms des sections de tous les membres retournés en une requête
+    noms_sections = dict(Section.SECTIONS_CHOICES)
+    sections = {}
+    for adherent_id, section_nom in Adherent.sections.through.objects.filter(
+        adherent_id__in=[m['id'] for m in membres]
+    ).order_by('id').values_list('adherent_id', 'section__nom'):
+        sections.setdefault(adherent_id, []).append(noms_sections.get(section_nom, section_nom))
+    niveaux = dict(Adherent.NIVEAUX_CHOICES)
+    statuts = dict(Adherent.STATUT_CHOICES)
     data = [
         {
-            'id': m.id,
-            'nom': m.nom,
-            'prenom': m.prenom,
-            'niveau': m.get_niveau_display(),
-            'sections': [s.get_nom_display() for s in m.sections.all()],
-            'statut': m.get_statut_display(),
-            'date_delivrance_caci': m.date_delivrance_caci.strftime('%d/%m/%Y') if m.date_delivrance_caci else '',
+            'id': m['id'],
+            'nom': m['nom'],
+            'prenom': m['prenom'],
+            'niveau': niveaux.get(m['niveau'], m['niveau']),
+            'sections': sections.get(m['id'], []),
+            'statut': statuts.get(m['statut'], m['statut']),
+            'date_delivrance_caci': m['date_delivrance_caci'].strftime('%d/%m/%Y') if m['date_delivrance_caci'] else '',
         }
         for m in membres
     ]
@@ -933,9 +970,9 @@ def api_recherche_non_membre(request):
     prenom = request.GET.get('prenom', '').strip()
     non_membres = Adherent.objects.filter(type_personne='non_adherent')
     if nom:
-        non_membres = non_membres.filter(nom__icontains=nom)
+        non_membres = rechercher_adherents(non_membres, nom, champs=('nom',))
     if prenom:
-        non_membres = non_membres.filter(prenom__icontains=prenom)
+        non_membres = rechercher_adherents(non_membres, prenom, champs=('prenom',))
     non_membres = non_membres.order_by('nom', 'prenom')
     results = []
     for nm in non_membres:
@@ -1017,7 +1054,7 @@ def api_details_non_adherent(request, adherent_id):
 # Vues pour l'import Excel
 @login_required
 def import_adherents_excel(request):
-    """Import en masse d'adhérents depuis un fichier Excel"""
+    """Import en masse d'adhérents depuis un fichier Excel (voir import_adherents.py)"""
     if request.method == 'POST':
         if 'excel_file' in request.FILES:
             excel_file = request.FILES['excel_file']
@@ -1027,194 +1064,27 @@ def import_adherents_excel(request):
                 messages.error(request, 'Veuillez sélectionner un fichier Excel (.xlsx ou .xls)')
                 return render(request, 'gestion/import_adherents_excel.html')
             
+            simulation = bool(request.POST.get('simulation'))
             try:
-                import pandas as pd
-                from datetime import datetime
-                import re
-                
-                # Lire le fichier Excel
-                if excel_file.name.endswith('.xlsx'):
-                    df = pd.read_excel(excel_file, engine='openpyxl')
-                else:
-                    df = pd.read_excel(excel_file, engine='xlrd')
-                
-                # --- Ajout des nouveaux champs dans l'import ---
-                required_columns = ['nom', 'prenom', 'date_naissance', 'adresse', 'code_postal', 'ville', 'email', 
-                                  'telephone', 'numero_licence', 'assurance', 'date_delivrance_caci', 'niveau', 'statut']
-                missing_columns = [col for col in required_columns if col not in df.columns]
-                
-                if missing_columns:
-                    messages.error(request, f'Colonnes manquantes dans le fichier : {", ".join(missing_columns)}')
-                    return render(request, 'gestion/import_adherents_excel.html')
-                
-                # Valeurs autorisées pour la validation
-                niveaux_valides = [c[0] for c in Adherent.NIVEAUX_CHOICES]
-                statuts_valides = [c[0] for c in Adherent.STATUT_CHOICES]
-                assurances_valides = [c[0] for c in Adherent.ASSURANCE_CHOICES]
-                
-                # Traitement des données
-                success_count = 0
-                error_count = 0
-                errors = []
-                imported_adherents = []
-                
-                for index, row in df.iterrows():
-                    try:
-                        # Nettoyer les données
-                        nom = str(row['nom']).strip() if pd.notna(row['nom']) else ''
-                        prenom = str(row['prenom']).strip() if pd.notna(row['prenom']) else ''
-                        email = str(row['email']).strip() if pd.notna(row['email']) else ''
-                        numero_licence = str(row['numero_licence']).strip() if pd.notna(row['numero_licence']) else ''
-                        assurance = str(row['assurance']).strip() if pd.notna(row['assurance']) else ''
-                        code_postal = str(row['code_postal']).strip() if pd.notna(row['code_postal']) else ''
-                        ville = str(row['ville']).strip() if pd.notna(row['ville']) else ''
-                        
-                        # Vérifier les champs obligatoires
-                        if not nom or not prenom or not email:
-                            errors.append(f"Ligne {index + 2}: nom, prénom et email sont obligatoires")
-                            error_count += 1
-                            continue
-                        
-                        # Vérifier si l'adhérent existe déjà (email OU nom+prénom)
-                        if Adherent.objects.filter(email=email).exists():
-                            errors.append(f"Ligne {index + 2}: l'email {email} existe déjà")
-                            error_count += 1
-                            continue
-                        
-                        if Adherent.objects.filter(nom=nom, prenom=prenom).exists():
-                            errors.append(f"Ligne {index + 2}: l'adhérent {nom} {prenom} existe déjà")
-                            error_count += 1
-                            continue
-                        
-                        # Validation du format des dates (DD/MM/YYYY uniquement)
-                        date_naissance = None
-                        date_delivrance_caci = None
-                        
-                        # Validation date de naissance
-                        if pd.notna(row['date_naissance']):
-                            date_str = str(row['date_naissance']).strip()
-                            if re.match(r'^\d{2}/\d{2}/\d{4}$', date_str):
-                                try:
-                                    date_naissance = datetime.strptime(date_str, '%d/%m/%Y').date()
-                                except ValueError:
-                                    errors.append(f"Ligne {index + 2}: date de naissance '{date_str}' invalide (format DD/MM/YYYY attendu)")
-                                    error_count += 1
-                                    continue
-                            else:
-                                errors.append(f"Ligne {index + 2}: date de naissance '{date_str}' format incorrect (DD/MM/YYYY attendu)")
-                                error_count += 1
-                                continue
-                        else:
-                            date_naissance = datetime.now().date()
-                        
-                        # Validation date fin validité CACI
-                        if pd.notna(row['date_delivrance_caci']):
-                            date_str = str(row['date_delivrance_caci']).strip()
-                            if re.match(r'^\d{2}/\d{2}/\d{4}$', date_str):
-                                try:
-                                    date_delivrance_caci = datetime.strptime(date_str, '%d/%m/%Y').date()
-                                except ValueError:
-                                    errors.append(f"Ligne {index + 2}: date fin validité CACI '{date_str}' invalide (format DD/MM/YYYY attendu)")
-                                    error_count += 1
-                                    continue
-                            else:
-                                errors.append(f"Ligne {index + 2}: date fin validité CACI '{date_str}' format incorrect (DD/MM/YYYY attendu)")
-                                error_count += 1
-                                continue
-                        else:
-                            date_delivrance_caci = datetime.now().date()
-                        
-                        # Validation du niveau
-                        niveau = str(row['niveau']).strip() if pd.notna(row['niveau']) else 'debutant'
-                        if niveau not in niveaux_valides:
-                            errors.append(f"Ligne {index + 2}: niveau '{niveau}' invalide (valeurs: {', '.join(niveaux_valides)})")
-                            error_count += 1
-                            continue
-                        
-                        # Validation du statut
-                        statut = str(row['statut']).strip() if pd.notna(row['statut']) else 'eleve'
-                        if statut not in statuts_valides:
-                            errors.append(f"Ligne {index + 2}: statut '{statut}' invalide (valeurs: {', '.join(statuts_valides)})")
-                            error_count += 1
-                            continue
-                        
-                        # Validation de l'assurance
-                        if assurance not in assurances_valides:
-                            errors.append(f"Ligne {index + 2}: assurance '{assurance}' invalide (valeurs: {', '.join(assurances_valides)})")
-                            error_count += 1
-                            continue
-                        
-                        # Validation des sections
-                        sections_invalides = []
-                        if 'sections' in df.columns and pd.notna(row['sections']):
-                            sections_str = str(row['sections']).strip()
-                            if sections_str:
-                                section_names = [s.strip() for s in sections_str.split(',')]
-                                for section_name in section_names:
-                                    if not Section.objects.filter(nom=section_name).exists():
-                                        sections_invalides.append(section_name)
-                        
-                        if sections_invalides:
-                            errors.append(f"Ligne {index + 2}: sections inexistantes: {', '.join(sections_invalides)}")
-                            error_count += 1
-                            continue
-                        
-                        # Si toutes les validations passent, créer l'adhérent
-                        adherent = Adherent.objects.create(
-                            nom=nom,
-                            prenom=prenom,
-                            date_naissance=date_naissance,
-                            adresse=str(row['adresse']).strip() if pd.notna(row['adresse']) else '',
-                            code_postal=code_postal,
-                            ville=ville,
-                            email=email,
-                            telephone=str(row['telephone']).strip() if pd.notna(row['telephone']) else '',
-                            numero_licence=numero_licence,
-                            assurance=assurance,
-                            date_delivrance_caci=date_delivrance_caci,
-                            niveau=niveau,
-                            statut=statut,
-                        )
-                        
-                        # Ajouter les sections
-                        if 'sections' in df.columns and pd.notna(row['sections']):
-                            sections_str = str(row['sections']).strip()
-                            if sections_str:
-                                section_names = [s.strip() for s in sections_str.split(',')]
-                                for section_name in section_names:
-                                    try:
-                                        section = Section.objects.get(nom=section_name)
-                                        adherent.sections.add(section)
-                                    except Section.DoesNotExist:
-                                        pass
-                        
-                        success_count += 1
-                        imported_adherents.append(f"{nom} {prenom}")
-                        
-                    except Exception as e:
-                        errors.append(f"Ligne {index + 2}: {str(e)}")
-                        error_count += 1
-                
-                # Stocker les résultats dans la session pour l'affichage
-                request.session['import_results'] = {
-                    'success_count': success_count,
-                    'error_count': error_count,
-                    'errors': errors,
-                    'imported_adherents': imported_adherents
-                }
-                
-                # Messages de résultat
-                if success_count > 0:
-                    messages.success(request, f'{success_count} adhérent(s) importé(s) avec succès')
-                
-                if error_count > 0:
-                    messages.warning(request, f'{error_count} erreur(s) lors de l\'import')
-                
-                return render(request, 'gestion/import_adherents_excel.html')
-                
-            except Exception as e:
-                messages.error(request, f'Erreur lors de la lecture du fichier Excel : {str(e)}')
+                resultats = importer_adherents(excel_file, excel_file.name, simulation=simulation)
+            except ErreurImport as e:
+                messages.error(request, str(e))
                 return render(request, 'gestion/import_adherents_excel.html')
+            
+            # Stocker les résultats dans la session pour l'affichage
+            request.session['import_results'] = resultats
+            
+            # Messages de résultat
+            if resultats['success_count'] > 0:
+                if simulation:
+                    messages.info(request, f"Simulation : {resultats['success_count']} adhérent(s) seraient importé(s), rien n'a été enregistré")
+                else:
+                    messages.success(request, f"{resultats['success_count']} adhérent(s) importé(s) avec succès")
+            
+            if resultats['error_count'] > 0:
+                messages.warning(request, f"{resultats['error_count']} erreur(s) lors de l'import")
+            
+            return render(request, 'gestion/import_adherents_excel.html')
         else:
             messages.error(request, 'Aucun fichier sélectionné')
             return render(request, 'gestion/import_adherents_excel.html')
@@ -1295,11 +1165,12 @@ class CustomLoginView(LoginView):
 
     def get_success_url(self):
         user = self.request.user
+        roles = roles_utilisateur(user)
         # Vérifier d'abord si l'utilisateur est Codir
-        if user.groups.filter(name='codir').exists():
+        if 'codir' in roles:
             return reverse_lazy('dashboard')
         # Vérifier si l'utilisateur est encadrant uniquement (pas Codir)
-        elif user.groups.filter(name='encadrant').exists():
+        elif 'encadrant' in roles:
             return reverse_lazy('eleve_list')
         # Sinon, logique normale pour les élèves
         elif hasattr(user, 'adherent_profile') and getattr(user.adherent_profile, 'statut', None) == 'eleve':
@@ -1385,38 +1256,28 @@ def envoyer_mail_invitation_seance(request, seance_id):
     if not emails:
         messages.error(request, "Aucun email d'adhérent trouvé.")
         return redirect('seance_detail', pk=seance_id)
-    # Prépare le message
-    subject = f"Inscription à la séance du {seance.date.strftime('%d/%m/%Y')} - {seance.lieu.nom}"
-    url = request.build_absolute_uri(f"/inscription/{lien.uuid}/")
-    message_txt = render_to_string('gestion/email_invitation_seance.txt', {'seance': seance, 'lien': lien, 'url': url})
-    message_html = render_to_string('gestion/email_invitation_seance.html', {'seance': seance, 'lien': lien, 'url': url})
-    # Pas d'envoi en copie pour les invitations
-    datatuple = [(subject, adherent, [adherent.email]) for adherent in adherents if adherent.email]
-    from django.core.mail import EmailMultiAlternatives
-    # Liste pour stocker les destinataires qui ont reçu le mail
-    destinataires_envoyes = []
-    for subject, adherent, recipient_list in datatuple:
-        url = request.build_absolute_uri(f"/inscription/{lien.uuid}/")
-        context = {'seance': seance, 'lien': lien, 'url': url, 'adherent': adherent}
-        message_txt = render_to_string('gestion/email_invitation_seance.txt', context)
-        message_html = render_to_string('gestion/email_invitation_seance.html', context)
-        email = EmailMultiAlternatives(subject, message_txt, None, recipient_list)
-        email.attach_alternative(message_html, "text/html")
-        # Attacher l'image de signature en inline
-        signature_img_path = os.path.join(settings.BASE_DIR, 'static', 'Signature_mouss2.png')
-        if os.path.exists(signature_img_path):
-            with open(signature_img_path, 'rb') as img:
-                mime_img = MIMEImage(img.read(), _subtype='png')
-                mime_img.add_header('Content-ID', '<signature_mouss2>')
-                mime_img.add_header('Content-Disposition', 'inline', filename='Signature_mouss2.png')
-                email.attach(mime_img)
-        email.send()
-        # Ajouter le destinataire à la liste
-        destinataires_envoyes.append({
-            'nom': adherent.nom,
-            'prenom': adherent.prenom,
-            'email': adherent.email
-        })
+    # Prépare le message : templates compilés une fois, seul l'adhérent change d'un mail à l'autre
+    # (pas d'envoi en copie pour les invitations)
+    modele = ModeleMail(
+        f"Inscription à la séance du {seance.date.strftime('%d/%m/%Y')} - {seance.lieu.nom}",
+        texte=gabarit_fichier('gestion/email_invitation_seance.txt'),
+        html=gabarit_fichier('gestion/email_invitation_seance.html'),
+        contexte={'seance': seance, 'lien': lien, 'url': request.build_absolute_uri(f"/inscription/{lien.uuid}/")},
+        signature=SIGNATURE,
+    )
+
+    def construire_messages():
+        for adherent in adherents:
+            if adherent.email:
+                yield adherent, modele.message([adherent.email], {'adherent': adherent})
+
+    # Mise en file : la commande traiter_boite_envoi envoie les mails au rythme autorisé par le serveur SMTP
+    mis_en_file = mettre_en_file(construire_messages(), origine='invitation', seance=seance)
+    # Liste des destinataires dont le mail est en file
+    destinataires_envoyes = [
+        {'nom': adherent.nom, 'prenom': adherent.prenom, 'email': adherent.email}
+        for adherent, mail in hors_doublons(request, mis_en_file)
+    ]
     # Stocker la liste des destinataires dans la session pour l'affichage
     request.session['destinataires_invitation_envoyes'] = destinataires_envoyes
     # Stocker aussi dans la session pour l'export Excel (avec la date de la séance)
@@ -1426,18 +1287,14 @@ def envoyer_mail_invitation_seance(request, seance_id):
         'date_seance': seance.date.strftime('%d/%m/%Y'),
         'lieu': str(seance.lieu.nom) if seance.lieu else ''
     }
-    messages.success(request, f"Invitation envoyée à {len(emails)} adhérents.")
+    if destinataires_envoyes:
+        messages.success(request, f"Invitation mise en file d'envoi pour {len(destinataires_envoyes)} adhérents.")
     return redirect('seance_detail', pk=seance_id)
 
 
 @login_required
 def exporter_destinataires_evaluation_excel(request, seance_id):
     """Exporte la liste des destinataires des liens d'évaluation en Excel"""
-    import openpyxl
-    from openpyxl.utils import get_column_letter
-    from openpyxl.styles import Alignment, Font, PatternFill
-    from django.http import HttpResponse
-    
     seance = get_object_or_404(Seance, pk=seance_id)
     detail_route_name = _detail_route_name_for_seance(seance)
     
@@ -1453,65 +1310,19 @@ def exporter_destinataires_evaluation_excel(request, seance_id):
         messages.error(request, "Aucun destinataire à exporter.")
         return redirect(detail_route_name, pk=seance_id)
     
-    # Création du workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'Destinataires liens évaluation'
-    
-    # En-tête avec informations de la séance
-    ws.append(['Séance du ' + export_data.get('date_seance', ''), ''])
-    ws.append(['Lieu : ' + export_data.get('lieu', ''), ''])
-    ws.append([''])  # Ligne vide
-    
-    # En-têtes du tableau
-    headers = ['Nom', 'Prénom', 'Email', 'Palanquée']
-    ws.append(headers)
-    
-    # Style pour les en-têtes
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-    
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=4, column=col_num)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-    
-    # Données
-    for dest in destinataires:
-        ws.append([
-            dest.get('nom', '').upper(),
-            dest.get('prenom', '').capitalize(),
-            dest.get('email', ''),
-            dest.get('palanquee', '')
-        ])
-    
-    # Ajuster la largeur des colonnes
-    ws.column_dimensions[get_column_letter(1)].width = 25  # Nom
-    ws.column_dimensions[get_column_letter(2)].width = 25  # Prénom
-    ws.column_dimensions[get_column_letter(3)].width = 35  # Email
-    ws.column_dimensions[get_column_letter(4)].width = 30  # Palanquée
-    
-    # Réponse HTTP
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
     date_str = export_data.get('date_seance', '').replace('/', '-')
-    filename = f"destinataires_evaluation_{date_str}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    wb.save(response)
-    return response
+    return export_destinataires(
+        'Destinataires liens évaluation',
+        ['Séance du ' + export_data.get('date_seance', ''), 'Lieu : ' + export_data.get('lieu', '')],
+        [('Nom', 'nom', 25), ('Prénom', 'prenom', 25), ('Email', 'email', 35), ('Palanquée', 'palanquee', 30)],
+        destinataires,
+        f"destinataires_evaluation_{date_str}.xlsx",
+    )
 
 
 @login_required
 def exporter_destinataires_pdf_excel(request, seance_id):
     """Exporte la liste des destinataires des PDF palanquées en Excel"""
-    import openpyxl
-    from openpyxl.utils import get_column_letter
-    from openpyxl.styles import Alignment, Font, PatternFill
-    from django.http import HttpResponse
-
     seance = get_object_or_404(Seance, pk=seance_id)
     detail_route_name = _detail_route_name_for_seance(seance)
 
@@ -1526,58 +1337,19 @@ def exporter_destinataires_pdf_excel(request, seance_id):
         messages.error(request, "Aucun destinataire à exporter.")
         return redirect(detail_route_name, pk=seance_id)
 
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'Destinataires PDF palanquées'
-
-    ws.append(['Séance du ' + export_data.get('date_seance', ''), ''])
-    ws.append(['Lieu : ' + export_data.get('lieu', ''), ''])
-    ws.append([''])
-
-    headers = ['Nom', 'Prénom', 'Email', 'Palanquée']
-    ws.append(headers)
-
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=4, column=col_num)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-
-    for dest in destinataires:
-        ws.append([
-            dest.get('nom', '').upper(),
-            dest.get('prenom', '').capitalize(),
-            dest.get('email', ''),
-            dest.get('palanquee', '')
-        ])
-
-    ws.column_dimensions[get_column_letter(1)].width = 25
-    ws.column_dimensions[get_column_letter(2)].width = 25
-    ws.column_dimensions[get_column_letter(3)].width = 35
-    ws.column_dimensions[get_column_letter(4)].width = 30
-
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
     date_str = export_data.get('date_seance', '').replace('/', '-')
-    filename = f"destinataires_pdf_palanquees_{date_str}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-    wb.save(response)
-    return response
+    return export_destinataires(
+        'Destinataires PDF palanquées',
+        ['Séance du ' + export_data.get('date_seance', ''), 'Lieu : ' + export_data.get('lieu', '')],
+        [('Nom', 'nom', 25), ('Prénom', 'prenom', 25), ('Email', 'email', 35), ('Palanquée', 'palanquee', 30)],
+        destinataires,
+        f"destinataires_pdf_palanquees_{date_str}.xlsx",
+    )
 
 
 @login_required
 def exporter_destinataires_invitation_excel(request, seance_id):
     """Exporte la liste des destinataires de l'invitation en Excel"""
-    import openpyxl
-    from openpyxl.utils import get_column_letter
-    from openpyxl.styles import Alignment, Font, PatternFill
-    from django.http import HttpResponse
-    
     seance = get_object_or_404(Seance, pk=seance_id)
     
     # Récupérer les destinataires depuis la session
@@ -1592,62 +1364,18 @@ def exporter_destinataires_invitation_excel(request, seance_id):
         messages.error(request, "Aucun destinataire à exporter.")
         return redirect('seance_detail', pk=seance_id)
     
-    # Création du workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'Destinataires invitation'
-    
-    # En-tête avec informations de la séance
-    ws.append(['Séance du ' + export_data.get('date_seance', ''), ''])
-    ws.append(['Lieu : ' + export_data.get('lieu', ''), ''])
-    ws.append([''])  # Ligne vide
-    
-    # En-têtes du tableau
-    headers = ['Nom', 'Prénom', 'Email']
-    ws.append(headers)
-    
-    # Style pour les en-têtes
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-    
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=4, column=col_num)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-    
-    # Données
-    for dest in destinataires:
-        ws.append([
-            dest.get('nom', '').upper(),
-            dest.get('prenom', '').capitalize(),
-            dest.get('email', '')
-        ])
-    
-    # Ajuster la largeur des colonnes
-    ws.column_dimensions[get_column_letter(1)].width = 25  # Nom
-    ws.column_dimensions[get_column_letter(2)].width = 25  # Prénom
-    ws.column_dimensions[get_column_letter(3)].width = 35  # Email
-    
-    # Réponse HTTP
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
     date_str = export_data.get('date_seance', '').replace('/', '-')
-    filename = f"destinataires_invitation_{date_str}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    wb.save(response)
-    return response
+    return export_destinataires(
+        'Destinataires invitation',
+        ['Séance du ' + export_data.get('date_seance', ''), 'Lieu : ' + export_data.get('lieu', '')],
+        [('Nom', 'nom', 25), ('Prénom', 'prenom', 25), ('Email', 'email', 35)],
+        destinataires,
+        f"destinataires_invitation_{date_str}.xlsx",
+    )
 
 @login_required
 def exporter_destinataires_communication_excel(request, seance_id):
     """Exporte la liste des destinataires de la communication en Excel"""
-    import openpyxl
-    from openpyxl.utils import get_column_letter
-    from openpyxl.styles import Alignment, Font, PatternFill
-    from django.http import HttpResponse
-    
     seance = get_object_or_404(Seance, pk=seance_id)
     
     # Récupérer les destinataires depuis la session
@@ -1662,63 +1390,22 @@ def exporter_destinataires_communication_excel(request, seance_id):
         messages.error(request, "Aucun destinataire à exporter.")
         return redirect('seance_communiquer', pk=seance_id)
     
-    # Création du workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'Destinataires communication'
-    
-    # En-tête avec informations de la séance
-    ws.append(['Séance du ' + export_data.get('date_seance', ''), ''])
-    ws.append(['Lieu : ' + export_data.get('lieu', ''), ''])
-    ws.append(['Objet : ' + export_data.get('objet', ''), ''])
-    ws.append([''])  # Ligne vide
-    
-    # En-têtes du tableau
-    headers = ['Nom', 'Prénom', 'Email']
-    ws.append(headers)
-    
-    # Style pour les en-têtes
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-    
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=5, column=col_num)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-    
-    # Données
-    for dest in destinataires:
-        ws.append([
-            dest.get('nom', '').upper(),
-            dest.get('prenom', '').capitalize(),
-            dest.get('email', '')
-        ])
-    
-    # Ajuster la largeur des colonnes
-    ws.column_dimensions[get_column_letter(1)].width = 25  # Nom
-    ws.column_dimensions[get_column_letter(2)].width = 25  # Prénom
-    ws.column_dimensions[get_column_letter(3)].width = 35  # Email
-    
-    # Réponse HTTP
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
     date_str = export_data.get('date_seance', '').replace('/', '-')
-    filename = f"destinataires_communication_{date_str}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    wb.save(response)
-    return response
+    return export_destinataires(
+        'Destinataires communication',
+        [
+            'Séance du ' + export_data.get('date_seance', ''),
+            'Lieu : ' + export_data.get('lieu', ''),
+            'Objet : ' + export_data.get('objet', ''),
+        ],
+        [('Nom', 'nom', 25), ('Prénom', 'prenom', 25), ('Email', 'email', 35)],
+        destinataires,
+        f"destinataires_communication_{date_str}.xlsx",
+    )
 
 @login_required
 def exporter_destinataires_adherents_excel(request):
     """Exporte la liste des destinataires de la communication avec les adhérents en Excel"""
-    import openpyxl
-    from openpyxl.utils import get_column_letter
-    from openpyxl.styles import Alignment, Font, PatternFill
-    from django.http import HttpResponse
-    
     # Récupérer les destinataires depuis la session
     if 'destinataires_adherents_export' not in request.session:
         messages.error(request, "Aucune liste de destinataires disponible pour l'export.")
@@ -1731,62 +1418,19 @@ def exporter_destinataires_adherents_excel(request):
         messages.error(request, "Aucun destinataire à exporter.")
         return redirect('adherents_communiquer')
     
-    # Création du workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'Destinataires communication'
-    
-    # En-tête avec informations
-    ws.append(['Objet : ' + export_data.get('objet', ''), ''])
-    ws.append([''])  # Ligne vide
-    
-    # En-têtes du tableau
-    headers = ['Nom', 'Prénom', 'Email']
-    ws.append(headers)
-    
-    # Style pour les en-têtes
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-    
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=3, column=col_num)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-    
-    # Données
-    for dest in destinataires:
-        ws.append([
-            dest.get('nom', '').upper(),
-            dest.get('prenom', '').capitalize(),
-            dest.get('email', '')
-        ])
-    
-    # Ajuster la largeur des colonnes
-    ws.column_dimensions[get_column_letter(1)].width = 25  # Nom
-    ws.column_dimensions[get_column_letter(2)].width = 25  # Prénom
-    ws.column_dimensions[get_column_letter(3)].width = 35  # Email
-    
-    # Réponse HTTP
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
     from datetime import datetime
     date_str = datetime.now().strftime('%Y-%m-%d')
-    filename = f"destinataires_adherents_{date_str}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    wb.save(response)
-    return response
+    return export_destinataires(
+        'Destinataires communication',
+        ['Objet : ' + export_data.get('objet', '')],
+        [('Nom', 'nom', 25), ('Prénom', 'prenom', 25), ('Email', 'email', 35)],
+        destinataires,
+        f"destinataires_adherents_{date_str}.xlsx",
+    )
 
 @login_required
 def exporter_destinataires_covoiturage_excel(request, seance_id):
     """Exporte la liste des destinataires du mail de covoiturage en Excel"""
-    import openpyxl
-    from openpyxl.utils import get_column_letter
-    from openpyxl.styles import Alignment, Font, PatternFill
-    from django.http import HttpResponse
-    
     seance = get_object_or_404(Seance, pk=seance_id)
     
     # Récupérer les destinataires depuis la session
@@ -1801,55 +1445,14 @@ def exporter_destinataires_covoiturage_excel(request, seance_id):
         messages.error(request, "Aucun destinataire à exporter.")
         return redirect('seance_detail', pk=seance_id)
     
-    # Création du workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'Destinataires covoiturage'
-    
-    # En-tête avec informations de la séance
-    ws.append(['Séance du ' + export_data.get('date_seance', ''), ''])
-    ws.append(['Lieu : ' + export_data.get('lieu', ''), ''])
-    ws.append([''])  # Ligne vide
-    
-    # En-têtes du tableau
-    headers = ['Nom', 'Prénom', 'Email', 'Rôle']
-    ws.append(headers)
-    
-    # Style pour les en-têtes
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-    
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=4, column=col_num)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-    
-    # Données
-    for dest in destinataires:
-        ws.append([
-            dest.get('nom', '').upper(),
-            dest.get('prenom', '').capitalize(),
-            dest.get('email', ''),
-            dest.get('role', '')
-        ])
-    
-    # Ajuster la largeur des colonnes
-    ws.column_dimensions[get_column_letter(1)].width = 25  # Nom
-    ws.column_dimensions[get_column_letter(2)].width = 25  # Prénom
-    ws.column_dimensions[get_column_letter(3)].width = 35  # Email
-    ws.column_dimensions[get_column_letter(4)].width = 15  # Rôle
-    
-    # Réponse HTTP
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
     date_str = export_data.get('date_seance', '').replace('/', '-')
-    filename = f"destinataires_covoiturage_{date_str}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    wb.save(response)
-    return response
+    return export_destinataires(
+        'Destinataires covoiturage',
+        ['Séance du ' + export_data.get('date_seance', ''), 'Lieu : ' + export_data.get('lieu', '')],
+        [('Nom', 'nom', 25), ('Prénom', 'prenom', 25), ('Email', 'email', 35), ('Rôle', 'role', 15)],
+        destinataires,
+        f"destinataires_covoiturage_{date_str}.xlsx",
+    )
 
 def inscription_seance_uuid(request, uuid):
     lien = get_object_or_404(LienInscriptionSeance, uuid=uuid)
@@ -1858,6 +1461,15 @@ def inscription_seance_uuid(request, uuid):
         return render(request, 'gestion/inscription_expiree.html', {'seance': lien.seance})
     return render(request, 'gestion/inscription_seance.html', {'seance': lien.seance, 'lien': lien})
 
+def _mail_confirmation_inscription(request, lien, personne):
+    seance = lien.seance
+    modele = ModeleMail(
+        f"Confirmation d'inscription à la séance du {seance.date.strftime('%d/%m/%Y')}",
+        texte=gabarit_fichier('gestion/email_confirmation_inscription.txt'),
+    )
+    url = request.build_absolute_uri(f"/inscription/{lien.uuid}/")
+    return modele.message([personne.email], {'seance': seance, 'personne': personne, 'url': url})
+
 @csrf_exempt
 @require_POST
 def api_inscrire_membre_app(request):
@@ -1884,13 +1496,8 @@ def api_inscrire_membre_app(request):
             inscription.save()
         # Envoi mail confirmation
         if membre.email:
-            subject = f"Confirmation d'inscription à la séance du {seance.date.strftime('%d/%m/%Y')}"
-            url = request.build_absolute_uri(f"/inscription/{lien.uuid}/")
-            message = render_to_string('gestion/email_confirmation_inscription.txt', {'seance': seance, 'personne': membre, 'url': url})
-            cc_emails = getattr(settings, 'EMAIL_CC_DEFAULT', [])
-            from django.core.mail import EmailMessage
-            email = EmailMessage(subject, message, None, [membre.email])#
-            email.send(fail_silently=True)
+            with section('smtp'):
+                _mail_confirmation_inscription(request, lien, membre).send(fail_silently=True)
         return JsonResponse({'success': True, 'message': 'Inscription réussie ! Un email de confirmation vous a été envoyé.'})
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)})
@@ -1942,14 +1549,9 @@ def api_inscrire_non_membre(request):
             debug_msgs.append("Inscription mise à jour")
         # Envoi mail confirmation
         if personne.email:
-            subject = f"Confirmation d'inscription à la séance du {seance.date.strftime('%d/%m/%Y')}"
-            url = request.build_absolute_uri(f"/inscription/{lien.uuid}/")
-            message = render_to_string('gestion/email_confirmation_inscription.txt', {'seance': seance, 'personne': personne, 'url': url})
-            cc_emails = getattr(settings, 'EMAIL_CC_DEFAULT', [])
-            from django.core.mail import EmailMessage
             try:
-                email = EmailMessage(subject, message, None, [personne.email])#, cc=cc_emails
-                email.send(fail_silently=True)
+                with section('smtp'):
+                    _mail_confirmation_inscription(request, lien, personne).send(fail_silently=True)
                 debug_msgs.append("Mail envoyé")
             except Exception as mail_e:
                 debug_msgs.append(f"Erreur envoi mail: {str(mail_e)}")
@@ -1973,72 +1575,50 @@ def supprimer_inscription_seance(request, inscription_id):
 
 @login_required
 def exporter_inscrits_seance(request, seance_id):
-    import openpyxl
-    from openpyxl.utils import get_column_letter
-    from openpyxl.styles import Alignment
     seance = get_object_or_404(Seance, pk=seance_id)
-    inscrits = seance.inscriptions.select_related('personne').all()
+    inscriptions = seance.inscriptions.select_related('personne')
     # Sépare encadrants et autres
-    encadrants = [i.personne for i in inscrits if i.personne.statut == 'encadrant']
-    eleves = [i.personne for i in inscrits if i.personne.statut != 'encadrant']
-    # Création du workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'Inscrits séance'
+    encadrants = [i.personne for i in inscriptions.filter(personne__statut='encadrant')]
+    eleves = (
+        i.personne for i in parcourir(
+            inscriptions.exclude(personne__statut='encadrant').prefetch_related('personne__sections')
+        )
+    )
+    classeur = ClasseurExcel()
+    feuille = classeur.feuille('Inscrits séance', [18] * (4 + len(encadrants)))
     # Ligne 1 : Date
-    ws.append([f"Date : {seance.date.strftime('%d/%m/%Y')}"])
-    # Ligne 2 : Encadrants
-    row2 = [None, None, None, 'Encadrant']
-    for enc in encadrants:
-        row2.append(f"{enc.nom} {enc.prenom}")
-    ws.append(row2)
+    feuille.ligne([f"Date : {seance.date.strftime('%d/%m/%Y')}"])
+    # Ligne 2 : Encadrants (texte vertical)
+    feuille.ligne(
+        [None, None, None, 'Encadrant'] + [f"{enc.nom} {enc.prenom}" for enc in encadrants],
+        styles={idx: 'vertical' for idx in range(4, 4 + len(encadrants))},
+    )
     # Ligne 3 : En-têtes
-    headers = ['Nom Prénom', 'Niveau', 'Section', 'Profondeur max']
-    headers += ['' for _ in encadrants]
-    ws.append(headers)
+    feuille.ligne(['Nom Prénom', 'Niveau', 'Section', 'Profondeur max'] + ['' for _ in encadrants])
     # Lignes suivantes : inscrits
     for eleve in eleves:
         nom_prenom = f"{eleve.nom} {eleve.prenom}"
         niveau = eleve.get_niveau_display() if hasattr(eleve, 'get_niveau_display') else ''
         sections = ', '.join([s.get_nom_display() for s in eleve.sections.all()])
-        row = [nom_prenom, niveau, sections, '']
-        row += ['' for _ in encadrants]
-        ws.append(row)
-    # Mise en forme : texte vertical pour les encadrants
-    for idx, enc in enumerate(encadrants, start=5):
-        cell = ws.cell(row=2, column=idx)
-        cell.alignment = Alignment(text_rotation=90, vertical='bottom', horizontal='center')
-    # Largeur des colonnes
-    for i, col in enumerate(ws.columns, 1):
-        ws.column_dimensions[get_column_letter(i)].width = 18
-    # Export
-    from django.http import HttpResponse
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="inscrits_seance_{seance.id}.xlsx"'
-    wb.save(response)
-    return response
+        feuille.ligne([nom_prenom, niveau, sections, ''] + ['' for _ in encadrants])
+    return classeur.reponse(f"inscrits_seance_{seance.id}.xlsx")
 
 @login_required
 def exporter_covoiturage_seance(request, seance_id):
-    import pandas as pd
     seance = get_object_or_404(Seance, pk=seance_id)
-    inscrits = seance.inscriptions.select_related('personne').all()
-    data = []
-    for ins in inscrits:
-        data.append({
-            'Nom': ins.personne.nom,
-            'Prénom': ins.personne.prenom,
-            'Type': 'Adhérent' if ins.personne.type_personne == 'adherent' else 'Non adhérent',
-            'Covoiturage': dict(ins.COVOITURAGE_CHOICES).get(ins.covoiturage, ''),
-            'Lieu de prise en charge': ins.lieu_covoiturage or '',
-        })
-    df = pd.DataFrame(data)
-    from django.http import HttpResponse
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="covoiturage_seance_{seance.id}.xlsx"'
-    with pd.ExcelWriter(response, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False)
-    return response
+    inscrits = seance.inscriptions.select_related('personne')
+    classeur = ClasseurExcel()
+    feuille = classeur.feuille('Sheet1')
+    feuille.ligne(['Nom', 'Prénom', 'Type', 'Covoiturage', 'Lieu de prise en charge'], style='entete_colonne')
+    for ins in parcourir(inscrits):
+        feuille.ligne([
+            ins.personne.nom,
+            ins.personne.prenom,
+            'Adhérent' if ins.personne.type_personne == 'adherent' else 'Non adhérent',
+            dict(ins.COVOITURAGE_CHOICES).get(ins.covoiturage, ''),
+            ins.lieu_covoiturage or '',
+        ])
+    return classeur.reponse(f"covoiturage_seance_{seance.id}.xlsx")
 
 @method_decorator(csrf_protect, name='dispatch')
 class AdherentPublicCreateView(CreateView):
@@ -2287,7 +1867,8 @@ def import_exercices_evaluation_excel(request):
                 if not default_available:
                     messages.error(request, "Le fichier Programme.xlsx est introuvable à la racine du projet.")
                     return redirect('import_exercices_evaluation_excel')
-                wb = openpyxl.load_workbook(programme_path, read_only=True, data_only=True)
+                with section('openpyxl'):
+                    wb = openpyxl.load_workbook(programme_path, read_only=True, data_only=True)
             else:
                 excel_file = request.FILES.get('excel_file')
                 if not excel_file:
@@ -2296,9 +1877,11 @@ def import_exercices_evaluation_excel(request):
                 if not excel_file.name.endswith(('.xlsx', '.xls')):
                     messages.error(request, "Veuillez sélectionner un fichier Excel (.xlsx ou .xls).")
                     return redirect('import_exercices_evaluation_excel')
-                wb = openpyxl.load_workbook(excel_file, read_only=True, data_only=True)
+                with section('openpyxl'):
+                    wb = openpyxl.load_workbook(excel_file, read_only=True, data_only=True)
 
-            stats = _import_exercices_evaluation_from_workbook(wb)
+            with section('openpyxl'):
+                stats = _import_exercices_evaluation_from_workbook(wb)
             wb.close()
 
             if stats['created']:
@@ -2359,9 +1942,6 @@ def import_exercices_evaluation_excel(request):
 
 @login_required
 def export_adherents_excel(request):
-    import pandas as pd
-    from django.http import HttpResponse
-
     # Récupération des 3 groupes
     adherents = Adherent.objects.filter(type_personne='adherent').order_by('nom', 'prenom')
     non_adh_actifs = Adherent.objects.filter(type_personne='non_adherent', actif=True).order_by('nom', 'prenom')
@@ -2373,40 +1953,34 @@ def export_adherents_excel(request):
         'Numéro de licence', 'Assurance', 'Date délivrance CACI', 'Niveau', 'Statut', 'Section', 'Date de naissance'
     ]
 
-    def adherent_to_dict(a):
-        return {
-            'Nom': a.nom.upper(),
-            'Prénom': a.prenom.capitalize(),
-            'Email': a.email,
-            'Téléphone': a.telephone,
-            'Adresse': a.adresse,
-            'Code postal': a.code_postal,
-            'Ville': a.ville,
-            'Numéro de licence': a.numero_licence,
-            'Assurance': a.assurance,
-            'Date délivrance CACI': a.date_delivrance_caci,
-            'Niveau': a.get_niveau_display() if hasattr(a, 'get_niveau_display') else a.niveau,
-            'Statut': a.get_statut_display() if hasattr(a, 'get_statut_display') else a.statut,
-            'Section': ', '.join([s.get_nom_display() for s in a.sections.all()]),
-            'Date de naissance': a.date_naissance,
-        }
-
-    # Création des DataFrames
-    data_adh = [adherent_to_dict(a) for a in adherents]
-    data_non_adh_actifs = [adherent_to_dict(a) for a in non_adh_actifs]
-    data_non_adh_inactifs = [adherent_to_dict(a) for a in non_adh_inactifs]
+    def ligne_adherent(a):
+        return [
+            a.nom.upper(),
+            a.prenom.capitalize(),
+            a.email,
+            a.telephone,
+            a.adresse,
+            a.code_postal,
+            a.ville,
+            a.numero_licence,
+            a.assurance,
+            a.date_delivrance_caci,
+            a.get_niveau_display() if hasattr(a, 'get_niveau_display') else a.niveau,
+            a.get_statut_display() if hasattr(a, 'get_statut_display') else a.statut,
+            ', '.join([s.get_nom_display() for s in a.sections.all()]),
+            a.date_naissance,
+        ]
 
-    df_adh = pd.DataFrame(data_adh, columns=colonnes)
-    df_non_adh_actifs = pd.DataFrame(data_non_adh_actifs, columns=colonnes)
-    df_non_adh_inactifs = pd.DataFrame(data_non_adh_inactifs, columns=colonnes)
-
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="adherents.xlsx"'
-    with pd.ExcelWriter(response, engine='openpyxl') as writer:
-        df_adh.to_excel(writer, sheet_name='Adhérents', index=False)
-        df_non_adh_actifs.to_excel(writer, sheet_name='Non adhérents actifs', index=False)
-        df_non_adh_inactifs.to_excel(writer, sheet_name='Non adhérents désactivés', index=False)
-    return response
+    classeur = ClasseurExcel()
+    for titre, queryset in [
+        ('Adhérents', adherents),
+        ('Non adhérents actifs', non_adh_actifs),
+        ('Non adhérents désactivés', non_adh_inactifs),
+    ]:
+        feuille = classeur.feuille(titre)
+        feuille.ligne(colonnes, style='entete_colonne')
+        feuille.lignes(ligne_adherent(a) for a in parcourir(queryset.prefetch_related('sections')))
+    return classeur.reponse('adherents.xlsx')
 
 @login_required
 def importer_palanquees_seance(request, seance_id):
@@ -2415,7 +1989,8 @@ def importer_palanquees_seance(request, seance_id):
     if request.method == 'POST' and request.FILES.get('fichier_palanquees'):
         fichier = request.FILES['fichier_palanquees']
         try:
-            wb = openpyxl.load_workbook(fichier)
+            with section('openpyxl'):
+                wb = openpyxl.load_workbook(fichier)
             ws = wb.active
             # Suppression des palanquées existantes
             seance.palanques.all().delete()
@@ -2799,462 +2374,55 @@ def generer_fiche_securite(request, seance_id):
         p.line(2*cm, y, width-2*cm, y)
         y -= 0.5*cm
     p.showPage()
-    p.save()
+    with section('reportlab'):
+        p.save()
     buffer.seek(0)
     return HttpResponse(buffer, content_type='application/pdf')
 
 @login_required
 def generer_fiche_securite_excel(request, seance_id):
-    import openpyxl
-    from pathlib import Path
-    from io import BytesIO
-
-    def _niveau_court(adherent):
-        mapping = {
-            'debutant': 'DEB',
-            'niveau1': 'N1',
-            'niveau2': 'N2',
-            'niveau3': 'N3',
-            'initiateur1': 'E1',
-            'initiateur2': 'E2',
-            'moniteur_federal1': 'E3',
-            'moniteur_federal2': 'E4',
-        }
-        return mapping.get(getattr(adherent, 'niveau', None), '-')
-
-    def _safe_unmerge_cells(ws, range_string):
-        """Dé-fusionne une plage en créant les cellules manquantes (contournement KeyError openpyxl)."""
-        from openpyxl.utils import range_boundaries
-
-        min_col, min_row, max_col, max_row = range_boundaries(range_string)
-        for row in range(min_row, max_row + 1):
-            for col in range(min_col, max_col + 1):
-                if (row, col) not in ws._cells:
-                    ws.cell(row=row, column=col)
-        ws.unmerge_cells(range_string)
-
-    def _restructure_plongee_header(ws):
-        """Fusionne PLONGEE n°1/n°2 en « PLONGEE n° » + cellule numéro à côté (BE)."""
-        from openpyxl.styles import Alignment
-
-        to_unmerge = []
-        for merged_range in list(ws.merged_cells.ranges):
-            if merged_range.min_col >= 57 and merged_range.max_row <= 4:
-                to_unmerge.append(str(merged_range))
-        for ref in to_unmerge:
-            _safe_unmerge_cells(ws, ref)
-        ws.merge_cells('BE1:BF4')
-        ws.merge_cells('BG1:BK4')
-        ws['BG1'] = 'PLONGEE n°'
-        ws['BE1'] = ''
-        for cell_ref in ('BG1', 'BE1'):
-            ws[cell_ref].alignment = Alignment(horizontal='center', vertical='center')
-
-    def _set_aptitude_moniteurs_title(ws, row):
-        """Titre fusionné B:P sur la ligne des aptitudes moniteurs."""
-        from copy import copy
-        from openpyxl.styles import Alignment, Border
-
-        col_b, col_p = 2, 16
-        to_unmerge = []
-        for merged_range in list(ws.merged_cells.ranges):
-            if (
-                merged_range.min_row == row
-                and merged_range.max_row == row
-                and merged_range.min_col >= col_b
-                and merged_range.max_col <= col_p
-            ):
-                to_unmerge.append(str(merged_range))
-        for ref in to_unmerge:
-            _safe_unmerge_cells(ws, ref)
-        ws.merge_cells(f'B{row}:P{row}')
-
-        # Même fond que l'en-tête « Nom » (ligne 15), bordures gauche/droite comme la ligne élève suivante.
-        header_fill = copy(ws['D15'].fill)
-        ref_row_below = row + 1
-        left_side = copy(ws.cell(ref_row_below, col_b).border.left)
-        right_side = copy(ws.cell(ref_row_below, col_p).border.right)
-        for col in range(col_b, col_p + 1):
-            cell = ws.cell(row=row, column=col)
-            cell.fill = copy(header_fill)
-            cell.border = Border(
-                left=left_side if col == col_b else None,
-                right=right_side if col == col_p else None,
-            )
-
-        title_cell = ws[f'B{row}']
-        title_cell.value = 'Aptitude moniteurs'
-        title_cell.alignment = Alignment(horizontal='center', vertical='center')
-
-    def _apply_row_borders_from_below(ws, row, col_min, col_max):
-        """Reproduit les bordures de la ligne suivante (ex. colonnes R → fin palanquées)."""
-        from copy import copy
-        from openpyxl.styles import Border
-
-        ref_row = row + 1
-        for col in range(col_min, col_max + 1):
-            ref_border = ws.cell(ref_row, col).border
-            ws.cell(row, col).border = Border(
-                left=copy(ref_border.left) if ref_border.left else None,
-                right=copy(ref_border.right) if ref_border.right else None,
-                top=copy(ref_border.top) if ref_border.top else None,
-                bottom=copy(ref_border.bottom) if ref_border.bottom else None,
-            )
-
-    def _unmerge_cells_on_row(ws, row, col_min, col_max):
-        """Dé-fusionne les plages qui chevauchent une ligne et une bande de colonnes."""
-        to_unmerge = []
-        for merged_range in list(ws.merged_cells.ranges):
-            if (
-                merged_range.min_row <= row <= merged_range.max_row
-                and merged_range.min_col <= col_max
-                and merged_range.max_col >= col_min
-            ):
-                to_unmerge.append(str(merged_range))
-        for ref in to_unmerge:
-            _safe_unmerge_cells(ws, ref)
-
-    def _row_has_eleve_merges(ws, row):
-        for merged_range in ws.merged_cells.ranges:
-            if (
-                merged_range.min_row == row
-                and merged_range.max_row == row
-                and merged_range.min_col == 2
-                and merged_range.max_col == 3
-            ):
-                return True
-        return False
-
-    def _apply_ligne_eleve_merges(ws, row, col_starts_palanquees):
-        """
-        Réapplique les fusions d'une ligne élève (B:C, O:P, R:T, palanquées par 3 colonnes).
-        Nécessaire pour la dernière ligne après insert_rows, qui perd ses fusions avec openpyxl.
-        """
-        from openpyxl.utils import column_index_from_string, get_column_letter
-
-        _unmerge_cells_on_row(ws, row, 2, 62)
-        for start_col, end_col in (('B', 'C'), ('O', 'P'), ('R', 'T')):
-            ws.merge_cells(f'{start_col}{row}:{end_col}{row}')
-        for col_start in col_starts_palanquees:
-            end_col = get_column_letter(column_index_from_string(col_start) + 2)
-            ws.merge_cells(f'{col_start}{row}:{end_col}{row}')
-
-    def _copy_row_styles_from_reference(ws, row, ref_row, col_min, col_max):
-        """Copie bordures et fond depuis une ligne de référence (ligne au-dessus)."""
-        from copy import copy
-
-        for col in range(col_min, col_max + 1):
-            ref_cell = ws.cell(ref_row, col)
-            cell = ws.cell(row, col)
-            if ref_cell.has_style:
-                cell.border = copy(ref_cell.border)
-                cell.fill = copy(ref_cell.fill)
-
-    def _generate_sortie_security_sheet(seance):
-        """
-        Génère la fiche sécurité 'sortie' à partir du modèle ESTARTIT.
-        Grille: colonnes = palanquées/moniteurs, lignes = élèves, X = appartenance.
-        """
-        palanquees = list(
-            seance.palanques.select_related('encadrant').prefetch_related('eleves', 'palanqueeeleve_set__eleve')
-        )
-
-        # Localiser le modèle (gère l'espace insécable dans le nom de fichier).
-        model_candidates = sorted(Path('.').glob('ESTARTIT*securite.xlsx'))
-        if not model_candidates:
-            raise FileNotFoundError("Modèle ESTARTIT introuvable (ESTARTIT*securite.xlsx).")
-        wb = openpyxl.load_workbook(model_candidates[0])
-        ws = wb.active
-
-        _restructure_plongee_header(ws)
-        # Ligne 16 réservée aux aptitudes moniteurs (E1, E2, …) ; élèves décalés d'une ligne.
-        ws.insert_rows(16)
-
-        # En-tête
-        ws['I1'] = seance.date.strftime('%d/%m/%Y')
-        ws['I3'] = seance.directeur_plongee.nom_complet if seance.directeur_plongee else '-'
-        if seance.lieu:
-            site_label = f"SITE : {seance.lieu.nom}"
-            if seance.lieu.ville:
-                site_label = f"{site_label} - {seance.lieu.ville}"
-            ws['V3'] = site_label
-        else:
-            ws['V3'] = "SITE :"
-
-        # Colonnes palanquées (14 max dans le modèle, 3 colonnes fusionnées par palanquée).
-        col_starts = ['U', 'X', 'AA', 'AD', 'AG', 'AJ', 'AM', 'AP', 'AS', 'AV', 'AY', 'BB', 'BE', 'BH']
-        max_palanquees = len(col_starts)
-        palanquees_export = palanquees[:max_palanquees]
-
-        # Nettoyage entête colonnes.
-        from openpyxl.styles import Alignment
-        row_aptitudes_moniteurs = 16
-
-        for col in col_starts:
-            ws[f'{col}14'] = ''
-            ws[f'{col}15'] = ''
-            ws[f'{col}{row_aptitudes_moniteurs}'] = ''
-            ws[f'{col}6'] = ''
-            ws[f'{col}7'] = ''
-
-        for idx, palanquee in enumerate(palanquees_export):
-            col = col_starts[idx]
-            encadrant_label = (
-                f"{palanquee.encadrant.nom} {palanquee.encadrant.prenom}"
-                if palanquee.encadrant
-                else 'AUTONOMES'
-            )
-            ws[f'{col}14'] = ''
-            ws[f'{col}15'] = encadrant_label
-            ws[f'{col}15'].alignment = Alignment(
-                text_rotation=90,
-                horizontal='center',
-                vertical='center',
-                wrap_text=True,
-            )
-            if palanquee.encadrant:
-                ws[f'{col}{row_aptitudes_moniteurs}'] = _niveau_court(palanquee.encadrant)
-            else:
-                ws[f'{col}{row_aptitudes_moniteurs}'] = ''
-            ws[f'{col}{row_aptitudes_moniteurs}'].alignment = Alignment(
-                horizontal='center',
-                vertical='center',
-            )
-            ws[f'{col}6'] = palanquee.profondeur_max if palanquee.profondeur_max is not None else ''
-            ws[f'{col}7'] = palanquee.duree if palanquee.duree is not None else ''
-
-        _set_aptitude_moniteurs_title(ws, row_aptitudes_moniteurs)
-
-        # Bordures colonnes R → fin des palanquées (R16:T16, U16:W16, …), comme les lignes élèves.
-        from openpyxl.utils import column_index_from_string
-        col_r = column_index_from_string('R')
-        col_last_palanquee = column_index_from_string(col_starts[-1]) + 2
-        _apply_row_borders_from_below(ws, row_aptitudes_moniteurs, col_r, col_last_palanquee)
-
-        # Augmenter la hauteur de la ligne des noms moniteurs pour améliorer la lisibilité verticale.
-        ws.row_dimensions[15].height = 85
-
-        # Élèves en lignes (même logique que l'écran de création des palanquées).
-        inscriptions = seance.inscriptions.select_related('personne').all()
-        eleves = [
-            i.personne
-            for i in inscriptions
-            if i.personne.statut == 'eleve' or (i.personne.statut == 'encadrant' and i.role_pour_seance == 'eleve')
-        ]
-        eleves = sorted(eleves, key=lambda e: (e.nom.upper(), e.prenom.upper()))
-
-        row_start = 17
-        row_end = 42
-        row_capacity = row_end - row_start + 1
-        eleves_export = eleves[:row_capacity]
-
-        # Nettoyage de la zone élèves + matrice X
-        for row in range(row_start, row_end + 1):
-            ws[f'B{row}'] = ''
-            ws[f'D{row}'] = ''
-            ws[f'O{row}'] = ''
-            ws[f'R{row}'] = ''
-            for col in col_starts:
-                ws[f'{col}{row}'] = ''
-
-        # Index de ligne par élève
-        eleve_row = {}
-        for idx, eleve in enumerate(eleves_export, start=1):
-            row = row_start + idx - 1
-            eleve_row[eleve.id] = row
-            ws[f'B{row}'] = idx
-            ws[f'D{row}'] = f"{eleve.nom} {eleve.prenom}"
-            ws[f'O{row}'] = _niveau_court(eleve)
-
-        # Aptitudes + croix X par palanquée.
-        for col_idx, palanquee in enumerate(palanquees_export):
-            col = col_starts[col_idx]
-            for pal_eleve in palanquee.palanqueeeleve_set.select_related('eleve').all():
-                row = eleve_row.get(pal_eleve.eleve_id)
-                if not row:
-                    continue
-                ws[f'{col}{row}'] = 'X'
-                if pal_eleve.aptitude:
-                    ws[f'R{row}'] = pal_eleve.aptitude
-
-        # insert_rows(16) ne reporte pas les fusions sur la dernière ligne élève (42).
-        from openpyxl.utils import column_index_from_string
-        col_b = 2
-        col_last_palanquee = column_index_from_string(col_starts[-1]) + 2
-        for row in range(row_start, row_end + 1):
-            if not _row_has_eleve_merges(ws, row):
-                ref_row = row - 1 if row > row_start else row + 1
-                _apply_ligne_eleve_merges(ws, row, col_starts)
-                _copy_row_styles_from_reference(ws, row, ref_row, col_b, col_last_palanquee)
-
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-        return output
+    """Fiche de sécurité Excel de la séance ou de la sortie (voir fiche_securite.py)"""
+    seance = get_object_or_404(Seance.objects.select_related('lieu', 'directeur_plongee'), pk=seance_id)
+    try:
+        contenu = fiche_securite(seance)
+    except FileNotFoundError as exc:
+        messages.error(request, str(exc))
+        return redirect('sortie_detail' if seance.est_sortie else 'seance_detail', pk=seance.id)
 
-    seance = get_object_or_404(Seance, pk=seance_id)
-    if seance.est_sortie:
-        try:
-            output = _generate_sortie_security_sheet(seance)
-        except FileNotFoundError as exc:
-            messages.error(request, str(exc))
-            return redirect('sortie_detail', pk=seance.id)
-
-        response = HttpResponse(
-            output,
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = (
-            f'attachment; filename="APP_Fiche-secu_sortie_{seance.date.strftime("%Y-%m-%d")}.xlsx"'
-        )
-        return response
-
-    from openpyxl.styles import PatternFill
-    palanquees = list(seance.palanques.select_related('encadrant').prefetch_related('eleves'))
-    wb = openpyxl.load_workbook('fiche_securite_modele.xlsx')
-    ws = wb.active
-
-    # --- Champs fixes ---
-    ws['D2'] = seance.date.strftime('%d/%m/%Y')
-    ws['P2'] = seance.heure_debut.strftime('%Hh%M') if seance.heure_debut else "-"
-    ws['AA2'] = seance.heure_fin.strftime('%Hh%M') if seance.heure_fin else "-"
-    directeur = seance.directeur_plongee.nom_complet if seance.directeur_plongee else "-"
-    ws['H5'] = directeur
-    ws['H56'] = directeur
-    # Présence du président
-    ws['AC4'] = "Oui" if getattr(seance, 'presence_president', False) else "Non"
-
-    # --- Mapping blocs palanquée ---
-    bloc_map = [
-        (18, 'A'), (18, 'M'), (18, 'Y'),
-        (31, 'A'), (31, 'M'), (31, 'Y'),
-        (44, 'A'), (44, 'M'), (44, 'Y'),
-    ]
-    niveau_col = {'A': 'J', 'M': 'V', 'Y': 'AH'}
-    prof_col = {'A': 'F', 'M': 'R', 'Y': 'AD'}
-    duree_col = {'A': 'J', 'M': 'V', 'Y': 'AH'}
-
-    def niveau_encadrant_display(niveau):
-        mapping = {
-            'encadrant1': 'E1',
-            'encadrant2': 'E2',
-            'initiateur1': 'E1',
-            'initiateur2': 'E2',
-            'moniteur_federal1': 'E3',
-            'moniteur_federal2': 'E4',
-        }
-        return mapping.get(niveau, niveau)
-
-    # Découpage en tranches de 9 palanquées
-    nb_blocs = (len(palanquees) + 8) // 9
-    for bloc_idx in range(nb_blocs):
-        if bloc_idx > 0:
-            # Ajoute une nouvelle feuille à partir du modèle
-            ws_new = wb.copy_worksheet(ws)
-            ws_new.title = f"Fiche {bloc_idx+1}"
-            ws = ws_new
-            # Vider les cellules des blocs palanquées (9 blocs max)
-            for idx in range(9):
-                if idx < len(bloc_map):
-                    base_row, base_col = bloc_map[idx]
-                    # Efface encadrant, niveau, profondeur, durée
-                    ws[f'{base_col}{base_row}'] = ""
-                    ws[f'{niveau_col[base_col]}{base_row}'] = ""
-                    for i in range(4):
-                        ws[f'{base_col}{base_row+2+i}'] = ""
-                        ws[f'{niveau_col[base_col]}{base_row+2+i}'] = ""
-                    ws[f'{prof_col[base_col]}{base_row+7}'] = ""
-                    ws[f'{duree_col[base_col]}{base_row+7}'] = ""
-        # Remplir les infos fixes à chaque feuille/bloc
-        ws['D2'] = seance.date.strftime('%d/%m/%Y')
-        ws['P2'] = seance.heure_debut.strftime('%Hh%M') if seance.heure_debut else "-"
-        ws['AA2'] = seance.heure_fin.strftime('%Hh%M') if seance.heure_fin else "-"
-        ws['H5'] = directeur
-        ws['H56'] = directeur
-        ws['AC4'] = "Oui" if getattr(seance, 'presence_president', False) else "Non"
-        # Palanquées de ce bloc
-        palanquees_bloc = palanquees[bloc_idx*9:(bloc_idx+1)*9]
-        for idx, palanquee in enumerate(palanquees_bloc):
-            base_row, base_col = bloc_map[idx]
-            ws[f'{base_col}{base_row}'] = palanquee.encadrant.nom_complet if palanquee.encadrant else "AUTONOMES"
-            niveau = palanquee.encadrant.niveau if palanquee.encadrant and hasattr(palanquee.encadrant, 'niveau') else "-"
-            ws[f'{niveau_col[base_col]}{base_row}'] = niveau_encadrant_display(niveau)
-            eleves = list(palanquee.eleves.all())
-            for i in range(4):
-                nom_cell = f'{base_col}{base_row+2+i}'
-                niv_cell = f'{niveau_col[base_col]}{base_row+2+i}'
-                if i < len(eleves):
-                    eleve = eleves[i]
-                    ws[nom_cell] = f"{eleve.nom} {eleve.prenom}"
-                    aptitude = "-"
-                    palanquee_eleve = palanquee.palanqueeeleve_set.filter(eleve=eleve).first()
-                    if palanquee_eleve and palanquee_eleve.aptitude:
-                        aptitude = palanquee_eleve.get_aptitude_display()
-                    ws[niv_cell] = aptitude
-                else:
-                    ws[nom_cell] = ""
-                    ws[niv_cell] = ""
-            ws[f'{prof_col[base_col]}{base_row+7}'] = palanquee.profondeur_max if palanquee.profondeur_max else "-"
-            ws[f'{duree_col[base_col]}{base_row+7}'] = palanquee.duree if palanquee.duree else "-"
-        # Comptage adultes/enfants/total (sur la première feuille uniquement)
-        if bloc_idx == 0:
-            adultes = 0
-            enfants = 0
-            for palanquee in palanquees:
-                # Compter les élèves
-                for eleve in palanquee.eleves.all():
-                    if hasattr(eleve, 'date_naissance') and eleve.date_naissance:
-                        from datetime import date
-                        age = (date.today() - eleve.date_naissance).days // 365
-                        if age < 18:
-                            enfants += 1
-                        else:
-                            adultes += 1
-                    else:
-                        adultes += 1
-                # Compter l'encadrant s'il existe
-                if palanquee.encadrant and hasattr(palanquee.encadrant, 'date_naissance') and palanquee.encadrant.date_naissance:
-                    from datetime import date
-                    age = (date.today() - palanquee.encadrant.date_naissance).days // 365
-                    if age < 18:
-                        enfants += 1
-                    else:
-                        adultes += 1
-                elif palanquee.encadrant:
-                    adultes += 1
-            total = adultes + enfants
-            ws['AH57'] = adultes
-            ws['AH58'] = enfants
-            ws['AH59'] = total
-
-    # Export
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    response = HttpResponse(output, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="APP_Fiche-secu_{seance.date.strftime('%Y-%m-%d')}.xlsx"'
+    response = HttpResponse(
+        contenu,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+    prefixe = 'APP_Fiche-secu_sortie' if seance.est_sortie else 'APP_Fiche-secu'
+    response['Content-Disposition'] = f'attachment; filename="{prefixe}_{seance.date.strftime("%Y-%m-%d")}.xlsx"'
     return response
 
-def peut_voir_suivi(user, eleve_id):
+def peut_voir_tous_les_suivis(user):
+    """Suivis de formation de tous les élèves : superutilisateur, admin ou encadrant."""
     if not user.is_authenticated:
         return False
     if user.is_superuser:
         return True
-    if user.groups.filter(name='admin').exists():
-        return True
-    if user.groups.filter(name='encadrant').exists():
+    roles = roles_utilisateur(user)
+    return 'admin' in roles or 'encadrant' in roles
+
+def peut_voir_suivi(user, eleve_id):
+    if not user.is_authenticated:
+        return False
+    if peut_voir_tous_les_suivis(user):
         return True
+    roles = roles_utilisateur(user)
     adherent = getattr(user, 'adherent_profile', None)
-    return user.groups.filter(name='eleve').exists() and adherent and adherent.id == eleve_id
+    return 'eleve' in roles and adherent and adherent.id == eleve_id
 
 def suivi_formation_eleve(request, eleve_id):
     if not peut_voir_suivi(request.user, int(eleve_id)):
         # Redirige l'élève vers sa propre fiche, les autres vers la liste des élèves
-        if request.user.groups.filter(name='eleve').exists():
+        if 'eleve' in roles_utilisateur(request.user):
             adherent = getattr(request.user, 'adherent_profile', None)
             if adherent:
                 return redirect('suivi_formation_eleve', eleve_id=adherent.id)
-        elif request.user.groups.filter(name='encadrant').exists():
+        elif 'encadrant' in roles_utilisateur(request.user):
             return redirect('eleve_list')
         else:
             return redirect('dashboard')
@@ -3262,58 +2430,7 @@ def suivi_formation_eleve(request, eleve_id):
 
 def _suivi_formation_eleve(request, eleve_id):
     eleve = get_object_or_404(Adherent, pk=eleve_id)
-    # Récupérer toutes les sections de l'élève
-    sections = eleve.sections.all()
-    # Récupérer tous les groupes de compétences de ses sections
-    groupes = GroupeCompetence.objects.filter(section__in=sections).prefetch_related('competences__exercices')
-    # Récupérer toutes les évaluations exercices de l'élève (dernière par exercice = la plus récente)
-    evals = EvaluationExercice.objects.filter(eleve=eleve, exercice__type=Exercice.TYPE_CLASSIQUE).order_by('-date_evaluation')
-    evals_dict = {}
-    for e in evals:
-        if e.exercice_id not in evals_dict:
-            evals_dict[e.exercice_id] = e
-    # Historique par exercice
-    historiques = {}
-    for ex in Exercice.objects.filter(type=Exercice.TYPE_CLASSIQUE):
-        historiques[ex.id] = list(EvaluationExercice.objects.filter(eleve=eleve, exercice=ex).order_by('-date_evaluation'))
-    # Exercices qui ont déjà une validation DT (pour masquer le bouton)
-    validation_dt_exercice_ids = set(
-        EvaluationExercice.objects.filter(
-            eleve=eleve,
-            palanquee__isnull=True,
-            exercice__type=Exercice.TYPE_CLASSIQUE,
-        ).values_list('exercice_id', flat=True)
-    )
-    progression = []
-    for groupe in groupes:
-        groupe_data = {'groupe': groupe, 'competences': [], 'etoile_groupe': True}
-        for comp in groupe.competences.all():
-            comp_data = {'competence': comp, 'exercices': [], 'etoile_competence': True}
-            for ex in comp.exercices.filter(type=Exercice.TYPE_CLASSIQUE):
-                eval_ex = evals_dict.get(ex.id)
-                etoiles = eval_ex.note if eval_ex and eval_ex.note else 0
-                commentaire = eval_ex.commentaire if eval_ex else ''
-                raison = eval_ex.raison_non_realise if eval_ex else None
-                raison_display = ''
-                if raison:
-                    raison_display = dict(EvaluationExercice.RAISON_NON_REALISE_CHOICES).get(raison, '')
-                comp_data['exercices'].append({
-                    'exercice': ex,
-                    'etoiles': etoiles,
-                    'commentaire': commentaire,
-                    'raison': raison,
-                    'raison_display': raison_display,
-                    'has_validation_dt': ex.id in validation_dt_exercice_ids,
-                })
-                if etoiles < 3:
-                    comp_data['etoile_competence'] = False
-            # Si la compétence n'a aucun exercice, elle n'est pas validée
-            if not comp_data['exercices']:
-                comp_data['etoile_competence'] = False
-            groupe_data['competences'].append(comp_data)
-            if not comp_data['etoile_competence']:
-                groupe_data['etoile_groupe'] = False
-        progression.append(groupe_data)
+    progression, historiques = _build_suivi_formation_data(eleve)
     # Résumé
     nb_groupes = len(progression)
     nb_groupes_valides = sum(1 for g in progression if g['etoile_groupe'])
@@ -3326,166 +2443,67 @@ def _suivi_formation_eleve(request, eleve_id):
         'nb_groupes_valides': nb_groupes_valides,
         'nb_competences': nb_competences,
         'nb_competences_valides': nb_competences_valides,
-        'evals': evals,  # debug
         'range3': [1, 2, 3],
         'historiques': historiques,
     }
     return render(request, 'gestion/suivi_formation_eleve.html', context)
 
 
-def _build_suivi_formation_pdf(eleve, progression, historiques, titre="SUIVI DE"):
-    """Construit le contenu PDF du suivi (même structure que la page)."""
-    from django.utils import timezone
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=1.5*cm, rightMargin=1.5*cm, topMargin=1.5*cm, bottomMargin=1.5*cm)
-    elements = []
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=14, spaceAfter=12, alignment=TA_CENTER)
-    date_style = ParagraphStyle('DateGen', parent=styles['Normal'], alignment=TA_CENTER)
-    section_style = ParagraphStyle('Section', parent=styles['Normal'], alignment=TA_CENTER, spaceAfter=4)
-    stats_style = ParagraphStyle('Stats', parent=styles['Normal'], fontSize=8, alignment=TA_CENTER, spaceBefore=12, spaceAfter=0)
-    heading_style = ParagraphStyle('Heading', parent=styles['Heading2'], fontSize=11, spaceAfter=6, spaceBefore=12)
-    sub_style = ParagraphStyle('Sub', parent=styles['Normal'], fontSize=10, spaceAfter=4, spaceBefore=8, leftIndent=20)
-    exercice_style = ParagraphStyle('Exercice', parent=styles['Normal'], fontSize=9, spaceAfter=2, spaceBefore=10, leftIndent=40)
-    hist_style = ParagraphStyle('Hist', parent=styles['Normal'], fontSize=9, spaceAfter=2, leftIndent=40)
-
-    date_gen = timezone.now().strftime('%d/%m/%Y à %H:%M')
-    elements.append(Paragraph(f"Généré le : {date_gen}", date_style))
-    elements.append(Spacer(1, 12))
-    elements.append(Paragraph(f"<b>{titre} :</b> {eleve.nom_complet.upper()}", title_style))
-    sections_names = ", ".join(s.get_nom_display() for s in eleve.sections.all()) or "-"
-    elements.append(Paragraph(f"<b>SECTION(S) :</b> {sections_names}", section_style))
-    nb_groupes = len(progression)
-    nb_groupes_valides = sum(1 for g in progression if g['etoile_groupe'])
-    nb_competences = sum(len(g['competences']) for g in progression)
-    nb_competences_valides = sum(1 for g in progression for c in g['competences'] if c['etoile_competence'])
-    stats_text = f"<b>{nb_groupes_valides}/{nb_groupes} groupe(s) validé(s)</b><br/><b>{nb_competences_valides}/{nb_competences} compétence(s) validée(s)</b>"
-    elements.append(Paragraph(stats_text, stats_style))
-    elements.append(Spacer(1, 12))
-
-    for g in progression:
-        statut_g = "Validé" if g['etoile_groupe'] else "En cours"
-        coche_g = '<font color="#28a745" size="18"> ✓</font>' if g['etoile_groupe'] else ''
-        elements.append(Paragraph(f"<b>{g['groupe'].intitule}</b> — {statut_g}{coche_g}", heading_style))
-        for c in g['competences']:
-            statut_c = "validée" if c['etoile_competence'] else "en cours"
-            coche = '<font color="#28a745" size="18"> ✓</font>' if c['etoile_competence'] else ''
-            elements.append(Paragraph(f"<b>{c['competence'].nom}</b> — {statut_c}{coche}", sub_style))
-            for e in c['exercices']:
-                n = e['etoiles'] or 0
-                if n:
-                    etoiles_texte = '<font color="#E6B800">' + "★" * n + '</font>'
-                else:
-                    etoiles_texte = ''
-                elements.append(Paragraph(f"<b>{e['exercice'].nom}</b> — {etoiles_texte}", exercice_style))
-                hist_list = historiques.get(e['exercice'].id, [])
-                for h in hist_list:
-                    date_str = (h.date_evaluation.strftime('%d/%m/%Y') if getattr(h, 'date_evaluation', None) else '-')
-                    if getattr(h, 'palanquee', None) and getattr(h.palanquee, 'seance', None):
-                        date_str = h.palanquee.seance.date.strftime('%d/%m/%Y')
-                    moniteur = (getattr(h, 'encadrant', None) and h.encadrant.nom_complet) or "Validé par le DT"
-                    comm = (getattr(h, 'commentaire', None) or '').replace('<', ' ').replace('>', ' ')
-                    elements.append(Paragraph(f"Date : {date_str} — Moniteur : {moniteur} — {comm}", hist_style))
-            elements.append(Spacer(1, 4))
-        elements.append(Spacer(1, 8))
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer.getvalue()
-
-
 def _build_suivi_formation_data(eleve, exercice_type=Exercice.TYPE_CLASSIQUE):
-    sections = eleve.sections.all()
-    groupes = GroupeCompetence.objects.filter(section__in=sections).prefetch_related('competences__exercices')
-    evals = EvaluationExercice.objects.filter(eleve=eleve, exercice__type=exercice_type).order_by('-date_evaluation')
-    evals_dict = {}
-    for e in evals:
-        if e.exercice_id not in evals_dict:
-            evals_dict[e.exercice_id] = e
-
-    historiques = {}
-    for ex in Exercice.objects.filter(type=exercice_type):
-        historiques[ex.id] = list(
-            EvaluationExercice.objects.filter(eleve=eleve, exercice=ex).order_by('-date_evaluation')
-        )
-
-    validation_dt_exercice_ids = set()
-    if exercice_type == Exercice.TYPE_CLASSIQUE:
-        validation_dt_exercice_ids = set(
-            EvaluationExercice.objects.filter(
-                eleve=eleve,
-                palanquee__isnull=True,
-                exercice__type=Exercice.TYPE_CLASSIQUE,
-            ).values_list('exercice_id', flat=True)
-        )
-
-    progression = []
-    for groupe in groupes:
-        groupe_data = {'groupe': groupe, 'competences': [], 'etoile_groupe': True}
-        for comp in groupe.competences.all():
-            comp_data = {'competence': comp, 'exercices': [], 'etoile_competence': True}
-            for ex in comp.exercices.filter(type=exercice_type):
-                eval_ex = evals_dict.get(ex.id)
-                etoiles = eval_ex.note if eval_ex and eval_ex.note else 0
-                commentaire = eval_ex.commentaire if eval_ex else ''
-                raison = eval_ex.raison_non_realise if eval_ex else None
-                raison_display = dict(EvaluationExercice.RAISON_NON_REALISE_CHOICES).get(raison, '') if raison else ''
-                comp_data['exercices'].append({
-                    'exercice': ex, 'etoiles': etoiles, 'commentaire': commentaire,
-                    'raison': raison, 'raison_display': raison_display,
-                    'has_validation_dt': ex.id in validation_dt_exercice_ids,
-                })
-                if etoiles < 3:
-                    comp_data['etoile_competence'] = False
-            if not comp_data['exercices']:
-                comp_data['etoile_competence'] = False
-            groupe_data['competences'].append(comp_data)
-            if not comp_data['etoile_competence']:
-                groupe_data['etoile_groupe'] = False
-        progression.append(groupe_data)
-
-    return progression, historiques
+    return construire_suivis_formation([eleve], exercice_type)[eleve.id]
 
 
 @login_required
 def suivi_formation_eleve_pdf(request, eleve_id):
     """Génère un PDF du suivi de formation (ouvre dans un nouvel onglet)."""
     if not peut_voir_suivi(request.user, int(eleve_id)):
-        if request.user.groups.filter(name='eleve').exists():
+        if 'eleve' in roles_utilisateur(request.user):
             adherent = getattr(request.user, 'adherent_profile', None)
             if adherent:
                 return redirect('suivi_formation_eleve', eleve_id=adherent.id)
-        elif request.user.groups.filter(name='encadrant').exists():
+        elif 'encadrant' in roles_utilisateur(request.user):
             return redirect('eleve_list')
         else:
             return redirect('dashboard')
     eleve = get_object_or_404(Adherent, pk=eleve_id)
-    progression, historiques = _build_suivi_formation_data(eleve)
-    pdf_content = _build_suivi_formation_pdf(eleve, progression, historiques)
+    pdf_content = suivi_formation_pdfs([eleve])[eleve.id]
     response = HttpResponse(pdf_content, content_type='application/pdf')
     response['Content-Disposition'] = 'inline; filename="suivi_formation_{}.pdf"'.format(eleve.nom_complet.replace(' ', '_'))
     return response
 
 
+@login_required
+def suivis_formation_section_zip(request, section_id):
+    """Archive ZIP des PDF de suivi de formation des élèves actifs d'une section, envoyée au fil de la génération."""
+    if not peut_voir_tous_les_suivis(request.user):
+        return redirect('dashboard')
+    section = get_object_or_404(Section, pk=section_id)
+    eleves = section.adherents.filter(statut='eleve', actif=True).order_by('nom', 'prenom')
+    response = StreamingHttpResponse(archive_suivis_formation(eleves), content_type='application/zip')
+    response['Content-Disposition'] = 'attachment; filename="suivis_formation_{}_{}.zip"'.format(
+        section.nom, timezone.localdate().strftime('%Y-%m-%d')
+    )
+    return response
+
+
 @login_required
 def suivi_evaluations_exercices_eleve_pdf(request, eleve_id):
     """Génère un PDF du suivi des exercices d'évaluation (ouvre dans un nouvel onglet)."""
     if not peut_voir_suivi(request.user, int(eleve_id)):
-        if request.user.groups.filter(name='eleve').exists():
+        if 'eleve' in roles_utilisateur(request.user):
             adherent = getattr(request.user, 'adherent_profile', None)
             if adherent:
                 return redirect('suivi_formation_eleve', eleve_id=adherent.id)
-        elif request.user.groups.filter(name='encadrant').exists():
+        elif 'encadrant' in roles_utilisateur(request.user):
             return redirect('eleve_list')
         else:
             return redirect('dashboard')
     eleve = get_object_or_404(Adherent, pk=eleve_id)
-    progression, historiques = _build_suivi_formation_data(eleve, exercice_type=Exercice.TYPE_EVALUATION)
-    pdf_content = _build_suivi_formation_pdf(
-        eleve,
-        progression,
-        historiques,
+    pdf_content = suivi_formation_pdfs(
+        [eleve],
+        exercice_type=Exercice.TYPE_EVALUATION,
         titre="SUIVI ÉVALUATIONS",
-    )
+    )[eleve.id]
     response = HttpResponse(pdf_content, content_type='application/pdf')
     response['Content-Disposition'] = 'inline; filename="suivi_evaluations_{}.pdf"'.format(
         eleve.nom_complet.replace(' ', '_')
@@ -3753,116 +2771,66 @@ def envoyer_pdf_palanquees_encadrants(request, seance_id):
     singleton.corps_html = corps_html
     singleton.save(update_fields=['corps_html'])
 
-    palanquees = seance.palanques.all()
-    nb_envoyes = 0
-    erreurs = []
-    destinataires_envoyes = []
-    cc = getattr(settings, 'EMAIL_CC_DEFAULT', [])
-    signature_html = get_signature_html()
-    signature_img_path = os.path.join(settings.BASE_DIR, 'static', 'Signature_mouss.png')
-    fiche_previsionnelle = None
-    if seance.fiche_securite_previsionnelle:
-        try:
-            with open(seance.fiche_securite_previsionnelle.path, 'rb') as f:
-                fiche_previsionnelle = (
-                    os.path.basename(seance.fiche_securite_previsionnelle.name),
-                    f.read(),
-                )
-        except Exception as e:
-            erreurs.append(f"Fiche de sécu prévisionnelle : impossible de joindre le fichier ({str(e)}).")
-
-    for palanquee in palanquees:
-        encadrant = palanquee.encadrant
-        if not encadrant or not encadrant.email:
-            continue
-        buffer = BytesIO()
-        write_palanquee_pdf(buffer, palanquee)
-        buffer.seek(0)
-        # Corps du mail : template Django + signature
-        subject = f"Fiche palanquée - {palanquee.nom} ({seance.date})"
-        try:
-            tpl = django_engine.from_string(corps_html)
-            rendered_main_html = tpl.render({'palanquee': palanquee, 'seance': seance})
-        except Exception as e:
-            erreurs.append(f"{encadrant.nom_complet} (rendu du message) : {str(e)}")
-            continue
-        body_html = f"{rendered_main_html}{signature_html}"
-        body_plain = strip_tags(rendered_main_html).strip()
-        if not body_plain:
-            body_plain = strip_tags(body_html).strip() or '(message vide)'
-        email = EmailMultiAlternatives(subject, body_plain, to=[encadrant.email], cc=cc)
-        email.attach(f"fiche_palanquee_{palanquee.seance.date}_{palanquee.encadrant.nom_complet}.pdf", buffer.read(), 'application/pdf')
-        if fiche_previsionnelle:
-            email.attach(fiche_previsionnelle[0], fiche_previsionnelle[1], 'application/octet-stream')
-        for eleve in palanquee.eleves.all():
-            try:
-                progression_eleve, historiques_eleve = _build_suivi_formation_data(eleve)
-                pdf_suivi_eleve = _build_suivi_formation_pdf(eleve, progression_eleve, historiques_eleve)
-                email.attach(
-                    f"suivi_formation_{eleve.nom_complet.replace(' ', '_')}.pdf",
-                    pdf_suivi_eleve,
-                    'application/pdf'
-                )
-            except Exception as e:
-                erreurs.append(
-                    f"{encadrant.nom_complet} - {eleve.nom_complet} : impossible de générer le PDF de suivi ({str(e)})."
-                )
-        email.attach_alternative(body_html, "text/html")
-        if os.path.exists(signature_img_path):
-            with open(signature_img_path, 'rb') as img:
-                mime_img = MIMEImage(img.read(), _subtype='png')
-                mime_img.add_header('Content-ID', '<signature_mouss2>')
-                mime_img.add_header('Content-Disposition', 'inline', filename='Signature_mouss2.png')
-                email.attach(mime_img)
-        try:
-            email.send()
-            nb_envoyes += 1
-            destinataires_envoyes.append({
-                'nom': encadrant.nom,
-                'prenom': encadrant.prenom,
-                'email': encadrant.email,
-                'palanquee': palanquee.nom
-            })
-        except Exception as e:
-            erreurs.append(f"{encadrant.nom_complet} : {str(e)}")
-    if destinataires_envoyes:
-        request.session['destinataires_pdf_envoyes'] = destinataires_envoyes
-        request.session['destinataires_pdf_export'] = {
-            'destinataires': destinataires_envoyes,
-            'seance_id': seance_id,
-            'date_seance': seance.date.strftime('%d/%m/%Y'),
-            'lieu': str(seance.lieu.nom) if seance.lieu else ''
-        }
-    # Messages Django (affichés après rechargement de la page séance)
-    confirmation_lignes = []
-    if nb_envoyes:
-        succ = f"{nb_envoyes} PDF envoyés aux encadrants."
-        messages.success(request, succ)
-        confirmation_lignes.append(succ)
-    elif not erreurs:
-        avert = (
-            "Aucun PDF envoyé : vérifiez qu'il existe des palanquées avec un encadrant "
-            "disposant d'une adresse e-mail."
-        )
-        messages.warning(request, avert)
-        confirmation_lignes.append(avert)
-    if erreurs:
-        err_msg = "Erreurs lors de l'envoi : " + ", ".join(erreurs)
-        messages.error(request, err_msg)
-        confirmation_lignes.append(err_msg)
-
+    # Génération des PDF et envoi des mails par la commande traiter_envois_pdf
+    tache = envoi_pdf.creer_tache(seance, corps_html, auteur=request.user)
+    msg = "Envoi des PDF aux encadrants en cours : les mails partent en arrière-plan."
     if wants_json:
         return JsonResponse(
             {
                 'ok': True,
-                'nb_envoyes': nb_envoyes,
-                'messages': confirmation_lignes,
-                'erreurs_detail': erreurs,
+                'tache_id': tache.pk,
+                'suivi_url': reverse('api_envoi_pdf_palanquees', kwargs={'tache_id': tache.pk}),
+                'messages': [msg],
                 'redirect_url': redirect_url,
-            }
+            },
+            status=202,
         )
+    messages.info(request, msg)
     return redirect(detail_route_name, pk=seance_id)
 
+
+@login_required
+@require_GET
+def api_envoi_pdf_palanquees(request, tache_id):
+    """
+    Progression d'un envoi des PDF palanquées. Une fois la tâche terminée, la réponse
+    reprend le compte rendu de l'envoi (nb_envoyes, messages, erreurs_detail, redirect_url)
+    et, au premier appel, le place dans les messages et la session comme l'envoi direct.
+    """
+    tache = get_object_or_404(TacheEnvoiPdfPalanquees.objects.select_related('seance__lieu'), pk=tache_id)
+    seance = tache.seance
+    data = {
+        'ok': tache.statut != TacheEnvoiPdfPalanquees.STATUT_ECHEC,
+        'tache_id': tache.pk,
+        'statut': tache.statut,
+        'statut_display': tache.get_statut_display(),
+        'termine': tache.est_terminee,
+        'nb_total': tache.nb_total,
+        'nb_traites': tache.nb_traites,
+        'nb_envoyes': tache.nb_envoyes,
+        'messages': [],
+        'erreurs_detail': tache.erreurs,
+        'redirect_url': reverse(_detail_route_name_for_seance(seance), kwargs={'pk': seance.pk}),
+    }
+    if not tache.est_terminee:
+        return JsonResponse(data)
+    lignes = envoi_pdf.messages_resultat(tache)
+    data['messages'] = [texte for _, texte in lignes]
+    premier_appel = TacheEnvoiPdfPalanquees.objects.filter(pk=tache.pk, resultat_notifie=False).update(resultat_notifie=True)
+    if premier_appel:
+        if tache.destinataires:
+            request.session['destinataires_pdf_envoyes'] = tache.destinataires
+            request.session['destinataires_pdf_export'] = {
+                'destinataires': tache.destinataires,
+                'seance_id': seance.pk,
+                'date_seance': seance.date.strftime('%d/%m/%Y'),
+                'lieu': str(seance.lieu.nom) if seance.lieu else ''
+            }
+        # Messages Django (affichés après rechargement de la page séance)
+        for niveau, texte in lignes:
+            messages.add_message(request, niveau, texte)
+    return JsonResponse(data)
+
 @login_required
 def envoyer_mail_covoiturage(request, seance_id):
     seance = get_object_or_404(Seance, pk=seance_id)
@@ -3881,64 +2849,34 @@ def envoyer_mail_covoiturage(request, seance_id):
     for ins in passagers:
         tableau2 += f"<tr><td style='padding: 8px;'>{ins.personne.nom}</td><td style='padding: 8px;'>{ins.personne.prenom}</td><td style='padding: 8px;'>{ins.personne.email}</td><td style='padding: 8px;'>{ins.personne.telephone}</td><td style='padding: 8px;'>{ins.lieu_covoiturage or ''}</td></tr>"
     tableau2 += "</table>"
-    cc = getattr(settings, 'EMAIL_CC_COVOIT', [])
-    signature_html = get_signature_html()
-    signature_img_path = os.path.join(settings.BASE_DIR, 'static', 'Signature_mouss2.png')
-    nb_envoyes = 0
-    erreurs = []
-    # Liste pour stocker les destinataires qui ont reçu le mail
-    destinataires_envoyes = []
-    for ins in passagers:
-        if not ins.personne.email:
-            continue
-        subject = f"Covoiturage pour la séance du {seance.date.strftime('%d/%m/%Y')}"
-        body_html = f"<div style='font-size: 16px;'><p>Bonjour {ins.personne.prenom},</p><p>Voici la liste des personnes qui <b style='color:red'>proposent</b> du covoiturage pour la séance du {seance.date.strftime('%d/%m/%Y')} :</p>{tableau}<p>Voici la liste des personnes qui <b style='color:red'>sont en demande</b> de covoiturage :</p>{tableau2}<p>Merci de contacter directement les conducteurs pour organiser ton déplacement.</p><p>Subaquatiquement,</p></div>" + signature_html
-        email = EmailMultiAlternatives(subject, '', to=[ins.personne.email], cc=cc)
-        email.attach_alternative(body_html, "text/html")
-        if os.path.exists(signature_img_path):
-            with open(signature_img_path, 'rb') as img:
-                mime_img = MIMEImage(img.read(), _subtype='png')
-                mime_img.add_header('Content-ID', '<signature_mouss2>')
-                mime_img.add_header('Content-Disposition', 'inline', filename='Signature_mouss2.png')
-                email.attach(mime_img)
-        try:
-            email.send()
-            nb_envoyes += 1
-            # Ajouter le destinataire à la liste
-            destinataires_envoyes.append({
-                'nom': ins.personne.nom,
-                'prenom': ins.personne.prenom,
-                'email': ins.personne.email,
-                'role': 'Passager'
-            })
-        except Exception as e:
-            erreurs.append(f"{ins.personne.nom} {ins.personne.prenom} : {str(e)}")
+    # Corps compilé une fois avec les deux tableaux ; seul le prénom change d'un mail à l'autre
+    date_seance = seance.date.strftime('%d/%m/%Y')
+    modele = ModeleMail(
+        f"Covoiturage pour la séance du {date_seance}",
+        texte='',
+        html=gabarit(
+            "<div style='font-size: 16px;'><p>Bonjour {{ prenom }},</p><p>Voici la liste des personnes qui <b style='color:red'>proposent</b> du covoiturage pour la séance du {{ date_seance }} :</p>{{ tableau }}<p>Voici la liste des personnes qui <b style='color:red'>sont en demande</b> de covoiturage :</p>{{ tableau2 }}<p>Merci de contacter directement les conducteurs pour organiser ton déplacement.</p><p>Subaquatiquement,</p></div>"
+            + get_signature_html()
+        ),
+        contexte={'date_seance': date_seance, 'tableau': mark_safe(tableau), 'tableau2': mark_safe(tableau2)},
+        signature=SIGNATURE,
+        cc=getattr(settings, 'EMAIL_CC_COVOIT', []),
+    )
 
-    for ins in conducteurs:
-        if not ins.personne.email:
-            continue
-        subject = f"Covoiturage pour la séance du {seance.date.strftime('%d/%m/%Y')}"
-        body_html = f"<div style='font-size: 16px;'><p>Bonjour {ins.personne.prenom},</p><p>Voici la liste des personnes qui <b style='color:red'>proposent</b> du covoiturage pour la séance du {seance.date.strftime('%d/%m/%Y')} :</p>{tableau}<p>Voici la liste des personnes qui <b style='color:red'>sont en demande</b> de covoiturage :</p>{tableau2}<p>Merci de contacter directement les conducteurs pour organiser ton déplacement.</p><p>Subaquatiquement,</p></div>" + signature_html
-        email = EmailMultiAlternatives(subject, '', to=[ins.personne.email], cc=cc)
-        email.attach_alternative(body_html, "text/html")
-        if os.path.exists(signature_img_path):
-            with open(signature_img_path, 'rb') as img:
-                mime_img = MIMEImage(img.read(), _subtype='png')
-                mime_img.add_header('Content-ID', '<signature_mouss2>')
-                mime_img.add_header('Content-Disposition', 'inline', filename='Signature_mouss2.png')
-                email.attach(mime_img)
-        try:
-            email.send()
-            nb_envoyes += 1
-            # Ajouter le destinataire à la liste
-            destinataires_envoyes.append({
-                'nom': ins.personne.nom,
-                'prenom': ins.personne.prenom,
-                'email': ins.personne.email,
-                'role': 'Conducteur'
-            })
-        except Exception as e:
-            erreurs.append(f"{ins.personne.nom} {ins.personne.prenom} : {str(e)}")
+    def construire_messages():
+        for role, inscriptions_role in (('Passager', passagers), ('Conducteur', conducteurs)):
+            for ins in inscriptions_role:
+                if not ins.personne.email:
+                    continue
+                yield (ins, role), modele.message([ins.personne.email], {'prenom': ins.personne.prenom})
+
+    # Mise en file : la commande traiter_boite_envoi envoie les mails au rythme autorisé par le serveur SMTP
+    mis_en_file = mettre_en_file(construire_messages(), origine='covoiturage', seance=seance)
+    # Liste des destinataires dont le mail est en file
+    destinataires_envoyes = [
+        {'nom': ins.personne.nom, 'prenom': ins.personne.prenom, 'email': ins.personne.email, 'role': role}
+        for (ins, role), mail in hors_doublons(request, mis_en_file)
+    ]
 
     # Stocker la liste des destinataires dans la session pour l'affichage
     if destinataires_envoyes:
@@ -3951,10 +2889,8 @@ def envoyer_mail_covoiturage(request, seance_id):
             'lieu': str(seance.lieu.nom) if seance.lieu else ''
         }
 
-    if nb_envoyes:
-        messages.success(request, f"{nb_envoyes} mails de covoiturage envoyés.")
-    if erreurs:
-        messages.error(request, "Erreurs lors de l'envoi : " + ", ".join(erreurs))
+    if destinataires_envoyes:
+        messages.success(request, f"{len(destinataires_envoyes)} mails de covoiturage mis en file d'envoi.")
     return redirect('seance_detail', pk=seance_id)
 
 @csrf_exempt
@@ -3962,7 +2898,6 @@ def envoyer_mail_covoiturage(request, seance_id):
 @login_required
 def envoyer_mail_inscription(request):
     import json
-    from email.mime.image import MIMEImage
     try:
         data = json.loads(request.body)
         email = data.get('email')
@@ -3971,7 +2906,6 @@ def envoyer_mail_inscription(request):
         url = request.build_absolute_uri('/adherents/inscription/2025-2026/')
         subject = "Finalisation de ton inscription - Aquadémie Paris Plongée"
         signature_html = get_signature_html()
-        signature_img_path = os.path.join(settings.BASE_DIR, 'static', 'Signature_mouss2.png')
         body_html = f"""
 Bonjour,<br><br>
 Je constate que tu as procédé à ton inscription sur HelloAsso et que tu as omis de renseigner le formulaire de l'étape n°1.<br>
@@ -3980,16 +2914,11 @@ Pour y remédier, il faut finaliser ton inscription et renseigner ce formulaire
 Je t'en remercie par avance.<br><br>
 Subaquatiquement,<br>
 """ + signature_html
-        cc = getattr(settings, 'EMAIL_CC_DEFAULT', [])
-        email_obj = EmailMultiAlternatives(subject, '', to=[email], cc=cc)
-        email_obj.attach_alternative(body_html, "text/html")
-        if os.path.exists(signature_img_path):
-            with open(signature_img_path, 'rb') as img:
-                mime_img = MIMEImage(img.read(), _subtype='png')
-                mime_img.add_header('Content-ID', '<signature_mouss2>')
-                mime_img.add_header('Content-Disposition', 'inline', filename='Signature_mouss2.png')
-                email_obj.attach(mime_img)
-        email_obj.send()
+        modele = ModeleMail(
+            subject, texte='', html=body_html, signature=SIGNATURE, cc=getattr(settings, 'EMAIL_CC_DEFAULT', []),
+        )
+        with section('smtp'):
+            modele.message([email]).send()
         return JsonResponse({'success': True})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
@@ -4006,11 +2935,10 @@ def valider_caci(request, adherent_id):
 @login_required
 def envoyer_liens_evaluation_encadrants(request, seance_id):
     seance = get_object_or_404(Seance, pk=seance_id)
-    nb_envoyes = 0
     erreurs = []
-    # Liste pour stocker les destinataires qui ont reçu le mail
-    destinataires_envoyes = []
-    for palanquee in seance.palanques.all():
+    a_envoyer = []
+    modele = modele_mail_lien_evaluation()
+    for palanquee in seance.palanques.select_related('encadrant', 'seance'):
         encadrant = palanquee.encadrant
         if not encadrant or not encadrant.email:
             erreurs.append(f"{palanquee.nom} : pas d'encadrant ou d'email")
@@ -4032,19 +2960,19 @@ def envoyer_liens_evaluation_encadrants(request, seance_id):
             from datetime import timedelta
             lien.date_expiration = timezone.now() + timedelta(days=7)
             lien.save()
-        # Envoyer le mail
-        ok, msg = envoyer_lien_evaluation(lien, request)
-        if ok:
-            nb_envoyes += 1
-            # Ajouter le destinataire à la liste
-            destinataires_envoyes.append({
-                'nom': encadrant.nom,
-                'prenom': encadrant.prenom,
-                'email': encadrant.email,
-                'palanquee': palanquee.nom
-            })
-        else:
-            erreurs.append(f"{palanquee.nom} : {msg}")
+        a_envoyer.append((palanquee, construire_mail_lien_evaluation(lien, request, modele)))
+    # Mise en file : la commande traiter_boite_envoi envoie les mails au rythme autorisé par le serveur SMTP
+    mis_en_file = mettre_en_file(a_envoyer, origine='lien_evaluation', seance=seance)
+    # Liste des destinataires dont le mail est en file
+    destinataires_envoyes = [
+        {
+            'nom': palanquee.encadrant.nom,
+            'prenom': palanquee.encadrant.prenom,
+            'email': palanquee.encadrant.email,
+            'palanquee': palanquee.nom
+        }
+        for palanquee, mail in hors_doublons(request, mis_en_file)
+    ]
     # Stocker la liste des destinataires dans la session pour l'affichage
     if destinataires_envoyes:
         request.session['destinataires_evaluation_envoyes'] = destinataires_envoyes
@@ -4055,10 +2983,10 @@ def envoyer_liens_evaluation_encadrants(request, seance_id):
             'date_seance': seance.date.strftime('%d/%m/%Y'),
             'lieu': str(seance.lieu.nom) if seance.lieu else ''
         }
-    if nb_envoyes:
-        messages.success(request, f"{nb_envoyes} mails de lien d'évaluation envoyés aux encadrants.")
+    if destinataires_envoyes:
+        messages.success(request, f"{len(destinataires_envoyes)} mails de lien d'évaluation mis en file d'envoi pour les encadrants.")
     if erreurs:
-        messages.error(request, "Erreurs lors de l'envoi : " + ", ".join(erreurs))
+        messages.error(request, "Mails non envoyés : " + ", ".join(erreurs))
     return redirect(_detail_route_name_for_seance(seance), pk=seance_id)
 
 def copier_caci(request, adherent_id):
@@ -4169,31 +3097,26 @@ def creer_compte_adherent(request, adherent_id):
     uid = urlsafe_base64_encode(force_bytes(user.pk))
     token = default_token_generator.make_token(user)
     activation_url = f"https://{current_site.domain}{reverse('password_reset_confirm', kwargs={'uidb64': uid, 'token': token})}"
-    message = render_to_string('registration/account_activation_email.html', {
+    modele = ModeleMail(
+        subject, texte=gabarit_fichier('registration/account_activation_email.html'), from_email=settings.DEFAULT_FROM_EMAIL,
+    )
+    mail = modele.message([user.email], {
         'user': user,
         'activation_url': activation_url,
         'site_name': current_site.name,
         'domain': current_site.domain,
     })
-    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+    with section('smtp'):
+        mail.send()
     messages.success(request, f"Compte utilisateur créé et mail d'activation envoyé à {user.email}.")
     return redirect('adherent_list')
 
 @staff_member_required
 def exporter_inscrits_seance_excel(request, seance_id):
-    import openpyxl
-    from openpyxl.utils import get_column_letter
-    from openpyxl.styles import Alignment
-    from django.http import HttpResponse
     from gestion.models import Seance, InscriptionSeance
 
     seance = get_object_or_404(Seance, pk=seance_id)
-    inscriptions = seance.inscriptions.select_related('personne').all()
-
-    # Séparation
-    eleves = [i.personne for i in inscriptions if i.personne.statut == 'eleve']
-    encadrants = [i.personne for i in inscriptions if i.personne.statut == 'encadrant']
-    covoiturage = [i for i in inscriptions if i.covoiturage in ['propose', 'besoin']]
+    inscriptions = seance.inscriptions.select_related('personne')
 
     # Colonnes communes
     colonnes = [
@@ -4201,12 +3124,6 @@ def exporter_inscrits_seance_excel(request, seance_id):
         'Date de délivrance CACI', 'Numéro licence', 'Niveau', 'Statut', 'Adhérent'
     ]
 
-    wb = openpyxl.Workbook()
-    ws_eleves = wb.active
-    ws_eleves.title = 'Élèves'
-    ws_encadrants = wb.create_sheet('Encadrants')
-    ws_covoit = wb.create_sheet('Covoiturage')
-
     # Helper pour remplir
     def ligne_adherent(a):
         return [
@@ -4224,108 +3141,90 @@ def exporter_inscrits_seance_excel(request, seance_id):
             'Oui' if getattr(a, 'type_personne', 'adherent') == 'adherent' else 'Non',
         ]
 
+    classeur = ClasseurExcel()
+    largeurs = [18] * len(colonnes)
+
     # Élèves
-    ws_eleves.append(colonnes)
-    for a in eleves:
-        ws_eleves.append(ligne_adherent(a))
+    feuille = classeur.feuille('Élèves', largeurs)
+    feuille.ligne(colonnes)
+    feuille.lignes(ligne_adherent(i.personne) for i in parcourir(inscriptions.filter(personne__statut='eleve')))
 
     # Encadrants
-    ws_encadrants.append(colonnes)
-    for a in encadrants:
-        ws_encadrants.append(ligne_adherent(a))
+    feuille = classeur.feuille('Encadrants', largeurs)
+    feuille.ligne(colonnes)
+    feuille.lignes(ligne_adherent(i.personne) for i in parcourir(inscriptions.filter(personne__statut='encadrant')))
 
     # Covoiturage
     colonnes_covoit = colonnes + ['Type covoiturage', 'Lieu covoiturage']
-    ws_covoit.append(colonnes_covoit)
-    for ins in covoiturage:
-        a = ins.personne
-        row = ligne_adherent(a)
+    feuille = classeur.feuille('Covoiturage', largeurs + [18, 18])
+    feuille.ligne(colonnes_covoit)
+    for ins in parcourir(inscriptions.filter(covoiturage__in=['propose', 'besoin'])):
+        row = ligne_adherent(ins.personne)
         row += [dict(InscriptionSeance.COVOITURAGE_CHOICES).get(ins.covoiturage, ''), ins.lieu_covoiturage or '']
-        ws_covoit.append(row)
+        feuille.ligne(row)
 
-    # Largeur colonnes
-    for ws in [ws_eleves, ws_encadrants, ws_covoit]:
-        for i, col in enumerate(ws.columns, 1):
-            ws.column_dimensions[get_column_letter(i)].width = 18
-
-    # Réponse HTTP
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    nom_fichier = f"inscrits_seance_{seance.date.strftime('%Y-%m-%d')}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{nom_fichier}"'
-    wb.save(response)
-    return response
+    return classeur.reponse(f"inscrits_seance_{seance.date.strftime('%Y-%m-%d')}.xlsx")
 
 
 @login_required
 @group_required('admin')
 def exporter_participations_encadrants_excel(request):
-    from openpyxl.styles import Font, PatternFill, Alignment
-
-    seances = Seance.objects.all().order_by('date')
-    date_debut = request.GET.get('date_debut')
-    date_fin = request.GET.get('date_fin')
-
-    if date_debut:
-        seances = seances.filter(date__gte=date_debut)
-    if date_fin:
-        seances = seances.filter(date__lte=date_fin)
-
-    seances = list(seances)
-    seance_ids = [seance.id for seance in seances]
-
-    participations_qs = InscriptionSeance.objects.filter(
-        seance_id__in=seance_ids,
-        personne__statut='encadrant',
-        role_pour_seance='encadrant',
-    ).values_list('personne_id', 'seance_id')
-    participations = set(participations_qs)
-
-    encadrants = (
-        Adherent.objects.filter(
-            statut='encadrant',
-            inscriptions_seance__seance_id__in=seance_ids,
-            inscriptions_seance__role_pour_seance='encadrant',
-        )
-        .distinct()
-        .order_by('nom', 'prenom')
-    )
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'Participations encadrants'
+    """Tableau encadrants × séances de la période demandée (saison en cours par défaut)."""
+    date_debut, date_fin, annee_saison = periode_participations(request.GET)
+    matrice = matrice_participations(date_debut, date_fin)
+
+    headers = ['Encadrant'] + [date.strftime('%d/%m/%Y') for _, date in matrice.seances]
+    classeur = ClasseurExcel()
+    feuille = classeur.feuille('Participations encadrants', [35] + [12] * len(matrice.seances))
+    feuille.ligne(headers, style='entete_clair')
+
+    styles_cases = {col_idx: 'centre' for col_idx in range(1, len(headers))}
+    for ligne, (_, nom, prenom) in enumerate(matrice.encadrants):
+        row = [f"{nom} {prenom}"] + ['x' if participe else '' for participe in matrice.cases(ligne)]
+        feuille.ligne(row, styles=styles_cases)
+
+    if annee_saison is not None:
+        suffix = f"_{libelle_saison(annee_saison)}"
+    elif date_debut or date_fin:
+        suffix = f"_{date_debut or 'debut'}_{date_fin or 'fin'}"
+    else:
+        suffix = ''
+    return classeur.reponse(f"participations_encadrants{suffix}.xlsx")
 
-    headers = ['Encadrant'] + [seance.date.strftime('%d/%m/%Y') for seance in seances]
-    ws.append(headers)
 
-    header_fill = PatternFill(start_color='D9E1F2', end_color='D9E1F2', fill_type='solid')
-    for col_idx in range(1, len(headers) + 1):
-        cell = ws.cell(row=1, column=col_idx)
-        cell.font = Font(bold=True)
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal='center', vertical='center')
+def _contexte_participations(request):
+    date_debut, date_fin, annee_saison = periode_participations(request.GET)
+    matrice = matrice_participations(date_debut, date_fin)
+    return {
+        'date_debut': date_debut,
+        'date_fin': date_fin,
+        'saison': libelle_saison(annee_saison) if annee_saison is not None else None,
+        **matrice.resume(),
+    }
 
-    for encadrant in encadrants:
-        row = [f"{encadrant.nom} {encadrant.prenom}"]
-        for seance in seances:
-            row.append('x' if (encadrant.id, seance.id) in participations else '')
-        ws.append(row)
 
-    ws.column_dimensions['A'].width = 35
-    for col_idx in range(2, len(headers) + 1):
-        col_letter = get_column_letter(col_idx)
-        ws.column_dimensions[col_letter].width = 12
+@login_required
+def participations_encadrants(request):
+    """Rapport des participations des encadrants : totaux par encadrant et par saison."""
+    from .utils import can_access_dashboard
+    if not can_access_dashboard(request.user):
+        return redirect('login')
+    context = _contexte_participations(request)
+    context['saisons_disponibles'] = [(annee, libelle_saison(annee)) for annee in saisons_disponibles()]
+    context['saison_choisie'] = request.GET.get('saison', '')
+    return render(request, 'gestion/participations_encadrants.html', context)
 
-    for row in ws.iter_rows(min_row=2, min_col=2, max_row=ws.max_row, max_col=ws.max_column):
-        for cell in row:
-            cell.alignment = Alignment(horizontal='center', vertical='center')
 
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    suffix = ''
-    if date_debut or date_fin:
-        suffix = f"_{date_debut or 'debut'}_{date_fin or 'fin'}"
-    response['Content-Disposition'] = f'attachment; filename="participations_encadrants{suffix}.xlsx"'
-    wb.save(response)
-    return response
+@login_required
+def api_participations_encadrants(request):
+    """API JSON des participations des encadrants (mêmes paramètres que le rapport)."""
+    from .utils import can_access_dashboard
+    if not can_access_dashboard(request.user):
+        return JsonResponse({'error': 'Accès refusé'}, status=403)
+    context = _contexte_participations(request)
+    context['date_debut'] = context['date_debut'].isoformat() if context['date_debut'] else None
+    context['date_fin'] = context['date_fin'].isoformat() if context['date_fin'] else None
+    return JsonResponse(context)
 
 def affecter_section_masse(request):
     from django.contrib import messages
@@ -4564,7 +3463,6 @@ def envoyer_pdf_palanquee_encadrant(request, palanquee_id):
     import os
     from django.conf import settings
     from .utils import get_signature_html
-    from django.core.mail import EmailMultiAlternatives
     from django.template.loader import render_to_string
     from .models import Palanquee
 
@@ -4608,25 +3506,20 @@ def envoyer_pdf_palanquee_encadrant(request, palanquee_id):
     if palanquee.precision_exercices:
         elements.append(Paragraph("Nota", heading_style))
         elements.append(Paragraph(palanquee.precision_exercices, normal_style))
-    doc.build(elements)
+    with section('reportlab'):
+        doc.build(elements)
     buffer.seek(0)
     # Préparer et envoyer le mail
     signature_html = get_signature_html()
-    signature_img_path = os.path.join(settings.BASE_DIR, 'static', 'Signature_mouss.png')
-    subject = f"Fiche palanquée - {palanquee.nom} ({seance.date})"
     body = render_to_string('gestion/email_pdf_palanquee.txt', {'palanquee': palanquee, 'seance': seance})
     body_html = f"<p>{body.replace(chr(10), '<br>')}</p>{signature_html}"
-    email = EmailMultiAlternatives(subject, body, to=[encadrant.email])
-    email.attach(f"fiche_palanquee_{palanquee.seance.date}_{palanquee.encadrant.nom_complet}.pdf", buffer.read(), 'application/pdf')
-    email.attach_alternative(body_html, "text/html")
-    if os.path.exists(signature_img_path):
-        with open(signature_img_path, 'rb') as img:
-            mime_img = MIMEImage(img.read(), _subtype='png')
-            mime_img.add_header('Content-ID', '<signature_mouss2>')
-            mime_img.add_header('Content-Disposition', 'inline', filename='Signature_mouss2.png')
-            email.attach(mime_img)
+    modele = ModeleMail(f"Fiche palanquée - {palanquee.nom} ({seance.date})", texte=body, html=body_html, signature=SIGNATURE_PDF)
+    email = modele.message([encadrant.email], pieces_jointes=[
+        (f"fiche_palanquee_{palanquee.seance.date}_{palanquee.encadrant.nom_complet}.pdf", buffer.read(), 'application/pdf'),
+    ])
     try:
-        email.send()
+        with section('smtp'):
+            email.send()
         messages.success(request, f"PDF envoyé à l'encadrant {encadrant.nom_complet}.")
     except Exception as e:
         messages.error(request, f"Erreur lors de l'envoi : {str(e)}")
@@ -4646,7 +3539,7 @@ class CommunicationAdherentsView(LoginRequiredMixin, View):
         for adherent in adherents_qs:
             is_codir = False
             if adherent.user:
-                is_codir = adherent.user.groups.filter(name='codir').exists()
+                is_codir = any(group.name == 'codir' for group in adherent.user.groups.all())
             adherents_avec_codir.append((adherent, is_codir))
         
         adherents_choices = [
@@ -4656,7 +3549,7 @@ class CommunicationAdherentsView(LoginRequiredMixin, View):
         listes_diffusion = ListeDiffusion.objects.all().prefetch_related('adherents')
         form = CommunicationAdherentsForm(inscrits_choices=adherents_choices, listes_diffusion=listes_diffusion)
         modeles = ModeleMailAdherents.objects.all()
-        historique = HistoriqueMailAdherents.objects.order_by('-date_envoi')[:20]
+        historique = annoter_etat_envoi(HistoriqueMailAdherents.objects.order_by('-date_envoi'))[:20]
         # Préparer les données des listes pour le JavaScript (IDs des adhérents par liste)
         import json
         listes_data = {}
@@ -4688,7 +3581,7 @@ class CommunicationAdherentsView(LoginRequiredMixin, View):
         for adherent in adherents_qs:
             is_codir = False
             if adherent.user:
-                is_codir = adherent.user.groups.filter(name='codir').exists()
+                is_codir = any(group.name == 'codir' for group in adherent.user.groups.all())
             adherents_avec_codir.append((adherent, is_codir))
         
         adherents_choices = [
@@ -4698,7 +3591,7 @@ class CommunicationAdherentsView(LoginRequiredMixin, View):
         listes_diffusion = ListeDiffusion.objects.all().prefetch_related('adherents')
         form = CommunicationAdherentsForm(request.POST, request.FILES, inscrits_choices=adherents_choices, listes_diffusion=listes_diffusion)
         modeles = ModeleMailAdherents.objects.all()
-        historique = HistoriqueMailAdherents.objects.all()[:20]
+        historique = annoter_etat_envoi(HistoriqueMailAdherents.objects.all())[:20]
         # Préparer les données des listes pour le JavaScript (IDs des adhérents par liste)
         import json
         listes_data = {}
@@ -4818,7 +3711,6 @@ class CommunicationAdherentsView(LoginRequiredMixin, View):
                         'historique': historique,
                         'listes_diffusion': listes_diffusion,
                     })
-            from django.core.mail import EmailMessage
             from django.conf import settings
             # Charger les fichiers en mémoire une seule fois pour éviter les problèmes de lecture multiple
             fichiers_data = []
@@ -4851,32 +3743,38 @@ class CommunicationAdherentsView(LoginRequiredMixin, View):
                         'email': adherent.email
                     })
             
-            # Envoi individuel à chaque destinataire (sans BCC)
-            batch_size = 10
+            # Un mail par destinataire (sans BCC) ; les fichiers joints sont encodés une fois pour tous
+            modele = ModeleMail(
+                form.cleaned_data['objet'],
+                html=form.cleaned_data['contenu'],
+                html_seul=True,
+                pieces_jointes=[(f_data['name'], f_data['content'], f_data['content_type']) for f_data in fichiers_data],
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                reply_to=reply_to_list,
+            )
+
+            def construire_messages():
+                for email_dest in destinataires:
+                    yield email_dest, modele.message([email_dest])
+
+            # Historique, auquel chaque mail mis en file est rattaché pour suivre son envoi
+            historique_mail = HistoriqueMailAdherents.objects.create(
+                objet=form.cleaned_data['objet'],
+                contenu=form.cleaned_data['contenu'],
+                destinataires=",".join(destinataires),
+                fichiers=",".join([f.name for f in fichiers]),
+                auteur=request.user
+            )
+            # Mise en file : la commande traiter_boite_envoi envoie les mails au rythme autorisé par le serveur SMTP
+            mis_en_file = mettre_en_file(
+                construire_messages(), origine='communication_adherents', historique_adherents=historique_mail,
+            )
             destinataires_envoyes = []
-            for i in range(0, len(destinataires), batch_size):
-                batch = destinataires[i:i+batch_size]
-                # Envoyer un mail individuel à chaque destinataire du lot
-                for email_dest in batch:
-                    email = EmailMessage(
-                        subject=form.cleaned_data['objet'],
-                        body=form.cleaned_data['contenu'],
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        to=[email_dest],
-                        reply_to=reply_to_list if reply_to_list else None,
-                    )
-                    email.content_subtype = "html"
-                    # Utiliser les données pré-chargées au lieu de relire les fichiers
-                    for f_data in fichiers_data:
-                        email.attach(f_data['name'], f_data['content'], f_data['content_type'])
-                    email.send()
-                    # Ajouter le destinataire à la liste
-                    dest_info = next((d for d in destinataires_complets if d['email'] == email_dest), None)
-                    if dest_info and dest_info not in destinataires_envoyes:
-                        destinataires_envoyes.append(dest_info)
-                # Pause entre les lots pour éviter les limites SMTP
-                if (i + batch_size) < len(destinataires):
-                    time.sleep(3)
+            for email_dest, mail in hors_doublons(request, mis_en_file):
+                # Ajouter le destinataire à la liste
+                dest_info = next((d for d in destinataires_complets if d['email'] == email_dest), None)
+                if dest_info and dest_info not in destinataires_envoyes:
+                    destinataires_envoyes.append(dest_info)
             
             # Stocker la liste des destinataires dans la session pour l'affichage
             if destinataires_envoyes:
@@ -4886,16 +3784,7 @@ class CommunicationAdherentsView(LoginRequiredMixin, View):
                     'destinataires': destinataires_envoyes,
                     'objet': form.cleaned_data['objet']
                 }
-            
-            # Historique
-            HistoriqueMailAdherents.objects.create(
-                objet=form.cleaned_data['objet'],
-                contenu=form.cleaned_data['contenu'],
-                destinataires=",".join(destinataires),
-                fichiers=",".join([f.name for f in fichiers]),
-                auteur=request.user
-            )
-            messages.success(request, f"Mail envoyé avec succès à {len(destinataires_envoyes)} destinataire(s).")
+            messages.success(request, f"Mail mis en file d'envoi pour {len(destinataires_envoyes)} destinataire(s).")
             return redirect('adherents_communiquer')
         else:
             return render(request, 'gestion/communication_adherents.html', {
@@ -4955,11 +3844,158 @@ def suivi_inscrits_seance(request, seance_id):
     }
     return render(request, 'gestion/seance_suivi_inscrits.html', context)
 
+def _suivi_date_seance(evaluation):
+    if evaluation and evaluation.palanquee and evaluation.palanquee.seance:
+        return evaluation.palanquee.seance.date.strftime('%d/%m/%Y')
+    return ''
+
+
+def _suivi_cellule_par_exercice(eleve, progression, avec_historique=False):
+    """Cellule élève de la vue « par exercice » des API de suivi."""
+    derniere_eval = progression.derniere_evaluation
+    derniere_eval_max = progression.derniere_evaluation_max
+    eleve_data = {
+        'id': eleve.id,
+        'nom': eleve.nom,
+        'prenom': eleve.prenom,
+        'nom_complet': eleve.nom_complet,
+        'note_max': progression.note_max,
+        'nb_eval_max': progression.nb_eval_max,
+        'commentaire': derniere_eval.commentaire if derniere_eval else '',
+        'date_derniere_eval': derniere_eval.date_evaluation.strftime('%d/%m/%Y') if derniere_eval and derniere_eval.date_evaluation else '',
+        'date_seance': _suivi_date_seance(derniere_eval),
+        'encadrant_max': derniere_eval_max.encadrant.nom_complet if derniere_eval_max and derniere_eval_max.encadrant else '',
+        'has_evaluation': progression.has_evaluation,
+    }
+    if avec_historique:
+        # Évaluations notées, ordonnées par note décroissante (pour l'affichage par élève)
+        toutes_evaluations = [
+            {
+                'note': ev.note,
+                'date': ev.date_evaluation.strftime('%d/%m/%Y') if ev.date_evaluation else '',
+                'commentaire': ev.commentaire or '',
+                'encadrant': ev.encadrant.nom_complet if ev.encadrant else ''
+            }
+            for ev in progression.historique if ev.note
+        ]
+        toutes_evaluations.sort(key=lambda x: x['note'], reverse=True)
+        eleve_data['toutes_evaluations'] = toutes_evaluations
+    return eleve_data
+
+
+def _suivi_cellule_par_eleve(exercice, progression):
+    """Cellule exercice de la vue « par élève » des API de suivi."""
+    derniere_eval = progression.derniere_evaluation
+    return {
+        'id': exercice.id,
+        'nom': exercice.nom,
+        'note_max': progression.note_max,
+        'nb_eval_max': progression.nb_eval_max,
+        'commentaire': derniere_eval.commentaire if derniere_eval else '',
+        'date_derniere_eval': derniere_eval.date_evaluation.strftime('%d/%m/%Y') if derniere_eval and derniere_eval.date_evaluation else '',
+        'date_seance': _suivi_date_seance(derniere_eval),
+        'encadrant': derniere_eval.encadrant.nom_complet if derniere_eval and derniere_eval.encadrant else '',
+        'has_evaluation': progression.has_evaluation,
+    }
+
+
+def _suivi_section_payload(section, eleves, exercices, avec_historique=False):
+    """Ancien format détaillé des API de suivi (?version=1) : vues par exercice et par élève."""
+    progressions = charger_progressions(eleves, exercices, avec_historique=avec_historique)
+    result = {
+        'section_nom': section.get_nom_display(),
+        'exercices': [
+            {
+                'id': exercice.id,
+                'nom': exercice.nom,
+                'eleves_data': [
+                    _suivi_cellule_par_exercice(eleve, progressions[(eleve.id, exercice.id)], avec_historique)
+                    for eleve in eleves
+                ],
+            }
+            for exercice in exercices
+        ],
+        # Liste des élèves pour référence
+        'eleves': [
+            {'id': e.id, 'nom': e.nom, 'prenom': e.prenom, 'nom_complet': e.nom_complet}
+            for e in eleves
+        ],
+        # Structure pour l'affichage par élève
+        'eleves_data': [
+            {
+                'id': eleve.id,
+                'nom': eleve.nom,
+                'prenom': eleve.prenom,
+                'nom_complet': eleve.nom_complet,
+                'exercices': [
+                    _suivi_cellule_par_eleve(exercice, progressions[(eleve.id, exercice.id)])
+                    for exercice in exercices
+                ],
+            }
+            for eleve in eleves
+        ],
+    }
+    return result
+
+# Version du format compact des API de suivi (?version=1 : ancien format détaillé)
+SUIVI_FORMAT_VERSION = 2
+
+
+def _suivi_section_compact(section, eleves, exercices):
+    """
+    Format compact des API de suivi : élèves, exercices, encadrants et dates
+    envoyés une seule fois, puis une cellule par couple (élève, exercice) dans
+    un tableau dense indexé par eleve_index * len(exercices) + exercice_index.
+    Une cellule vaut null si l'élève n'a jamais été évalué sur l'exercice, sinon
+    [note_max, nb_eval_max, commentaire, date_derniere_eval, date_seance,
+    encadrant, encadrant_max], les dates et encadrants étant des index dans
+    les tableaux 'dates' et 'encadrants' (ou null).
+    Le navigateur reconstruit les vues par exercice et par élève (pivoterSuiviCompact).
+    """
+    progressions = charger_progressions(eleves, exercices)
+    dictionnaires = {'dates': {}, 'encadrants': {}}
+
+    def indexer(nom, valeur):
+        if not valeur:
+            return None
+        return dictionnaires[nom].setdefault(valeur, len(dictionnaires[nom]))
+
+    cellules = []
+    for eleve in eleves:
+        for exercice in exercices:
+            progression = progressions[(eleve.id, exercice.id)]
+            if not progression.has_evaluation:
+                cellules.append(None)
+                continue
+            derniere_eval = progression.derniere_evaluation
+            derniere_eval_max = progression.derniere_evaluation_max
+            cellules.append([
+                progression.note_max,
+                progression.nb_eval_max,
+                derniere_eval.commentaire,
+                indexer('dates', derniere_eval.date_evaluation.strftime('%d/%m/%Y') if derniere_eval.date_evaluation else ''),
+                indexer('dates', _suivi_date_seance(derniere_eval)),
+                indexer('encadrants', derniere_eval.encadrant.nom_complet if derniere_eval.encadrant else ''),
+                indexer('encadrants', derniere_eval_max.encadrant.nom_complet if derniere_eval_max and derniere_eval_max.encadrant else ''),
+            ])
+    return {
+        'version': SUIVI_FORMAT_VERSION,
+        'section_nom': section.get_nom_display(),
+        'eleves': [[e.id, e.nom, e.prenom] for e in eleves],
+        'exercices': [[ex.id, ex.nom] for ex in exercices],
+        'dates': list(dictionnaires['dates']),
+        'encadrants': list(dictionnaires['encadrants']),
+        'cellules': cellules,
+    }
+
+
+def _suivi_format_detaille(request):
+    return request.GET.get('version') == '1'
+
 @login_required
+@gzip_page
 def api_suivi_inscrits_section(request, seance_id):
     """API AJAX pour charger les exercices et les données des élèves selon la section"""
-    from django.db.models import Max, Count
-    
     seance = get_object_or_404(Seance, pk=seance_id)
     section_id = request.GET.get('section_id')
     
@@ -4971,13 +4007,7 @@ def api_suivi_inscrits_section(request, seance_id):
     except Section.DoesNotExist:
         return JsonResponse({'error': 'Section introuvable'}, status=404)
     
-    # Récupérer les exercices de la section (via les compétences)
-    competences = Competence.objects.filter(section=section).prefetch_related('exercices')
-    exercices_ids = set()
-    for comp in competences:
-        exercices_ids.update(comp.exercices.filter(type=Exercice.TYPE_CLASSIQUE).values_list('id', flat=True))
-    
-    exercices = Exercice.objects.filter(id__in=exercices_ids).order_by('nom')
+    exercices = list(exercices_section(section))
     
     # Récupérer les élèves inscrits à la séance ET de la section
     inscriptions = InscriptionSeance.objects.filter(
@@ -4988,131 +4018,9 @@ def api_suivi_inscrits_section(request, seance_id):
     
     eleves = [ins.personne for ins in inscriptions]
     
-    # Pour chaque exercice, préparer les données des élèves
-    result = {
-        'section_nom': section.get_nom_display(),
-        'exercices': [],
-        'eleves': []
-    }
-    
-    for exercice in exercices:
-        exercice_data = {
-            'id': exercice.id,
-            'nom': exercice.nom,
-            'eleves_data': []
-        }
-        
-        for eleve in eleves:
-            # Récupérer toutes les évaluations de cet élève pour cet exercice (toutes séances confondues)
-            evaluations = EvaluationExercice.objects.filter(
-                eleve=eleve,
-                exercice=exercice
-            ).select_related('encadrant', 'palanquee__seance').order_by('-date_evaluation')
-            
-            # Trouver la note maximale
-            note_max = None
-            if evaluations.exists():
-                note_max = evaluations.aggregate(Max('note'))['note__max']
-            
-            # Compter le nombre d'évaluations avec cette note maximale
-            nb_eval_max = 0
-            derniere_eval_max = None
-            if note_max:
-                evals_max = evaluations.filter(note=note_max).order_by('-date_evaluation')
-                nb_eval_max = evals_max.count()
-                # Dernière évaluation avec la note maximale
-                derniere_eval_max = evals_max.first()
-            
-            # Dernière évaluation (toutes notes confondues)
-            derniere_eval = evaluations.first()
-            
-            # Préparer toutes les évaluations pour l'affichage par élève (ordonnées par note décroissante)
-            toutes_evaluations = []
-            for eval in evaluations:
-                if eval.note:  # Seulement les évaluations avec une note
-                    toutes_evaluations.append({
-                        'note': eval.note,
-                        'date': eval.date_evaluation.strftime('%d/%m/%Y') if eval.date_evaluation else '',
-                        'commentaire': eval.commentaire or '',
-                        'encadrant': eval.encadrant.nom_complet if eval.encadrant else ''
-                    })
-            # Trier par note décroissante
-            toutes_evaluations.sort(key=lambda x: x['note'], reverse=True)
-            
-            eleve_data = {
-                'id': eleve.id,
-                'nom': eleve.nom,
-                'prenom': eleve.prenom,
-                'nom_complet': eleve.nom_complet,
-                'note_max': note_max,
-                'nb_eval_max': nb_eval_max,
-                'commentaire': derniere_eval.commentaire if derniere_eval else '',
-                'date_derniere_eval': derniere_eval.date_evaluation.strftime('%d/%m/%Y') if derniere_eval and derniere_eval.date_evaluation else '',
-                'date_seance': derniere_eval.palanquee.seance.date.strftime('%d/%m/%Y') if derniere_eval and derniere_eval.palanquee and derniere_eval.palanquee.seance else '',
-                'encadrant_max': derniere_eval_max.encadrant.nom_complet if derniere_eval_max and derniere_eval_max.encadrant else '',
-                'has_evaluation': evaluations.exists(),
-                'toutes_evaluations': toutes_evaluations  # Pour l'affichage par élève
-            }
-            
-            exercice_data['eleves_data'].append(eleve_data)
-        
-        result['exercices'].append(exercice_data)
-    
-    # Liste des élèves pour référence
-    result['eleves'] = [
-        {'id': e.id, 'nom': e.nom, 'prenom': e.prenom, 'nom_complet': e.nom_complet}
-        for e in eleves
-    ]
-    
-    # Structure pour l'affichage par élève
-    result['eleves_data'] = []
-    for eleve in eleves:
-        eleve_data = {
-            'id': eleve.id,
-            'nom': eleve.nom,
-            'prenom': eleve.prenom,
-            'nom_complet': eleve.nom_complet,
-            'exercices': []
-        }
-        
-        for exercice in exercices:
-            # Récupérer toutes les évaluations de cet élève pour cet exercice
-            evaluations = EvaluationExercice.objects.filter(
-                eleve=eleve,
-                exercice=exercice
-            ).select_related('encadrant', 'palanquee__seance').order_by('-date_evaluation')
-            
-            # Trouver la note maximale et le nombre de fois qu'il a eu cette note
-            note_max = None
-            nb_eval_max = 0
-            derniere_eval_max = None
-            if evaluations.exists():
-                note_max = evaluations.aggregate(Max('note'))['note__max']
-                if note_max:
-                    evals_max = evaluations.filter(note=note_max).order_by('-date_evaluation')
-                    nb_eval_max = evals_max.count()
-                    derniere_eval_max = evals_max.first()
-            
-            # Dernière évaluation (toutes notes confondues)
-            derniere_eval = evaluations.first()
-            
-            exercice_data = {
-                'id': exercice.id,
-                'nom': exercice.nom,
-                'note_max': note_max,
-                'nb_eval_max': nb_eval_max,
-                'commentaire': derniere_eval.commentaire if derniere_eval else '',
-                'date_derniere_eval': derniere_eval.date_evaluation.strftime('%d/%m/%Y') if derniere_eval and derniere_eval.date_evaluation else '',
-                'date_seance': derniere_eval.palanquee.seance.date.strftime('%d/%m/%Y') if derniere_eval and derniere_eval.palanquee and derniere_eval.palanquee.seance else '',
-                'encadrant': derniere_eval.encadrant.nom_complet if derniere_eval and derniere_eval.encadrant else '',
-                'has_evaluation': evaluations.exists()
-            }
-            
-            eleve_data['exercices'].append(exercice_data)
-        
-        result['eleves_data'].append(eleve_data)
-    
-    return JsonResponse(result)
+    if _suivi_format_detaille(request):
+        return JsonResponse(_suivi_section_payload(section, eleves, exercices, avec_historique=True))
+    return JsonResponse(_suivi_section_compact(section, eleves, exercices))
 
 @login_required
 def api_historique_eleve_exercice(request, eleve_id, exercice_id):
@@ -5160,10 +4068,9 @@ def suivi_eleves(request):
     return render(request, 'gestion/eleve_suivi.html', context)
 
 @login_required
+@gzip_page
 def api_suivi_eleves_section(request):
     """API AJAX pour charger les exercices et les données de tous les élèves selon la section"""
-    from django.db.models import Max
-    
     section_id = request.GET.get('section_id')
     
     if not section_id:
@@ -5174,130 +4081,15 @@ def api_suivi_eleves_section(request):
     except Section.DoesNotExist:
         return JsonResponse({'error': 'Section introuvable'}, status=404)
     
-    # Récupérer les exercices de la section (via les compétences)
-    competences = Competence.objects.filter(section=section).prefetch_related('exercices')
-    exercices_ids = set()
-    for comp in competences:
-        exercices_ids.update(comp.exercices.filter(type=Exercice.TYPE_CLASSIQUE).values_list('id', flat=True))
-    
-    exercices = Exercice.objects.filter(id__in=exercices_ids).order_by('nom')
+    exercices = list(exercices_section(section))
     
     # Récupérer TOUS les élèves de la section (pas seulement ceux inscrits à une séance)
-    eleves = Adherent.objects.filter(
+    eleves = list(Adherent.objects.filter(
         statut='eleve',
         sections=section,
         actif=True
-    ).order_by('nom', 'prenom')
-    
-    # Pour chaque exercice, préparer les données des élèves
-    result = {
-        'section_nom': section.get_nom_display(),
-        'exercices': [],
-        'eleves': []
-    }
+    ).order_by('nom', 'prenom'))
     
-    for exercice in exercices:
-        exercice_data = {
-            'id': exercice.id,
-            'nom': exercice.nom,
-            'eleves_data': []
-        }
-        
-        for eleve in eleves:
-            # Récupérer toutes les évaluations de cet élève pour cet exercice (toutes séances confondues)
-            evaluations = EvaluationExercice.objects.filter(
-                eleve=eleve,
-                exercice=exercice
-            ).select_related('encadrant', 'palanquee__seance').order_by('-date_evaluation')
-            
-            # Trouver la note maximale
-            note_max = None
-            if evaluations.exists():
-                note_max = evaluations.aggregate(Max('note'))['note__max']
-            
-            # Compter le nombre d'évaluations avec cette note maximale
-            nb_eval_max = 0
-            derniere_eval_max = None
-            if note_max:
-                evals_max = evaluations.filter(note=note_max).order_by('-date_evaluation')
-                nb_eval_max = evals_max.count()
-                # Dernière évaluation avec la note maximale
-                derniere_eval_max = evals_max.first()
-            
-            # Dernière évaluation (toutes notes confondues)
-            derniere_eval = evaluations.first()
-            
-            eleve_data = {
-                'id': eleve.id,
-                'nom': eleve.nom,
-                'prenom': eleve.prenom,
-                'nom_complet': eleve.nom_complet,
-                'note_max': note_max,
-                'nb_eval_max': nb_eval_max,
-                'commentaire': derniere_eval.commentaire if derniere_eval else '',
-                'date_derniere_eval': derniere_eval.date_evaluation.strftime('%d/%m/%Y') if derniere_eval and derniere_eval.date_evaluation else '',
-                'date_seance': derniere_eval.palanquee.seance.date.strftime('%d/%m/%Y') if derniere_eval and derniere_eval.palanquee and derniere_eval.palanquee.seance else '',
-                'encadrant_max': derniere_eval_max.encadrant.nom_complet if derniere_eval_max and derniere_eval_max.encadrant else '',
-                'has_evaluation': evaluations.exists(),
-            }
-            
-            exercice_data['eleves_data'].append(eleve_data)
-        
-        result['exercices'].append(exercice_data)
-    
-    # Liste des élèves pour référence
-    result['eleves'] = [
-        {'id': e.id, 'nom': e.nom, 'prenom': e.prenom, 'nom_complet': e.nom_complet}
-        for e in eleves
-    ]
-    
-    # Structure pour l'affichage par élève
-    result['eleves_data'] = []
-    for eleve in eleves:
-        eleve_data = {
-            'id': eleve.id,
-            'nom': eleve.nom,
-            'prenom': eleve.prenom,
-            'nom_complet': eleve.nom_complet,
-            'exercices': []
-        }
-        
-        for exercice in exercices:
-            # Récupérer toutes les évaluations de cet élève pour cet exercice
-            evaluations = EvaluationExercice.objects.filter(
-                eleve=eleve,
-                exercice=exercice
-            ).select_related('encadrant', 'palanquee__seance').order_by('-date_evaluation')
-            
-            # Trouver la note maximale et le nombre de fois qu'il a eu cette note
-            note_max = None
-            nb_eval_max = 0
-            derniere_eval_max = None
-            if evaluations.exists():
-                note_max = evaluations.aggregate(Max('note'))['note__max']
-                if note_max:
-                    evals_max = evaluations.filter(note=note_max).order_by('-date_evaluation')
-                    nb_eval_max = evals_max.count()
-                    derniere_eval_max = evals_max.first()
-            
-            # Dernière évaluation (toutes notes confondues)
-            derniere_eval = evaluations.first()
-            
-            exercice_data = {
-                'id': exercice.id,
-                'nom': exercice.nom,
-                'note_max': note_max,
-                'nb_eval_max': nb_eval_max,
-                'commentaire': derniere_eval.commentaire if derniere_eval else '',
-                'date_derniere_eval': derniere_eval.date_evaluation.strftime('%d/%m/%Y') if derniere_eval and derniere_eval.date_evaluation else '',
-                'date_seance': derniere_eval.palanquee.seance.date.strftime('%d/%m/%Y') if derniere_eval and derniere_eval.palanquee and derniere_eval.palanquee.seance else '',
-                'encadrant': derniere_eval.encadrant.nom_complet if derniere_eval and derniere_eval.encadrant else '',
-                'has_evaluation': evaluations.exists()
-            }
-            
-            eleve_data['exercices'].append(exercice_data)
-        
-        result['eleves_data'].append(eleve_data)
-    
-    return JsonResponse(result)
-
+    if _suivi_format_detaille(request):
+        return JsonResponse(_suivi_section_payload(section, eleves, exercices))
+    return JsonResponse(_suivi_section_compact(section, eleves, exercices))
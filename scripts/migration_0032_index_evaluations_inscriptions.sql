@@ -0,0 +1,30 @@
+-- PostgreSQL équivalent à la migration Django 0032_index_evaluations_inscriptions
+-- Index composites des chemins les plus sollicités :
+--   * historique d'un élève sur un exercice (eleve, exercice, date décroissante)
+--   * saisie des évaluations par palanquée (palanquee, eleve, exercice)
+--   * adhérents filtrés par type de personne, statut et activité
+-- Les index simples sur evaluationexercice.eleve_id, evaluationexercice.palanquee_id et
+-- inscriptionseance.seance_id deviennent redondants (couverts par un index composite
+-- ou par l'index unique (seance_id, personne_id)) et sont supprimés.
+--
+-- CONCURRENTLY évite de bloquer les écritures pendant la création : ne pas exécuter
+-- ce script dans une transaction (psql -f sans BEGIN/COMMIT).
+--
+-- Après exécution sur la base de production, si la migration n’est pas enregistrée dans Django :
+--   python manage.py migrate gestion 0032 --fake
+--
+-- Mesure avant / après sur un jeu de données synthétique :
+--   python manage.py mesurer_index
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS adherent_type_statut_actif
+    ON gestion_adherent (type_personne, statut, actif);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS evalex_eleve_ex_date
+    ON gestion_evaluationexercice (eleve_id, exercice_id, date_evaluation DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS evalex_palanquee_eleve_ex
+    ON gestion_evaluationexercice (palanquee_id, eleve_id, exercice_id);
+
+DROP INDEX CONCURRENTLY IF EXISTS gestion_evaluationexercice_eleve_id_7d2e5ec8;
+DROP INDEX CONCURRENTLY IF EXISTS gestion_evaluationexercice_palanquee_id_19ac170e;
+DROP INDEX CONCURRENTLY IF EXISTS gestion_inscriptionseance_seance_id_1520ccf4;
@@ -329,4 +329,60 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     console.log('Application Club de Plongée initialisée avec succès !');
-}); 
\ No newline at end of file
+}); 
+// Reconstruit, à partir du format compact des API de suivi (version 2),
+// les vues par exercice (exercices[].eleves_data[]) et par élève (eleves_data[].exercices[]).
+function pivoterSuiviCompact(data) {
+    if (data.version !== 2) {
+        return data;
+    }
+    const valeur = function(table, index) {
+        return index === null || index === undefined ? '' : table[index];
+    };
+    const eleves = data.eleves.map(function(e) {
+        return {id: e[0], nom: e[1], prenom: e[2], nom_complet: e[1] + ' ' + e[2]};
+    });
+    const exercices = data.exercices.map(function(ex) {
+        return {id: ex[0], nom: ex[1]};
+    });
+    const nbExercices = exercices.length;
+    const cellule = function(i, j) {
+        const c = data.cellules[i * nbExercices + j];
+        if (!c) {
+            return {note_max: null, nb_eval_max: 0, commentaire: '', date_derniere_eval: '', date_seance: '',
+                    encadrant: '', encadrant_max: '', has_evaluation: false};
+        }
+        return {
+            note_max: c[0],
+            nb_eval_max: c[1],
+            commentaire: c[2],
+            date_derniere_eval: valeur(data.dates, c[3]),
+            date_seance: valeur(data.dates, c[4]),
+            encadrant: valeur(data.encadrants, c[5]),
+            encadrant_max: valeur(data.encadrants, c[6]),
+            has_evaluation: true
+        };
+    };
+    return {
+        section_nom: data.section_nom,
+        eleves: eleves,
+        exercices: exercices.map(function(ex, j) {
+            return Object.assign({}, ex, {
+                eleves_data: eleves.map(function(e, i) {
+                    const c = cellule(i, j);
+                    delete c.encadrant;
+                    return Object.assign({}, e, c);
+                })
+            });
+        }),
+        eleves_data: eleves.map(function(e, i) {
+            return Object.assign({}, e, {
+                exercices: exercices.map(function(ex, j) {
+                    const c = cellule(i, j);
+                    delete c.encadrant_max;
+                    return Object.assign({}, ex, c);
+                })
+            });
+        })
+    };
+}